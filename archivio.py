@@ -0,0 +1,381 @@
+"""💾 Archivio persistente SQLite del bot BasilicataGo.
+
+Conserva i messaggi programmati, le pubblicazioni ricorrenti, le
+impostazioni, gli iscritti al bot, lo stato dei broadcast e la posta in
+uscita verso il canale in modo che sopravvivano a riavvii e crash.
+
+Il database è in modalità WAL. Le scritture non vengono eseguite subito:
+finiscono in una coda che la coroutine scrittore() svuota in un'unica
+transazione su un thread separato, così i comandi non attendono l'fsync.
+Fanno eccezione la creazione dei broadcast e la posta in uscita, scritte
+subito perché lo stato deve essere su disco prima della chiamata a Telegram.
+
+Se la transazione fallisce perché il file è occupato (altri processi sullo
+stesso archivio) il blocco torna in testa alla coda e si riprova con un
+ritardo crescente; con altri errori si riprovano le operazioni una per una
+e si scartano, annotandole nel log, solo quelle che falliscono.
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Attesa per raggruppare più scritture nella stessa transazione
+RITARDO_SCRITTURA = 0.2
+# Ritardo massimo tra due tentativi quando il database è occupato
+RITARDO_MASSIMO = 10.0
+# Tentativi della scrittura finale alla chiusura
+TENTATIVI_CHIUSURA = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS programmati (
+    id        TEXT PRIMARY KEY,
+    quando    REAL NOT NULL,
+    messaggio TEXT NOT NULL,
+    gruppo    TEXT
+);
+CREATE TABLE IF NOT EXISTS ricorrenze (
+    id          TEXT PRIMARY KEY,
+    espressione TEXT NOT NULL,
+    testo       TEXT,
+    gruppo      TEXT
+);
+CREATE TABLE IF NOT EXISTS impostazioni (
+    chiave TEXT PRIMARY KEY,
+    valore TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS iscritti (
+    chat_id     INTEGER PRIMARY KEY,
+    iscritto_il REAL NOT NULL,
+    disiscritto INTEGER NOT NULL DEFAULT 0,
+    bloccato    INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS broadcast (
+    id            INTEGER PRIMARY KEY,
+    testo         TEXT NOT NULL,
+    admin_chat    INTEGER NOT NULL,
+    messaggio_id  INTEGER,
+    totale        INTEGER NOT NULL,
+    cursore       INTEGER NOT NULL DEFAULT 0,
+    inviati       INTEGER NOT NULL DEFAULT 0,
+    falliti       INTEGER NOT NULL DEFAULT 0,
+    completato    INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS uscita (
+    id         INTEGER PRIMARY KEY,
+    chiave     TEXT NOT NULL UNIQUE,
+    chat_id    INTEGER NOT NULL,
+    testo      TEXT NOT NULL,
+    opzioni    TEXT NOT NULL,
+    stato      TEXT NOT NULL DEFAULT 'in_attesa',
+    tentativi  INTEGER NOT NULL DEFAULT 0,
+    prossimo   REAL NOT NULL,
+    creato     REAL NOT NULL,
+    message_id INTEGER,
+    errore     TEXT
+);
+CREATE INDEX IF NOT EXISTS uscita_stato ON uscita (stato);
+"""
+
+# Colonne aggiunte dopo la prima versione dello schema: (tabella, colonna, tipo)
+COLONNE_AGGIUNTE = (
+    ('programmati', 'gruppo', 'TEXT'),
+    ('ricorrenze', 'gruppo', 'TEXT'),
+)
+
+# Colonne aggiornabili con aggiorna_uscita()
+CAMPI_USCITA = frozenset(('stato', 'tentativi', 'prossimo', 'message_id', 'errore'))
+
+
+def occupato(errore):
+    """True se l'errore SQLite è transitorio: il database è bloccato da un'altra connessione."""
+    return isinstance(errore, sqlite3.OperationalError) and ('locked' in str(errore) or 'busy' in str(errore))
+
+
+class Archivio:
+    """Accesso al database con scritture asincrone raggruppate."""
+
+    def __init__(self, percorso):
+        self.percorso = percorso
+        self._conn = sqlite3.connect(percorso, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migra()
+        self._lock = threading.Lock()
+        self._coda = []
+        self._in_attesa = asyncio.Event()
+        self._scrittura = asyncio.Lock()  # un blocco di scritture alla volta, nell'ordine della coda
+        self._ritardo = RITARDO_SCRITTURA  # cresce finché il database resta occupato
+
+    def _migra(self):
+        """Aggiunge ai database esistenti le colonne introdotte dopo la loro creazione."""
+        for tabella, colonna, tipo in COLONNE_AGGIUNTE:
+            colonne = {riga[1] for riga in self._conn.execute(f"PRAGMA table_info({tabella})")}
+            if colonna not in colonne:
+                self._conn.execute(f"ALTER TABLE {tabella} ADD COLUMN {colonna} {tipo}")
+                logger.info(f"💾 Archivio aggiornato: colonna {tabella}.{colonna}")
+
+    # ------------------------------------------------------------------
+    # Letture (sincrone: all'avvio o tramite asyncio.to_thread)
+    # ------------------------------------------------------------------
+
+    def carica_programmati(self):
+        """Tutti i messaggi programmati in un'unica lettura: [(id, quando, messaggio, gruppo)]."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, quando, messaggio, gruppo FROM programmati ORDER BY quando"
+            ).fetchall()
+
+    def carica_ricorrenze(self):
+        """Tutte le pubblicazioni ricorrenti: [(id, espressione, testo, gruppo)]."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, espressione, testo, gruppo FROM ricorrenze ORDER BY id"
+            ).fetchall()
+
+    def conta_iscritti(self):
+        """Numero di iscritti raggiungibili (non disiscritti né bloccati)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM iscritti WHERE disiscritto = 0 AND bloccato = 0"
+            ).fetchone()[0]
+
+    def leggi_iscritti(self, dopo, limite):
+        """Pagina di chat_id raggiungibili maggiori di `dopo`, in ordine crescente."""
+        with self._lock:
+            righe = self._conn.execute(
+                "SELECT chat_id FROM iscritti WHERE chat_id > ? AND disiscritto = 0 AND bloccato = 0 "
+                "ORDER BY chat_id LIMIT ?",
+                (dopo, limite)
+            ).fetchall()
+        return [riga[0] for riga in righe]
+
+    def broadcast_in_corso(self):
+        """L'ultimo broadcast non completato (come dict) oppure None."""
+        with self._lock:
+            cursore = self._conn.execute(
+                "SELECT * FROM broadcast WHERE completato = 0 ORDER BY id DESC LIMIT 1"
+            )
+            riga = cursore.fetchone()
+            if riga is None:
+                return None
+            return dict(zip((c[0] for c in cursore.description), riga))
+
+    def crea_broadcast(self, testo, admin_chat, messaggio_id, totale):
+        """Registra subito (senza coda) un nuovo broadcast e ne restituisce l'id."""
+        with self._lock:
+            return self._conn.execute(
+                "INSERT INTO broadcast (testo, admin_chat, messaggio_id, totale) VALUES (?, ?, ?, ?)",
+                (testo, admin_chat, messaggio_id, totale)
+            ).lastrowid
+
+    def _righe(self, sql, parametri=()):
+        """Righe di una SELECT come dict (da chiamare con il lock)."""
+        cursore = self._conn.execute(sql, parametri)
+        colonne = [c[0] for c in cursore.description]
+        return [dict(zip(colonne, riga)) for riga in cursore.fetchall()]
+
+    def leggi_uscita(self, id):
+        """Un post della posta in uscita (come dict) oppure None."""
+        with self._lock:
+            righe = self._righe("SELECT * FROM uscita WHERE id = ?", (id,))
+        return righe[0] if righe else None
+
+    def uscita_in_sospeso(self):
+        """Post in attesa, bloccati o interrotti durante l'invio, in ordine di creazione."""
+        with self._lock:
+            return self._righe(
+                "SELECT * FROM uscita WHERE stato IN ('in_attesa', 'in_invio', 'bloccato') ORDER BY id"
+            )
+
+    def conta_uscita(self):
+        """Numero di post per stato: {stato: n}."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT stato, COUNT(*) FROM uscita GROUP BY stato").fetchall())
+
+    def registra_uscita(self, chiave, chat_id, testo, opzioni, adesso):
+        """Registra subito (senza coda) un post; se la chiave esiste lo lascia com'è.
+
+        Restituisce (riga, nuova).
+        """
+        with self._lock:
+            nuova = self._conn.execute(
+                "INSERT OR IGNORE INTO uscita (chiave, chat_id, testo, opzioni, prossimo, creato) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (chiave, chat_id, testo, opzioni, adesso, adesso)
+            ).rowcount == 1
+            riga = self._righe("SELECT * FROM uscita WHERE chiave = ?", (chiave,))[0]
+        return riga, nuova
+
+    def aggiorna_uscita(self, id, **campi):
+        """Aggiorna subito (senza coda) lo stato di un post."""
+        if not campi.keys() <= CAMPI_USCITA:
+            raise ValueError(f"Campi non validi: {set(campi) - CAMPI_USCITA}")
+        assegnazioni = ", ".join(f"{campo} = ?" for campo in campi)
+        with self._lock:
+            self._conn.execute(f"UPDATE uscita SET {assegnazioni} WHERE id = ?", (*campi.values(), id))
+
+    def pulisci_uscita(self, prima_di):
+        """Dimentica i post conclusi creati prima di `prima_di`."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM uscita WHERE stato IN ('consegnato', 'fallito', 'scartato') AND creato < ?",
+                (prima_di,)
+            )
+
+    def leggi_impostazione(self, chiave, predefinito=None):
+        with self._lock:
+            riga = self._conn.execute(
+                "SELECT valore FROM impostazioni WHERE chiave = ?", (chiave,)
+            ).fetchone()
+        return riga[0] if riga else predefinito
+
+    # ------------------------------------------------------------------
+    # Scritture (in coda)
+    # ------------------------------------------------------------------
+
+    def _accoda(self, sql, parametri):
+        self._coda.append((sql, parametri))
+        self._in_attesa.set()
+
+    def salva_programmato(self, id, quando, messaggio, gruppo=None):
+        self._accoda(
+            "INSERT OR REPLACE INTO programmati (id, quando, messaggio, gruppo) VALUES (?, ?, ?, ?)",
+            (id, quando, messaggio, gruppo)
+        )
+
+    def rimuovi_programmato(self, id):
+        self._accoda("DELETE FROM programmati WHERE id = ?", (id,))
+
+    def salva_ricorrenza(self, id, espressione, testo, gruppo=None):
+        self._accoda(
+            "INSERT OR REPLACE INTO ricorrenze (id, espressione, testo, gruppo) VALUES (?, ?, ?, ?)",
+            (id, espressione, testo, gruppo)
+        )
+
+    def rimuovi_ricorrenza(self, id):
+        self._accoda("DELETE FROM ricorrenze WHERE id = ?", (id,))
+
+    def salva_impostazione(self, chiave, valore):
+        self._accoda(
+            "INSERT OR REPLACE INTO impostazioni (chiave, valore) VALUES (?, ?)",
+            (chiave, str(valore))
+        )
+
+    def iscrivi(self, chat_id, adesso):
+        """Aggiunge (o riattiva) un iscritto."""
+        self._accoda(
+            "INSERT INTO iscritti (chat_id, iscritto_il) VALUES (?, ?) "
+            "ON CONFLICT(chat_id) DO UPDATE SET disiscritto = 0, bloccato = 0",
+            (chat_id, adesso)
+        )
+
+    def disiscrivi(self, chat_id):
+        self._accoda("UPDATE iscritti SET disiscritto = 1 WHERE chat_id = ?", (chat_id,))
+
+    def segna_bloccato(self, chat_id):
+        self._accoda("UPDATE iscritti SET bloccato = 1 WHERE chat_id = ?", (chat_id,))
+
+    def aggiorna_broadcast(self, id, cursore, inviati, falliti, completato=False):
+        self._accoda(
+            "UPDATE broadcast SET cursore = ?, inviati = ?, falliti = ?, completato = ? WHERE id = ?",
+            (cursore, inviati, falliti, int(completato), id)
+        )
+
+    def _esegui_blocco(self, operazioni):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for sql, parametri in operazioni:
+                    self._conn.execute(sql, parametri)
+                self._conn.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+
+    def _esegui_singole(self, operazioni):
+        """Dopo un errore non transitorio: ogni operazione nella sua transazione, scartando quelle che falliscono.
+
+        Restituisce le operazioni non eseguite perché il database è occupato.
+        """
+        for k, (sql, parametri) in enumerate(operazioni):
+            try:
+                self._esegui_blocco([(sql, parametri)])
+            except sqlite3.Error as e:
+                if occupato(e):
+                    return operazioni[k:]
+                logger.error(f"❌ Operazione scartata dall'archivio: {sql} {parametri!r}: {e}")
+        return []
+
+    def svuota(self):
+        """Scrive subito tutte le operazioni in coda (bloccante)."""
+        operazioni, self._coda = self._coda, []
+        ritardo = RITARDO_SCRITTURA
+        if not operazioni:
+            return
+        for _ in range(TENTATIVI_CHIUSURA):
+            try:
+                self._esegui_blocco(operazioni)
+                return
+            except sqlite3.Error as e:
+                if not occupato(e):
+                    logger.error(f"❌ Errore scrittura archivio ({len(operazioni)} operazioni): {e}")
+                    operazioni = self._esegui_singole(operazioni)
+                    if not operazioni:
+                        return
+            time.sleep(ritardo)
+            ritardo = min(ritardo * 2, RITARDO_MASSIMO)
+        if operazioni:
+            logger.error(f"❌ Archivio occupato, {len(operazioni)} operazioni perse: {operazioni!r}")
+
+    async def scrivi_coda(self):
+        """Scrive subito le operazioni in coda, dopo quelle già in scrittura (restano in ordine).
+
+        Se il database è occupato le operazioni non scritte tornano in testa
+        alla coda e restituisce False: le riprova lo scrittore, con un
+        ritardo che raddoppia a ogni tentativo fino a RITARDO_MASSIMO.
+        """
+        async with self._scrittura:
+            operazioni, self._coda = self._coda, []
+            if not operazioni:
+                return True
+            try:
+                await asyncio.to_thread(self._esegui_blocco, operazioni)
+                rimaste = []
+            except sqlite3.Error as e:
+                if occupato(e):
+                    rimaste = operazioni
+                else:
+                    logger.error(f"❌ Errore scrittura archivio ({len(operazioni)} operazioni): {e}")
+                    rimaste = await asyncio.to_thread(self._esegui_singole, operazioni)
+            if not rimaste:
+                self._ritardo = RITARDO_SCRITTURA
+                return True
+            self._coda[:0] = rimaste
+            self._in_attesa.set()
+            self._ritardo = min(self._ritardo * 2, RITARDO_MASSIMO)
+            logger.warning(f"⚠️ Archivio occupato, {len(rimaste)} operazioni riprovate tra {self._ritardo:.1f}s")
+            return False
+
+    async def scrittore(self):
+        """Coroutine che scrive la coda a blocchi su un thread separato."""
+        try:
+            while True:
+                await self._in_attesa.wait()
+                await asyncio.sleep(self._ritardo)
+                self._in_attesa.clear()
+                await self.scrivi_coda()
+        except asyncio.CancelledError:
+            logger.info("⏸️ Scrittore archivio fermato")
+            raise
+
+    def chiudi(self):
+        """Scrive le operazioni rimaste e chiude il database."""
+        self.svuota()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,94 @@
+"""⏱️ Tempi di avvio del bot (--profile-startup).
+
+ProfiloAvvio segna la fine di ogni fase dell'avvio (import, configurazione,
+Application, get_me, servizi e polling, primo update) e, se attivo,
+misura anche quanto costa ogni import del modulo principale:
+
+    profilo = ProfiloAvvio(attivo='--profile-startup' in sys.argv)
+    profilo.segui_import()
+    import telegram ...
+    profilo.fase('import')
+
+Il tempo di un import è cumulativo (comprende i moduli che importa a sua
+volta) e conta solo la prima volta: un modulo già caricato costa zero.
+Deve essere importato prima di tutto il resto, quindi usa solo la libreria
+standard.
+"""
+import builtins
+import time
+
+# Import mostrati nel rapporto (i più lenti)
+MAX_IMPORT = 12
+
+
+class TempiImport:
+    """Sostituto di __import__ che misura gli import fatti direttamente dal chiamante."""
+
+    def __init__(self, orologio=time.perf_counter):
+        self.orologio = orologio
+        self.tempi = {}
+        self._originale = None
+        self._profondita = 0
+
+    def __call__(self, nome, globals=None, locals=None, fromlist=(), level=0):
+        if self._profondita:
+            return self._originale(nome, globals, locals, fromlist, level)
+        self._profondita += 1
+        inizio = self.orologio()
+        try:
+            return self._originale(nome, globals, locals, fromlist, level)
+        finally:
+            self._profondita -= 1
+            self.tempi[nome] = self.tempi.get(nome, 0.0) + self.orologio() - inizio
+
+    def installa(self):
+        self._originale = builtins.__import__
+        builtins.__import__ = self
+
+    def rimuovi(self):
+        if builtins.__import__ is self:
+            builtins.__import__ = self._originale
+
+
+class ProfiloAvvio:
+    """Durate delle fasi dell'avvio, misurate dalla creazione del profilo."""
+
+    def __init__(self, attivo=False, orologio=time.perf_counter):
+        self.attivo = attivo
+        self.orologio = orologio
+        self.inizio = self._ultimo = orologio()
+        self.fasi = []  # (nome, secondi)
+        self.import_ = None
+
+    def segui_import(self):
+        """Se attivo, misura gli import fino alla prossima fase."""
+        if self.attivo:
+            self.import_ = TempiImport(self.orologio)
+            self.import_.installa()
+
+    def fase(self, nome):
+        """Chiude la fase `nome` (dalla fine della precedente); restituisce la durata."""
+        if self.import_ is not None:
+            self.import_.rimuovi()
+        adesso = self.orologio()
+        durata = adesso - self._ultimo
+        self._ultimo = adesso
+        self.fasi.append((nome, durata))
+        return durata
+
+    def totale(self):
+        return self._ultimo - self.inizio
+
+    def rapporto(self):
+        """Testo con gli import più lenti e la durata di ogni fase."""
+        righe = ["⏱️ Profilo di avvio"]
+        if self.import_ is not None and self.import_.tempi:
+            righe.append("Import:")
+            lenti = sorted(self.import_.tempi.items(), key=lambda voce: voce[1], reverse=True)
+            for nome, secondi in lenti[:MAX_IMPORT]:
+                righe.append(f"  {nome:<28}{secondi * 1000:>9.1f} ms")
+        righe.append("Fasi:")
+        for nome, secondi in self.fasi:
+            righe.append(f"  {nome:<28}{secondi * 1000:>9.1f} ms")
+        righe.append(f"  {'totale':<28}{self.totale() * 1000:>9.1f} ms")
+        return '\n'.join(righe)
@@ -0,0 +1 @@
+"""Benchmark offline del bot BasilicataGo (nessuna chiamata a Telegram)."""
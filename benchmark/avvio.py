@@ -0,0 +1,155 @@
+"""🚀 Tempo al primo update: avvio a freddo del bot contro la Bot API finta.
+
+Uso:
+    python -m benchmark.avvio [--giri 5] [--latenza 0.05] [--destinazioni 3]
+
+A ogni giro avvia `python gobasilicata_bot.py --profile-startup` in un
+processo nuovo (interprete, import, archivio, Application, polling) con
+TELEGRAM_BASE_URL verso benchmark.finto_api e un tap sul menu già in coda.
+Il tempo al primo update va dal lancio del processo alla prima
+answerCallbackQuery ricevuta dalla Bot API finta; --latenza è l'attesa di
+ogni chiamata, come il viaggio di andata e ritorno verso Telegram.
+
+Riporta mediana, minimo e massimo, le chiamate fatte prima del primo
+update e la mediana di ogni fase stampata dal bot con --profile-startup.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmark.finto_api import FintoAPI, update_tap
+from catalogo import SCHERMATA_PRINCIPALE
+
+BOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gobasilicata_bot.py')
+# Righe del rapporto di --profile-startup: "Import:" / "Fasi:" seguite da "  nome   12.3 ms"
+RIGA_SEZIONE = re.compile(r'^(?P<sezione>\w+):$')
+RIGA_TEMPO = re.compile(r'^\s+(?P<nome>\S+(?: \S+)*)\s+(?P<ms>\d+(?:\.\d+)?) ms$')
+# Import mostrati nel riepilogo
+MAX_IMPORT = 8
+ATTESA_MASSIMA = 30
+
+
+class APIAvvio(FintoAPI):
+    """FintoAPI che annota l'ordine delle chiamate e l'istante della prima risposta a un tap."""
+
+    def __init__(self, **opzioni):
+        super().__init__(**opzioni)
+        self.sequenza = []
+        self.primo_update = None
+        self._risposto = asyncio.Event()
+
+    async def rispondi(self, metodo, parametri):
+        if not self._risposto.is_set():
+            self.sequenza.append(metodo)
+        if metodo == 'answerCallbackQuery' and not self._risposto.is_set():
+            self.primo_update = time.perf_counter()
+            self._risposto.set()
+        return await super().rispondi(metodo, parametri)
+
+    async def attendi_primo_update(self, secondi):
+        await asyncio.wait_for(self._risposto.wait(), timeout=secondi)
+
+
+def scrivi_destinazioni(cartella, quante):
+    """File con `quante` destinazioni nel gruppo predefinito."""
+    percorso = os.path.join(cartella, 'destinazioni.json')
+    canali = {f"canale{i}": {'chat_id': -1001000000000 - i} for i in range(quante)}
+    with open(percorso, 'w', encoding='utf-8') as f:
+        json.dump({'destinazioni': canali, 'gruppi': {'predefinito': list(canali)}}, f)
+    return percorso
+
+
+async def giro(argomenti, cartella, numero):
+    """Un avvio a freddo: (secondi al primo update, chiamate prima del primo update, fasi)."""
+    api = APIAvvio(latenza=argomenti.latenza, seme=numero)
+    await api.avvia()
+    api.inietta(update_tap(api.nuovo_update_id(), SCHERMATA_PRINCIPALE))
+    ambiente = dict(
+        os.environ,
+        TELEGRAM_TOKEN='0:avvio',
+        TELEGRAM_BASE_URL=api.base_url,
+        ADMIN_ID='42',
+        ARCHIVIO_PATH=os.path.join(cartella, f'avvio{numero}.db'),
+        LOG_LIVELLO='WARNING'
+    )
+    if argomenti.destinazioni:
+        ambiente['DESTINAZIONI_PATH'] = scrivi_destinazioni(cartella, argomenti.destinazioni)
+
+    inizio = time.perf_counter()
+    processo = await asyncio.create_subprocess_exec(
+        sys.executable, BOT, '--profile-startup', env=ambiente,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        await api.attendi_primo_update(ATTESA_MASSIMA)
+        durata = api.primo_update - inizio
+        sequenza = list(api.sequenza)
+    finally:
+        if processo.returncode is None:
+            processo.send_signal(signal.SIGTERM)
+        uscita, _ = await processo.communicate()
+        await api.ferma()
+
+    return durata, sequenza, leggi_profilo(uscita.decode('utf-8', 'replace'))
+
+
+def leggi_profilo(testo):
+    """{(sezione, nome): ms} dal rapporto stampato con --profile-startup."""
+    tempi = {}
+    sezione = None
+    for riga in testo.splitlines():
+        trovata = RIGA_SEZIONE.match(riga)
+        if trovata:
+            sezione = trovata['sezione']
+            continue
+        trovata = RIGA_TEMPO.match(riga)
+        if trovata and sezione:
+            tempi[sezione, trovata['nome']] = float(trovata['ms'])
+    return tempi
+
+
+async def principale(argomenti):
+    durate = []
+    fasi = defaultdict(list)
+    sequenza = []
+    with tempfile.TemporaryDirectory() as cartella:
+        for numero in range(argomenti.giri):
+            durata, sequenza, fasi_giro = await giro(argomenti, cartella, numero)
+            durate.append(durata)
+            for voce, ms in fasi_giro.items():
+                fasi[voce].append(ms)
+            print(f"   giro {numero + 1}: {durata * 1000:.0f} ms")
+
+    print(f"\n🚀 Tempo al primo update ({argomenti.giri} avvii, latenza {argomenti.latenza * 1000:.0f} ms):")
+    print(f"   mediana {statistics.median(durate) * 1000:.0f} ms, "
+          f"min {min(durate) * 1000:.0f} ms, max {max(durate) * 1000:.0f} ms")
+    print(f"   chiamate prima del primo update: {' → '.join(sequenza)}")
+    mediane = {voce: statistics.median(valori) for voce, valori in fasi.items()}
+    lenti = sorted(((nome, ms) for (sezione, nome), ms in mediane.items() if sezione == 'Import'),
+                   key=lambda voce: voce[1], reverse=True)
+    if lenti:
+        print("\n📦 Import più lenti (mediana):")
+        for nome, ms in lenti[:MAX_IMPORT]:
+            print(f"   {nome:<28}{ms:>9.1f} ms")
+    if any(sezione == 'Fasi' for sezione, _ in mediane):
+        print("\n⏱️ Fasi dell'avvio (mediana, dal primo import del bot):")
+        for (sezione, nome), ms in mediane.items():
+            if sezione == 'Fasi':
+                print(f"   {nome:<28}{ms:>9.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--giri', type=int, default=5, help='avvii a freddo da misurare')
+    parser.add_argument('--latenza', type=float, default=0.05, help='secondi di attesa per chiamata alla Bot API')
+    parser.add_argument('--destinazioni', type=int, default=0,
+                        help='destinazioni da verificare all\'avvio (0 = solo il canale predefinito)')
+    asyncio.run(principale(parser.parse_args()))
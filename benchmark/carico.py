@@ -0,0 +1,134 @@
+"""🏋️ Prova di carico: run_polling, pianificatore e invii contro la Bot API finta via HTTP.
+
+Uso:
+    python -m benchmark.carico [--ritmo 2000] [--durata 10] [--chat 5000]
+                               [--latenza 0] [--jitter 0] [--errori-429 0] [--errori-5xx 0]
+                               [--programmati 20]
+
+Il bot completo (Updater in polling, ProcessoreUpdate, LimitatoreInvii,
+pianificatore, archivio) gira contro benchmark.finto_api su HTTP locale.
+Gli update (tap sui pulsanti del menu, ruotando su --chat chat) vengono
+iniettati a --ritmo update/s per --durata secondi; durante la prova scadono
+--programmati messaggi programmati verso il canale.
+
+Riporta update/s elaborati, arretrato, latenza dall'iniezione alla fine degli
+handler, chiamate ed errori della Bot API, flood wait e memoria massima.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import resource
+import statistics
+import time
+from collections import Counter
+
+os.environ.setdefault('TELEGRAM_TOKEN', '0:benchmark')
+os.environ.setdefault('ARCHIVIO_PATH', ':memory:')
+os.environ.setdefault('LIMITE_GLOBALE', '100000')
+os.environ.setdefault('LIMITE_PRIVATO', '100000')
+
+from telegram import Update  # noqa: E402
+from telegram.ext import TypeHandler  # noqa: E402
+
+import gobasilicata_bot as bot  # noqa: E402
+from benchmark.finto_api import FintoAPI, update_tap  # noqa: E402
+
+ATTESA_FINALE = 30  # secondi concessi per smaltire l'arretrato
+
+
+class Sonda:
+    """Conta gli update elaborati e la latenza dall'iniezione."""
+
+    def __init__(self):
+        self.inizio = {}
+        self.latenze = []
+        self.errori = Counter()
+
+    def inietta(self, update_id):
+        self.inizio[update_id] = time.perf_counter()
+
+    async def __call__(self, update: Update, context):
+        inizio = self.inizio.pop(update.update_id, None)
+        if inizio is not None:
+            self.latenze.append(time.perf_counter() - inizio)
+
+    async def errore(self, update, context):
+        self.errori[type(context.error).__name__] += 1
+
+
+async def principale(argomenti):
+    api = FintoAPI(
+        latenza=argomenti.latenza, jitter=argomenti.jitter,
+        errori_429=argomenti.errori_429, errori_5xx=argomenti.errori_5xx, seme=1
+    )
+    await api.avvia()
+    sonda = Sonda()
+    application = bot.crea_applicazione(base_url=api.base_url)
+    application.add_handler(TypeHandler(Update, sonda), group=1)
+    application.add_error_handler(sonda.errore)
+
+    await application.initialize()
+    await bot.all_avvio(application)
+    await application.start()
+    await application.updater.start_polling(poll_interval=0, timeout=10)
+
+    # Messaggi programmati distribuiti lungo la prova
+    adesso = time.time()
+    context = bot.TempContext(application)
+    for k in range(argomenti.programmati):
+        quando = adesso + argomenti.durata * (k + 1) / (argomenti.programmati + 1)
+        bot.pianifica_programmato(context, f'carico_{k}', quando, f'Prova di carico {k}')
+
+    chiavi = list(bot.catalogo.corrente().schermate)
+
+    def fabbrica(update_id):
+        sonda.inietta(update_id)
+        return update_tap(update_id, chiavi[update_id % len(chiavi)], 10_000 + update_id % argomenti.chat)
+
+    inizio = time.perf_counter()
+    iniettati = await api.inietta_a_ritmo(fabbrica, argomenti.ritmo, argomenti.durata)
+    fine_iniezione = time.perf_counter()
+    elaborati_in_tempo = len(sonda.latenze)
+
+    scadenza = time.monotonic() + ATTESA_FINALE
+    while len(sonda.latenze) < iniettati and time.monotonic() < scadenza:
+        await asyncio.sleep(0.05)
+    totale = time.perf_counter() - inizio
+
+    invii = bot.limitatore.metriche()
+    programmati_rimasti = len(bot.pianificatore.lavori('programmato'))
+
+    await application.updater.stop()
+    await application.stop()
+    await bot.alla_chiusura(application)
+    await application.shutdown()
+    await api.ferma()
+
+    elaborati = len(sonda.latenze)
+    print(f"📥 Iniettati: {iniettati} in {fine_iniezione - inizio:.1f} s ({argomenti.ritmo:.0f} update/s richiesti)")
+    print(f"⚡ Elaborati: {elaborati} ({elaborati / totale:.0f} update/s), "
+          f"arretrato a fine iniezione: {iniettati - elaborati_in_tempo}, non elaborati: {iniettati - elaborati}")
+    if len(sonda.latenze) >= 2:
+        ms = sorted(x * 1000 for x in sonda.latenze)
+        p = statistics.quantiles(ms, n=100)
+        print(f"⏱️ Latenza: p50={p[49]:.1f} ms  p95={p[94]:.1f} ms  p99={p[98]:.1f} ms  max={ms[-1]:.1f} ms")
+    print(f"📨 Programmati inviati: {argomenti.programmati - programmati_rimasti}/{argomenti.programmati}")
+    print(f"🌐 Chiamate API: {dict(api.chiamate.most_common())}")
+    print(f"💥 Errori iniettati: {dict(api.errori)}  negli handler: {dict(sonda.errori)}")
+    print(f"🚦 Flood wait: {invii['flood_wait']}  attesa media invii: {invii['attesa_media_ms']:.1f} ms")
+    print(f"💾 Memoria massima: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ritmo', type=float, default=2000, help='update/s da iniettare')
+    parser.add_argument('--durata', type=float, default=10, help='secondi di iniezione')
+    parser.add_argument('--chat', type=int, default=5000)
+    parser.add_argument('--latenza', type=float, default=0.0, help='secondi per chiamata API')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--errori-429', type=float, default=0.0, help='probabilità per chiamata')
+    parser.add_argument('--errori-5xx', type=float, default=0.0, help='probabilità per chiamata')
+    parser.add_argument('--programmati', type=int, default=20)
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(principale(parser.parse_args()))
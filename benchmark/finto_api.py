@@ -0,0 +1,319 @@
+"""🧪 Sostituto locale della Bot API di Telegram per benchmark e prove di carico.
+
+Risponde su http://host:porta/bot<token>/<metodo> ai metodi usati dal bot
+(getUpdates, sendMessage, editMessageText, answerCallbackQuery,
+deleteMessage(s), getChat, getChatMember...). Gli update da consegnare con
+getUpdates si aggiungono con inietta() o, a ritmo costante, con
+inietta_a_ritmo(). Latenza ed errori 429/5xx sono configurabili; come
+Telegram, un editMessageText che non cambia il messaggio risponde 400
+"message is not modified".
+
+    api = FintoAPI(latenza=0.02, errori_429=0.001)
+    await api.avvia()
+    application = bot.crea_applicazione(base_url=api.base_url)
+
+Il bot vero si collega allo stesso modo con TELEGRAM_BASE_URL=<api.base_url>.
+Senza HTTP, le stesse risposte arrivano al Bot tramite RichiestaFinta:
+
+    application = bot.crea_applicazione(richiesta=RichiestaFinta(FintoAPI()))
+
+Da riga di comando avvia il server e inietta tap sul menu a ritmo costante:
+
+    python -m benchmark.finto_api --porta 8081 --ritmo 500 --chat 1000
+    TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot python gobasilicata_bot.py
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter, deque
+from urllib.parse import parse_qsl
+
+from telegram.request import BaseRequest
+
+import catalogo
+from server_http import Risposta, ServerHTTP
+
+BOT_ID = 123456
+BOT_USERNAME = 'basilicatagobot'
+
+# Metodi mai soggetti a errori iniettati (servono all'avvio e al polling)
+METODI_SENZA_ERRORI = frozenset({'getMe', 'getUpdates', 'deleteWebhook', 'setWebhook'})
+
+
+def leggi_parametri(richiesta):
+    """PTB invia i parametri come form urlencoded con valori in JSON."""
+    if richiesta.intestazioni.get('content-type', '').startswith('application/json'):
+        return json.loads(richiesta.corpo or b'{}')
+    parametri = {}
+    for chiave, valore in parse_qsl(richiesta.corpo.decode()):
+        try:
+            parametri[chiave] = json.loads(valore)
+        except ValueError:
+            parametri[chiave] = valore
+    return parametri
+
+
+def update_tap(update_id, data, chat_id=None):
+    """Update JSON di un tap su un pulsante inline (di default una chat diversa per tap)."""
+    chat_id = chat_id if chat_id is not None else 10_000 + update_id
+    utente = {'id': chat_id, 'is_bot': False, 'first_name': 'Turista'}
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': utente,
+            'chat_instance': str(chat_id),
+            'data': data,
+            'message': {
+                'message_id': 1,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': 'menu'
+            }
+        }
+    }
+
+
+class ErroreAPI(Exception):
+    """Risposta di errore di un metodo (es. 400 Bad Request)."""
+
+    def __init__(self, codice, descrizione):
+        super().__init__(descrizione)
+        self.codice = codice
+        self.descrizione = descrizione
+
+
+def chat(chat_id):
+    tipo = 'private' if chat_id > 0 else 'channel'
+    return {'id': chat_id, 'type': tipo, 'username': 'basilicataGo' if tipo == 'channel' else None}
+
+
+class FintoAPI:
+    """Bot API finta: registra le chiamate e consegna gli update iniettati.
+
+    `latenza` (+ fino a `jitter`) secondi per chiamata; `errori_429` ed
+    `errori_5xx` sono probabilità per chiamata, `retry_after` i secondi
+    indicati nelle risposte 429.
+    """
+
+    def __init__(self, host='127.0.0.1', porta=0, latenza=0.0, jitter=0.0,
+                 errori_429=0.0, errori_5xx=0.0, retry_after=1, seme=None):
+        self.server = ServerHTTP(host, porta)
+        self.latenza = latenza
+        self.jitter = jitter
+        self.errori_429 = errori_429
+        self.errori_5xx = errori_5xx
+        self.retry_after = retry_after
+        self._rng = random.Random(seme)
+        self.chiamate = Counter()
+        self.errori = Counter()
+        self._update = deque()
+        self._nuovi = asyncio.Event()
+        self._message_id = itertools.count(1000)
+        self._contenuti = {}  # (chat_id, message_id) -> contenuto dell'ultimo edit
+        self._update_id = itertools.count(1)
+        self.server.rotta_predefinita(self._instrada)
+
+    @property
+    def base_url(self):
+        return f"http://{self.server.host}:{self.server.porta}/bot"
+
+    async def avvia(self):
+        await self.server.avvia()
+
+    async def ferma(self):
+        await self.server.ferma()
+
+    # ------------------------------------------------------------------
+    # Update
+    # ------------------------------------------------------------------
+
+    def nuovo_update_id(self):
+        return next(self._update_id)
+
+    def inietta(self, update):
+        """Aggiunge un update (dict JSON) alla coda di getUpdates."""
+        self._update.append(update)
+        self._nuovi.set()
+
+    @property
+    def in_coda(self):
+        """Update iniettati non ancora confermati dal bot (offset di getUpdates)."""
+        return len(self._update)
+
+    async def inietta_a_ritmo(self, fabbrica, al_secondo, durata, passo=0.01):
+        """Inietta `fabbrica(update_id)` a `al_secondo` update/s per `durata` secondi."""
+        inizio = time.monotonic()
+        iniettati = 0
+        while True:
+            trascorso = time.monotonic() - inizio
+            if trascorso >= durata:
+                return iniettati
+            dovuti = int(trascorso * al_secondo)
+            for _ in range(dovuti - iniettati):
+                self._update.append(fabbrica(self.nuovo_update_id()))
+            if dovuti > iniettati:
+                iniettati = dovuti
+                self._nuovi.set()
+            await asyncio.sleep(passo)
+
+    # ------------------------------------------------------------------
+    # Bot API
+    # ------------------------------------------------------------------
+
+    def _errore(self, metodo):
+        """Eventuale errore iniettato: (stato HTTP, risposta JSON) oppure None."""
+        if metodo in METODI_SENZA_ERRORI:
+            return None
+        caso = self._rng.random()
+        if caso < self.errori_429:
+            self.errori[429] += 1
+            return 429, {
+                'ok': False, 'error_code': 429,
+                'description': f"Too Many Requests: retry after {self.retry_after}",
+                'parameters': {'retry_after': self.retry_after}
+            }
+        if caso < self.errori_429 + self.errori_5xx:
+            self.errori[502] += 1
+            return 502, {'ok': False, 'error_code': 502, 'description': 'Bad Gateway'}
+        return None
+
+    async def rispondi(self, metodo, parametri):
+        """Stato HTTP e corpo JSON della risposta della Bot API a `metodo`."""
+        self.chiamate[metodo] += 1
+        if self.latenza or self.jitter:
+            await asyncio.sleep(self.latenza + self._rng.random() * self.jitter)
+        errore = self._errore(metodo)
+        if errore is not None:
+            stato, risposta = errore
+            return stato, json.dumps(risposta).encode()
+        gestore = getattr(self, f"api_{metodo}", None)
+        try:
+            risultato = True if gestore is None else await gestore(parametri)
+        except ErroreAPI as e:
+            self.errori[e.codice] += 1
+            return e.codice, json.dumps({'ok': False, 'error_code': e.codice, 'description': e.descrizione}).encode()
+        return 200, json.dumps({'ok': True, 'result': risultato}).encode()
+
+    async def _instrada(self, richiesta):
+        metodo = richiesta.percorso.rsplit('/', 1)[-1]
+        stato, corpo = await self.rispondi(metodo, leggi_parametri(richiesta))
+        return Risposta(stato, corpo, 'application/json')
+
+    def _messaggio(self, parametri):
+        return {
+            'message_id': next(self._message_id),
+            'date': int(time.time()),
+            'chat': chat(int(parametri.get('chat_id', 1))),
+            'text': parametri.get('text', '')
+        }
+
+    async def api_getMe(self, parametri):
+        return {'id': BOT_ID, 'is_bot': True, 'first_name': 'BasilicataGo', 'username': BOT_USERNAME}
+
+    async def api_getUpdates(self, parametri):
+        offset = parametri.get('offset') or 0
+        while self._update and self._update[0]['update_id'] < offset:
+            self._update.popleft()
+        if not self._update:
+            self._nuovi.clear()
+            try:
+                await asyncio.wait_for(self._nuovi.wait(), timeout=float(parametri.get('timeout') or 0))
+            except asyncio.TimeoutError:
+                pass
+        limite = int(parametri.get('limit') or 100)
+        return list(itertools.islice(self._update, limite))
+
+    async def api_sendMessage(self, parametri):
+        return self._messaggio(parametri)
+
+    async def api_editMessageText(self, parametri):
+        chiave = (parametri.get('chat_id'), parametri.get('message_id'))
+        contenuto = (parametri.get('text'), parametri.get('reply_markup'), parametri.get('parse_mode'))
+        if self._contenuti.get(chiave) == contenuto:
+            raise ErroreAPI(400, "Bad Request: message is not modified: specified new message content "
+                                 "and reply markup are exactly the same as a current content and reply "
+                                 "markup of the message")
+        self._contenuti[chiave] = contenuto
+        return self._messaggio(parametri)
+
+    async def api_getChat(self, parametri):
+        return {**chat(int(parametri['chat_id'])), 'accent_color_id': 0, 'max_reaction_count': 11}
+
+    async def api_getChatMember(self, parametri):
+        return {
+            'status': 'administrator',
+            'user': {'id': BOT_ID, 'is_bot': True, 'first_name': 'BasilicataGo'},
+            'can_be_edited': False, 'is_anonymous': False, 'can_manage_chat': True,
+            'can_delete_messages': True, 'can_manage_video_chats': True,
+            'can_restrict_members': True, 'can_promote_members': False,
+            'can_change_info': True, 'can_invite_users': True,
+            'can_post_stories': True, 'can_edit_stories': True, 'can_delete_stories': True,
+            'can_post_messages': True
+        }
+
+
+class RichiestaFinta(BaseRequest):
+    """Richieste del Bot servite in memoria da una FintoAPI (senza HTTP)."""
+
+    def __init__(self, api):
+        self.api = api
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        metodo = url.rsplit('/', 1)[-1]
+        parametri = json.loads(json.dumps(request_data.parameters)) if request_data else {}
+        return await self.api.rispondi(metodo, parametri)
+
+
+async def _principale(argomenti):
+    catalogo.inizializza(argomenti.catalogo)
+    chiavi = list(catalogo.corrente().schermate)
+    api = FintoAPI(
+        argomenti.host, argomenti.porta, latenza=argomenti.latenza, jitter=argomenti.jitter,
+        errori_429=argomenti.errori_429, errori_5xx=argomenti.errori_5xx
+    )
+    await api.avvia()
+    print(f"🧪 Bot API finta su {api.base_url}")
+
+    def fabbrica(update_id):
+        return update_tap(update_id, chiavi[update_id % len(chiavi)], 10_000 + update_id % argomenti.chat)
+
+    try:
+        while True:
+            iniettati = await api.inietta_a_ritmo(fabbrica, argomenti.ritmo, 10) if argomenti.ritmo else 0
+            if not argomenti.ritmo:
+                await asyncio.sleep(10)
+            print(f"📥 +{iniettati} update, {api.in_coda} in coda, chiamate: {dict(api.chiamate)}")
+    finally:
+        await api.ferma()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8081)
+    parser.add_argument('--ritmo', type=float, default=0, help='update/s da iniettare')
+    parser.add_argument('--chat', type=int, default=1000, help='chat diverse tra cui ruotare i tap')
+    parser.add_argument('--latenza', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--errori-429', type=float, default=0.0)
+    parser.add_argument('--errori-5xx', type=float, default=0.0)
+    parser.add_argument('--catalogo', default='catalogo.json')
+    try:
+        asyncio.run(_principale(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,167 @@
+"""⏱️ Latenza end-to-end degli handler: polling contro webhook.
+
+Uso:
+    python -m benchmark.latenza [--update 500] [--raffica 1000] [--max-coda 200]
+
+Il bot gira contro la Bot API finta (benchmark.finto_api). Per ogni tap su
+un pulsante del menu si misura il tempo dall'arrivo dell'update (iniettato
+in getUpdates oppure inviato con POST al webhook) alla fine di button_handler.
+
+Poi invia al webhook una raffica di --raffica update concorrenti con un
+handler lento e controlla che gli update in volo non superino --max-coda
+(il resto riceve 503).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault('TELEGRAM_TOKEN', '0:benchmark')
+os.environ.setdefault('ARCHIVIO_PATH', ':memory:')
+os.environ.setdefault('LIMITE_GLOBALE', '100000')
+
+import httpx  # noqa: E402
+from telegram import Update  # noqa: E402
+from telegram.ext import TypeHandler  # noqa: E402
+
+import gobasilicata_bot as bot  # noqa: E402
+from benchmark.finto_api import FintoAPI, update_tap  # noqa: E402
+from webhook import INTESTAZIONE_SEGRETO, ServerWebhook  # noqa: E402
+
+SEGRETO = 'segreto-benchmark'
+
+
+class Sonda:
+    """Registra l'istante in cui un update ha finito gli handler del gruppo 0."""
+
+    def __init__(self):
+        self.inizio = {}
+        self.latenze = []
+        self.completati = asyncio.Event()
+        self.attesi = 0
+
+    async def __call__(self, update: Update, context):
+        inizio = self.inizio.pop(update.update_id, None)
+        if inizio is not None:
+            self.latenze.append(time.perf_counter() - inizio)
+        if len(self.latenze) >= self.attesi:
+            self.completati.set()
+
+
+def riepilogo(nome, latenze):
+    ms = sorted(x * 1000 for x in latenze)
+    p = statistics.quantiles(ms, n=100)
+    print(f"{nome:8} n={len(ms):5}  p50={p[49]:7.2f} ms  p95={p[94]:7.2f} ms  p99={p[98]:7.2f} ms")
+
+
+async def prepara(api, sonda):
+    application = bot.crea_applicazione(base_url=api.base_url)
+    application.add_handler(TypeHandler(Update, sonda), group=1)
+    await application.initialize()
+    await application.start()
+    return application
+
+
+async def misura_polling(n):
+    api, sonda = FintoAPI(), Sonda()
+    await api.avvia()
+    application = await prepara(api, sonda)
+    await application.updater.start_polling(poll_interval=0, timeout=10)
+
+    chiavi = list(bot.catalogo.corrente().schermate)
+    for i in range(n):
+        sonda.attesi = i + 1
+        update_id = api.nuovo_update_id()
+        sonda.inizio[update_id] = time.perf_counter()
+        api.inietta(update_tap(update_id, chiavi[i % len(chiavi)]))
+        await sonda.completati.wait()
+        sonda.completati.clear()
+
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+    await api.ferma()
+    return sonda.latenze
+
+
+async def misura_webhook(n):
+    api, sonda = FintoAPI(), Sonda()
+    await api.avvia()
+    application = await prepara(api, sonda)
+    server = ServerWebhook(application, segreto=SEGRETO, porta=0)
+    await server.avvia()
+    server.pronto = True
+
+    url = f"http://127.0.0.1:{server.server.porta}{server.percorso}"
+    chiavi = list(bot.catalogo.corrente().schermate)
+    async with httpx.AsyncClient(headers={INTESTAZIONE_SEGRETO: SEGRETO}) as client:
+        for i in range(n):
+            sonda.attesi = i + 1
+            update_id = api.nuovo_update_id()
+            sonda.inizio[update_id] = time.perf_counter()
+            risposta = await client.post(url, json=update_tap(update_id, chiavi[i % len(chiavi)]))
+            risposta.raise_for_status()
+            await sonda.completati.wait()
+            sonda.completati.clear()
+
+        rifiutata = await client.post(url, json={}, headers={INTESTAZIONE_SEGRETO: 'sbagliato'})
+        assert rifiutata.status_code == 403
+
+    await server.ferma()
+    await application.stop()
+    await application.shutdown()
+    await api.ferma()
+    return sonda.latenze
+
+
+async def misura_raffica(quanti, max_coda):
+    """Update accettati, rifiutati con 503 e massimo in volo durante una raffica sul webhook."""
+    api = FintoAPI()
+    await api.avvia()
+    application = bot.crea_applicazione(base_url=api.base_url)
+    processore = application.update_processor
+    massimo = 0
+
+    async def lento(update, context):
+        nonlocal massimo
+        massimo = max(massimo, processore.in_volo)
+        await asyncio.sleep(0.05)
+
+    application.add_handler(TypeHandler(Update, lento), group=-1)
+    await application.initialize()
+    await application.start()
+    server = ServerWebhook(application, segreto=SEGRETO, porta=0, max_coda=max_coda)
+    await server.avvia()
+    server.pronto = True
+
+    url = f"http://127.0.0.1:{server.server.porta}{server.percorso}"
+    limiti = httpx.Limits(max_connections=50)
+    async with httpx.AsyncClient(headers={INTESTAZIONE_SEGRETO: SEGRETO}, limits=limiti, timeout=60) as client:
+        risposte = await asyncio.gather(*(
+            client.post(url, json=update_tap(api.nuovo_update_id(), bot.catalogo.SCHERMATA_PRINCIPALE, 10_000 + i))
+            for i in range(quanti)
+        ))
+    stati = [risposta.status_code for risposta in risposte]
+    await server.ferma()
+    await application.stop()
+    await application.shutdown()
+    await api.ferma()
+    return stati.count(200), stati.count(503), massimo
+
+
+async def principale(argomenti):
+    riepilogo('polling', await misura_polling(argomenti.update))
+    riepilogo('webhook', await misura_webhook(argomenti.update))
+    accettati, rifiutati, massimo = await misura_raffica(argomenti.raffica, argomenti.max_coda)
+    print(f"raffica  {accettati} accettati, {rifiutati} rifiutati con 503, "
+          f"massimo in volo {massimo} (limite {argomenti.max_coda})")
+    assert massimo <= argomenti.max_coda, massimo
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--update', type=int, default=500)
+    parser.add_argument('--raffica', type=int, default=1000, help='update concorrenti sul webhook')
+    parser.add_argument('--max-coda', type=int, default=200, help='limite del webhook (WEBHOOK_MAX_CODA)')
+    asyncio.run(principale(parser.parse_args()))
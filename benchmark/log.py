@@ -0,0 +1,94 @@
+"""📓 Costo dei log sul thread dell'event loop: handler sincrono contro diario.
+
+Uso:
+    python -m benchmark.log [--righe 2000] [--ritardo 0.001] [--raffica 20000]
+
+Scrive --righe record (con un argomento da formattare) su un flusso che
+impiega --ritardo secondi per ogni write, come uno stdout rediretto su un
+disco lento. Con lo StreamHandler di logging.basicConfig l'attesa è tutta
+sul thread che chiama logger.info; con diario.configura il chiamante mette
+solo il record in coda e il listener scrive in background.
+
+Poi invia --raffica avvisi identici in meno di un secondo e riporta quanti
+ne lascia passare il limite per modello.
+"""
+import argparse
+import io
+import logging
+import statistics
+import time
+
+import diario
+
+
+class FlussoLento(io.TextIOBase):
+    """Flusso di testo che attende `ritardo` secondi a ogni write."""
+
+    def __init__(self, ritardo):
+        self.ritardo = ritardo
+        self.righe = 0
+
+    def write(self, testo):
+        time.sleep(self.ritardo)
+        self.righe += testo.count('\n')
+        return len(testo)
+
+
+def misura(logger, righe):
+    """Durate (secondi) di ogni chiamata a logger.info sul thread corrente."""
+    durate = []
+    for i in range(righe):
+        inizio = time.perf_counter()
+        logger.info("📤 Invio a %d destinazioni (%s)", i % 7, f"prova:{i}")
+        durate.append(time.perf_counter() - inizio)
+    return durate
+
+
+def riepilogo(nome, durate, totale):
+    us = sorted(d * 1e6 for d in durate)
+    p99 = statistics.quantiles(us, n=100)[98]
+    print(f"{nome:10}: media {statistics.fmean(us):9.1f} µs  p99 {p99:9.1f} µs  "
+          f"sul chiamante {sum(durate):6.2f} s  scritto in {totale:6.2f} s")
+
+
+def principale(argomenti):
+    radice = logging.getLogger()
+    logger = logging.getLogger('prova')
+
+    # logging.basicConfig: formattazione e write sul thread del chiamante
+    flusso = FlussoLento(argomenti.ritardo)
+    sincrono = logging.StreamHandler(flusso)
+    sincrono.setFormatter(logging.Formatter(diario.FORMATO_CLASSICO))
+    radice.handlers[:] = [sincrono]
+    radice.setLevel(logging.INFO)
+    inizio = time.perf_counter()
+    durate = misura(logger, argomenti.righe)
+    riepilogo('sincrono', durate, time.perf_counter() - inizio)
+
+    # diario: solo il record in coda; JSON e write nel thread del listener
+    flusso = FlussoLento(argomenti.ritardo)
+    diario.configura(destinazione=logging.StreamHandler(flusso), limite=0)
+    inizio = time.perf_counter()
+    durate = misura(logger, argomenti.righe)
+    diario.ferma()
+    assert flusso.righe == argomenti.righe, flusso.righe
+    riepilogo('diario', durate, time.perf_counter() - inizio)
+
+    # Raffica dello stesso avviso: al massimo `limite` righe al secondo
+    flusso = FlussoLento(0)
+    diario.configura(destinazione=logging.StreamHandler(flusso), limite=20)
+    inizio = time.perf_counter()
+    for i in range(argomenti.raffica):
+        logger.warning("⚠️ Broadcast a %s fallito: %s", 10_000 + i, "Forbidden: bot was blocked by the user")
+    durata = time.perf_counter() - inizio
+    scartati = diario.raffica().soppressi
+    diario.ferma()
+    print(f"raffica   : {argomenti.raffica} avvisi in {durata:.2f} s, {flusso.righe} scritti, {scartati} soppressi")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--righe', type=int, default=2000)
+    parser.add_argument('--ritardo', type=float, default=0.001, help='secondi per ogni write')
+    parser.add_argument('--raffica', type=int, default=20_000)
+    principale(parser.parse_args())
@@ -0,0 +1,606 @@
+"""⏱️ Micro-benchmark: dispatch a tabella vs vecchia catena if/elif di button_handler.
+
+Uso:
+    python -m benchmark.menu [--tap 200000] [--sessioni 10000] [--tap-sessione 8] [--doppio 0.1] [--seme 1]
+
+Confronta i tap/sec del nuovo button_handler (indice delle schermate del catalogo) con la
+catena if/elif originale, riportata qui sotto come riferimento. Le chiamate
+verso Telegram sono sostituite da stub che non fanno nulla.
+
+Simula poi --sessioni utenti che premono --tap-sessione pulsanti a caso
+partendo dal menu principale (--doppio è la probabilità di premerne uno
+due volte di fila) e conta le chiamate alla Bot API per sessione con la
+catena originale, senza la cache delle modifiche e con ogni modalità dei
+pulsanti link del catalogo.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import Counter
+
+os.environ.setdefault('TELEGRAM_TOKEN', '0:benchmark')
+os.environ.setdefault('ARCHIVIO_PATH', ':memory:')
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update  # noqa: E402
+from telegram.ext import ContextTypes  # noqa: E402
+
+import catalogo  # noqa: E402
+import gobasilicata_bot as bot  # noqa: E402
+from modifiche import CacheModifiche  # noqa: E402
+
+
+class _Messaggio:
+    chat_id = 1
+    message_id = 1
+
+
+class FakeQuery:
+    """Callback query finta: registra solo l'ultima chiamata."""
+
+    __slots__ = ('data', 'message', 'ultima')
+
+    def __init__(self, data):
+        self.data = data
+        self.message = _Messaggio()
+        self.ultima = None
+
+    async def answer(self, text=None, show_alert=False):
+        pass
+
+    async def edit_message_text(self, text, reply_markup=None, parse_mode=None):
+        self.ultima = ('edit', text, reply_markup, parse_mode)
+
+
+class FakeBot:
+    __slots__ = ('ultima',)
+
+    def __init__(self):
+        self.ultima = None
+
+    async def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+        self.ultima = ('send', text, reply_markup, parse_mode)
+
+
+class FakeContext:
+    __slots__ = ('bot',)
+
+    def __init__(self):
+        self.bot = FakeBot()
+
+
+class ContaQuery(FakeQuery):
+    """Callback query finta che conta le chiamate alla Bot API."""
+
+    __slots__ = ('chiamate',)
+
+    def __init__(self, data, chiamate):
+        super().__init__(data)
+        self.chiamate = chiamate
+
+    async def answer(self, text=None, show_alert=False):
+        self.chiamate['answerCallbackQuery'] += 1
+
+    async def edit_message_text(self, text, reply_markup=None, parse_mode=None):
+        self.chiamate['editMessageText'] += 1
+        await super().edit_message_text(text, reply_markup, parse_mode)
+
+
+class ContaBot(FakeBot):
+    __slots__ = ('chiamate',)
+
+    def __init__(self, chiamate):
+        super().__init__()
+        self.chiamate = chiamate
+
+    async def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+        self.chiamate['sendMessage'] += 1
+        await super().send_message(chat_id, text, reply_markup, parse_mode)
+
+
+class FakeUpdate:
+    __slots__ = ('callback_query',)
+
+    def __init__(self, query):
+        self.callback_query = query
+
+
+# --------------------------------------------------------------------------
+# CATENA IF/ELIF ORIGINALE (riferimento)
+# --------------------------------------------------------------------------
+
+def _legacy_main_menu_keyboard():
+    keyboard = [
+        [InlineKeyboardButton("🏖️ Dove Dormire", callback_data='MENU_DOVE_DORMIRE')],
+        [InlineKeyboardButton("🗺️ Cosa Vedere", callback_data='MENU_COSA_VEDERE')],
+        [InlineKeyboardButton("🍷 Prodotti Lucani", callback_data='MENU_PRODOTTI_LUCANI')],
+        [InlineKeyboardButton("📋 Servizi BasilicataGo", callback_data='MENU_SERVIZI_BASILICATAGO')]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+
+async def legacy_button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Gestisce tutte le interazioni con i pulsanti inline."""
+    query = update.callback_query
+    await query.answer()
+    
+    data = query.data
+
+    if data == 'TORNA_MENU_PRINCIPALE':
+        await query.edit_message_text(
+            text="🏛️ **Esplora la Basilicata**\n\nCosa ti interessa scoprire?",
+            reply_markup=_legacy_main_menu_keyboard(),
+            parse_mode='Markdown'
+        )
+        return
+
+    elif data == 'MENU_DOVE_DORMIRE':
+        pulsanti_dormire = [
+            [InlineKeyboardButton("🏡 Bio del Fico - Locazione Turistica", callback_data='LINK_BIODELFICO')],
+            [InlineKeyboardButton("🏨 Tutte le Strutture Ricettive", callback_data='LINK_STRUTTURE_BASILICATAGO')],
+            [InlineKeyboardButton("⬅️ Menu Principale", callback_data='TORNA_MENU_PRINCIPALE')]
+        ]
+        
+        await query.edit_message_text(
+            text=(
+                "**🏖️ DOVE DORMIRE IN BASILICATA**\n\n"
+                "Scopri le migliori strutture ricettive della regione:\n"
+                "🏡 Agriturismi e case vacanza\n"
+                "🏨 Hotel e B&B\n"
+                "🏛️ Dimore storiche e masserie"
+            ),
+            reply_markup=InlineKeyboardMarkup(pulsanti_dormire),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'LINK_BIODELFICO':
+        await query.answer("Apertura in corso...", show_alert=False)
+        await context.bot.send_message(
+            chat_id=query.message.chat_id,
+            text=(
+                "🏡 **Bio del Fico - Locazione Turistica**\n\n"
+                "Vivi un'esperienza autentica nella natura lucana!\n\n"
+                "🌿 Immerso nel verde della Basilicata\n"
+                "🏖️ A pochi km dalle spiagge più belle\n"
+                "🍇 Prodotti biologici a km zero\n\n"
+                "🔗 **Prenota ora:** https://biodelfico.com"
+            ),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'LINK_STRUTTURE_BASILICATAGO':
+        await query.answer("Apertura in corso...", show_alert=False)
+        await context.bot.send_message(
+            chat_id=query.message.chat_id,
+            text=(
+                "🏨 **Strutture Ricettive Basilicata**\n\n"
+                "Trova l'alloggio perfetto su BasilicataGo:\n\n"
+                "✅ Hotel, B&B, Agriturismi\n"
+                "✅ Case vacanza e appartamenti\n"
+                "✅ Recensioni verificate\n"
+                "✅ Prenotazione diretta\n\n"
+                "🔗 **Scopri tutte le strutture:** https://basilicatago.com"
+            ),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'MENU_COSA_VEDERE':
+        pulsanti_vedere = [
+            [InlineKeyboardButton("🏛️ Matera e i Sassi", callback_data='DESTINAZIONE_MATERA')],
+            [InlineKeyboardButton("🏖️ Maratea e le Spiagge", callback_data='DESTINAZIONE_MARATEA')],
+            [InlineKeyboardButton("🏰 Borghi e Castelli", callback_data='DESTINAZIONE_BORGHI')],
+            [InlineKeyboardButton("🌄 Parchi Naturali", callback_data='DESTINAZIONE_PARCHI')],
+            [InlineKeyboardButton("⬅️ Menu Principale", callback_data='TORNA_MENU_PRINCIPALE')]
+        ]
+        
+        await query.edit_message_text(
+            text="**🗺️ COSA VEDERE IN BASILICATA**\n\nScegli una destinazione:",
+            reply_markup=InlineKeyboardMarkup(pulsanti_vedere),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'DESTINAZIONE_MATERA':
+        pulsanti_matera = [
+            [InlineKeyboardButton("📋 Maggiori Info", callback_data='INFO_MATERA')],
+            [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_COSA_VEDERE')]
+        ]
+        await query.edit_message_text(
+            text=(
+                "**🏛️ MATERA - CITTÀ DEI SASSI**\n\n"
+                "Patrimonio UNESCO dal 1993\n\n"
+                "✨ I Sassi Barisano e Caveoso\n"
+                "⛪ Chiese rupestri\n"
+                "🏺 Casa Grotta e Cisterna del Palombaro\n"
+                "🎬 Location di film internazionali\n\n"
+                "📍 Capitale Europea della Cultura 2019"
+            ),
+            reply_markup=InlineKeyboardMarkup(pulsanti_matera),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'INFO_MATERA':
+        await query.answer("Apertura in corso...", show_alert=False)
+        await context.bot.send_message(
+            chat_id=query.message.chat_id,
+            text=(
+                "📋 **Informazioni su Matera**\n\n"
+                "🔗 Scopri tutti i dettagli, servizi e strutture su:\n"
+                "https://basilicatago.com"
+            ),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'DESTINAZIONE_MARATEA':
+        pulsanti_maratea = [
+            [InlineKeyboardButton("🏖️ Spiagge", callback_data='INFO_SPIAGGE')],
+            [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_COSA_VEDERE')]
+        ]
+        await query.edit_message_text(
+            text=(
+                "**🏖️ MARATEA - PERLA DEL TIRRENO**\n\n"
+                "32 km di costa mozzafiato\n\n"
+                "🏝️ Spiagge e calette nascoste\n"
+                "⛰️ Cristo Redentore (21 metri)\n"
+                "🏛️ Centro storico medievale\n"
+                "🌊 Mare cristallino\n\n"
+                "📍 Unica località lucana sul Mar Tirreno"
+            ),
+            reply_markup=InlineKeyboardMarkup(pulsanti_maratea),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'INFO_SPIAGGE':
+        await query.answer("Apertura in corso...", show_alert=False)
+        await context.bot.send_message(
+            chat_id=query.message.chat_id,
+            text=(
+                "🏖️ **Le Spiagge della Basilicata**\n\n"
+                "Scopri tutte le spiagge, lidi e servizi su:\n"
+                "https://basilicatago.com"
+            ),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'DESTINAZIONE_BORGHI':
+        await query.edit_message_text(
+            text=(
+                "**🏰 BORGHI E CASTELLI**\n\n"
+                "📍 **Castelmezzano** e **Pietrapertosa** - Volo dell'Angelo\n"
+                "📍 **Craco** - Città fantasma\n"
+                "📍 **Venosa** - Città di Orazio\n"
+                "📍 **Tricarico** - Borgo arabo-normanno\n"
+                "📍 **Muro Lucano** - Borgo Presepe\n\n"
+                "🔗 Scopri tutti i borghi su https://basilicatago.com"
+            ),
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_COSA_VEDERE')]
+            ]),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'DESTINAZIONE_PARCHI':
+        await query.edit_message_text(
+            text=(
+                "**🌄 PARCHI NATURALI**\n\n"
+                "🌲 **Parco del Pollino** - Il più grande d'Italia\n"
+                "🏔️ **Parco della Val d'Agri**\n"
+                "🌊 **Riserva dei Calanchi di Montalbano Jonico**\n"
+                "🦅 **Parco di Gallipoli Cognato**\n"
+                "🌋 **Laghi di Monticchio** (laghi vulcanici)\n\n"
+                "🔗 Itinerari e info: https://basilicatago.com"
+            ),
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_COSA_VEDERE')]
+            ]),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'MENU_PRODOTTI_LUCANI':
+        pulsanti_prodotti = [
+            [InlineKeyboardButton("🧀 Formaggi DOP", callback_data='PRODOTTI_FORMAGGI')],
+            [InlineKeyboardButton("🥓 Salumi e Lucanica", callback_data='PRODOTTI_SALUMI')],
+            [InlineKeyboardButton("🍷 Vini e Aglianico", callback_data='PRODOTTI_VINI')],
+            [InlineKeyboardButton("🌶️ Peperoni Cruschi IGP", callback_data='PRODOTTI_CRUSCHI')],
+            [InlineKeyboardButton("🛒 Acquista su BasilicataGo", callback_data='LINK_PRODOTTI_BASILICATAGO')],
+            [InlineKeyboardButton("⬅️ Menu Principale", callback_data='TORNA_MENU_PRINCIPALE')]
+        ]
+        
+        await query.edit_message_text(
+            text=(
+                "**🍷 PRODOTTI TIPICI LUCANI**\n\n"
+                "Scopri le eccellenze enogastronomiche della Basilicata:\n"
+                "Prodotti DOP, IGP e tradizioni centenarie"
+            ),
+            reply_markup=InlineKeyboardMarkup(pulsanti_prodotti),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'PRODOTTI_FORMAGGI':
+        await query.edit_message_text(
+            text=(
+                "**🧀 FORMAGGI LUCANI DOP**\n\n"
+                "🧀 **Caciocavallo Silano DOP**\n"
+                "🧀 **Canestrato di Moliterno IGP**\n"
+                "🧀 **Pecorino di Filiano DOP**\n"
+                "🧀 **Ricotta forte lucana**\n\n"
+                "Formaggi prodotti con latte di pascoli montani e tecniche tradizionali.\n\n"
+                "🛒 Acquista su https://basilicatago.com"
+            ),
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_PRODOTTI_LUCANI')]
+            ]),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'PRODOTTI_SALUMI':
+        await query.edit_message_text(
+            text=(
+                "**🥓 SALUMI E LUCANICA**\n\n"
+                "🥓 **Lucanica di Picerno IGP**\n"
+                "🥓 **Soppressata lucana**\n"
+                "🥓 **Salsiccia al Peperone Crusco**\n"
+                "🥓 **Pezzenta** (salame povero)\n\n"
+                "Salumi artigianali con carne di maiali allevati allo stato brado.\n\n"
+                "🛒 Ordina su https://basilicatago.com"
+            ),
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_PRODOTTI_LUCANI')]
+            ]),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'PRODOTTI_VINI':
+        await query.edit_message_text(
+            text=(
+                "**🍷 VINI LUCANI**\n\n"
+                "🍷 **Aglianico del Vulture DOC**\n"
+                "🍷 **Matera DOC**\n"
+                "🍷 **Grottino di Roccanova DOC**\n"
+                "🥂 **Malvasia e Moscato**\n\n"
+                "Vini pregiati da terreni vulcanici e colline soleggiate.\n\n"
+                "🛒 Enoteca su https://basilicatago.com"
+            ),
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_PRODOTTI_LUCANI')]
+            ]),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'PRODOTTI_CRUSCHI':
+        await query.edit_message_text(
+            text=(
+                "**🌶️ PEPERONI CRUSCHI IGP**\n\n"
+                "Il simbolo della cucina lucana!\n\n"
+                "✨ Peperoni di Senise essiccati al sole\n"
+                "🔥 Fritti fino a diventare croccanti\n"
+                "🍝 Perfetti con pasta e piatti tipici\n"
+                "🏅 Presidio Slow Food\n\n"
+                "🛒 Acquista su https://basilicatago.com"
+            ),
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_PRODOTTI_LUCANI')]
+            ]),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'LINK_PRODOTTI_BASILICATAGO':
+        await query.answer("Apertura in corso...", show_alert=False)
+        await context.bot.send_message(
+            chat_id=query.message.chat_id,
+            text=(
+                "🛒 **Shop Prodotti Lucani**\n\n"
+                "Acquista online le eccellenze della Basilicata:\n\n"
+                "✅ Spedizione in tutta Italia\n"
+                "✅ Produttori selezionati\n"
+                "✅ Qualità certificata DOP/IGP\n\n"
+                "🔗 **Acquista ora:** https://basilicatago.com"
+            ),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'MENU_SERVIZI_BASILICATAGO':
+        pulsanti_servizi = [
+            [InlineKeyboardButton("🏠 Strutture Ricettive", callback_data='SERVIZIO_STRUTTURE')],
+            [InlineKeyboardButton("📢 Annunci", callback_data='SERVIZIO_ANNUNCI')],
+            [InlineKeyboardButton("🛒 Shop Prodotti", callback_data='SERVIZIO_SHOP')],
+            [InlineKeyboardButton("🌐 Vai al Portale", callback_data='LINK_PORTALE_BASILICATAGO')],
+            [InlineKeyboardButton("⬅️ Menu Principale", callback_data='TORNA_MENU_PRINCIPALE')]
+        ]
+        
+        await query.edit_message_text(
+            text=(
+                "**📋 SERVIZI BASILICATAGO.COM**\n\n"
+                "Il portale completo per turismo e servizi in Basilicata:\n\n"
+                "🏨 Prenota strutture ricettive\n"
+                "📢 Consulta annunci locali\n"
+                "🛒 Acquista prodotti tipici\n"
+                "🗺️ Scopri itinerari turistici"
+            ),
+            reply_markup=InlineKeyboardMarkup(pulsanti_servizi),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'SERVIZIO_STRUTTURE':
+        await query.answer("Apertura in corso...", show_alert=False)
+        await context.bot.send_message(
+            chat_id=query.message.chat_id,
+            text=(
+                "🏨 **Strutture Ricettive**\n\n"
+                "Database completo con:\n"
+                "✅ Hotel, B&B, Agriturismi\n"
+                "✅ Case vacanza\n"
+                "✅ Masserie e dimore storiche\n"
+                "✅ Recensioni e contatti diretti\n\n"
+                "🔗 https://basilicatago.com"
+            ),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'SERVIZIO_ANNUNCI':
+        await query.answer("Apertura in corso...", show_alert=False)
+        await context.bot.send_message(
+            chat_id=query.message.chat_id,
+            text=(
+                "📢 **Annunci Basilicata**\n\n"
+                "Trova e pubblica:\n"
+                "🏠 Immobili\n"
+                "🚗 Veicoli\n"
+                "💼 Servizi locali\n"
+                "🎯 Eventi e iniziative\n\n"
+                "🔗 https://basilicatago.com"
+            ),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'SERVIZIO_SHOP':
+        await query.answer("Apertura in corso...", show_alert=False)
+        await context.bot.send_message(
+            chat_id=query.message.chat_id,
+            text=(
+                "🛒 **Shop Prodotti Lucani**\n\n"
+                "Acquista online:\n"
+                "🧀 Formaggi DOP/IGP\n"
+                "🥓 Salumi artigianali\n"
+                "🍷 Vini pregiati\n"
+                "🌶️ Peperoni Cruschi\n\n"
+                "Spedizione in tutta Italia!\n\n"
+                "🔗 https://basilicatago.com"
+            ),
+            parse_mode='Markdown'
+        )
+
+    elif data == 'LINK_PORTALE_BASILICATAGO':
+        await query.answer("Apertura in corso...", show_alert=False)
+        await context.bot.send_message(
+            chat_id=query.message.chat_id,
+            text=(
+                "🌐 **BasilicataGo - Portale Turistico**\n\n"
+                "Il riferimento per scoprire e vivere la Basilicata:\n\n"
+                "🏛️ Destinazioni e attrazioni\n"
+                "🏨 Prenotazioni strutture\n"
+                "🛒 Shop prodotti locali\n"
+                "📢 Annunci e servizi\n"
+                "📰 News e eventi\n\n"
+                "🔗 **Visita ora:** https://basilicatago.com"
+            ),
+            parse_mode='Markdown'
+        )
+
+
+# --------------------------------------------------------------------------
+# BENCHMARK
+# --------------------------------------------------------------------------
+
+def _risultato(update, context):
+    ultima = update.callback_query.ultima or context.bot.ultima
+    azione, testo, tastiera, parse_mode = ultima
+    return azione, testo, tastiera.to_dict() if tastiera else None, parse_mode
+
+
+async def verifica_equivalenza():
+    """Controlla che il nuovo handler produca gli stessi messaggi della catena."""
+    for data in bot.catalogo.corrente().schermate:
+        risultati = []
+        for handler in (legacy_button_handler, bot.button_handler):
+            update, context = FakeUpdate(FakeQuery(data)), FakeContext()
+            bot.cache_modifiche.dimentica(_Messaggio.chat_id, _Messaggio.message_id)
+            await handler(update, context)
+            risultati.append(_risultato(update, context))
+        if risultati[0] != risultati[1]:
+            raise AssertionError(f"Schermata diversa per {data}")
+
+
+async def misura(handler, tap):
+    chiavi = list(bot.catalogo.corrente().schermate)
+    updates = [FakeUpdate(FakeQuery(chiavi[i % len(chiavi)])) for i in range(tap)]
+    context = FakeContext()
+    inizio = time.perf_counter()
+    for update in updates:
+        await handler(update, context)
+    return tap / (time.perf_counter() - inizio)
+
+
+async def sessioni(handler, quante, tap, seme, doppio):
+    """Chiamate alla Bot API per `quante` sessioni di `tap` pulsanti premuti a caso.
+
+    Un pulsante url non chiama il bot; un messaggio inviato in chat non
+    sostituisce il menu, quindi l'utente continua dalla tastiera di prima.
+    Ogni sessione parte da un menu appena inviato, come handle_menu_button;
+    con probabilità `doppio` un pulsante viene premuto due volte di fila.
+    """
+    rng = random.Random(seme)
+    chiamate = Counter()
+    context = FakeContext()
+    context.bot = ContaBot(chiamate)
+    link = 0
+    schermata = catalogo.corrente().schermate[catalogo.SCHERMATA_PRINCIPALE]
+    principale = schermata.tastiera
+    for _ in range(quante):
+        tastiera = principale
+        bot.cache_modifiche.ricorda(_Messaggio.chat_id, _Messaggio.message_id, schermata.impronta)
+        for _ in range(tap):
+            pulsante = rng.choice([p for riga in tastiera.inline_keyboard for p in riga])
+            volte = 2 if rng.random() < doppio else 1
+            if pulsante.url:
+                link += 1
+                continue
+            for _ in range(volte):
+                update = FakeUpdate(ContaQuery(pulsante.callback_data, chiamate))
+                await handler(update, context)
+                if update.callback_query.ultima is not None and update.callback_query.ultima[2] is not None:
+                    tastiera = update.callback_query.ultima[2]
+                elif context.bot.ultima is not None:
+                    link += 1
+                    context.bot.ultima = None
+    return chiamate, link
+
+
+async def confronta_modalita(quante, tap, seme, doppio):
+    originale = catalogo.corrente()
+    cache = bot.cache_modifiche
+    righe = []
+    try:
+        chiamate, link = await sessioni(legacy_button_handler, quante, tap, seme, doppio)
+        righe.append(('if/elif', chiamate, link))
+        # Stesse sessioni senza la cache delle modifiche (capienza 0)
+        bot.cache_modifiche = CacheModifiche(0)
+        chiamate, link = await sessioni(bot.button_handler, quante, tap, seme, doppio)
+        righe.append(('no cache', chiamate, link))
+        bot.cache_modifiche = cache
+        for modalita in catalogo.MODALITA_LINK:
+            catalogo._corrente = catalogo.carica_catalogo(originale.percorso, modalita)
+            chiamate, link = await sessioni(bot.button_handler, quante, tap, seme, doppio)
+            righe.append((modalita, chiamate, link))
+    finally:
+        catalogo._corrente = originale
+        bot.cache_modifiche = cache
+
+    riferimento = sum(righe[0][1].values()) / quante
+    print(f"\n📱 {quante} sessioni da {tap} tap, {doppio:.0%} premuti due volte (chiamate alla Bot API per sessione)")
+    for nome, chiamate, link in righe:
+        totale = sum(chiamate.values()) / quante
+        dettaglio = ", ".join(f"{metodo} {n / quante:.2f}" for metodo, n in sorted(chiamate.items()))
+        print(f"{nome:9}: {totale:5.2f} risparmiate {riferimento - totale:5.2f}  "
+              f"({dettaglio}; link aperti {link / quante:.2f})")
+
+
+async def principale(argomenti):
+    await verifica_equivalenza()
+    print(f"✅ {len(bot.catalogo.corrente().schermate)} schermate equivalenti alla catena if/elif")
+    vecchio = await misura(legacy_button_handler, argomenti.tap)
+    nuovo = await misura(bot.button_handler, argomenti.tap)
+    print(f"if/elif  : {vecchio:12,.0f} tap/s")
+    print(f"tabella  : {nuovo:12,.0f} tap/s")
+    print(f"speedup  : {nuovo / vecchio:12.1f}x")
+    await confronta_modalita(argomenti.sessioni, argomenti.tap_sessione, argomenti.seme, argomenti.doppio)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tap', type=int, default=200_000)
+    parser.add_argument('--sessioni', type=int, default=10_000)
+    parser.add_argument('--tap-sessione', type=int, default=8)
+    parser.add_argument('--doppio', type=float, default=0.1, help='probabilità di un doppio tap')
+    parser.add_argument('--seme', type=int, default=1)
+    asyncio.run(principale(parser.parse_args()))
@@ -0,0 +1,159 @@
+"""🧩 Throughput con più processi lavoratori (LAVORATORI) contro la Bot API finta.
+
+Uso:
+    python -m benchmark.processi [--lavoratori 0,1,2,4] [--update 3000] [--chat 1000]
+                                 [--latenza 0] [--uccidi]
+
+Per ogni valore di --lavoratori avvia `python gobasilicata_bot.py` in
+polling verso benchmark.finto_api (0 = un solo processo, come prima),
+attende che risponda a un primo giro di tap, poi mette in coda --update
+tap sul menu da --chat chat diverse e misura il tempo fino alla risposta
+all'ultimo (answerCallbackQuery).
+
+Con --uccidi, a un terzo della prova un lavoratore viene terminato con
+SIGKILL: il front lo riavvia e gli reinvia gli update non confermati.
+Si verifica che tutti i tap ricevano risposta e si contano quelli
+elaborati due volte.
+
+La Bot API finta gira in questo processo: su poche CPU è lei a limitare
+il throughput, e con una sola CPU più processi non possono che dividersi
+lo stesso core.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmark.finto_api import FintoAPI, update_tap
+from catalogo import SCHERMATA_PRINCIPALE, inizializza, corrente
+
+BOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gobasilicata_bot.py')
+RISCALDAMENTO = 50
+ATTESA_MASSIMA = 300
+
+
+class APIRisposte(FintoAPI):
+    """FintoAPI che conta le risposte a ogni callback query."""
+
+    def __init__(self, **opzioni):
+        super().__init__(**opzioni)
+        self.risposte = Counter()
+        self._nuove = asyncio.Event()
+
+    async def api_answerCallbackQuery(self, parametri):
+        self.risposte[str(parametri.get('callback_query_id'))] += 1
+        self._nuove.set()
+        return True
+
+    async def attendi(self, ids, secondi, durante=None):
+        """Attende la risposta a tutti gli `ids`; `durante(risposti)` viene chiamata a ogni avanzamento."""
+        limite = time.monotonic() + secondi
+        while True:
+            risposti = sum(1 for id in ids if id in self.risposte)
+            if durante is not None:
+                durante(risposti)
+            if risposti == len(ids):
+                return
+            if time.monotonic() > limite:
+                raise TimeoutError(f"{len(ids) - risposti} tap senza risposta")
+            self._nuove.clear()
+            try:
+                await asyncio.wait_for(self._nuove.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+
+
+def figli(pid):
+    """PID dei processi figli (Linux)."""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def inietta_tap(api, quanti, chat, chiavi):
+    ids = []
+    for _ in range(quanti):
+        update_id = api.nuovo_update_id()
+        api.inietta(update_tap(update_id, chiavi[update_id % len(chiavi)], 10_000 + update_id % chat))
+        ids.append(str(update_id))
+    return ids
+
+
+async def prova(argomenti, lavoratori, cartella, chiavi):
+    api = APIRisposte(latenza=argomenti.latenza, seme=lavoratori)
+    await api.avvia()
+    ambiente = dict(
+        os.environ,
+        TELEGRAM_TOKEN='0:processi',
+        TELEGRAM_BASE_URL=api.base_url,
+        ADMIN_ID='42',
+        ARCHIVIO_PATH=os.path.join(cartella, f'processi{lavoratori}.db'),
+        LAVORATORI=str(lavoratori),
+        SMISTAMENTO_SOCKET=os.path.join(cartella, f'processi{lavoratori}.sock'),
+        LIMITE_GLOBALE='1000000',
+        LIMITE_PRIVATO='1000000',
+        LOG_LIVELLO='WARNING'
+    )
+    processo = await asyncio.create_subprocess_exec(sys.executable, BOT, env=ambiente)
+    try:
+        # Primo giro: tutti i processi avviati e collegati
+        await api.attendi(inietta_tap(api, RISCALDAMENTO, argomenti.chat, chiavi), ATTESA_MASSIMA)
+
+        ucciso = []
+
+        def durante(risposti):
+            if argomenti.uccidi and lavoratori and not ucciso and risposti >= argomenti.update // 3:
+                vittima = figli(processo.pid)[0]
+                os.kill(vittima, signal.SIGKILL)
+                ucciso.append(vittima)
+
+        ids = inietta_tap(api, argomenti.update, argomenti.chat, chiavi)
+        inizio = time.perf_counter()
+        await api.attendi(ids, ATTESA_MASSIMA, durante)
+        durata = time.perf_counter() - inizio
+        doppi = sum(1 for id in ids if api.risposte[id] > 1)
+        return durata, doppi, bool(ucciso)
+    finally:
+        processo.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(processo.wait(), timeout=60)
+        except asyncio.TimeoutError:
+            processo.kill()
+            await processo.wait()
+        await api.ferma()
+
+
+async def principale(argomenti):
+    inizializza('catalogo.json')
+    chiavi = [chiave for chiave, schermata in corrente().schermate.items() if schermata.azione == 'edit']
+    chiavi.remove(SCHERMATA_PRINCIPALE)
+    print(f"🧩 {argomenti.update} tap da {argomenti.chat} chat, latenza Bot API {argomenti.latenza * 1000:.0f} ms, "
+          f"{os.cpu_count()} CPU")
+    base = None
+    with tempfile.TemporaryDirectory() as cartella:
+        for lavoratori in argomenti.lavoratori:
+            durata, doppi, ucciso = await prova(argomenti, lavoratori, cartella, chiavi)
+            al_secondo = argomenti.update / durata
+            base = base or al_secondo
+            nome = f"{lavoratori} lavoratori" if lavoratori else "un processo"
+            riga = f"   {nome:<14} {al_secondo:8.0f} update/s  ({al_secondo / base:.2f}x)"
+            if ucciso:
+                riga += f"  lavoratore ucciso: tutti i tap con risposta, {doppi} elaborati due volte"
+            print(riga)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lavoratori', type=lambda testo: [int(n) for n in testo.split(',')], default=[0, 1, 2, 4],
+                        help='numeri di lavoratori da provare, separati da virgole')
+    parser.add_argument('--update', type=int, default=3000, help='tap per prova')
+    parser.add_argument('--chat', type=int, default=1000, help='chat diverse tra cui ruotare i tap')
+    parser.add_argument('--latenza', type=float, default=0.0, help='secondi di attesa per chiamata alla Bot API')
+    parser.add_argument('--uccidi', action='store_true', help='termina un lavoratore a metà prova')
+    asyncio.run(principale(parser.parse_args()))
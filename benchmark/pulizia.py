@@ -0,0 +1,88 @@
+"""🧹 Chiamate a Telegram per la pulizia dei messaggi: una per messaggio contro deleteMessages.
+
+Uso:
+    python -m benchmark.pulizia [--chat 50] [--messaggi 40]
+
+Simula un'ondata di messaggi di testo da `--chat` chat diverse verso
+handle_other_messages, con un Bot finto che conta le chiamate, e controlla
+che le cancellazioni avvengano a blocchi: una chiamata per chat per finestra,
+al massimo 100 id per chiamata, e nessun messaggio perso all'arresto.
+"""
+import argparse
+import asyncio
+import os
+from collections import Counter
+from types import SimpleNamespace
+
+os.environ.setdefault('TELEGRAM_TOKEN', '0:benchmark')
+os.environ.setdefault('ARCHIVIO_PATH', ':memory:')
+
+import gobasilicata_bot as bot  # noqa: E402
+from pulizia import MAX_PER_CHIAMATA, CestinoMessaggi  # noqa: E402
+
+
+class FintoBot:
+    """Conta le chiamate e i messaggi cancellati per chat."""
+
+    def __init__(self):
+        self.chiamate = Counter()
+        self.cancellati = Counter()
+
+    async def delete_messages(self, chat_id, message_ids):
+        assert len(message_ids) <= MAX_PER_CHIAMATA
+        self.chiamate['deleteMessages'] += 1
+        self.cancellati[chat_id] += len(message_ids)
+        return True
+
+
+def update_testo(chat_id, message_id):
+    return SimpleNamespace(
+        effective_chat=SimpleNamespace(id=chat_id),
+        message=SimpleNamespace(message_id=message_id)
+    )
+
+
+async def ondata(finto, chat, messaggi):
+    context = SimpleNamespace(bot=finto)
+    for message_id in range(1, messaggi + 1):
+        for chat_id in range(1, chat + 1):
+            await bot.handle_other_messages(update_testo(chat_id, message_id), context)
+
+
+async def principale(chat, messaggi):
+    # Finestra di tempo: una chiamata per chat
+    bot.cestino = CestinoMessaggi(ritardo=0.05)
+    finto = FintoBot()
+    await ondata(finto, chat, min(messaggi, MAX_PER_CHIAMATA - 1))
+    await asyncio.sleep(bot.cestino.ritardo * 2)
+    assert finto.chiamate['deleteMessages'] == chat, finto.chiamate
+    print(f"✅ finestra: {chat} chat -> {finto.chiamate['deleteMessages']} chiamate")
+
+    # Soglia: ogni 100 messaggi parte subito un blocco
+    bot.cestino = CestinoMessaggi(ritardo=3600)
+    finto = FintoBot()
+    await ondata(finto, 1, 250)
+    await asyncio.sleep(0)
+    assert finto.chiamate['deleteMessages'] == 2 and bot.cestino.in_attesa == 50
+    await bot.cestino.svuota()
+    assert finto.chiamate['deleteMessages'] == 3 and finto.cancellati[1] == 250
+    print("✅ soglia: 250 messaggi -> 3 chiamate (100 + 100 + 50 all'arresto)")
+
+    # Arresto: nulla resta in attesa
+    bot.cestino = CestinoMessaggi(ritardo=3600)
+    finto = FintoBot()
+    await ondata(finto, chat, messaggi)
+    await bot.cestino.svuota()
+    totale = chat * messaggi
+    assert sum(finto.cancellati.values()) == totale and bot.cestino.in_attesa == 0
+    m = bot.cestino.metriche()
+    print(f"📊 {totale} messaggi: {m['chiamate']} chiamate invece di {totale} "
+          f"({m['risparmiate']} risparmiate, -{100 * m['risparmiate'] / totale:.1f}%)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chat', type=int, default=50)
+    parser.add_argument('--messaggi', type=int, default=40)
+    argomenti = parser.parse_args()
+    asyncio.run(principale(argomenti.chat, argomenti.messaggi))
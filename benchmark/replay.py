@@ -0,0 +1,278 @@
+"""🔁 Replay di flussi di update realistici contro il bot, con Bot API finta in memoria.
+
+Uso:
+    python -m benchmark.replay [--sessioni 300] [--latenza-api 0] [--seme 1]
+                               [--salva base.json] [--confronta base.json] [--tolleranza 0.25]
+
+Il flusso mescola sessioni di navigazione nel menu (/start, pulsante
+"Scopri la Basilicata", tap sui pulsanti seguendo le tastiere del catalogo),
+messaggi di testo da cancellare e comandi admin. Gli update passano da
+Application.process_update attraverso il ProcessoreUpdate del bot; le
+chiamate alla Bot API sono servite da RichiestaFinta con latenza
+configurabile.
+
+Riporta update/s, latenza p50/p95/p99 per handler e memoria allocata per
+update (tracemalloc, in un secondo passaggio). Con --salva i risultati
+diventano una baseline JSON; con --confronta il comando esce con codice 1
+se update/s o p95 di un handler peggiorano oltre la tolleranza.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+os.environ.setdefault('TELEGRAM_TOKEN', '0:benchmark')
+os.environ.setdefault('ARCHIVIO_PATH', ':memory:')
+os.environ.setdefault('ADMIN_ID', '42')
+os.environ.setdefault('LIMITE_GLOBALE', '100000')
+os.environ.setdefault('LIMITE_PRIVATO', '100000')
+
+from telegram import Update  # noqa: E402
+
+import gobasilicata_bot as bot  # noqa: E402
+from benchmark.finto_api import FintoAPI, RichiestaFinta  # noqa: E402
+
+ADMIN_ID = int(os.environ['ADMIN_ID'])
+COMANDI_ADMIN = ('/stato_bot', '/lista_programmati', '/help', '/verifica_permessi')
+TESTI_CASUALI = ('ciao', 'info?', 'orari museo', '👍', 'quanto costa', 'grazie mille')
+
+
+# ----------------------------------------------------------------------
+# Generatore di update
+# ----------------------------------------------------------------------
+
+class Generatore:
+    """Produce update JSON con id crescenti; ogni update è etichettato con l'handler atteso."""
+
+    def __init__(self, seme):
+        self.rng = random.Random(seme)
+        self._update_id = 0
+        self._message_id = 0
+
+    def _ids(self):
+        self._update_id += 1
+        self._message_id += 1
+        return self._update_id, self._message_id
+
+    def messaggio(self, chat_id, testo):
+        update_id, message_id = self._ids()
+        utente = {'id': chat_id, 'is_bot': False, 'first_name': 'Turista'}
+        dati = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': utente,
+            'text': testo
+        }
+        if testo.startswith('/'):
+            dati['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(testo.split()[0])}]
+        return {'update_id': update_id, 'message': dati}
+
+    def tap(self, chat_id, data):
+        update_id, message_id = self._ids()
+        utente = {'id': chat_id, 'is_bot': False, 'first_name': 'Turista'}
+        return {
+            'update_id': update_id,
+            'callback_query': {
+                'id': str(update_id),
+                'from': utente,
+                'chat_instance': str(chat_id),
+                'data': data,
+                'message': {
+                    'message_id': message_id,
+                    'date': int(time.time()),
+                    'chat': {'id': chat_id, 'type': 'private'},
+                    'text': 'menu'
+                }
+            }
+        }
+
+    def sessione_menu(self, chat_id, passi):
+        """/start, pulsante del menu e `passi` tap seguendo le tastiere del catalogo."""
+        schermate = bot.catalogo.corrente().schermate
+        yield '/start', self.messaggio(chat_id, '/start')
+        yield 'handle_menu_button', self.messaggio(chat_id, '🏛️ Scopri la Basilicata')
+        corrente = 'TORNA_MENU_PRINCIPALE'
+        for _ in range(passi):
+            tastiera = schermate[corrente].tastiera
+            scelte = [
+                pulsante.callback_data
+                for riga in (tastiera.inline_keyboard if tastiera else ())
+                for pulsante in riga if pulsante.callback_data
+            ] or ['TORNA_MENU_PRINCIPALE']
+            data = self.rng.choice(scelte)
+            yield data, self.tap(chat_id, data)
+            if schermate[data].azione == 'edit':
+                corrente = data
+
+    def flusso(self, sessioni):
+        """Flusso mescolato: sessioni di menu, testi da cancellare e comandi admin."""
+        sorgenti = []
+        for i in range(sessioni):
+            chat_id = 100_000 + i
+            sorgenti.append(list(self.sessione_menu(chat_id, self.rng.randint(2, 12))))
+            if self.rng.random() < 0.3:
+                sorgenti.append([
+                    ('handle_other_messages', self.messaggio(chat_id, self.rng.choice(TESTI_CASUALI)))
+                    for _ in range(self.rng.randint(1, 5))
+                ])
+            if self.rng.random() < 0.05:
+                comando = self.rng.choice(COMANDI_ADMIN)
+                sorgenti.append([(comando, self.messaggio(ADMIN_ID, comando))])
+        # Intercala le sorgenti mantenendo l'ordine all'interno di ciascuna
+        risultato = []
+        while sorgenti:
+            sorgente = self.rng.choice(sorgenti)
+            risultato.append(sorgente.pop(0))
+            if not sorgente:
+                sorgenti.remove(sorgente)
+        return risultato
+
+
+# ----------------------------------------------------------------------
+# Esecuzione
+# ----------------------------------------------------------------------
+
+def percentili(durate):
+    ms = sorted(x * 1000 for x in durate)
+    if len(ms) < 2:
+        return {'p50': ms[0], 'p95': ms[0], 'p99': ms[0]}
+    p = statistics.quantiles(ms, n=100, method='inclusive')
+    return {'p50': p[49], 'p95': p[94], 'p99': p[98]}
+
+
+async def prepara(latenza):
+    api = FintoAPI(latenza=latenza)
+    application = bot.crea_applicazione(richiesta=RichiestaFinta(api))
+    await application.initialize()
+    return api, application
+
+
+async def chiudi(application):
+    await bot.cestino.svuota()
+    await application.shutdown()
+
+
+async def misura_tempi(flusso, latenza):
+    """Update/s e durata per handler, con il ProcessoreUpdate del bot."""
+    api, application = await prepara(latenza)
+    updates = [(etichetta, Update.de_json(dati, application.bot)) for etichetta, dati in flusso]
+    durate = defaultdict(list)
+
+    async def elabora(etichetta, update):
+        inizio = time.perf_counter()
+        await application.process_update(update)
+        durate[etichetta].append(time.perf_counter() - inizio)
+
+    processore = application.update_processor
+    inizio = time.perf_counter()
+    await asyncio.gather(*(
+        processore.process_update(update, elabora(etichetta, update)) for etichetta, update in updates
+    ))
+    totale = time.perf_counter() - inizio
+    await chiudi(application)
+    return len(updates) / totale, durate, api.chiamate
+
+
+async def misura_memoria(flusso):
+    """Byte allocati (picco tracemalloc) per update, uno alla volta."""
+    _, application = await prepara(0)
+    updates = [(etichetta, Update.de_json(dati, application.bot)) for etichetta, dati in flusso]
+    allocati = defaultdict(list)
+    tracemalloc.start()
+    try:
+        for etichetta, update in updates:
+            tracemalloc.reset_peak()
+            prima = tracemalloc.get_traced_memory()[0]
+            await application.process_update(update)
+            allocati[etichetta].append(tracemalloc.get_traced_memory()[1] - prima)
+    finally:
+        tracemalloc.stop()
+    await chiudi(application)
+    return allocati
+
+
+async def esegui(sessioni, latenza, seme):
+    flusso = Generatore(seme).flusso(sessioni)
+    velocita, durate, chiamate = await misura_tempi(flusso, latenza)
+    allocati = await misura_memoria(flusso)
+    handler = {}
+    for etichetta in sorted(durate):
+        handler[etichetta] = {
+            'n': len(durate[etichetta]),
+            **percentili(durate[etichetta]),
+            'kib_per_update': statistics.fmean(allocati[etichetta]) / 1024
+        }
+    tutti = [x for valori in allocati.values() for x in valori]
+    return {
+        'parametri': {'sessioni': sessioni, 'latenza_api': latenza, 'seme': seme},
+        'update': len(flusso),
+        'update_al_secondo': velocita,
+        'kib_per_update': statistics.fmean(tutti) / 1024,
+        'chiamate_api': dict(chiamate),
+        'handler': handler
+    }
+
+
+def stampa(risultati):
+    print(f"📦 {risultati['update']} update  ⚡ {risultati['update_al_secondo']:.0f} update/s  "
+          f"💾 {risultati['kib_per_update']:.1f} KiB/update")
+    print(f"{'handler':32} {'n':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'KiB':>7}")
+    for nome, h in risultati['handler'].items():
+        print(f"{nome:32} {h['n']:6} {h['p50']:8.2f} {h['p95']:8.2f} {h['p99']:8.2f} {h['kib_per_update']:7.1f}")
+
+
+def confronta(risultati, baseline, tolleranza):
+    """Regressioni rispetto alla baseline (lista di messaggi, vuota se nessuna)."""
+    regressioni = []
+    minimo = baseline['update_al_secondo'] * (1 - tolleranza)
+    if risultati['update_al_secondo'] < minimo:
+        regressioni.append(
+            f"update/s {risultati['update_al_secondo']:.0f} < {baseline['update_al_secondo']:.0f}"
+        )
+    for nome, h in risultati['handler'].items():
+        base = baseline['handler'].get(nome)
+        if base and h['p95'] > base['p95'] * (1 + tolleranza):
+            regressioni.append(f"{nome}: p95 {h['p95']:.2f} ms > {base['p95']:.2f} ms")
+    return regressioni
+
+
+def principale():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessioni', type=int, default=300)
+    parser.add_argument('--latenza-api', type=float, default=0.0, help='secondi per chiamata')
+    parser.add_argument('--seme', type=int, default=1)
+    parser.add_argument('--salva', help='scrive i risultati come baseline JSON')
+    parser.add_argument('--confronta', help='baseline JSON con cui confrontare')
+    parser.add_argument('--tolleranza', type=float, default=0.25)
+    argomenti = parser.parse_args()
+
+    risultati = asyncio.run(esegui(argomenti.sessioni, argomenti.latenza_api, argomenti.seme))
+    stampa(risultati)
+
+    if argomenti.salva:
+        with open(argomenti.salva, 'w', encoding='utf-8') as f:
+            json.dump(risultati, f, indent=2, ensure_ascii=False)
+        print(f"💾 Baseline salvata in {argomenti.salva}")
+
+    if argomenti.confronta:
+        with open(argomenti.confronta, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['parametri'] != risultati['parametri']:
+            print(f"⚠️ Parametri diversi dalla baseline: {baseline['parametri']}")
+        regressioni = confronta(risultati, baseline, argomenti.tolleranza)
+        for messaggio in regressioni:
+            print(f"❌ {messaggio}")
+        if regressioni:
+            sys.exit(1)
+        print("✅ Nessuna regressione rispetto alla baseline")
+
+
+if __name__ == '__main__':
+    principale()
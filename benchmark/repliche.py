@@ -0,0 +1,197 @@
+"""👑 Più repliche del bot sullo stesso archivio: un solo leader pubblica, anche dopo un crash.
+
+Uso:
+    python -m benchmark.repliche [--repliche 2] [--lease 3] [--programmati 40] [--passo 0.5]
+                                 [--ritmo 20] [--seme 1]
+
+Avvia --repliche processi `python gobasilicata_bot.py` con LEADER_LEASE
+verso benchmark.finto_api e lo stesso ARCHIVIO_PATH, con --programmati
+messaggi programmati uno ogni --passo secondi. A un terzo dei programmati
+il leader viene terminato con SIGKILL e poi riavviato; intanto arrivano
+tap sul menu a --ritmo al secondo, ognuno consegnato a una sola replica
+(come un bilanciatore davanti ai webhook).
+
+Controlla che ogni programmato arrivi nel canale una volta sola (quelli in
+invio al momento del crash diventano incerti e li decide l'admin), misura
+il tempo tra il SIGKILL e il nuovo leader e conta i tap serviti da ogni
+replica.
+"""
+import argparse
+import asyncio
+import contextvars
+import os
+import signal
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from archivio import Archivio
+from benchmark.finto_api import FintoAPI, update_tap
+from catalogo import SCHERMATA_PRINCIPALE
+
+BOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gobasilicata_bot.py')
+CHAT_ID_CANALE = -1002702418249
+ADMIN_ID = 42
+# Secondi concessi alle repliche per avviarsi prima del primo programmato
+AVVIO = 8.0
+# Secondi concessi dopo l'ultimo programmato
+CODA = 5.0
+
+replica_corrente = contextvars.ContextVar('replica_corrente', default=None)
+
+
+class APIRepliche(FintoAPI):
+    """FintoAPI che consegna ogni update a una sola getUpdates e annota quale replica chiama.
+
+    La replica si riconosce dal token (`<n>:repliche`).
+    """
+
+    def __init__(self, **opzioni):
+        super().__init__(**opzioni)
+        self.post = defaultdict(list)  # testo -> [(istante, replica)]
+        self.tap = Counter()  # replica -> tap con risposta
+        self.risposti = set()
+        self.avvisi_admin = 0
+
+    async def _instrada(self, richiesta):
+        replica_corrente.set(richiesta.percorso.split('/')[1][len('bot'):].split(':')[0])
+        return await super()._instrada(richiesta)
+
+    async def api_getUpdates(self, parametri):
+        update = await super().api_getUpdates({**parametri, 'offset': 0})
+        for _ in update:
+            self._update.popleft()
+        return update
+
+    async def api_sendMessage(self, parametri):
+        chat_id = int(parametri.get('chat_id', 0))
+        if chat_id == CHAT_ID_CANALE:
+            self.post[parametri.get('text', '')].append((time.monotonic(), replica_corrente.get()))
+        elif chat_id == ADMIN_ID:
+            self.avvisi_admin += 1
+        return await super().api_sendMessage(parametri)
+
+    async def api_answerCallbackQuery(self, parametri):
+        self.risposti.add(str(parametri.get('callback_query_id')))
+        self.tap[replica_corrente.get()] += 1
+        return True
+
+
+def leggi_lease(percorso):
+    """(titolare, epoca) del lease delle pubblicazioni, o (None, 0)."""
+    try:
+        conn = sqlite3.connect(f"file:{percorso}?mode=ro", uri=True, timeout=1)
+        try:
+            riga = conn.execute("SELECT titolare, epoca FROM lease WHERE nome = 'pubblicazioni'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None, 0
+    return riga or (None, 0)
+
+
+def prepara_archivio(percorso, programmati, primo, passo):
+    """Archivio con i messaggi programmati (uno ogni `passo` secondi da `primo`, timestamp)."""
+    archivio = Archivio(percorso)
+    archivio.salva_impostazione('ricorrenze_inizializzate', 1)
+    for k in range(programmati):
+        archivio.salva_programmato(f"prova_{k}", primo + k * passo, f"Programmato {k}")
+    archivio.chiudi()
+
+
+async def avvia_replica(numero, api, cartella, argomenti):
+    ambiente = dict(
+        os.environ,
+        TELEGRAM_TOKEN=f'{numero}:repliche',
+        TELEGRAM_BASE_URL=api.base_url,
+        ADMIN_ID=str(ADMIN_ID),
+        ARCHIVIO_PATH=os.path.join(cartella, 'repliche.db'),
+        LEADER_LEASE=str(argomenti.lease),
+        LEADER_ID=str(numero),
+        RECUPERO_PROGRAMMATI='invia',
+        # Un programmato ogni --passo secondi: oltre il limite di Telegram per i canali (20 al minuto)
+        LIMITE_GRUPPO='100',
+        LOG_LIVELLO='WARNING'
+    )
+    return await asyncio.create_subprocess_exec(sys.executable, BOT, env=ambiente)
+
+
+async def attendi_leader(percorso, diverso_da=None, secondi=60):
+    """Primo titolare del lease diverso da `diverso_da`; (titolare, istante monotono)."""
+    limite = time.monotonic() + secondi
+    while time.monotonic() < limite:
+        titolare, _ = leggi_lease(percorso)
+        if titolare is not None and titolare != diverso_da:
+            return titolare, time.monotonic()
+        await asyncio.sleep(0.02)
+    raise TimeoutError("Nessun leader eletto")
+
+
+async def principale(argomenti):
+    api = APIRepliche(seme=argomenti.seme)
+    await api.avvia()
+    with tempfile.TemporaryDirectory() as cartella:
+        percorso = os.path.join(cartella, 'repliche.db')
+        inizio = time.time()
+        prepara_archivio(percorso, argomenti.programmati, inizio + AVVIO, argomenti.passo)
+        durata = AVVIO + argomenti.programmati * argomenti.passo + CODA
+        scadenza = {f"Programmato {k}": time.monotonic() + AVVIO + k * argomenti.passo
+                    for k in range(argomenti.programmati)}
+
+        repliche = {str(n): await avvia_replica(n, api, cartella, argomenti) for n in range(argomenti.repliche)}
+        iniezione = asyncio.create_task(api.inietta_a_ritmo(
+            lambda update_id: update_tap(update_id, SCHERMATA_PRINCIPALE, 10_000 + update_id % 500),
+            argomenti.ritmo, durata
+        ))
+        try:
+            leader, _ = await attendi_leader(percorso)
+            print(f"👑 {argomenti.repliche} repliche, lease {argomenti.lease:.1f}s: leader iniziale replica {leader}")
+
+            # SIGKILL al leader a un terzo dei programmati, poi lo si riavvia come follower
+            await asyncio.sleep(max(0.0, AVVIO + argomenti.programmati * argomenti.passo / 3 - (time.time() - inizio)))
+            repliche[leader].kill()
+            ucciso = time.monotonic()
+            await repliche[leader].wait()
+            nuovo, eletto = await attendi_leader(percorso, diverso_da=leader)
+            print(f"💥 Replica {leader} terminata con SIGKILL: replica {nuovo} leader dopo {eletto - ucciso:.2f}s "
+                  f"(massimo atteso {argomenti.lease * 4 / 3:.1f}s)")
+            repliche[leader] = await avvia_replica(int(leader), api, cartella, argomenti)
+
+            await iniezione
+        finally:
+            for processo in repliche.values():
+                if processo.returncode is None:
+                    processo.send_signal(signal.SIGTERM)
+            await asyncio.gather(*(processo.wait() for processo in repliche.values()))
+            iniezione.cancel()
+        await api.ferma()
+
+    inviati = {testo: invii for testo, invii in api.post.items() if testo in scadenza}
+    doppi = [testo for testo, invii in inviati.items() if len(invii) > 1]
+    mancanti = [testo for testo in scadenza if testo not in inviati]
+    ritardi = [invii[0][0] - scadenza[testo] for testo, invii in inviati.items()]
+    per_replica = Counter(invii[0][1] for invii in inviati.values())
+    print(f"📨 Programmati: {len(inviati)}/{len(scadenza)} pubblicati, {len(doppi)} due volte, "
+          f"{len(mancanti)} non pubblicati ({api.avvisi_admin} avvisi all'admin)")
+    if ritardi:
+        print(f"   ritardo rispetto all'orario: mediana {statistics.median(ritardi) * 1000:.0f} ms, "
+              f"max {max(ritardi) * 1000:.0f} ms")
+    print(f"   pubblicati per replica: {dict(sorted(per_replica.items()))}")
+    print(f"👆 Tap: {len(api.risposti)} con risposta, per replica: {dict(sorted(api.tap.items()))}")
+    if doppi:
+        print(f"❌ Pubblicati due volte: {', '.join(doppi)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repliche', type=int, default=2, help='processi del bot sullo stesso archivio')
+    parser.add_argument('--lease', type=float, default=3.0, help='LEADER_LEASE in secondi')
+    parser.add_argument('--programmati', type=int, default=40, help='messaggi programmati')
+    parser.add_argument('--passo', type=float, default=0.5, help='secondi tra due programmati')
+    parser.add_argument('--ritmo', type=float, default=20, help='tap al secondo sul menu')
+    parser.add_argument('--seme', type=int, default=1)
+    asyncio.run(principale(parser.parse_args()))
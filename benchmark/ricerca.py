@@ -0,0 +1,153 @@
+"""🔎 Ricerche inline al secondo: indice di trigrammi contro una scansione del catalogo.
+
+Uso:
+    python -m benchmark.ricerca [--ricerche 20000] [--distinte 500] [--seme 1]
+
+Genera --ricerche ricerche (su --distinte testi diversi, con frequenze a
+legge di potenza come quelle reali) da parole del catalogo, prefissi,
+accenti e refusi. Misura le ricerche al secondo:
+
+- con una scansione di tutte le schermate (testo normalizzato a ogni
+  ricerca, parole cercate come sottostringhe);
+- con IndiceRicerca senza LRU delle risposte (ogni ricerca calcolata);
+- con IndiceRicerca come nel bot (LRU delle risposte);
+- dall'update alla risposta answerInlineQuery, con l'Application completa
+  e la Bot API finta in memoria (RichiestaFinta).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+os.environ.setdefault('TELEGRAM_TOKEN', '0:benchmark')
+os.environ.setdefault('ARCHIVIO_PATH', ':memory:')
+os.environ.setdefault('LOG_LIVELLO', 'WARNING')
+
+from telegram import Update  # noqa: E402
+
+import catalogo  # noqa: E402
+import gobasilicata_bot as bot  # noqa: E402
+from benchmark.finto_api import FintoAPI, RichiestaFinta  # noqa: E402
+from ricerca import IndiceRicerca, normalizza, parole  # noqa: E402
+
+ACCENTI = {'a': 'à', 'e': 'è', 'i': 'ì', 'o': 'ò', 'u': 'ù'}
+
+
+def update_inline(update_id, testo, utente_id=None):
+    """Update JSON di una ricerca inline."""
+    utente_id = utente_id if utente_id is not None else 10_000 + update_id
+    return {
+        'update_id': update_id,
+        'inline_query': {
+            'id': str(update_id),
+            'from': {'id': utente_id, 'is_bot': False, 'first_name': 'Turista'},
+            'query': testo,
+            'offset': ''
+        }
+    }
+
+
+class APIInline(FintoAPI):
+    """FintoAPI che conta le risposte answerInlineQuery e i risultati restituiti."""
+
+    def __init__(self, **opzioni):
+        super().__init__(**opzioni)
+        self.risposte = 0
+        self.risultati = 0
+
+    async def api_answerInlineQuery(self, parametri):
+        risultati = parametri['results']
+        self.risposte += 1
+        self.risultati += len(json.loads(risultati) if isinstance(risultati, str) else risultati)
+        return True
+
+
+def varianti(rng, quante):
+    """Testi di ricerca: parole del catalogo intere, prefissi, con accenti, con refusi, coppie."""
+    vocabolario = sorted({parola for schermata in catalogo.corrente().schermate.values()
+                          for parola in parole(schermata.testo) if len(parola) > 3})
+    testi = []
+    while len(testi) < quante:
+        parola = rng.choice(vocabolario)
+        caso = rng.random()
+        if caso < 0.3:
+            parola = parola[:rng.randint(2, len(parola))]
+        elif caso < 0.45:
+            parola = ''.join(ACCENTI.get(c, c) if rng.random() < 0.3 else c for c in parola).capitalize()
+        elif caso < 0.6:
+            i = rng.randrange(len(parola))
+            parola = parola[:i] + rng.choice('aeiou') + parola[i + 1:]
+        elif caso < 0.75:
+            parola = f"{parola} {rng.choice(vocabolario)}"
+        testi.append(parola)
+    return testi
+
+
+def scansione(schermate):
+    """Ricerca senza indice: normalizza ogni schermata e cerca le parole come sottostringhe."""
+    def cerca(testo):
+        cercate = parole(testo)
+        return [chiave for chiave, schermata in schermate.items()
+                if all(cercata in normalizza(schermata.testo) for cercata in cercate)]
+    return cerca
+
+
+def misura(nome, cerca, ricerche, base=None):
+    inizio = time.perf_counter()
+    for testo in ricerche:
+        cerca(testo)
+    al_secondo = len(ricerche) / (time.perf_counter() - inizio)
+    confronto = f"  ({al_secondo / base:.0f}x)" if base else ""
+    print(f"   {nome:<28}{al_secondo:>12,.0f} ricerche/s  {1e6 / al_secondo:8.1f} µs{confronto}")
+    return al_secondo
+
+
+async def da_update(ricerche):
+    """Ricerche al secondo dall'update alla risposta, con l'Application completa e la Bot API in memoria."""
+    api = APIInline()
+    application = bot.crea_applicazione(richiesta=RichiestaFinta(api))
+    await application.initialize()
+    update = [Update.de_json(update_inline(i, testo), application.bot) for i, testo in enumerate(ricerche)]
+    inizio = time.perf_counter()
+    for singolo in update:
+        await application.process_update(singolo)
+    durata = time.perf_counter() - inizio
+    await application.shutdown()
+    assert api.risposte == len(ricerche), api.risposte
+    assert api.risultati, "nessun risultato nelle risposte"
+    return len(ricerche) / durata
+
+
+def principale(argomenti):
+    rng = random.Random(argomenti.seme)
+    distinte = varianti(rng, argomenti.distinte)
+    # Frequenze a legge di potenza: poche ricerche molto comuni, molte rare
+    pesi = [1 / (k + 1) for k in range(len(distinte))]
+    ricerche = rng.choices(distinte, pesi, k=argomenti.ricerche)
+    schermate = catalogo.corrente().schermate
+
+    inizio = time.perf_counter()
+    indice = catalogo.ricerca()
+    costruzione = time.perf_counter() - inizio
+    print(f"🔎 {len(ricerche)} ricerche ({len(distinte)} diverse) su {len(indice)} schermate, "
+          f"{len(indice.parole)} parole; indice costruito in {costruzione * 1000:.1f} ms")
+    for testo in ('vino', 'Città', 'mate', 'peperoni senise', 'materra'):
+        print(f"   {testo!r:>18} -> {', '.join(r.id for r in indice.cerca(testo)[:3]) or '-'}")
+    print()
+
+    base = misura('scansione', scansione(schermate), ricerche)
+    senza_lru = IndiceRicerca(schermate, escludi=(catalogo.SCHERMATA_PRINCIPALE,), cache_risposte=0)
+    misura('indice senza LRU', senza_lru.cerca, ricerche, base)
+    misura('indice con LRU', indice.cerca, ricerche, base)
+    al_secondo = asyncio.run(da_update(ricerche))
+    print(f"   {'update -> answerInlineQuery':<28}{al_secondo:>12,.0f} ricerche/s  {1e6 / al_secondo:8.1f} µs")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ricerche', type=int, default=20_000, help='ricerche da misurare')
+    parser.add_argument('--distinte', type=int, default=500, help='testi di ricerca diversi')
+    parser.add_argument('--seme', type=int, default=1)
+    principale(parser.parse_args())
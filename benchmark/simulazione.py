@@ -0,0 +1,416 @@
+"""🕰️ Simulazione a orologio virtuale di pubblicazioni ricorrenti e messaggi programmati.
+
+Uso:
+    python -m benchmark.simulazione [--mesi 14] [--programmati 2000] [--scatti 100000]
+        [--post 500] [--destinazioni 12] [--seme 1]
+
+Il pianificatore e le funzioni di pubblicazione del bot girano su un
+OrologioVirtuale: mesi di tempo scorrono in pochi secondi. Controlla che:
+
+- la pubblicazione quotidiana parta una e una sola volta al giorno all'ora
+  locale Europe/Rome, anche nei giorni del cambio d'ora (con un orario
+  normale e uno che cade nell'ora saltata/ripetuta);
+- una ricorrenza lun-ven e una del weekend scattino solo nei giorni giusti
+  e una ricorrenza modificata non ne sposti un'altra;
+- ogni messaggio programmato venga inviato una sola volta, all'istante
+  previsto;
+- con una Bot API inaffidabile la posta in uscita ritenti gli errori sicuri,
+  non pubblichi mai due volte lo stesso post e, dopo un riavvio a metà
+  invio, lasci all'admin i post incerti invece di ripubblicarli;
+- un post per un gruppo di destinazioni arrivi una volta in ogni canale,
+  con il modello del canale, senza superare `DESTINAZIONI_PARALLELE` invii
+  contemporanei e in meno tempo che uno dopo l'altro;
+- la memoria resti piatta su `--scatti` invii consecutivi.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import httpx
+os.environ.setdefault('TELEGRAM_TOKEN', '0:benchmark')
+os.environ.setdefault('ARCHIVIO_PATH', ':memory:')
+
+import pytz  # noqa: E402
+from telegram.error import NetworkError, RetryAfter, TimedOut  # noqa: E402
+
+import gobasilicata_bot as bot  # noqa: E402
+from orologio import OrologioVirtuale  # noqa: E402
+from pianificatore import Pianificatore  # noqa: E402
+from ricorrenze import MotoreRicorrenze  # noqa: E402
+from destinazioni import compila_destinazioni  # noqa: E402
+from uscita import BLOCCATO, CONSEGNATO, INCERTO, PostaInUscita  # noqa: E402
+
+ROMA = pytz.timezone('Europe/Rome')
+INIZIO = ROMA.localize(datetime(2026, 1, 1, 0, 0))
+GIORNO = 86400
+# Con l'orologio virtuale non c'è deriva: bastano risvegli più radi
+SONNO_SIMULATO = 3600
+# Crescita di memoria tollerata tra il riscaldamento e la fine della prova
+MAX_CRESCITA_MEMORIA = 256 * 1024
+
+
+class BotRegistra:
+    """Bot finto: registra l'istante virtuale di ogni invio (o solo li conta)."""
+
+    def __init__(self, orologio, registra=True):
+        self.orologio = orologio
+        self.registra = registra
+        self.inviati = []
+        self.conteggio = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.conteggio += 1
+        if self.registra:
+            self.inviati.append((self.orologio.adesso(), text))
+        return SimpleNamespace(message_id=self.conteggio)
+
+
+class BotInaffidabile(BotRegistra):
+    """Bot finto che fallisce a caso; un timeout su due arriva comunque nel canale."""
+
+    def __init__(self, orologio, rng, probabilita):
+        super().__init__(orologio)
+        self.rng = rng
+        self.probabilita = probabilita
+        self.tentativi = Counter()
+        self.timeout = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.tentativi[text] += 1
+        if self.rng.random() >= self.probabilita:
+            return await super().send_message(chat_id, text, **kwargs)
+        guasto = self.rng.choice(('5xx', 'connessione', 'flood', 'timeout'))
+        if guasto == '5xx':
+            raise NetworkError("Bad Gateway (502)")
+        if guasto == 'connessione':
+            try:
+                raise httpx.ConnectError("connessione rifiutata")
+            except httpx.ConnectError as e:
+                raise NetworkError(f"httpx.ConnectError: {e}") from e
+        if guasto == 'flood':
+            raise RetryAfter(30)
+        self.timeout += 1
+        if self.rng.random() < 0.5:
+            await super().send_message(chat_id, text, **kwargs)
+        try:
+            raise httpx.ReadTimeout("lettura scaduta")
+        except httpx.ReadTimeout as e:
+            raise TimedOut from e
+
+
+class BotLento(BotRegistra):
+    """Bot finto con una latenza virtuale per chat; conta gli invii contemporanei."""
+
+    def __init__(self, orologio, latenze):
+        super().__init__(orologio)
+        self.latenze = latenze
+        self.in_corso = 0
+        self.massimo = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.in_corso += 1
+        self.massimo = max(self.massimo, self.in_corso)
+        try:
+            await self.orologio.dormi(self.latenze[chat_id])
+        finally:
+            self.in_corso -= 1
+        return await super().send_message(chat_id, (chat_id, text), **kwargs)
+
+
+class BotBloccato(BotRegistra):
+    """Bot finto la cui chiamata non termina mai (il processo viene fermato durante l'invio)."""
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.Event().wait()
+
+
+async def prepara(registra=True, avviso=None):
+    """Sostituisce orologio, pianificatore e bot con quelli della simulazione."""
+    orologio = OrologioVirtuale(INIZIO)
+    bot.orologio = orologio
+    bot.pianificatore = Pianificatore(orologio)
+    bot.pianificatore.sonno_massimo = SONNO_SIMULATO
+    bot.ricorrenze = MotoreRicorrenze(bot.pianificatore, ROMA, bot.pubblica_ricorrenza)
+    bot.posta_uscita = PostaInUscita(bot.archivio, bot.pianificatore, seme=1)
+    bot.posta_uscita.avviso = avviso
+    application = SimpleNamespace(bot=BotRegistra(orologio, registra))
+    await bot.posta_uscita.avvia(application.bot)
+    task = asyncio.create_task(bot.pianificatore.esegui())
+    await orologio.avanza(0)
+    return orologio, application, task
+
+
+async def ferma(task):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def attesi_quotidiani(ore, minuti, giorni):
+    """Istanti attesi della pubblicazione quotidiana, calcolati giorno per giorno."""
+    attesi = []
+    for n in range(giorni):
+        giorno = INIZIO.date() + timedelta(days=n)
+        ingenuo = datetime(giorno.year, giorno.month, giorno.day, ore, minuti)
+        try:
+            locale = ROMA.localize(ingenuo, is_dst=None)
+        except pytz.NonExistentTimeError:
+            # Ora saltata: si pubblica un'ora dopo
+            locale = ROMA.localize(ingenuo + timedelta(hours=1), is_dst=True)
+        except pytz.AmbiguousTimeError:
+            # Ora ripetuta: una sola volta, nella seconda occorrenza (ora solare)
+            locale = ROMA.localize(ingenuo, is_dst=False)
+        attesi.append(locale.timestamp())
+    return attesi
+
+
+async def prova_quotidiana(ore, minuti, mesi):
+    orologio, application, task = await prepara()
+    bot.ricorrenze.imposta(bot.ID_QUOTIDIANO, f"{minuti} {ore} * * *")
+    bot.ricorrenze.avvia(bot.TempContext(application))
+    giorni = mesi * 30
+    await orologio.avanza(giorni * GIORNO)
+    await ferma(task)
+
+    inviati = [quando for quando, _ in application.bot.inviati]
+    attesi = [t for t in attesi_quotidiani(ore, minuti, giorni + 1) if t <= orologio.adesso()]
+    assert inviati == attesi, _differenze(inviati, attesi)
+    giorni_locali = Counter(datetime.fromtimestamp(t, ROMA).date() for t in inviati)
+    assert all(n == 1 for n in giorni_locali.values())
+    cambi = sum(1 for a, b in zip(inviati, inviati[1:]) if b - a != GIORNO)
+    print(f"✅ Quotidiano {ore:02d}:{minuti:02d}: {len(inviati)} pubblicazioni in {giorni} giorni, "
+          f"una al giorno all'ora locale ({cambi} giorni di 23/25 ore)")
+
+
+async def prova_settimanali(mesi):
+    """Ricorrenze lun-ven e weekend; a metà prova si modifica solo la seconda."""
+    orologio, application, task = await prepara()
+    bot.ricorrenze.imposta('feriale', '0 9 * * lun-ven', 'feriale')
+    bot.ricorrenze.imposta('weekend', '30 19 * * sab,dom', 'weekend')
+    bot.ricorrenze.avvia(bot.TempContext(application))
+    prossima_feriale = bot.ricorrenze.prossima('feriale')
+
+    meta = mesi * 15 * GIORNO
+    await orologio.avanza(meta)
+    bot.ricorrenze.imposta('weekend', '0 11 * * dom', 'weekend')
+    assert bot.ricorrenze.prossima('feriale') >= prossima_feriale
+    await orologio.avanza(meta)
+    await ferma(task)
+
+    divisione = INIZIO.timestamp() + meta
+    for quando, testo in application.bot.inviati:
+        locale = datetime.fromtimestamp(quando, ROMA)
+        if testo == 'feriale':
+            atteso = locale.weekday() < 5 and (locale.hour, locale.minute) == (9, 0)
+        elif quando < divisione:
+            atteso = locale.weekday() >= 5 and (locale.hour, locale.minute) == (19, 30)
+        else:
+            atteso = locale.weekday() == 6 and (locale.hour, locale.minute) == (11, 0)
+        assert atteso, f"{testo} inviato {locale:%a %d/%m/%Y %H:%M}"
+    conteggio = Counter(testo for _, testo in application.bot.inviati)
+    giorni_feriali = sum(
+        1 for n in range(mesi * 30)
+        if (INIZIO.date() + timedelta(days=n)).weekday() < 5
+    )
+    assert conteggio['feriale'] == giorni_feriali, (conteggio, giorni_feriali)
+    print(f"✅ Settimanali: {conteggio['feriale']} feriali e {conteggio['weekend']} weekend "
+          f"nei giorni giusti, anche dopo la modifica di una sola ricorrenza")
+
+
+def _differenze(inviati, attesi):
+    fmt = lambda t: datetime.fromtimestamp(t, ROMA).strftime('%d/%m/%Y %H:%M %Z')  # noqa: E731
+    for i, (a, b) in enumerate(zip(inviati, attesi)):
+        if a != b:
+            return f"#{i}: inviato {fmt(a)}, atteso {fmt(b)}"
+    return f"{len(inviati)} inviati, {len(attesi)} attesi"
+
+
+async def prova_programmati(quanti, mesi, seme):
+    orologio, application, task = await prepara()
+    rng = random.Random(seme)
+    contesto = bot.TempContext(application)
+    fine = INIZIO + timedelta(days=mesi * 30)
+
+    # Orari casuali, più tutti quelli a ridosso dei cambi d'ora
+    orari = [rng.randint(int(INIZIO.timestamp()), int(fine.timestamp())) for _ in range(quanti)]
+    for transizione in ROMA._utc_transition_times:
+        t = pytz.utc.localize(transizione).timestamp()
+        if INIZIO.timestamp() < t < fine.timestamp():
+            orari.extend(t + delta for delta in (-3600, -60, 0, 60, 3600))
+
+    attesi = {}
+    for i, quando in enumerate(orari):
+        task_id = f"sim_{i}"
+        bot.pianifica_programmato(contesto, task_id, datetime.fromtimestamp(quando, ROMA), task_id)
+        attesi[task_id] = quando
+
+    await orologio.avanza(fine.timestamp() - INIZIO.timestamp() + GIORNO)
+    await ferma(task)
+    bot.archivio.svuota()
+
+    inviati = Counter(testo for _, testo in application.bot.inviati)
+    assert set(inviati) == set(attesi) and all(n == 1 for n in inviati.values()), "invii mancanti o doppi"
+    for quando, testo in application.bot.inviati:
+        assert quando == attesi[testo], f"{testo}: inviato a {quando}, atteso {attesi[testo]}"
+    print(f"✅ Programmati: {len(attesi)} inviati una volta ciascuno all'istante previsto")
+
+
+async def prova_uscita(quanti, seme):
+    """Post con una Bot API inaffidabile, poi un riavvio con un invio a metà."""
+    avvisi = []
+
+    async def avviso(riga):
+        avvisi.append(riga['stato'])
+
+    orologio, application, task = await prepara(avviso=avviso)
+    rng = random.Random(seme)
+    inaffidabile = BotInaffidabile(orologio, rng, probabilita=0.3)
+    bot.posta_uscita.bot = inaffidabile
+    prima = Counter(bot.archivio.conta_uscita())
+
+    contesto = bot.TempContext(SimpleNamespace(bot=inaffidabile))
+    for i in range(quanti):
+        await bot.invia_al_canale(contesto, f"sim_uscita:{i}", f"post {i}")
+        # Lo stesso post chiesto una seconda volta (es. update ricevuto due volte)
+        if rng.random() < 0.1:
+            await bot.invia_al_canale(contesto, f"sim_uscita:{i}", f"post {i}")
+        await orologio.avanza(rng.randint(0, 120))
+    await orologio.avanza(GIORNO)
+    await ferma(task)
+
+    pubblicati = Counter(testo for _, testo in inaffidabile.inviati)
+    stati = Counter(bot.archivio.conta_uscita()) - prima
+    assert all(n == 1 for n in pubblicati.values()), "post pubblicato due volte"
+    assert stati[INCERTO] == inaffidabile.timeout == avvisi.count(INCERTO), (stati, inaffidabile.timeout)
+    assert stati[CONSEGNATO] + stati[INCERTO] == quanti, stati
+    ritentati = sum(1 for n in inaffidabile.tentativi.values() if n > 1)
+
+    # Riavvio: il bot si ferma durante la chiamata a Telegram
+    orologio, application, task = await prepara()
+    bloccato = BotBloccato(orologio)
+    bot.posta_uscita.bot = bloccato
+    invio = asyncio.create_task(bot.invia_al_canale(bot.TempContext(application), 'sim_riavvio', 'riavvio'))
+    await orologio.avanza(1)
+    invio.cancel()
+    await ferma(task)
+
+    orologio, application, task = await prepara(avviso=avviso)
+    await bot.invia_al_canale(bot.TempContext(application), 'sim_riavvio', 'riavvio')
+    await orologio.avanza(GIORNO)
+    await ferma(task)
+    assert not application.bot.inviati and avvisi[-1] == INCERTO, "post interrotto ripubblicato"
+
+    print(f"✅ Posta in uscita: {stati[CONSEGNATO]}/{quanti} consegnati ({ritentati} dopo nuovi tentativi), "
+          f"{stati[INCERTO]} incerti lasciati all'admin, nessun doppione anche dopo un riavvio")
+
+
+async def prova_destinazioni(quante, limite, seme):
+    """Un post per un gruppo di `quante` canali con latenze diverse e al massimo `limite` invii insieme."""
+    rng = random.Random(seme)
+    orologio, application, task = await prepara()
+    dati = {
+        'destinazioni': {
+            f"canale{i}": {'chat_id': -1000 - i, 'modello': f"{{testo}} #{i}" if i % 2 else None}
+            for i in range(quante)
+        },
+        'gruppi': {'tutti': [f"canale{i}" for i in range(quante)]}
+    }
+    precedenti = bot.destinazioni, bot.DESTINAZIONI_PARALLELE
+    bot.destinazioni = compila_destinazioni(dati)
+    bot.DESTINAZIONI_PARALLELE = limite
+    latenze = {d.chat_id: rng.uniform(0.5, 3.0) for d in bot.destinazioni.destinazioni.values()}
+    lento = BotLento(orologio, latenze)
+    bot.posta_uscita.bot = lento
+    # Una destinazione bloccata: il post resta da parte senza chiamare Telegram
+    bot.posta_uscita.controllo = lambda chat_id: "permessi revocati" if chat_id == -1000 else None
+
+    try:
+        contesto = bot.TempContext(SimpleNamespace(bot=lento))
+        inizio = orologio.adesso()
+        invio = asyncio.create_task(bot.invia_al_canale(contesto, 'sim_gruppo', 'evento', gruppo='tutti'))
+        while not invio.done():
+            await orologio.avanza(0.25)
+        esiti = invio.result()
+        durata = orologio.adesso() - inizio
+        # Lo stesso post di nuovo: nessun invio
+        ripetuti = await bot.invia_al_canale(contesto, 'sim_gruppo', 'evento', gruppo='tutti')
+    finally:
+        bot.destinazioni, bot.DESTINAZIONI_PARALLELE = precedenti
+        # Il post bloccato non deve ripartire nelle prove successive
+        for riga in bot.archivio.uscita_in_sospeso():
+            await bot.posta_uscita.scarta(riga['id'])
+        await ferma(task)
+
+    attesi = {
+        d.chat_id: d.applica('evento') for d in compila_destinazioni(dati).destinazioni.values()
+        if d.chat_id != -1000
+    }
+    pubblicati = [testo for _, testo in lento.inviati]
+    assert sorted(pubblicati) == sorted(attesi.items()), pubblicati
+    assert [e.destinazione for e in esiti] == list(dati['destinazioni']), "esiti fuori ordine"
+    assert esiti[0].stato == BLOCCATO and all(e.stato == CONSEGNATO for e in esiti[1:]), esiti
+    assert [e.stato for e in ripetuti] == [e.stato for e in esiti] and len(lento.inviati) == quante - 1
+    assert lento.massimo <= limite, f"{lento.massimo} invii contemporanei con limite {limite}"
+    in_fila = sum(latenze[chat_id] for chat_id in attesi)
+    assert durata < in_fila, (durata, in_fila)
+    print(f"✅ Destinazioni: {quante - 1}/{quante} canali in {durata:.1f} s virtuali "
+          f"(in fila {in_fila:.1f} s), al massimo {lento.massimo} invii insieme, 1 bloccato, nessun doppione")
+
+
+async def prova_memoria(scatti):
+    """Invii consecutivi a un minuto di distanza, pianificati a finestre di 1000."""
+    orologio, application, task = await prepara(registra=False)
+    contesto = bot.TempContext(application)
+    finestra = 1000
+    riscaldamento = min(10_000, scatti // 10)
+    memoria_riscaldamento = None
+    tracemalloc.start()
+    inizio = time.perf_counter()
+    for base in range(0, scatti, finestra):
+        for i in range(base, min(base + finestra, scatti)):
+            quando = INIZIO.timestamp() + 60 * (i + 1)
+            bot.pianifica_programmato(contesto, f"m_{i % (2 * finestra)}", quando, 'x')
+        await orologio.avanza(60 * min(finestra, scatti - base))
+        bot.archivio.svuota()
+        if memoria_riscaldamento is None and base + finestra >= riscaldamento:
+            memoria_riscaldamento = tracemalloc.get_traced_memory()[0]
+    memoria_finale = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    durata = time.perf_counter() - inizio
+    await ferma(task)
+
+    crescita = memoria_finale - memoria_riscaldamento
+    assert application.bot.conteggio == scatti, application.bot.conteggio
+    assert len(bot.pianificatore) == 0 and orologio.timer_attivi <= 1
+    assert crescita < MAX_CRESCITA_MEMORIA, f"memoria cresciuta di {crescita / 1024:.0f} KiB"
+    giorni = scatti * 60 / GIORNO
+    print(f"✅ Memoria: {scatti} invii ({giorni:.0f} giorni simulati) in {durata:.1f} s, "
+          f"crescita dopo il riscaldamento {crescita / 1024:+.1f} KiB")
+
+
+async def principale(argomenti):
+    logging.getLogger().setLevel(logging.WARNING)
+    for ore, minuti in ((9, 0), (2, 30)):
+        await prova_quotidiana(ore, minuti, argomenti.mesi)
+    await prova_settimanali(argomenti.mesi)
+    await prova_programmati(argomenti.programmati, argomenti.mesi, argomenti.seme)
+    await prova_uscita(argomenti.post, argomenti.seme)
+    await prova_destinazioni(argomenti.destinazioni, 4, argomenti.seme)
+    await prova_memoria(argomenti.scatti)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mesi', type=int, default=14)
+    parser.add_argument('--programmati', type=int, default=2000)
+    parser.add_argument('--scatti', type=int, default=100_000)
+    parser.add_argument('--post', type=int, default=500)
+    parser.add_argument('--destinazioni', type=int, default=12)
+    parser.add_argument('--seme', type=int, default=1)
+    asyncio.run(principale(parser.parse_args()))
@@ -0,0 +1,165 @@
+"""📊 Costo delle statistiche dei percorsi: registrazione, aggregazione, file e /statistiche.
+
+Uso:
+    python -m benchmark.statistiche [--eventi 1000000] [--chat 20000] [--giorni 7] [--seme 1]
+
+Genera --eventi tap da --chat utenti distribuiti su --giorni giorni:
+ogni sessione parte da /start e segue a caso i pulsanti del catalogo
+(catalogo.json), con una probabilità di fermarsi a ogni passo.
+
+Misura:
+- il costo di Statistiche.registra() sul percorso caldo, contro una
+  chiamata vuota e contro l'append di una tupla a una lista di eventi;
+- l'aggregazione in background (eventi al secondo);
+- dimensione e tempi di scrittura e lettura del file dei contatori;
+- il riepilogo di /statistiche calcolato dai contatori, contro lo stesso
+  conteggio (più visitati nelle ultime 24 ore) fatto scorrendo gli eventi.
+"""
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+from catalogo import SCHERMATA_PRINCIPALE, corrente, inizializza
+from statistiche import Statistiche
+
+PROBABILITA_USCITA = 0.2
+# Pausa tra due tap della stessa sessione (secondi)
+PAUSA = (2, 40)
+
+
+class Tempo:
+    """Orologio che il generatore sposta a mano."""
+
+    def __init__(self, inizio):
+        self.valore = inizio
+
+    def __call__(self):
+        return self.valore
+
+
+def percorsi(rng, quanti, chat, giorni, inizio):
+    """(istante, chat_id, nodo) ordinati nel tempo, sessioni casuali nel menu."""
+    schermate = corrente().schermate
+    pulsanti = {
+        chiave: [b.callback_data for riga in s.tastiera.inline_keyboard for b in riga if b.callback_data]
+        for chiave, s in schermate.items() if s.azione == 'edit' and s.tastiera
+    }
+    eventi = []
+    while len(eventi) < quanti:
+        chat_id = 10_000 + rng.randrange(chat)
+        istante = inizio + rng.random() * giorni * 86400
+        eventi.append((istante, chat_id, '/start'))
+        menu = SCHERMATA_PRINCIPALE
+        while len(eventi) < quanti and rng.random() > PROBABILITA_USCITA:
+            istante += rng.uniform(*PAUSA)
+            scelta = rng.choice(pulsanti[menu])
+            eventi.append((istante, chat_id, scelta))
+            if scelta in pulsanti:
+                menu = scelta
+    eventi.sort()
+    return eventi
+
+
+def per_evento(durata, quanti):
+    return f"{durata / quanti * 1e9:7.0f} ns/evento"
+
+
+def principale(argomenti):
+    inizializza('catalogo.json')
+    rng = random.Random(argomenti.seme)
+    inizio = time.time() - argomenti.giorni * 86400
+    eventi = percorsi(rng, argomenti.eventi, argomenti.chat, argomenti.giorni, inizio)
+    fine = eventi[-1][0]
+    print(f"📊 {len(eventi)} tap da {argomenti.chat} chat in {argomenti.giorni} giorni")
+
+    # Percorso caldo: un blocco alla volta, come tra due aggregazioni (qui l'istante non conta)
+    prova = Statistiche()
+    blocco = prova.capienza // 2
+    registrazione = aggregazione = vuota = lista = 0.0
+    grezzi = []
+
+    def niente(chat_id, nome):
+        pass
+
+    for primo in range(0, len(eventi), blocco):
+        parte = eventi[primo:primo + blocco]
+        t = time.perf_counter()
+        for _, chat_id, nome in parte:
+            niente(chat_id, nome)
+        vuota += time.perf_counter() - t
+
+        t = time.perf_counter()
+        for istante, chat_id, nome in parte:
+            grezzi.append((istante, chat_id, nome))
+        lista += time.perf_counter() - t
+
+        t = time.perf_counter()
+        for _, chat_id, nome in parte:
+            prova.registra(chat_id, nome)
+        registrazione += time.perf_counter() - t
+
+        t = time.perf_counter()
+        prova.aggrega()
+        aggregazione += time.perf_counter() - t
+    n = len(eventi)
+    print("\n👆 Registrazione (percorso caldo):")
+    print(f"   chiamata vuota        {per_evento(vuota, n)}")
+    print(f"   append a una lista    {per_evento(lista, n)}")
+    print(f"   Statistiche.registra  {per_evento(registrazione, n)}")
+    print(f"   aggregazione          {per_evento(aggregazione, n)}  ({n / aggregazione:,.0f} eventi/s)")
+
+    # Contenuto: aggregazione a ogni secondo simulato, come nel bot
+    tempo = Tempo(inizio)
+    statistiche = Statistiche(adesso=tempo)
+    for secondo, parte in itertools.groupby(eventi, key=lambda evento: int(evento[0])):
+        for _, chat_id, nome in parte:
+            statistiche.registra(chat_id, nome)
+        tempo.valore = secondo
+        statistiche.aggrega()
+    print(f"   eventi persi: {statistiche.persi}, nodi: {len(statistiche.nodi)}, sessioni: {statistiche.sessioni}")
+
+    with tempfile.TemporaryDirectory() as cartella:
+        percorso = os.path.join(cartella, 'prova.statistiche')
+        t = time.perf_counter()
+        dimensione = statistiche.salva(percorso)
+        scrittura = time.perf_counter() - t
+        t = time.perf_counter()
+        riletta = Statistiche.leggi(percorso)
+        lettura = time.perf_counter() - t
+    assert list(riletta.totali) == list(statistiche.totali)
+    print(f"\n💾 File dei contatori: {dimensione / 1024:.1f} KiB, scrittura {scrittura * 1000:.1f} ms, "
+          f"lettura {lettura * 1000:.1f} ms (eventi grezzi: {n} tuple in memoria)")
+
+    # /statistiche: dai contatori contro una scansione degli eventi grezzi
+    t = time.perf_counter()
+    vista = Statistiche(capienza=1, adesso=tempo)
+    vista.unisci(statistiche)
+    ore = vista.per_ora(24, fine)
+    piu_visitati = vista.piu_visitati(10, 24, fine)
+    vista.uscite(5)
+    vista.percorso_frequente('/start')
+    contatori = time.perf_counter() - t
+
+    t = time.perf_counter()
+    limite = (int(fine) // 3600 - 23) * 3600
+    conteggio = Counter(nome for istante, _, nome in grezzi if istante >= limite)
+    scansione = time.perf_counter() - t
+    assert all(conteggio[nome] == visite for nome, visite in piu_visitati), (conteggio.most_common(10), piu_visitati)
+    print(f"\n📋 /statistiche: dai contatori {contatori * 1000:.1f} ms "
+          f"(più visitati, tap per ora, uscite e percorso)")
+    print(f"   solo i più visitati scorrendo gli eventi grezzi: {scansione * 1000:.1f} ms")
+    print(f"   ultime 24 ore: {sum(tap for _, tap in ore)} tap; più visitato {piu_visitati[0][0]} "
+          f"({piu_visitati[0][1]})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--eventi', type=int, default=1_000_000, help='tap da generare')
+    parser.add_argument('--chat', type=int, default=20_000, help='utenti diversi')
+    parser.add_argument('--giorni', type=int, default=7, help='giorni su cui distribuire i tap')
+    parser.add_argument('--seme', type=int, default=1)
+    principale(parser.parse_args())
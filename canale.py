@@ -0,0 +1,121 @@
+"""🩺 Stato di salute del canale, verificato in background.
+
+Un'unica coroutine (sorveglia) chiama get_chat e get_chat_member ogni
+`intervallo` secondi e tiene in memoria i dati del canale e il permesso di
+pubblicare. I comandi leggono questa cache senza chiamare Telegram e la
+posta in uscita la consulta prima di ogni invio, così un post verso un
+canale in cui il bot non può più scrivere viene fermato subito con il
+motivo invece di fallire dopo i tentativi.
+
+Gli errori di rete non cambiano lo stato (resta l'ultimo verificato);
+`avviso(salute)`, se impostato, è una coroutine chiamata quando il permesso
+di pubblicare cambia.
+"""
+import asyncio
+import logging
+
+from telegram.constants import ChatMemberStatus, ChatType
+from telegram.error import BadRequest, Forbidden
+
+from orologio import Orologio
+
+logger = logging.getLogger(__name__)
+
+
+# Nei gruppi basta farne parte: can_post_messages esiste solo per i canali
+STATI_GRUPPO = frozenset((ChatMemberStatus.OWNER, ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.MEMBER))
+
+
+def valuta(membro, tipo=ChatType.CHANNEL):
+    """(può pubblicare, motivo) dal ChatMember del bot nella chat di tipo `tipo` (canale o gruppo)."""
+    if tipo in (ChatType.GROUP, ChatType.SUPERGROUP):
+        if membro.status in STATI_GRUPPO:
+            return True, None
+        if membro.status == ChatMemberStatus.RESTRICTED:
+            if getattr(membro, 'is_member', True) and getattr(membro, 'can_send_messages', False):
+                return True, None
+            return False, "il bot non ha il permesso di inviare messaggi nel gruppo"
+        return False, f"il bot non fa parte del gruppo (stato: {membro.status})"
+    if membro.status == ChatMemberStatus.OWNER:
+        return True, None
+    if membro.status != ChatMemberStatus.ADMINISTRATOR:
+        return False, f"il bot non è amministratore del canale (stato: {membro.status})"
+    if not getattr(membro, 'can_post_messages', False):
+        return False, "il bot non ha il permesso di pubblicare messaggi"
+    return True, None
+
+
+class SaluteCanale:
+    """Cache dei dati del canale e del permesso di pubblicare."""
+
+    def __init__(self, chat_id, intervallo=300, orologio=None, nome=None):
+        self.chat_id = chat_id
+        self.nome = nome or str(chat_id)
+        self.intervallo = intervallo
+        self.orologio = orologio or Orologio()
+        self.chat = None
+        self.stato_membro = None
+        self.puo_pubblicare = None  # None = non ancora verificato
+        self.motivo = None
+        self.ultimo_errore = None
+        self.aggiornato = None
+        self.avviso = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def sano(self):
+        """False solo se è stato verificato che il bot non può pubblicare."""
+        return self.puo_pubblicare is not False
+
+    def blocco(self, chat_id):
+        """Motivo per cui un invio a `chat_id` va fermato, o None."""
+        if chat_id == self.chat_id and not self.sano:
+            return self.motivo
+        return None
+
+    async def aggiorna(self, bot):
+        """Rilegge chat e permessi da Telegram; avvisa se il permesso di pubblicare cambia."""
+        async with self._lock:
+            try:
+                chat = await bot.get_chat(self.chat_id)
+                membro = await bot.get_chat_member(self.chat_id, bot.id)
+            except (Forbidden, BadRequest) as e:
+                # Canale inesistente o bot rimosso
+                chat, stato_membro = self.chat, None
+                puo_pubblicare, motivo = False, f"canale non accessibile: {e}"
+            except Exception as e:
+                self.ultimo_errore = str(e)
+                logger.warning(f"⚠️ Verifica di '{self.nome}' non riuscita, resta lo stato precedente: {e}")
+                return
+            else:
+                stato_membro = membro.status
+                puo_pubblicare, motivo = valuta(membro, chat.type)
+
+            precedente = self.puo_pubblicare
+            self.chat = chat
+            self.stato_membro = stato_membro
+            self.puo_pubblicare = puo_pubblicare
+            self.motivo = motivo
+            self.ultimo_errore = None
+            self.aggiornato = self.orologio.adesso()
+
+        if puo_pubblicare != precedente and not (precedente is None and puo_pubblicare):
+            if puo_pubblicare:
+                logger.info(f"✅ Il bot può di nuovo pubblicare in '{self.nome}'")
+            else:
+                logger.error(f"❌ Il bot non può pubblicare in '{self.nome}': {motivo}")
+            if self.avviso is not None:
+                try:
+                    await self.avviso(self)
+                except Exception as e:
+                    logger.error(f"❌ Errore avviso stato canale: {e}")
+
+    async def sorveglia(self, bot):
+        """Coroutine che riaggiorna lo stato ogni `intervallo` secondi (il primo controllo è aggiorna())."""
+        try:
+            while True:
+                await self.orologio.dormi(self.intervallo)
+                await self.aggiorna(bot)
+        except asyncio.CancelledError:
+            logger.info(f"⏸️ Sorveglianza di '{self.nome}' fermata")
+            raise
@@ -0,0 +1,290 @@
+"""📚 Catalogo dei contenuti del bot BasilicataGo.
+
+Testi, tastiere e albero del menu vengono letti da un file JSON (o YAML) e
+compilati in uno snapshot immutabile. Lo snapshot corrente si ottiene con
+corrente(): un handler lo legge una sola volta all'inizio e continua a usarlo
+fino alla fine, anche se nel frattempo il catalogo viene ricaricato.
+
+Le schermate 'send' che rimandano a un sito (LINK_*, INFO_*, SERVIZIO_*)
+costano due chiamate per tap. Con la modalità link si possono compilare
+diversamente:
+
+    'callback' -> come sono nel file (ogni tap arriva al bot)
+    'url'      -> i pulsanti che le aprono diventano pulsanti url: nessuna
+                  chiamata, ma il tap non arriva al bot (niente metriche)
+    'modifica' -> diventano schermate 'edit' con un pulsante url e uno per
+                  tornare indietro: il tap resta nelle metriche e non
+                  aggiunge messaggi in chat
+
+In ogni modalità le schermate restano nell'indice, così i pulsanti dei
+messaggi già inviati continuano a funzionare.
+
+Ogni snapshot ha anche il suo indice per la ricerca inline (vedi ricerca).
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Mapping, NamedTuple, Optional
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from modifiche import impronta
+
+if TYPE_CHECKING:
+    from ricerca import IndiceRicerca
+
+logger = logging.getLogger(__name__)
+
+AVVISO_APERTURA = "Apertura in corso..."
+AZIONI = ('edit', 'send', 'answer')
+
+LINK_CALLBACK = 'callback'
+LINK_URL = 'url'
+LINK_MODIFICA = 'modifica'
+MODALITA_LINK = (LINK_CALLBACK, LINK_URL, LINK_MODIFICA)
+ETICHETTA_LINK = "🔗 Apri il sito"
+ETICHETTA_INDIETRO = "⬅️ Indietro"
+SCHERMATA_PRINCIPALE = 'TORNA_MENU_PRINCIPALE'
+# Tastiera del file aggiunta a ogni risultato della ricerca inline, se c'è
+TASTIERA_RICERCA = 'apri_bot'
+
+URL = re.compile(r'https?://[^\s)*_`]+')
+
+
+class Schermata(NamedTuple):
+    """Schermata precostruita del menu: testo, tastiera e azione da eseguire.
+
+    azione:
+        'edit'   -> modifica il messaggio del pulsante premuto
+        'send'   -> risponde con un avviso e invia un nuovo messaggio in chat
+        'answer' -> risponde solo alla callback (nessun messaggio)
+    """
+    azione: str
+    testo: str
+    tastiera: Optional[InlineKeyboardMarkup] = None
+    parse_mode: Optional[str] = 'Markdown'
+    avviso: Optional[str] = None
+    url: Optional[str] = None  # link della schermata ('url' nel file o l'ultimo nel testo)
+    impronta: Optional[int] = None  # hash di testo, tastiera e parse_mode (vedi modifiche)
+
+
+class Catalogo(NamedTuple):
+    """Snapshot compilato e immutabile del file catalogo."""
+    schermate: Mapping[str, Schermata]
+    testi: Mapping[str, str]
+    tastiere: Mapping[str, InlineKeyboardMarkup]
+    percorso: str
+    mtime: float
+    link: str = LINK_CALLBACK
+    ricerca: Optional['IndiceRicerca'] = None  # indice per la modalità inline, se già costruito
+
+
+SCHERMATA_VUOTA = Schermata(azione='answer', testo='', parse_mode=None)
+
+_corrente: Optional[Catalogo] = None
+_ricerca = None  # (snapshot, indice) costruito alla prima ricerca dopo l'avvio
+
+
+def compila_tastiera(pulsanti):
+    """Costruisce una InlineKeyboardMarkup (immutabile) da righe di dict."""
+    if not pulsanti:
+        return None
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(**pulsante) for pulsante in riga]
+        for riga in pulsanti
+    ])
+
+
+def trova_url(testo):
+    """Ultimo link nel testo di una schermata, o None."""
+    trovati = URL.findall(testo)
+    return trovati[-1] if trovati else None
+
+
+def sostituisci_link(tastiera, collegamenti):
+    """Tastiera con i pulsanti verso `collegamenti` (callback_data -> url) trasformati in pulsanti url."""
+    if tastiera is None:
+        return None
+    righe = tuple(
+        tuple(
+            InlineKeyboardButton(pulsante.text, url=collegamenti[pulsante.callback_data])
+            if pulsante.callback_data in collegamenti else pulsante
+            for pulsante in riga
+        )
+        for riga in tastiera.inline_keyboard
+    )
+    return tastiera if righe == tastiera.inline_keyboard else InlineKeyboardMarkup(righe)
+
+
+def compila_schermate(menu, link=LINK_CALLBACK):
+    """Compila l'albero del menu in un indice callback_data -> Schermata."""
+    if link not in MODALITA_LINK:
+        raise ValueError(f"Modalità link '{link}' non valida (ammesse: {', '.join(MODALITA_LINK)})")
+
+    schermate = {}
+    for chiave, voce in menu.items():
+        azione = voce.get('azione', 'edit')
+        if azione not in AZIONI:
+            raise ValueError(f"Azione '{azione}' non valida per {chiave}")
+        schermate[chiave] = Schermata(
+            azione=azione,
+            testo=voce['testo'],
+            tastiera=compila_tastiera(voce.get('pulsanti')),
+            parse_mode=voce.get('parse_mode', 'Markdown'),
+            avviso=voce.get('avviso', AVVISO_APERTURA if azione == 'send' else None),
+            url=voce.get('url') or trova_url(voce['testo'])
+        )
+
+    collegamenti = {
+        chiave: schermata.url for chiave, schermata in schermate.items()
+        if schermata.azione == 'send' and schermata.url
+    }
+    if link == LINK_URL:
+        schermate = {
+            chiave: schermata._replace(tastiera=sostituisci_link(schermata.tastiera, collegamenti))
+            for chiave, schermata in schermate.items()
+        }
+    elif link == LINK_MODIFICA:
+        # Ogni schermata link torna alla prima schermata che la apre
+        genitori = {}
+        for chiave, schermata in schermate.items():
+            for riga in (schermata.tastiera.inline_keyboard if schermata.tastiera else ()):
+                for pulsante in riga:
+                    if pulsante.callback_data in collegamenti:
+                        genitori.setdefault(pulsante.callback_data, chiave)
+        for chiave, url in collegamenti.items():
+            schermate[chiave] = schermate[chiave]._replace(
+                azione='edit',
+                tastiera=InlineKeyboardMarkup([
+                    [InlineKeyboardButton(ETICHETTA_LINK, url=url)],
+                    [InlineKeyboardButton(
+                        ETICHETTA_INDIETRO, callback_data=genitori.get(chiave, SCHERMATA_PRINCIPALE)
+                    )]
+                ]),
+                avviso=None
+            )
+    schermate = {
+        chiave: schermata._replace(impronta=impronta(schermata.testo, schermata.tastiera, schermata.parse_mode))
+        for chiave, schermata in schermate.items()
+    }
+    return MappingProxyType(schermate), collegamenti
+
+
+def leggi_file(percorso):
+    """Legge il file catalogo (JSON, oppure YAML se l'estensione è .yaml/.yml)."""
+    with open(percorso, encoding='utf-8') as f:
+        if percorso.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError("PyYAML non installato: usa un catalogo JSON") from None
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def costruisci_ricerca(schermate, tastiere):
+    """IndiceRicerca sulle schermate, con la tastiera TASTIERA_RICERCA in ogni risultato."""
+    from ricerca import IndiceRicerca  # Solo alla prima ricerca inline o ai ricaricamenti
+    tastiera = tastiere.get(TASTIERA_RICERCA)
+    return IndiceRicerca(
+        schermate, escludi=(SCHERMATA_PRINCIPALE,), tastiera=tastiera.inline_keyboard if tastiera else None
+    )
+
+
+def carica_catalogo(percorso, link=LINK_CALLBACK, con_ricerca=False):
+    """Legge e compila il catalogo (e, se `con_ricerca`, l'indice inline).
+
+    Solleva un'eccezione se il file non è valido.
+    """
+    mtime = os.stat(percorso).st_mtime
+    dati = leggi_file(percorso)
+
+    schermate, collegamenti = compila_schermate(dati['menu'], link)
+    if SCHERMATA_PRINCIPALE not in schermate:
+        raise ValueError(f"Manca la schermata {SCHERMATA_PRINCIPALE}")
+    if link == LINK_CALLBACK:
+        collegamenti = {}
+    tastiere = {
+        # Le tastiere dei post nel canale usano sempre pulsanti url: una
+        # schermata 'edit' modificherebbe il post per tutti
+        nome: sostituisci_link(compila_tastiera(pulsanti), collegamenti)
+        for nome, pulsanti in dati.get('tastiere', {}).items()
+    }
+
+    return Catalogo(
+        schermate=schermate,
+        testi=MappingProxyType(dict(dati.get('testi', {}))),
+        tastiere=MappingProxyType(tastiere),
+        percorso=percorso,
+        mtime=mtime,
+        link=link,
+        ricerca=costruisci_ricerca(schermate, tastiere) if con_ricerca else None
+    )
+
+
+def corrente() -> Catalogo:
+    """Restituisce lo snapshot attivo."""
+    return _corrente
+
+
+def ricerca() -> 'IndiceRicerca':
+    """Indice della ricerca inline dello snapshot attivo.
+
+    Dopo un ricaricamento è già pronto (costruito nel thread di ricarica);
+    all'avvio viene costruito alla prima ricerca, per non ritardare il
+    primo update.
+    """
+    global _ricerca
+    snapshot = _corrente
+    if snapshot.ricerca is not None:
+        return snapshot.ricerca
+    if _ricerca is None or _ricerca[0] is not snapshot:
+        _ricerca = (snapshot, costruisci_ricerca(snapshot.schermate, snapshot.tastiere))
+    return _ricerca[1]
+
+
+def inizializza(percorso, link=LINK_CALLBACK):
+    """Caricamento sincrono all'avvio (prima che parta l'event loop)."""
+    global _corrente
+    _corrente = carica_catalogo(percorso, link)
+    logger.info(f"📚 Catalogo caricato: {len(_corrente.schermate)} schermate da {percorso} (link: {link})")
+    return _corrente
+
+
+async def ricarica(percorso=None):
+    """Ricompila il catalogo in un thread e sostituisce lo snapshot in un colpo solo.
+
+    Se il file non è valido lo snapshot attivo resta quello precedente.
+    """
+    global _corrente
+    percorso = percorso or _corrente.percorso
+    nuovo = await asyncio.to_thread(carica_catalogo, percorso, _corrente.link, True)
+    _corrente = nuovo
+    logger.info(f"🔄 Catalogo ricaricato: {len(nuovo.schermate)} schermate")
+    return nuovo
+
+
+async def sorveglia_catalogo(intervallo=30):
+    """Ricarica il catalogo quando cambia la data di modifica del file."""
+    mtime_scartato = None
+    while True:
+        try:
+            await asyncio.sleep(intervallo)
+            percorso = _corrente.percorso
+            mtime = await asyncio.to_thread(lambda: os.stat(percorso).st_mtime)
+            if mtime in (_corrente.mtime, mtime_scartato):
+                continue
+            try:
+                await ricarica(percorso)
+            except Exception:
+                # Non riprovare finché il file non viene modificato di nuovo
+                mtime_scartato = mtime
+                raise
+        except asyncio.CancelledError:
+            logger.info("⏸️ Sorveglianza catalogo fermata")
+            break
+        except Exception as e:
+            logger.error(f"❌ Errore ricarica catalogo: {e}")
@@ -0,0 +1,123 @@
+"""📡 Canali e gruppi di destinazione delle pubblicazioni.
+
+Le destinazioni si leggono da un file JSON (o YAML) opzionale:
+
+    {
+      "destinazioni": {
+        "canale": {"chat_id": -1002702418249},
+        "matera": {"chat_id": -1001111111111, "modello": "{testo}\\n\\n📍 #Matera"},
+        "potenza": {"chat_id": -1002222222222}
+      },
+      "gruppi": {
+        "predefinito": ["canale"],
+        "regioni": ["matera", "potenza"],
+        "tutti": ["canale", "matera", "potenza"]
+      }
+    }
+
+Ogni destinazione è anche un gruppo di un solo elemento con il proprio
+nome. `modello` (facoltativo) personalizza il testo per quella chat:
+`{testo}` viene sostituito dal messaggio. Il gruppo `predefinito`, se
+manca, è la prima destinazione. Senza file c'è una sola destinazione,
+"canale".
+
+smista() pubblica lo stesso post in tutte le destinazioni di un gruppo in
+parallelo, con al massimo `limite` invii contemporanei, passando dalla
+posta in uscita (una chiave di idempotenza per destinazione).
+"""
+import asyncio
+import logging
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+from catalogo import leggi_file
+from uscita import FALLITO
+
+logger = logging.getLogger(__name__)
+
+PREDEFINITO = 'predefinito'
+SEGNAPOSTO = '{testo}'
+
+
+class Destinazione(NamedTuple):
+    nome: str
+    chat_id: int
+    modello: Optional[str] = None
+
+    def applica(self, testo):
+        """Testo del post per questa destinazione."""
+        return self.modello.replace(SEGNAPOSTO, testo) if self.modello else testo
+
+
+class Destinazioni(NamedTuple):
+    """Snapshot immutabile di destinazioni e gruppi."""
+    destinazioni: Mapping[str, Destinazione]
+    gruppi: Mapping[str, Tuple[Destinazione, ...]]
+
+    def risolvi(self, nome=None):
+        """Destinazioni di un gruppo (o di una singola destinazione). KeyError se sconosciuto."""
+        nome = nome or PREDEFINITO
+        if nome in self.gruppi:
+            return self.gruppi[nome]
+        return (self.destinazioni[nome],)
+
+    def __contains__(self, nome):
+        return nome in self.gruppi or nome in self.destinazioni
+
+    def chat_ids(self):
+        return [d.chat_id for d in self.destinazioni.values()]
+
+
+def compila_destinazioni(dati):
+    """Valida e compila il contenuto del file destinazioni."""
+    destinazioni = {}
+    for nome, voce in dati['destinazioni'].items():
+        modello = voce.get('modello')
+        if modello is not None and SEGNAPOSTO not in modello:
+            raise ValueError(f"Il modello di '{nome}' non contiene {SEGNAPOSTO}")
+        destinazioni[nome] = Destinazione(nome, int(voce['chat_id']), modello)
+    if not destinazioni:
+        raise ValueError("Nessuna destinazione configurata")
+
+    gruppi = {}
+    for nome, membri in dati.get('gruppi', {}).items():
+        sconosciute = [m for m in membri if m not in destinazioni]
+        if sconosciute:
+            raise ValueError(f"Gruppo '{nome}': destinazioni sconosciute {sconosciute}")
+        gruppi[nome] = tuple(destinazioni[m] for m in dict.fromkeys(membri))
+    gruppi.setdefault(PREDEFINITO, (next(iter(destinazioni.values())),))
+
+    return Destinazioni(MappingProxyType(destinazioni), MappingProxyType(gruppi))
+
+
+def carica_destinazioni(percorso, chat_id_predefinito):
+    """Legge il file destinazioni; senza file, solo il canale `chat_id_predefinito`."""
+    if not percorso:
+        return compila_destinazioni({'destinazioni': {'canale': {'chat_id': chat_id_predefinito}}})
+    return compila_destinazioni(leggi_file(percorso))
+
+
+class Esito(NamedTuple):
+    """Risultato di un post in una destinazione."""
+    destinazione: str
+    stato: str
+    message_id: Optional[int] = None
+    errore: Optional[str] = None
+
+
+async def smista(posta, destinazioni, chiave, testo, limite=5, **opzioni):
+    """Pubblica `testo` in tutte le `destinazioni`; restituisce un Esito per ciascuna, in ordine."""
+    semaforo = asyncio.Semaphore(limite)
+
+    async def invia(destinazione):
+        try:
+            async with semaforo:
+                riga = await posta.invia(
+                    f"{chiave}@{destinazione.nome}", destinazione.chat_id, destinazione.applica(testo), **opzioni
+                )
+        except Exception as e:
+            logger.error("❌ Pubblicazione in '%s' non riuscita: %s", destinazione.nome, e)
+            return Esito(destinazione.nome, FALLITO, errore=str(e))
+        return Esito(destinazione.nome, riga['stato'], riga['message_id'], riga['errore'])
+
+    return await asyncio.gather(*(invia(d) for d in destinazioni))
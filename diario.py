@@ -0,0 +1,167 @@
+"""📓 Log non bloccanti, in JSON.
+
+logger.info() sul thread dell'event loop crea solo il record e lo mette in
+una coda: formattazione e scrittura su stderr avvengono in un thread in
+background (QueueListener), così uno stdout lento o un disco pieno non
+fermano gli update.
+
+Ogni record è una riga JSON con ts, level, logger, msg e, quando ci sono,
+update_id, chat_id, handler, latency_ms, soppressi ed exc. update_id,
+chat_id e handler vengono dalla ContextVar `contesto`, impostata da
+metriche.strumenta per la durata di ogni handler.
+
+Contro le raffiche, FiltroRaffica lascia passare al massimo `limite` record
+con lo stesso modello di messaggio ogni `finestra` secondi (gli errori
+passano sempre); quelli scartati vengono contati nel campo `soppressi` del
+primo record della finestra successiva. Per questo nei percorsi caldi si
+scrive logger.warning("... %s", valore) e non con una f-string: il modello
+identifica l'evento e gli argomenti vengono formattati solo se il record
+viene scritto, nel thread del listener.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+FORMATO_JSON = 'json'
+FORMATO_TESTO = 'testo'
+FORMATI = (FORMATO_JSON, FORMATO_TESTO)
+FORMATO_CLASSICO = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+CAMPI = ('update_id', 'chat_id', 'handler', 'latency_ms', 'soppressi')
+# Oltre questo numero di modelli diversi i contatori delle raffiche ripartono da zero
+MAX_MODELLI = 2000
+
+contesto = ContextVar('contesto_log', default=None)
+_ascoltatore = None
+# Frazione degli update riusciti registrati nel log degli accessi (gli errori sempre)
+campione = 0.01
+
+
+def campiona():
+    """True per una frazione `campione` delle chiamate."""
+    return campione >= 1 or random.random() < campione
+
+
+class FiltroContesto(logging.Filter):
+    """Copia nel record i campi dell'update in corso."""
+
+    def filter(self, record):
+        valori = contesto.get()
+        if valori:
+            for campo, valore in valori.items():
+                if campo not in record.__dict__:
+                    setattr(record, campo, valore)
+        return True
+
+
+class FiltroRaffica(logging.Filter):
+    """Al massimo `limite` record per modello di messaggio ogni `finestra` secondi (sotto ERROR)."""
+
+    def __init__(self, limite=20, finestra=1.0, orologio=time.monotonic):
+        super().__init__()
+        self.limite = limite
+        self.finestra = finestra
+        self.orologio = orologio
+        self.soppressi = 0
+        self._modelli = {}  # (logger, modello) -> [inizio finestra, passati, soppressi]
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or not self.limite:
+            return True
+        chiave = (record.name, record.msg)
+        adesso = self.orologio()
+        voce = self._modelli.get(chiave)
+        if voce is None or adesso - voce[0] >= self.finestra:
+            if voce is not None and voce[2]:
+                record.soppressi = voce[2]
+            elif voce is None and len(self._modelli) >= MAX_MODELLI:
+                self._modelli.clear()
+            self._modelli[chiave] = [adesso, 1, 0]
+            return True
+        if voce[1] < self.limite:
+            voce[1] += 1
+            return True
+        voce[2] += 1
+        self.soppressi += 1
+        return False
+
+
+class FormatoJSON(logging.Formatter):
+    """Una riga JSON per record."""
+
+    def format(self, record):
+        dati = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for campo in CAMPI:
+            valore = record.__dict__.get(campo)
+            if valore is not None:
+                dati[campo] = valore
+        if record.exc_info:
+            dati['exc'] = self.formatException(record.exc_info)
+        return json.dumps(dati, ensure_ascii=False, default=str)
+
+
+class CodaLog(logging.handlers.QueueHandler):
+    """QueueHandler che non formatta il record: lo fa il listener nel suo thread."""
+
+    def prepare(self, record):
+        return record
+
+
+def configura(livello='INFO', formato=FORMATO_JSON, limite=20, finestra=1.0, frazione=0.01,
+              destinazione=None):
+    """Sostituisce gli handler del logger radice con la coda; restituisce il QueueListener avviato."""
+    global campione, _ascoltatore
+    if formato not in FORMATI:
+        raise ValueError(f"Formato di log '{formato}' non valido (ammessi: {', '.join(FORMATI)})")
+    campione = frazione
+
+    scrittore = destinazione or logging.StreamHandler(sys.stderr)
+    scrittore.setFormatter(FormatoJSON() if formato == FORMATO_JSON else logging.Formatter(FORMATO_CLASSICO))
+
+    coda = queue.SimpleQueue()
+    gestore = CodaLog(coda)
+    gestore.addFilter(FiltroContesto())
+    gestore.addFilter(FiltroRaffica(limite, finestra))
+
+    ferma()
+    radice = logging.getLogger()
+    for vecchio in list(radice.handlers):
+        radice.removeHandler(vecchio)
+    radice.addHandler(gestore)
+    radice.setLevel(livello)
+    # httpx scrive una riga INFO per ogni chiamata alla Bot API
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    _ascoltatore = logging.handlers.QueueListener(coda, scrittore, respect_handler_level=True)
+    _ascoltatore.start()
+    return _ascoltatore
+
+
+@atexit.register
+def ferma():
+    """Scrive i record rimasti in coda e ferma il thread (anche all'uscita, dopo sys.exit)."""
+    global _ascoltatore
+    if _ascoltatore is not None:
+        _ascoltatore.stop()
+        _ascoltatore = None
+
+
+def raffica():
+    """FiltroRaffica installato da configura(), se c'è."""
+    for gestore in logging.getLogger().handlers:
+        for filtro in gestore.filters:
+            if isinstance(filtro, FiltroRaffica):
+                return filtro
+    return None
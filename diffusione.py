@@ -0,0 +1,161 @@
+"""📣 Broadcast agli iscritti del bot con concorrenza limitata e ripresa dopo un crash.
+
+Gli iscritti vengono letti dall'archivio a pagine, in ordine di chat_id, e
+inviati da un numero fisso di lavoratori. Tutti gli invii passano dal
+LimitatoreInvii con priorità PRIORITA_BROADCAST, quindi non rallentano le
+risposte ai menu.
+
+Il cursore salvato è il chat_id più alto fino al quale tutti gli invii sono
+conclusi: dopo un crash si riparte da lì, ripetendo al più gli invii che
+erano in volo. Gli utenti che hanno bloccato il bot (403) vengono segnati
+come bloccati ed esclusi dai broadcast successivi.
+"""
+import asyncio
+import logging
+import time
+
+from telegram.error import BadRequest, Forbidden
+
+from invio import PRIORITA_BROADCAST
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONE_PAGINA = 500
+INTERVALLO_STATO = 5  # secondi tra due aggiornamenti del messaggio di stato
+
+
+class Diffusione:
+    """Un broadcast in corso (nuovo o ripreso dall'archivio)."""
+
+    def __init__(self, bot, archivio, riga, lavoratori=8):
+        self.bot = bot
+        self.archivio = archivio
+        self.id = riga['id']
+        self.testo = riga['testo']
+        self.admin_chat = riga['admin_chat']
+        self.messaggio_id = riga['messaggio_id']
+        self.totale = riga['totale']
+        self.cursore = riga['cursore']
+        self.inviati = riga['inviati']
+        self.falliti = riga['falliti']
+        self.lavoratori = lavoratori
+        self.bloccati = 0
+        self._inizio = time.monotonic()
+        self._inviati_inizio = self.inviati + self.falliti
+        # chat_id in ordine di distribuzione -> concluso?
+        self._in_volo = {}
+
+    @property
+    def rimanenti(self):
+        return max(0, self.totale - self.inviati - self.falliti)
+
+    def velocita(self):
+        trascorso = time.monotonic() - self._inizio
+        fatti = self.inviati + self.falliti - self._inviati_inizio
+        return fatti / trascorso if trascorso > 0 else 0.0
+
+    def testo_stato(self, finito=False):
+        titolo = "✅ **Broadcast completato**" if finito else "📣 **Broadcast in corso...**"
+        return (
+            f"{titolo}\n\n"
+            f"📤 Inviati: {self.inviati}\n"
+            f"❌ Falliti: {self.falliti} (🚫 bloccati: {self.bloccati})\n"
+            f"⏳ Rimanenti: {self.rimanenti}\n"
+            f"⚡ Velocità: {self.velocita():.1f} msg/s"
+        )
+
+    async def _aggiorna_stato(self, finito=False):
+        if self.messaggio_id is None:
+            return
+        try:
+            await self.bot.edit_message_text(
+                chat_id=self.admin_chat,
+                message_id=self.messaggio_id,
+                text=self.testo_stato(finito),
+                parse_mode='Markdown'
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Stato broadcast non aggiornato: {e}")
+
+    def _avanza_cursore(self):
+        """Sposta il cursore oltre tutti gli invii conclusi in ordine."""
+        for chat_id, concluso in list(self._in_volo.items()):
+            if not concluso:
+                break
+            self.cursore = chat_id
+            del self._in_volo[chat_id]
+
+    async def _invia(self, chat_id):
+        try:
+            await self.bot.send_message(
+                chat_id=chat_id,
+                text=self.testo,
+                parse_mode='Markdown',
+                rate_limit_args=PRIORITA_BROADCAST
+            )
+            self.inviati += 1
+        except Forbidden:
+            # L'utente ha bloccato il bot
+            self.falliti += 1
+            self.bloccati += 1
+            self.archivio.segna_bloccato(chat_id)
+        except BadRequest as e:
+            self.falliti += 1
+            if 'chat not found' in str(e).lower():
+                self.bloccati += 1
+                self.archivio.segna_bloccato(chat_id)
+        except Exception as e:
+            self.falliti += 1
+            logger.warning("⚠️ Broadcast a %s fallito: %s", chat_id, e)
+        finally:
+            self._in_volo[chat_id] = True
+            self._avanza_cursore()
+
+    async def _lavoratore(self, coda):
+        while True:
+            chat_id = await coda.get()
+            if chat_id is None:
+                return
+            await self._invia(chat_id)
+
+    async def _distribuisci(self, coda):
+        dopo = self.cursore
+        while True:
+            pagina = await asyncio.to_thread(self.archivio.leggi_iscritti, dopo, DIMENSIONE_PAGINA)
+            if not pagina:
+                break
+            for chat_id in pagina:
+                self._in_volo[chat_id] = False
+                await coda.put(chat_id)
+            dopo = pagina[-1]
+        for _ in range(self.lavoratori):
+            await coda.put(None)
+
+    async def _salva_periodicamente(self):
+        while True:
+            await asyncio.sleep(INTERVALLO_STATO)
+            self.archivio.aggiorna_broadcast(self.id, self.cursore, self.inviati, self.falliti)
+            await self._aggiorna_stato()
+
+    async def esegui(self):
+        """Invia il broadcast a tutti gli iscritti rimanenti."""
+        logger.info(f"📣 Broadcast {self.id}: {self.rimanenti} destinatari (cursore {self.cursore})")
+        coda = asyncio.Queue(maxsize=self.lavoratori * 2)
+        salvataggio = asyncio.create_task(self._salva_periodicamente())
+        try:
+            await asyncio.gather(
+                self._distribuisci(coda),
+                *(self._lavoratore(coda) for _ in range(self.lavoratori))
+            )
+        except BaseException:
+            # Interrotto (arresto o errore): si riprenderà dal cursore salvato
+            self.archivio.aggiorna_broadcast(self.id, self.cursore, self.inviati, self.falliti)
+            raise
+        finally:
+            salvataggio.cancel()
+
+        self.archivio.aggiorna_broadcast(
+            self.id, self.cursore, self.inviati, self.falliti, completato=True
+        )
+        await self._aggiorna_stato(finito=True)
+        logger.info(f"✅ Broadcast {self.id} completato: {self.inviati} inviati, {self.falliti} falliti")
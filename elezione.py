@@ -0,0 +1,190 @@
+"""👑 Elezione del leader tra più repliche del bot con un lease su SQLite.
+
+Le repliche condividono l'archivio: una riga della tabella `lease` dice chi
+è il leader (titolare), fino a quando (scadenza, timestamp) e da quale
+elezione (epoca). Ogni `durata / 3` secondi ogni replica prova a prendere o
+rinnovare il lease in una transazione BEGIN IMMEDIATE: ci riesce se il
+lease è già suo o è scaduto. Se il leader si ferma, un'altra replica lo
+sostituisce entro `durata + durata / 3` secondi; se si chiude normalmente
+rilascia il lease e il passaggio è immediato.
+
+Per non avere mai due leader, una replica si considera leader solo fino a
+`inizio dell'ultimo rinnovo riuscito + durata - margine` (orologio
+monotono): se l'archivio resta bloccato o il processo viene sospeso, smette
+di pubblicare prima che il lease scada per le altre. Le repliche devono
+quindi girare sulla stessa macchina (stesso orologio e stesso file).
+
+`promosso()` e `destituito()`, se impostate, sono coroutine chiamate quando
+la replica diventa leader e quando smette di esserlo.
+"""
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lease (
+    nome      TEXT PRIMARY KEY,
+    titolare  TEXT NOT NULL,
+    scadenza  REAL NOT NULL,
+    epoca     INTEGER NOT NULL
+);
+"""
+
+
+def identita_predefinita():
+    """host:pid più un suffisso casuale, diversa a ogni avvio."""
+    return f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(2)}"
+
+
+class Elezione:
+    """Lease `nome` nel database `percorso`, conteso dalle repliche."""
+
+    def __init__(self, percorso, durata=15.0, identita=None, nome='pubblicazioni',
+                 adesso=time.time, monotono=time.monotonic):
+        if durata <= 0:
+            raise ValueError("La durata del lease deve essere positiva")
+        self.percorso = percorso
+        self.durata = durata
+        self.intervallo = durata / 3
+        # Il leader smette di considerarsi tale un po' prima della scadenza vista dalle altre repliche
+        self.margine = durata / 5
+        self.identita = identita or identita_predefinita()
+        self.nome = nome
+        self.adesso = adesso
+        self.monotono = monotono
+        self.titolare = None
+        self.epoca = 0
+        self.cambi = 0
+        self.promosso = None
+        self.destituito = None
+        self._valido_fino = 0.0
+        self._era_leader = False
+        # Nessuna attesa oltre l'intervallo su un archivio bloccato
+        self._conn = sqlite3.connect(percorso, timeout=self.intervallo, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    @property
+    def leader(self):
+        return self.monotono() < self._valido_fino
+
+    def metriche(self):
+        return {
+            'leader': self.leader,
+            'titolare': self.titolare,
+            'epoca': self.epoca,
+            'cambi': self.cambi
+        }
+
+    def _tenta(self):
+        """Prende o rinnova il lease: (inizio monotono, titolare, epoca)."""
+        with self._lock:
+            inizio = self.monotono()
+            adesso = self.adesso()
+            return inizio, *self._transazione(adesso)
+
+    def _transazione(self, adesso):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            riga = self._conn.execute(
+                "SELECT titolare, scadenza, epoca FROM lease WHERE nome = ?", (self.nome,)
+            ).fetchone()
+            if riga is None:
+                titolare, epoca = self.identita, 1
+                self._conn.execute(
+                    "INSERT INTO lease (nome, titolare, scadenza, epoca) VALUES (?, ?, ?, ?)",
+                    (self.nome, titolare, adesso + self.durata, epoca)
+                )
+            elif riga[0] == self.identita or riga[1] <= adesso:
+                titolare = self.identita
+                epoca = riga[2] if riga[0] == self.identita else riga[2] + 1
+                self._conn.execute(
+                    "UPDATE lease SET titolare = ?, scadenza = ?, epoca = ? WHERE nome = ?",
+                    (titolare, adesso + self.durata, epoca, self.nome)
+                )
+            else:
+                titolare, _, epoca = riga
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return titolare, epoca
+
+    def _rilascia(self):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE lease SET scadenza = 0 WHERE nome = ? AND titolare = ?", (self.nome, self.identita)
+            )
+
+    async def _aggiorna(self):
+        """Chiama promosso/destituito se lo stato è cambiato dall'ultima volta."""
+        leader = self.leader
+        if leader == self._era_leader:
+            return
+        self._era_leader = leader
+        self.cambi += 1
+        if leader:
+            logger.info(f"👑 Questa replica è leader (epoca {self.epoca})")
+        else:
+            logger.warning(f"👑 Questa replica non è più leader (titolare {self.titolare})")
+        richiamo = self.promosso if leader else self.destituito
+        if richiamo is None:
+            return
+        try:
+            await richiamo()
+        except Exception as e:
+            logger.error(f"❌ Errore nel cambio di leader: {e}", exc_info=True)
+
+    async def esegui(self):
+        """Coroutine dell'elezione: da avviare una sola volta."""
+        logger.info(f"👑 Elezione avviata come {self.identita} (lease di {self.durata:.0f}s)")
+        try:
+            while True:
+                tentativo = asyncio.ensure_future(asyncio.to_thread(self._tenta))
+                while True:
+                    # Un rinnovo lento non deve tenere in vita un lease già scaduto
+                    attesa = max(0.0, self._valido_fino - self.monotono()) if self._era_leader else None
+                    fatti, _ = await asyncio.wait({tentativo}, timeout=attesa)
+                    if fatti:
+                        break
+                    await self._aggiorna()
+                try:
+                    inizio, self.titolare, self.epoca = tentativo.result()
+                except sqlite3.Error as e:
+                    logger.warning("⚠️ Lease non rinnovato: %s", e)
+                else:
+                    if self.titolare == self.identita:
+                        self._valido_fino = inizio + self.durata - self.margine
+                await self._aggiorna()
+                prossimo = self.intervallo
+                if self._era_leader:
+                    prossimo = min(prossimo, max(0.0, self._valido_fino - self.monotono()))
+                await asyncio.sleep(prossimo)
+        except asyncio.CancelledError:
+            logger.info("⏸️ Elezione fermata")
+            raise
+
+    async def rilascia(self):
+        """Cede il lease (alla chiusura), così un'altra replica lo prende subito."""
+        leader = self._era_leader
+        self._valido_fino = 0.0
+        self._era_leader = False
+        if not leader:
+            return
+        try:
+            await asyncio.to_thread(self._rilascia)
+            logger.info("👑 Lease rilasciato")
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Lease non rilasciato: %s", e)
+
+    def chiudi(self):
+        with self._lock:
+            self._conn.close()
@@ -1,32 +1,145 @@
+import sys
+
+from avvio import ProfiloAvvio
+
+# ⏱️ Tempi di avvio (con --profile-startup anche quelli di ogni import)
+profilo = ProfiloAvvio(attivo='--profile-startup' in sys.argv)
+profilo.segui_import()
+
+import argparse
 import logging
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update, KeyboardButton, ReplyKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, filters
-from datetime import datetime, timedelta
+from telegram.ext import (
+    Application, ApplicationHandlerStop, CommandHandler, CallbackQueryHandler, ContextTypes, InlineQueryHandler,
+    MessageHandler, TypeHandler, filters
+)
+from telegram.request import HTTPXRequest
+import httpx
+from datetime import datetime
 import pytz
 import os
-import sys
+import signal
 import asyncio
+import functools
+import tempfile
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
+import catalogo
+import diario
+import metriche
+from archivio import Archivio
+from canale import SaluteCanale
+from destinazioni import PREDEFINITO, Esito, carica_destinazioni, smista
+from invio import LimitatoreInvii
+from orologio import Orologio
+from pianificatore import Pianificatore
+from processore import ProcessoreUpdate, chiave_chat
+from ricorrenze import MotoreRicorrenze, localizza
+from modifiche import CacheModifiche
+from pulizia import CestinoMessaggi
+from statistiche import ERRORI_FILE, Statistiche
+from uscita import PostaInUscita, BLOCCATO, CONSEGNATO, IN_ATTESA, INCERTO
+
+profilo.fase('import')
+
 # Carica le variabili
 load_dotenv()
 
-# Configurazione logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+# Configurazione logging: JSON (o testo) scritto da un thread in background
+diario.configura(
+    livello=os.environ.get('LOG_LIVELLO', 'INFO'),
+    formato=os.environ.get('LOG_FORMATO', diario.FORMATO_JSON),
+    # Record con lo stesso modello al secondo, oltre i quali si scartano (0 = nessun limite)
+    limite=int(os.environ.get('LOG_RAFFICA', '20')),
+    # Frazione degli update riusciti nel log degli accessi
+    frazione=float(os.environ.get('LOG_CAMPIONE', '0.01'))
 )
 logger = logging.getLogger(__name__)
 
 # ✅ VARIABILI GLOBALI
-pubblicazione_task = None
-orario_pubblicazione = {'ore': 9, 'minuti': 0}
-messaggi_programmati = {}  # 🆕 Per messaggi programmati
+orologio = Orologio()  # 🕐 Sostituibile con un OrologioVirtuale nelle simulazioni
+pianificatore = Pianificatore(orologio)  # ⏰ Timer unico per pubblicazione quotidiana e messaggi programmati
+pianificatore_task = None
+servizi_task = []  # Task in background avviati da all_avvio
+lock_impostazioni = asyncio.Lock()  # 🔒 Serializza i comandi admin che modificano lo stato globale
+diffusione_task = None  # 📣 Broadcast in corso
 
 # PARAMETRI ESSENZIALI
 TOKEN = os.environ.get('TELEGRAM_TOKEN')
+# 🧪 Bot API alternativa (es. benchmark.finto_api per prove di carico); None = Telegram
+TELEGRAM_BASE_URL = os.environ.get('TELEGRAM_BASE_URL') or None
 ADMIN_ID_STR = os.environ.get('ADMIN_ID')
 CHAT_ID_CANALE = -1002702418249
+FUSO_ORARIO = pytz.timezone('Europe/Rome')  # 🌐 Creato una volta sola: tutte le date del bot sono in questo fuso
+# Ricorrenza creata al primo avvio dal vecchio orario unico (modificabile con /imposta_orario)
+ID_QUOTIDIANO = 'quotidiano'
+CATALOGO_PATH = os.environ.get(
+    'CATALOGO_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalogo.json')
+)
+CATALOGO_INTERVALLO = int(os.environ.get('CATALOGO_INTERVALLO', '30'))
+# 🔗 Pulsanti verso i siti: 'callback' (messaggio in chat), 'url' (nessuna chiamata) o 'modifica'
+PULSANTI_LINK = os.environ.get('PULSANTI_LINK', catalogo.LINK_CALLBACK)
+ARCHIVIO_PATH = os.environ.get(
+    'ARCHIVIO_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'basilicatago.db')
+)
+# Messaggi programmati scaduti durante un fermo: 'invia' (in ritardo), 'salta' o 'chiedi' all'admin
+RECUPERO_PROGRAMMATI = os.environ.get('RECUPERO_PROGRAMMATI', 'chiedi')
+# Limiti di invio verso Telegram (messaggi al secondo)
+LIMITE_GLOBALE = float(os.environ.get('LIMITE_GLOBALE', '30'))
+LIMITE_PRIVATO = float(os.environ.get('LIMITE_PRIVATO', '1'))
+LIMITE_GRUPPO = float(os.environ.get('LIMITE_GRUPPO', str(20 / 60)))
+# 🪝 Webhook: se WEBHOOK_URL è impostato il bot non usa il polling
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL')
+WEBHOOK_PERCORSO = os.environ.get('WEBHOOK_PERCORSO') or urlparse(WEBHOOK_URL or '').path or '/webhook'
+# Vuoto = generato all'avvio del webhook
+WEBHOOK_SEGRETO = os.environ.get('WEBHOOK_SEGRETO')
+WEBHOOK_HOST = os.environ.get('WEBHOOK_HOST', '127.0.0.1')
+WEBHOOK_PORTA = int(os.environ.get('WEBHOOK_PORTA', '8443'))
+WEBHOOK_MAX_CODA = int(os.environ.get('WEBHOOK_MAX_CODA', '1000'))
+# 🔀 Update elaborati in parallelo (chat diverse); 1 = elaborazione sequenziale
+MAX_LAVORATORI = int(os.environ.get('MAX_LAVORATORI', '32'))
+# 🧩 Processi lavoratori per gli update degli utenti, divisi per chat (0 = tutto in un processo)
+LAVORATORI = int(os.environ.get('LAVORATORI', '0'))
+# Socket Unix tra front e lavoratori (di default nella cartella temporanea)
+SMISTAMENTO_SOCKET = os.environ.get('SMISTAMENTO_SOCKET') or None
+# 👑 Più repliche sullo stesso archivio: secondi del lease del leader, l'unica che pubblica (0 = replica unica)
+LEADER_LEASE = float(os.environ.get('LEADER_LEASE') or 0)
+# Nome della replica nel lease (default host:pid)
+LEADER_ID = os.environ.get('LEADER_ID') or None
+# 📣 Invii contemporanei durante un /broadcast
+BROADCAST_LAVORATORI = int(os.environ.get('BROADCAST_LAVORATORI', '8'))
+# 🧹 Secondi di attesa prima di cancellare a blocchi i messaggi degli utenti
+PULIZIA_RITARDO = float(os.environ.get('PULIZIA_RITARDO', '1'))
+# 🪞 Messaggi del menu di cui si ricorda l'ultimo contenuto (per saltare gli edit identici)
+MODIFICHE_CAPIENZA = int(os.environ.get('MODIFICHE_CAPIENZA', '50000'))
+# 📈 Endpoint /metrics (formato Prometheus); disattivato se METRICHE_PORTA non è impostata
+METRICHE_HOST = os.environ.get('METRICHE_HOST', '127.0.0.1')
+METRICHE_PORTA = int(os.environ.get('METRICHE_PORTA') or 0) or None
+# 📮 Tentativi massimi per un post nel canale prima di segnalarlo all'admin
+USCITA_TENTATIVI = int(os.environ.get('USCITA_TENTATIVI', '8'))
+# Secondi concessi alla chiusura per concludere i post in invio
+USCITA_ATTESA_CHIUSURA = 10
+# 🩺 Secondi tra due verifiche in background di canale e permessi
+CANALE_INTERVALLO = float(os.environ.get('CANALE_INTERVALLO', '300'))
+# 📡 File con canali e gruppi di destinazione (senza file: solo CHAT_ID_CANALE)
+DESTINAZIONI_PATH = os.environ.get('DESTINAZIONI_PATH') or None
+# Pubblicazioni contemporanee quando un post va in più destinazioni
+DESTINAZIONI_PARALLELE = int(os.environ.get('DESTINAZIONI_PARALLELE', '5'))
+# 📊 Contatori dei percorsi nel menu per /statistiche, di default accanto all'archivio ('' = solo in memoria);
+# ogni lavoratore e ogni replica (con LEADER_ID) scrive il suo file con un suffisso
+STATISTICHE_PATH = os.environ.get(
+    'STATISTICHE_PATH',
+    '' if ARCHIVIO_PATH == ':memory:' else os.path.splitext(ARCHIVIO_PATH)[0] + '.statistiche'
+) or None
+# Secondi tra due salvataggi dei contatori
+STATISTICHE_SALVATAGGIO = float(os.environ.get('STATISTICHE_SALVATAGGIO', '60'))
+# Tap registrati in attesa di essere aggregati (ogni secondo); oltre, i più vecchi si perdono
+STATISTICHE_EVENTI = int(os.environ.get('STATISTICHE_EVENTI', '65536'))
+# 🔎 Secondi per cui Telegram può riusare i risultati di una ricerca inline
+RICERCA_CACHE = int(os.environ.get('RICERCA_CACHE', '300'))
 
 try:
     ADMIN_ID = int(ADMIN_ID_STR) if ADMIN_ID_STR else None
@@ -40,119 +153,285 @@ if not TOKEN:
 if not ADMIN_ID:
     logger.warning("ADMIN_ID non trovato")
 
+try:
+    catalogo.inizializza(CATALOGO_PATH, PULSANTI_LINK)
+except Exception as e:
+    logger.error(f"ERRORE CRITICO: catalogo non valido ({CATALOGO_PATH}): {e}")
+    sys.exit(1)
+
+try:
+    destinazioni = carica_destinazioni(DESTINAZIONI_PATH, CHAT_ID_CANALE)
+except Exception as e:
+    logger.error(f"ERRORE CRITICO: destinazioni non valide ({DESTINAZIONI_PATH}): {e}")
+    sys.exit(1)
+
+if RECUPERO_PROGRAMMATI not in ('invia', 'salta', 'chiedi'):
+    logger.warning(f"RECUPERO_PROGRAMMATI '{RECUPERO_PROGRAMMATI}' non valido, uso 'chiedi'")
+    RECUPERO_PROGRAMMATI = 'chiedi'
+
+# 💾 Archivio persistente (messaggi programmati e impostazioni)
+archivio = Archivio(ARCHIVIO_PATH)
+programmati_persi = {}  # Messaggi scaduti durante un fermo, in attesa di decisione dell'admin
+
+# 👑 Con più repliche solo il leader pubblica: pianificatore, posta in uscita e broadcast
+if LEADER_LEASE:
+    from elezione import Elezione  # Solo con più repliche
+    elezione = Elezione(ARCHIVIO_PATH, LEADER_LEASE, LEADER_ID)
+else:
+    elezione = None
+lavori_leader = []  # Task che girano solo mentre questa replica è leader
+
+# 📮 Ogni post nel canale passa dalla posta in uscita (chiave di idempotenza + nuovi tentativi)
+posta_uscita = PostaInUscita(archivio, pianificatore, max_tentativi=USCITA_TENTATIVI)
+
+# 🩺 Dati di ogni destinazione e permesso di pubblicare, aggiornati in background
+salute_canali = {
+    d.chat_id: SaluteCanale(d.chat_id, intervallo=CANALE_INTERVALLO, orologio=orologio, nome=d.nome)
+    for d in destinazioni.destinazioni.values()
+}
+
+
+def blocco_destinazione(chat_id):
+    """Motivo per cui non si può pubblicare in `chat_id` (None se si può o non è una destinazione)."""
+    salute = salute_canali.get(chat_id)
+    return salute.blocco(chat_id) if salute else None
+
+
+posta_uscita.controllo = blocco_destinazione
+
+# 📤 Tutte le chiamate a Telegram passano dal limitatore (coda a priorità + flood wait)
+limitatore = LimitatoreInvii(
+    admin_id=ADMIN_ID,
+    canali=destinazioni.chat_ids(),
+    # Con più processi ognuno ha la sua parte del limite globale
+    limite_globale=LIMITE_GLOBALE / (LAVORATORI + 1),
+    limite_privato=LIMITE_PRIVATO,
+    limite_gruppo=LIMITE_GRUPPO
+)
+
+limitatore.osservatore = metriche.osserva_api
+
+# 📈 Indicatori letti a ogni scrape di /metrics
+ritardo_loop = metriche.RitardoLoop()
+metriche.registro.registra(metriche.Indicatore(
+    'basilicatago_lavori_pianificati', 'Lavori nel pianificatore.', lambda: len(pianificatore)
+))
+metriche.registro.registra(metriche.Indicatore(
+    'basilicatago_coda_invii', 'Richieste in attesa nel limitatore.', lambda: limitatore.metriche()['in_coda']
+))
+metriche.registro.registra(metriche.Indicatore(
+    'basilicatago_destinazioni_bloccate', 'Destinazioni in cui il bot non può pubblicare.',
+    lambda: sum(not salute.sano for salute in salute_canali.values())
+))
+metriche.registro.registra(metriche.Indicatore(
+    'basilicatago_ritardo_loop_seconds', "Ultimo ritardo misurato dell'event loop.", lambda: ritardo_loop.ultimo
+))
+metriche.registro.registra(metriche.Indicatore(
+    'basilicatago_log_soppressi', 'Righe di log scartate dal limite per modello.',
+    lambda: diario.raffica().soppressi
+))
+if elezione is not None:
+    metriche.registro.registra(metriche.Indicatore(
+        'basilicatago_leader', '1 se questa replica è il leader che pubblica.', lambda: int(elezione.leader)
+    ))
+server_metriche = None
+richiesta_polling = None  # 📥 Richieste di getUpdates, creata da crea_applicazione
+smistatore = None  # 🧩 Front della modalità multi-processo (LAVORATORI > 0)
+
+# 🧹 Messaggi degli utenti da cancellare con deleteMessages
+cestino = CestinoMessaggi(ritardo=PULIZIA_RITARDO)
+
+# 🪞 Ultimo contenuto dei messaggi del menu
+cache_modifiche = CacheModifiche(MODIFICHE_CAPIENZA)
+metriche.registro.registra(metriche.Indicatore(
+    'basilicatago_modifiche_evitate', 'Edit identici del menu saltati senza chiamare Telegram.',
+    lambda: cache_modifiche.evitate
+))
+metriche.registro.registra(metriche.Indicatore(
+    'basilicatago_modifiche_espulse', 'Messaggi espulsi dalla cache delle modifiche.',
+    lambda: cache_modifiche.espulse
+))
+metriche.registro.registra(metriche.Indicatore(
+    'basilicatago_modifiche_in_cache', 'Messaggi nella cache delle modifiche.', lambda: len(cache_modifiche)
+))
+
+# 📊 Tap e comandi degli utenti, aggregati in background
+statistiche = Statistiche(capienza=STATISTICHE_EVENTI, adesso=orologio.adesso)
+statistiche_file = None  # File dei contatori di questo processo, scelto in main
+metriche.registro.registra(metriche.Indicatore(
+    'basilicatago_statistiche_perse', 'Tap non registrati nelle statistiche (anello pieno).',
+    lambda: statistiche.persi
+))
+
+
 # --------------------------------------------------------------------------
 # FUNZIONI BASE
 # --------------------------------------------------------------------------
 
-async def invia_al_canale(context: ContextTypes.DEFAULT_TYPE, messaggio: str, keyboard=None):
-    """Invia un messaggio al canale BasilicataGo."""
+async def invia_al_canale(context: ContextTypes.DEFAULT_TYPE, chiave: str, messaggio: str,
+                          keyboard=None, parse_mode='Markdown', gruppo=None):
+    """Pubblica un messaggio nelle destinazioni di `gruppo` (None: il gruppo predefinito).
+    
+    Passa dalla posta in uscita: la stessa `chiave` non viene mai pubblicata
+    due volte nella stessa destinazione. Restituisce un Esito per destinazione.
+    """
     try:
-        logger.info(f"📤 Tentativo invio al canale {CHAT_ID_CANALE}")
-        await context.bot.send_message(
-            chat_id=CHAT_ID_CANALE,
-            text=messaggio,
-            reply_markup=keyboard,
-            parse_mode='Markdown'
-        )
-        logger.info("✅ Messaggio inviato con successo")
+        elenco = destinazioni.risolvi(gruppo)
+    except KeyError:
+        # Gruppo tolto dalla configurazione dopo la programmazione: meglio non pubblicare che
+        # pubblicare altrove. Il post resta nella posta in uscita come fallito e l'admin viene avvisato.
+        errore = f"gruppo di destinazioni '{gruppo}' non più configurato"
+        riga = await posta_uscita.rifiuta(f"{chiave}@{gruppo}", 0, messaggio, errore)
+        return [Esito(gruppo, riga['stato'], riga['message_id'], riga['errore'])]
+    
+    logger.info("📤 Invio a %d destinazioni (%s)", len(elenco), chiave)
+    return await smista(
+        posta_uscita, elenco, chiave, messaggio,
+        limite=DESTINAZIONI_PARALLELE, reply_markup=keyboard, parse_mode=parse_mode
+    )
+
+
+def chiave_comando(nome, update):
+    """Chiave di idempotenza di un post chiesto con un comando (stessa per lo stesso messaggio)."""
+    return f"{nome}:{update.effective_chat.id}:{update.message.message_id}"
+
+
+def estrai_gruppo(argomenti):
+    """Separa un `@gruppo` iniziale dagli argomenti: (gruppo o None, resto).
+    
+    Solleva ValueError se il gruppo non è tra le destinazioni configurate.
+    """
+    if argomenti and argomenti[0].startswith('@') and len(argomenti[0]) > 1:
+        gruppo = argomenti[0][1:]
+        if gruppo not in destinazioni:
+            raise ValueError(f"gruppo di destinazioni sconosciuto: {gruppo}")
+        return gruppo, argomenti[1:]
+    return None, argomenti
+
+
+async def replica_leader(update: Update) -> bool:
+    """👑 True se questa replica può pubblicare; altrimenti lo spiega all'admin."""
+    if elezione is None or elezione.leader:
         return True
-    except Exception as e:
-        logger.error(f"❌ Errore: {e}")
-        return False
+    testo = f"👑 Pubblica solo la replica leader ({elezione.titolare or 'elezione in corso'}): riprova tra poco."
+    if update.callback_query:
+        await update.callback_query.answer(testo, show_alert=True)
+    else:
+        await update.effective_message.reply_text(testo)
+    return False
+
+
+def esito_pubblicazione(stato, motivo=None):
+    """Risposta all'admin per lo stato di un post nel canale."""
+    if stato == CONSEGNATO:
+        return "✅ Messaggio pubblicato nel canale @basilicataGo!"
+    if stato == IN_ATTESA:
+        return "⏳ Telegram non ha risposto: il messaggio verrà ripubblicato automaticamente."
+    if stato == INCERTO:
+        return "⚠️ Esito incerto: controlla il canale prima di ripubblicare."
+    if stato == BLOCCATO:
+        return (
+            f"🚫 Il bot non può pubblicare nel canale{': ' + motivo if motivo else ''}.\n"
+            "Il messaggio verrà pubblicato quando i permessi saranno ripristinati."
+        )
+    return "❌ Errore nella pubblicazione. Verifica che il bot sia amministratore del canale."
 
 
-async def messaggio_quotidiano(context: ContextTypes.DEFAULT_TYPE) -> None:
+ICONE_STATO = {CONSEGNATO: '✅', IN_ATTESA: '⏳', INCERTO: '⚠️', BLOCCATO: '🚫'}
+
+
+def riepilogo_pubblicazione(esiti):
+    """Risposta all'admin per un post in una o più destinazioni."""
+    if len(esiti) == 1:
+        return esito_pubblicazione(esiti[0].stato, esiti[0].errore)
+    
+    consegnati = sum(esito.stato == CONSEGNATO for esito in esiti)
+    righe = [f"📡 Pubblicato in {consegnati}/{len(esiti)} destinazioni\n"]
+    for esito in esiti:
+        icona = ICONE_STATO.get(esito.stato, '❌')
+        if esito.stato == CONSEGNATO:
+            righe.append(f"{icona} {esito.destinazione} (messaggio {esito.message_id})")
+        else:
+            righe.append(f"{icona} {esito.destinazione}: {esito.stato}" + (f" - {esito.errore}" if esito.errore else ""))
+    if consegnati < len(esiti):
+        righe.append("\n⏳ I post in attesa o bloccati verranno pubblicati automaticamente.")
+    return "\n".join(righe)
+
+
+async def messaggio_quotidiano(context: ContextTypes.DEFAULT_TYPE, chiave: str, gruppo=None):
     """Pubblica messaggio quotidiano."""
     logger.info("⚡ INIZIO messaggio_quotidiano")
-    logger.info(f"🕐 Orario attuale: {datetime.now(pytz.timezone('Europe/Rome')).strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    messaggio = (
-        "🌅 Buongiorno dalla Basilicata!\n\n"
-        "✨ Scopri oggi le meraviglie della nostra terra:\n\n"
-        "🏛️ Matera e i Sassi Patrimonio UNESCO\n"
-        "🏖️ Le spiagge di Maratea e Metaponto\n"
-        "🏡 Agriturismi e strutture ricettive\n"
-        "🍷 Prodotti tipici lucani DOP e IGP\n\n"
-        "👉 Usa il bot per esplorare tutte le destinazioni!"
-    )
-    
-    keyboard = [
-        [InlineKeyboardButton("🤖 Apri Bot BasilicataGo", url="https://t.me/basilicatagobot")]
-    ]
+    logger.info(f"🕐 Orario attuale: {orologio.ora(FUSO_ORARIO).strftime('%Y-%m-%d %H:%M:%S')}")
     
-    try:
-        logger.info(f"📤 Invio messaggio al canale {CHAT_ID_CANALE}")
-        await context.bot.send_message(
-            chat_id=CHAT_ID_CANALE,
-            text=messaggio,
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-        logger.info("✅ Messaggio quotidiano pubblicato con successo")
-    except Exception as e:
-        logger.error(f"❌ Errore pubblicazione automatica: {e}")
+    cat = catalogo.corrente()
+    return await invia_al_canale(
+        context, chiave, cat.testi['quotidiano'], cat.tastiere['apri_bot'], parse_mode=None, gruppo=gruppo
+    )
+
+
+# ✅ SISTEMA PUBBLICAZIONE AUTOMATICA SUL PIANIFICATORE
+class TempContext:
+    """Context minimo per gli invii fuori da un handler."""
+    def __init__(self, app):
+        self.bot = app.bot
+        self.application = app
 
 
-# ✅ SISTEMA PUBBLICAZIONE AUTOMATICA SENZA JOB_QUEUE
-async def loop_pubblicazione_quotidiana(application):
-    """Loop pubblicazione automatica."""
-    timezone = pytz.timezone('Europe/Rome')
+async def pubblica_ricorrenza(context, ricorrenza, quando) -> None:
+    """Pubblica nel canale una ricorrenza (senza testo: il messaggio quotidiano del catalogo)."""
+    # Una chiave per scadenza: se la stessa scadenza riscatta dopo un riavvio non si ripubblica
+    chiave = f"ricorrenza:{ricorrenza.id}:{int(quando.timestamp())}"
+    if ricorrenza.testo is None:
+        await messaggio_quotidiano(context, chiave, ricorrenza.gruppo)
+        return
     
-    while True:
+    logger.info("📤 Pubblicazione ricorrente '%s'", ricorrenza.id)
+    await invia_al_canale(
+        context, chiave, ricorrenza.testo, catalogo.corrente().tastiere['apri_bot'], gruppo=ricorrenza.gruppo
+    )
+
+
+def carica_ricorrenze():
+    """Carica le ricorrenze dall'archivio; al primo avvio crea quella quotidiana."""
+    for id, espressione, testo, gruppo in archivio.carica_ricorrenze():
         try:
-            now = datetime.now(timezone)
-            ore = orario_pubblicazione['ore']
-            minuti = orario_pubblicazione['minuti']
-            
-            target = now.replace(hour=ore, minute=minuti, second=0, microsecond=0)
-            if now >= target:
-                target += timedelta(days=1)
-            
-            attesa = (target - now).total_seconds()
-            logger.info(f"⏰ Prossima pubblicazione: {target.strftime('%d/%m/%Y %H:%M:%S')}")
-            logger.info(f"⏳ Attesa di {attesa/3600:.1f} ore")
-            
-            await asyncio.sleep(attesa)
-            
-            logger.info("📤 Pubblicazione automatica in corso...")
-            
-            # Crea context temporaneo
-            class TempContext:
-                def __init__(self, app):
-                    self.bot = app.bot
-                    self.application = app
-            
-            await messaggio_quotidiano(TempContext(application))
-            
-            logger.info("✅ Pubblicazione completata")
-            await asyncio.sleep(60)
-            
-        except asyncio.CancelledError:
-            logger.info("⏸️ Loop pubblicazione fermato")
-            break
-        except Exception as e:
-            logger.error(f"❌ Errore nel loop pubblicazione: {e}")
-            await asyncio.sleep(300)
+            ricorrenze.imposta(id, espressione, testo, gruppo)
+        except ValueError as e:
+            logger.error(f"❌ Ricorrenza '{id}' non valida ({espressione}): {e}")
+    
+    if archivio.leggi_impostazione('ricorrenze_inizializzate'):
+        return
+    # Migrazione dal vecchio orario unico della pubblicazione quotidiana
+    ore, minuti = map(int, archivio.leggi_impostazione('orario_pubblicazione', '09:00').split(':'))
+    ricorrenze.imposta(ID_QUOTIDIANO, f"{minuti} {ore} * * *")
+    archivio.salva_ricorrenza(ID_QUOTIDIANO, f"{minuti} {ore} * * *", None)
+    archivio.salva_impostazione('ricorrenze_inizializzate', 1)
+
+
+# 🔁 Pubblicazioni ricorrenti (ognuna è un lavoro indipendente nel pianificatore)
+ricorrenze = MotoreRicorrenze(pianificatore, FUSO_ORARIO, pubblica_ricorrenza)
+carica_ricorrenze()
+
+
+# --------------------------------------------------------------------------
+# TASTIERE
+# --------------------------------------------------------------------------
+
+REPLY_KEYBOARD = ReplyKeyboardMarkup(
+    [[KeyboardButton("🏛️ Scopri la Basilicata")]],
+    resize_keyboard=True,
+    one_time_keyboard=False
+)
 
 
 def get_reply_keyboard():
     """Tastiera permanente con il pulsante per aprire il menu."""
-    keyboard = [[KeyboardButton("🏛️ Scopri la Basilicata")]]
-    return ReplyKeyboardMarkup(
-        keyboard, 
-        resize_keyboard=True,
-        one_time_keyboard=False
-    )
+    return REPLY_KEYBOARD
 
 
 def get_main_menu_keyboard():
     """Menu principale con pulsanti inline."""
-    keyboard = [
-        [InlineKeyboardButton("🏖️ Dove Dormire", callback_data='MENU_DOVE_DORMIRE')],
-        [InlineKeyboardButton("🗺️ Cosa Vedere", callback_data='MENU_COSA_VEDERE')],
-        [InlineKeyboardButton("🍷 Prodotti Lucani", callback_data='MENU_PRODOTTI_LUCANI')],
-        [InlineKeyboardButton("📋 Servizi BasilicataGo", callback_data='MENU_SERVIZI_BASILICATAGO')]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return catalogo.corrente().schermate['TORNA_MENU_PRINCIPALE'].tastiera
 
 
 # --------------------------------------------------------------------------
@@ -161,46 +440,55 @@ def get_main_menu_keyboard():
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Avvia il bot e mostra il pulsante per aprire il menu."""
-    welcome_text = (
-        "🏛️ **Benvenuto su BasilicataGo!**\n\n"
-        "Scopri le meraviglie della Basilicata:\n\n"
-        "🏖️ Strutture ricettive e soggiorni\n"
-        "🗺️ Luoghi da visitare e borghi storici\n"
-        "🍷 Prodotti tipici e gastronomia lucana\n"
-        "📢 Annunci e opportunità locali\n\n"
-        "👇 Premi il pulsante per iniziare l'esplorazione!"
-    )
+    if update.effective_chat.type == 'private':
+        archivio.iscrivi(update.effective_chat.id, orologio.adesso())
     
     await update.message.reply_text(
-        text=welcome_text,
+        text=catalogo.corrente().testi['benvenuto'],
         reply_markup=get_reply_keyboard(),
         parse_mode='Markdown'
     )
 
 
+async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """🔕 Disiscrive l'utente dai messaggi broadcast."""
+    archivio.disiscrivi(update.effective_chat.id)
+    await update.message.reply_text(
+        "🔕 Non riceverai più messaggi da BasilicataGo.\n\n"
+        "Usa /start per iscriverti di nuovo."
+    )
+
+
 async def pubblica(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Comando per pubblicare un messaggio nel canale (solo per admin)."""
     if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
         await update.message.reply_text("❌ Non hai i permessi per usare questo comando.")
         return
+    if not await replica_leader(update):
+        return
     
     if not context.args:
         await update.message.reply_text(
             "📝 **Uso del comando /pubblica**\n\n"
-            "Sintassi: `/pubblica <messaggio>`\n\n"
-            "Esempio:\n"
-            "`/pubblica Nuova struttura ricettiva disponibile! 🏡`",
+            "Sintassi: `/pubblica [@gruppo] <messaggio>`\n\n"
+            "Esempi:\n"
+            "`/pubblica Nuova struttura ricettiva disponibile! 🏡`\n"
+            "`/pubblica @tutti Festa di San Rocco a Tolve! 🎉`",
             parse_mode='Markdown'
         )
         return
     
-    messaggio = " ".join(context.args)
-    successo = await invia_al_canale(context, messaggio)
+    try:
+        gruppo, parole = estrai_gruppo(context.args)
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}. Usa /destinazioni per vedere i gruppi.")
+        return
+    if not parole:
+        await update.message.reply_text("❌ Manca il messaggio da pubblicare.")
+        return
     
-    if successo:
-        await update.message.reply_text("✅ Messaggio pubblicato nel canale @basilicataGo!")
-    else:
-        await update.message.reply_text("❌ Errore nella pubblicazione. Verifica che il bot sia amministratore del canale.")
+    esiti = await invia_al_canale(context, chiave_comando('pubblica', update), " ".join(parole), gruppo=gruppo)
+    await update.message.reply_text(riepilogo_pubblicazione(esiti))
 
 
 async def pubblica_bot(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -208,29 +496,25 @@ async def pubblica_bot(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
         await update.message.reply_text("❌ Non hai i permessi per usare questo comando.")
         return
+    if not await replica_leader(update):
+        return
     
-    messaggio = (
-        "✨ **Scopri la Basilicata con BasilicataGo!**\n\n"
-        "🏖️ Trova dove dormire (hotel, B&B, agriturismi)\n"
-        "🗺️ Esplora le destinazioni più belle\n"
-        "🍷 Acquista prodotti tipici lucani\n"
-        "📢 Consulta annunci e servizi locali\n\n"
-        "👇 Inizia subito la tua esperienza!"
-    )
+    try:
+        gruppo, _ = estrai_gruppo(context.args)
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}. Usa /destinazioni per vedere i gruppi.")
+        return
     
-    keyboard = [
-        [InlineKeyboardButton("🤖 Apri Bot BasilicataGo", url="https://t.me/basilicatagobot")]
-    ]
+    cat = catalogo.corrente()
     
-    try:
-        await context.bot.send_message(
-            chat_id=CHAT_ID_CANALE,
-            text=messaggio,
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+    esiti = await invia_al_canale(
+        context, chiave_comando('pubblica_bot', update),
+        cat.testi['pubblica_bot'], cat.tastiere['apri_bot'], parse_mode=None, gruppo=gruppo
+    )
+    if all(esito.stato == CONSEGNATO for esito in esiti):
         await update.message.reply_text("✅ Messaggio con pulsante bot pubblicato!")
-    except Exception as e:
-        await update.message.reply_text(f"❌ Errore: {e}")
+    else:
+        await update.message.reply_text(riepilogo_pubblicazione(esiti))
 
 
 async def test_canale(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -238,12 +522,18 @@ async def test_canale(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
         await update.message.reply_text("❌ Non hai i permessi per usare questo comando.")
         return
+    if not await replica_leader(update):
+        return
     
     await update.message.reply_text("📤 Invio messaggio di test al canale...")
     
     try:
-        await messaggio_quotidiano(context)
-        await update.message.reply_text("✅ Messaggio di test inviato al canale @basilicataGo!")
+        gruppo, _ = estrai_gruppo(context.args)
+        esiti = await messaggio_quotidiano(context, chiave_comando('test_canale', update), gruppo)
+        if all(esito.stato == CONSEGNATO for esito in esiti):
+            await update.message.reply_text("✅ Messaggio di test inviato al canale @basilicataGo!")
+        else:
+            await update.message.reply_text(riepilogo_pubblicazione(esiti))
     except Exception as e:
         await update.message.reply_text(f"❌ Errore durante l'invio: {e}")
         logger.error(f"Errore test_canale: {e}")
@@ -253,7 +543,7 @@ async def test_canale(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 async def programma(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """📅 Programma un messaggio per una data/ora specifica.
     
-    Uso: /programma GG/MM/AAAA HH:MM <messaggio>
+    Uso: /programma GG/MM/AAAA HH:MM [@gruppo] <messaggio>
     Esempio: /programma 30/10/2025 15:30 Evento speciale domani! 🎉
     """
     if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
@@ -264,9 +554,10 @@ async def programma(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text(
             "📅 **Programma Messaggio**\n\n"
             "**Sintassi:**\n"
-            "`/programma GG/MM/AAAA HH:MM <messaggio>`\n\n"
+            "`/programma GG/MM/AAAA HH:MM [@gruppo] <messaggio>`\n\n"
             "**Esempi:**\n"
             "`/programma 30/10/2025 15:30 Evento speciale! 🎉`\n"
+            "`/programma 31/10/2025 10:00 @regioni Sagre del weekend 🍇`\n"
             "`/programma 01/11/2025 09:00 Buon mese di novembre!`\n"
             "`/programma 05/11/2025 18:00 Nuove offerte su BasilicataGo!`",
             parse_mode='Markdown'
@@ -277,15 +568,18 @@ async def programma(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         # Parse data e ora
         data_str = context.args[0]  # 30/10/2025
         ora_str = context.args[1]    # 15:30
-        messaggio = " ".join(context.args[2:])  # Resto del messaggio
+        gruppo, parole = estrai_gruppo(context.args[2:])
+        messaggio = " ".join(parole)  # Resto del messaggio
+        if not messaggio:
+            raise ValueError("Messaggio mancante")
         
         # Converti in datetime
-        timezone = pytz.timezone('Europe/Rome')
         giorno, mese, anno = map(int, data_str.split('/'))
         ore, minuti = map(int, ora_str.split(':'))
         
-        data_programmata = datetime(anno, mese, giorno, ore, minuti, tzinfo=timezone)
-        now = datetime.now(timezone)
+        # localize, non tzinfo=: con pytz il fuso passato al costruttore usa l'offset LMT (+0:50)
+        data_programmata = localizza(FUSO_ORARIO, datetime(anno, mese, giorno, ore, minuti))
+        now = orologio.ora(FUSO_ORARIO)
         
         # Verifica che sia nel futuro
         if data_programmata <= now:
@@ -301,42 +595,22 @@ async def programma(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         # Calcola attesa
         attesa = (data_programmata - now).total_seconds()
         
-        # Crea task per inviare il messaggio
-        async def invia_programmato():
-            try:
-                logger.info(f"⏳ Attesa di {attesa} secondi per messaggio programmato...")
-                await asyncio.sleep(attesa)
-                
-                logger.info(f"📤 Invio messaggio programmato: {messaggio[:50]}")
-                
-                keyboard = [[InlineKeyboardButton("🤖 Apri Bot BasilicataGo", url="https://t.me/basilicatagobot")]]
-                
-                await context.bot.send_message(
-                    chat_id=CHAT_ID_CANALE,
-                    text=messaggio,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='Markdown'
-                )
-                logger.info(f"✅ Messaggio programmato inviato con successo!")
-                
-            except asyncio.CancelledError:
-                logger.info(f"⏸️ Messaggio programmato cancellato")
-            except Exception as e:
-                logger.error(f"❌ Errore invio programmato: {e}")
-        
-        # Avvia task
-        task_id = f"msg_{int(datetime.now().timestamp())}"
-        messaggi_programmati[task_id] = {
-            'task': asyncio.create_task(invia_programmato()),
-            'data': data_programmata,
-            'messaggio': messaggio[:100]
-        }
+        # Aggiungi al pianificatore e all'archivio
+        async with lock_impostazioni:
+            task_id = base_id = f"msg_{int(orologio.adesso())}"
+            n = 2
+            while task_id in pianificatore:
+                task_id = f"{base_id}_{n}"
+                n += 1
+            pianifica_programmato(context, task_id, data_programmata, messaggio, gruppo=gruppo)
+            archivio.salva_programmato(task_id, data_programmata.timestamp(), messaggio, gruppo)
         
         await update.message.reply_text(
             f"✅ **Messaggio Programmato!**\n\n"
             f"📅 **Data:** {data_str}\n"
             f"🕐 **Ora:** {ora_str}\n"
-            f"📝 **Messaggio:** {messaggio[:100]}{'...' if len(messaggio) > 100 else ''}\n\n"
+            f"📝 **Messaggio:** {messaggio[:100]}{'...' if len(messaggio) > 100 else ''}\n"
+            f"📡 **Destinazioni:** `{gruppo or PREDEFINITO}`\n\n"
             f"🆔 **ID:** `{task_id}`\n"
             f"⏳ **Invio tra:** {int(attesa/3600)} ore e {int((attesa%3600)/60)} minuti\n\n"
             f"Usa `/lista_programmati` per vedere tutti i messaggi programmati\n"
@@ -347,8 +621,8 @@ async def programma(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         
     except ValueError as ve:
         await update.message.reply_text(
-            "❌ **Formato non valido!**\n\n"
-            "Usa: `/programma GG/MM/AAAA HH:MM <messaggio>`\n\n"
+            f"❌ **Formato non valido!** ({ve})\n\n"
+            "Usa: `/programma GG/MM/AAAA HH:MM [@gruppo] <messaggio>`\n\n"
             "Esempio: `/programma 30/10/2025 15:30 Il tuo messaggio qui`",
             parse_mode='Markdown'
         )
@@ -357,13 +631,213 @@ async def programma(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         logger.error(f"Errore programma: {e}")
 
 
+def chiave_programmato(task_id, data):
+    """Chiave di idempotenza di un messaggio programmato (id e orario originale)."""
+    quando = data.timestamp() if isinstance(data, datetime) else data
+    return f"programmato:{task_id}:{int(quando)}"
+
+
+def pianifica_programmato(context, task_id, data, messaggio, chiave=None, gruppo=None):
+    """Aggiunge un messaggio programmato al pianificatore.
+    
+    `chiave` va passata quando `data` non è l'orario originale (recupero dopo un fermo).
+    """
+    pianificatore.aggiungi(
+        data, invia_programmato, context, task_id, messaggio,
+        chiave or chiave_programmato(task_id, data), gruppo,
+        id=task_id,
+        tipo='programmato',
+        dati={'data': data, 'messaggio': messaggio[:100], 'gruppo': gruppo}
+    )
+
+
+async def invia_programmato(context, task_id: str, messaggio: str, chiave: str, gruppo=None) -> None:
+    """Invia al canale un messaggio programmato con /programma."""
+    try:
+        logger.info("📤 Invio messaggio programmato: %.50s", messaggio)
+        await invia_al_canale(
+            context, chiave, messaggio, catalogo.corrente().tastiere['apri_bot'], gruppo=gruppo
+        )
+    finally:
+        # Da qui in poi il post è nella posta in uscita
+        archivio.rimuovi_programmato(task_id)
+
+
+async def recupera_programmati(application, tolleranza=0) -> None:
+    """Ricarica dall'archivio i messaggi programmati e gestisce quelli scaduti durante il fermo.
+    
+    Quelli scaduti da meno di `tolleranza` secondi (il passaggio a un nuovo
+    leader) partono subito con la loro chiave originale.
+    """
+    adesso = orologio.adesso()
+    contesto = TempContext(application)
+    
+    righe = archivio.carica_programmati()
+    scaduti = []
+    
+    for task_id, quando, messaggio, gruppo in righe:
+        data = datetime.fromtimestamp(quando, FUSO_ORARIO)
+        if quando > adesso - tolleranza:
+            pianifica_programmato(contesto, task_id, data, messaggio, gruppo=gruppo)
+        elif RECUPERO_PROGRAMMATI == 'invia':
+            pianifica_programmato(
+                contesto, task_id, orologio.ora(FUSO_ORARIO), messaggio,
+                chiave_programmato(task_id, quando), gruppo
+            )
+            scaduti.append(task_id)
+        elif RECUPERO_PROGRAMMATI == 'salta':
+            archivio.rimuovi_programmato(task_id)
+            scaduti.append(task_id)
+        else:
+            programmati_persi[task_id] = (data, messaggio, gruppo)
+            scaduti.append(task_id)
+    
+    logger.info(f"💾 Messaggi programmati ricaricati: {len(righe)} ({len(scaduti)} scaduti, politica '{RECUPERO_PROGRAMMATI}')")
+    
+    if not programmati_persi or ADMIN_ID is None:
+        return
+    
+    for task_id, (data, messaggio, _) in programmati_persi.items():
+        keyboard = [[
+            InlineKeyboardButton("📤 Invia ora", callback_data=f"RECUPERO_INVIA:{task_id}"),
+            InlineKeyboardButton("🗑️ Scarta", callback_data=f"RECUPERO_SCARTA:{task_id}")
+        ]]
+        try:
+            await application.bot.send_message(
+                chat_id=ADMIN_ID,
+                text=(
+                    "⚠️ **Messaggio programmato non inviato**\n\n"
+                    f"Il bot era fermo il {data.strftime('%d/%m/%Y alle %H:%M')}.\n\n"
+                    f"🆔 `{task_id}`\n"
+                    f"📝 {messaggio[:100]}"
+                ),
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='Markdown'
+            )
+        except Exception as e:
+            logger.error(f"❌ Errore avviso recupero {task_id}: {e}")
+
+
+async def gestisci_recupero(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Gestisce la scelta dell'admin per un messaggio programmato scaduto durante il fermo."""
+    query = update.callback_query
+    
+    if ADMIN_ID is None or query.from_user.id != ADMIN_ID:
+        await query.answer("❌ Non hai i permessi.", show_alert=True)
+        return
+    if not await replica_leader(update):
+        return
+    
+    azione, task_id = query.data.split(':', 1)
+    perso = programmati_persi.pop(task_id, None)
+    
+    if perso is None:
+        await query.answer("ℹ️ Già gestito")
+        return
+    
+    await query.answer()
+    
+    if azione == 'RECUPERO_INVIA':
+        pianifica_programmato(
+            context, task_id, orologio.ora(FUSO_ORARIO), perso[1], chiave_programmato(task_id, perso[0]), perso[2]
+        )
+        esito = "📤 Invio in corso"
+    else:
+        archivio.rimuovi_programmato(task_id)
+        esito = "🗑️ Scartato"
+    
+    await query.edit_message_text(f"{esito}\n\n🆔 {task_id}\n📝 {perso[1][:100]}")
+
+
+async def avvisa_post(riga) -> None:
+    """Segnala all'admin un post incerto (con la scelta se reinviarlo) o fallito."""
+    if ADMIN_ID is None:
+        return
+    
+    if riga['stato'] == INCERTO:
+        titolo = (
+            "⚠️ Post dall'esito incerto\n\n"
+            "L'invio al canale si è interrotto e Telegram potrebbe averlo pubblicato. "
+            "Controlla il canale prima di reinviarlo."
+        )
+        keyboard = InlineKeyboardMarkup([[
+            InlineKeyboardButton("📤 Reinvia", callback_data=f"USCITA_INVIA:{riga['id']}"),
+            InlineKeyboardButton("✅ È già nel canale", callback_data=f"USCITA_SCARTA:{riga['id']}")
+        ]])
+    else:
+        titolo = (f"❌ Post non pubblicato dopo {riga['tentativi']} tentativi" if riga['tentativi']
+                  else "❌ Post non pubblicato")
+        keyboard = None
+    
+    # Senza Markdown: testo e chiave possono contenere caratteri speciali
+    await posta_uscita.bot.send_message(
+        chat_id=ADMIN_ID,
+        text=f"{titolo}\n\n🔑 {riga['chiave']}\n📝 {riga['testo'][:200]}\n💥 {riga['errore']}",
+        reply_markup=keyboard
+    )
+
+
+async def gestisci_uscita(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Gestisce la scelta dell'admin per un post dall'esito incerto."""
+    query = update.callback_query
+    
+    if ADMIN_ID is None or query.from_user.id != ADMIN_ID:
+        await query.answer("❌ Non hai i permessi.", show_alert=True)
+        return
+    if not await replica_leader(update):
+        return
+    
+    azione, id = query.data.split(':', 1)
+    riga = await asyncio.to_thread(archivio.leggi_uscita, int(id))
+    if riga is None or riga['stato'] != INCERTO:
+        await query.answer("ℹ️ Già gestito")
+        return
+    
+    await query.answer()
+    
+    if azione == 'USCITA_INVIA':
+        stato = await posta_uscita.conferma(riga['id'])
+        esito = esito_pubblicazione(stato, blocco_destinazione(riga['chat_id']))
+    else:
+        await posta_uscita.scarta(riga['id'])
+        esito = "🗑️ Non reinviato"
+    
+    await query.edit_message_text(f"{esito}\n\n🔑 {riga['chiave']}\n📝 {riga['testo'][:100]}")
+
+
+async def avvisa_salute(salute) -> None:
+    """Avvisa l'admin quando il bot perde o riacquista il permesso di pubblicare in una destinazione.
+    
+    Con più repliche lo fa solo il leader: è l'unico che può rimettere in
+    coda i post bloccati (i follower non hanno il pianificatore avviato) e
+    l'admin riceve un solo avviso.
+    """
+    if elezione is not None and not elezione.leader:
+        return
+    if salute.puo_pubblicare:
+        sbloccati = await posta_uscita.sblocca(salute.chat_id)
+        testo = f"✅ Il bot può di nuovo pubblicare in '{salute.nome}'."
+        if sbloccati:
+            testo += f"\n📮 {sbloccati} post in attesa verranno pubblicati ora."
+    else:
+        testo = (
+            f"🚫 Il bot non può più pubblicare in '{salute.nome}': {salute.motivo}.\n\n"
+            "I post verranno tenuti da parte finché i permessi non saranno ripristinati."
+        )
+    
+    if ADMIN_ID is not None:
+        await posta_uscita.bot.send_message(chat_id=ADMIN_ID, text=testo)
+
+
 async def lista_programmati(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """📋 Mostra tutti i messaggi programmati."""
     if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
         await update.message.reply_text("❌ Non hai i permessi per usare questo comando.")
         return
     
-    if not messaggi_programmati:
+    programmati = pianificatore.lavori(tipo='programmato')
+    
+    if not programmati:
         await update.message.reply_text(
             "📋 **Nessun messaggio programmato**\n\n"
             "Usa `/programma` per programmarne uno!",
@@ -371,29 +845,26 @@ async def lista_programmati(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return
     
-    timezone = pytz.timezone('Europe/Rome')
-    now = datetime.now(timezone)
+    now = orologio.ora(FUSO_ORARIO)
     
     testo = "📋 **Messaggi Programmati:**\n\n"
     
-    for task_id, info in messaggi_programmati.items():
-        task = info['task']
-        data = info['data']
-        messaggio = info['messaggio']
+    for lavoro in programmati:
+        data = lavoro.dati['data']
+        messaggio = lavoro.dati['messaggio']
+        gruppo = lavoro.dati.get('gruppo') or PREDEFINITO
         
         # Calcola tempo rimanente
-        if not task.done():
-            rimanente = (data - now).total_seconds()
-            ore_rimanenti = int(rimanente / 3600)
-            minuti_rimanenti = int((rimanente % 3600) / 60)
-            status = f"⏳ Tra {ore_rimanenti}h {minuti_rimanenti}m"
-        else:
-            status = "✅ Inviato"
+        rimanente = max(0, (data - now).total_seconds())
+        ore_rimanenti = int(rimanente / 3600)
+        minuti_rimanenti = int((rimanente % 3600) / 60)
+        status = f"⏳ Tra {ore_rimanenti}h {minuti_rimanenti}m"
         
         testo += (
-            f"**ID:** `{task_id}`\n"
+            f"**ID:** `{lavoro.id}`\n"
             f"📅 {data.strftime('%d/%m/%Y %H:%M')}\n"
             f"📝 {messaggio}...\n"
+            f"📡 {gruppo}\n"
             f"{status}\n\n"
         )
     
@@ -417,8 +888,13 @@ async def cancella_programmato(update: Update, context: ContextTypes.DEFAULT_TYP
         return
     
     task_id = context.args[0]
+    async with lock_impostazioni:
+        lavoro = pianificatore.get(task_id)
+        if lavoro is not None and lavoro.tipo == 'programmato':
+            pianificatore.cancella(task_id)
+            archivio.rimuovi_programmato(task_id)
     
-    if task_id not in messaggi_programmati:
+    if lavoro is None or lavoro.tipo != 'programmato':
         await update.message.reply_text(
             f"❌ **ID `{task_id}` non trovato**\n\n"
             "Usa `/lista_programmati` per vedere gli ID disponibili",
@@ -426,42 +902,29 @@ async def cancella_programmato(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         return
     
-    info = messaggi_programmati[task_id]
-    task = info['task']
-    
-    if not task.done():
-        task.cancel()
-        status_msg = "✅ Messaggio programmato cancellato!"
-    else:
-        status_msg = "ℹ️ Messaggio già inviato, rimosso dalla lista"
-    
-    del messaggi_programmati[task_id]
-    
     await update.message.reply_text(
-        f"{status_msg}\n\n"
+        f"✅ Messaggio programmato cancellato!\n\n"
         f"**ID:** `{task_id}`\n"
-        f"📝 {info['messaggio']}",
+        f"📝 {lavoro.dati['messaggio']}",
         parse_mode='Markdown'
     )
     logger.info(f"🗑️ Messaggio programmato {task_id} cancellato")
 
 
 async def imposta_orario(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """⏰ Imposta un nuovo orario per la pubblicazione automatica - SENZA JOB_QUEUE"""
-    global pubblicazione_task, orario_pubblicazione
-    
+    """⏰ Imposta l'orario della pubblicazione quotidiana (ricorrenza 'quotidiano')."""
     if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
         await update.message.reply_text("❌ Non hai i permessi per usare questo comando.")
         return
     
-    if not context.args or len(context.args) != 1:
+    if not context.args or len(context.args) > 2:
         await update.message.reply_text(
             "⏰ **Imposta Orario Pubblicazione**\n\n"
-            "**Sintassi:** `/imposta_orario HH:MM`\n\n"
+            "**Sintassi:** `/imposta_orario HH:MM [@gruppo]`\n\n"
             "**Esempi:**\n"
             "`/imposta_orario 09:00` - Ore 9:00\n"
             "`/imposta_orario 14:30` - Ore 14:30\n"
-            "`/imposta_orario 18:00` - Ore 18:00",
+            "`/imposta_orario 18:00 @tutti` - Ore 18:00 in tutte le destinazioni del gruppo",
             parse_mode='Markdown'
         )
         return
@@ -472,42 +935,31 @@ async def imposta_orario(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         
         if not (0 <= ore <= 23 and 0 <= minuti <= 59):
             raise ValueError("Orario non valido")
+        gruppo, _ = estrai_gruppo(context.args[1:])
         
-        # Aggiorna l'orario
-        orario_pubblicazione['ore'] = ore
-        orario_pubblicazione['minuti'] = minuti
-        
-        # Riavvia il task
-        if pubblicazione_task and not pubblicazione_task.done():
-            pubblicazione_task.cancel()
-            try:
-                await pubblicazione_task
-            except asyncio.CancelledError:
-                pass
-        
-        pubblicazione_task = asyncio.create_task(
-            loop_pubblicazione_quotidiana(context.application)
-        )
-        
-        timezone = pytz.timezone('Europe/Rome')
-        now = datetime.now(timezone)
-        prossimo_invio = now.replace(hour=ore, minute=minuti, second=0, microsecond=0)
-        
-        if prossimo_invio <= now:
-            prossimo_invio += timedelta(days=1)
+        # Aggiorna e ripianifica solo la ricorrenza quotidiana
+        async with lock_impostazioni:
+            attuale = ricorrenze.get(ID_QUOTIDIANO)
+            testo = attuale.testo if attuale else None
+            if gruppo is None and attuale:
+                gruppo = attuale.gruppo
+            espressione = f"{minuti} {ore} * * *"
+            ricorrenze.imposta(ID_QUOTIDIANO, espressione, testo, gruppo)
+            archivio.salva_ricorrenza(ID_QUOTIDIANO, espressione, testo, gruppo)
+            prossimo_invio = ricorrenze.prossima(ID_QUOTIDIANO)
         
         await update.message.reply_text(
             f"✅ **Orario aggiornato!**\n\n"
             f"📅 Pubblicazione quotidiana impostata alle **{ore:02d}:{minuti:02d}**\n"
-            f"🕐 Prossimo invio: **{prossimo_invio.strftime('%d/%m/%Y alle %H:%M')}**",
+            f"🕐 Prossimo invio: **{prossimo_invio.strftime('%d/%m/%Y alle %H:%M') if prossimo_invio else '-'}**",
             parse_mode='Markdown'
         )
         logger.info(f"✅ Orario pubblicazione aggiornato a {ore:02d}:{minuti:02d}")
         
-    except ValueError:
+    except ValueError as ve:
         await update.message.reply_text(
-            "❌ **Formato orario non valido!**\n\n"
-            "Usa il formato `HH:MM` (24 ore)\n"
+            f"❌ **Formato non valido!** ({ve})\n\n"
+            "Usa il formato `HH:MM` (24 ore), seguito dal gruppo facoltativo\n"
             "Esempio: `/imposta_orario 09:00`",
             parse_mode='Markdown'
         )
@@ -516,6 +968,155 @@ async def imposta_orario(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         logger.error(f"Errore imposta_orario: {e}")
 
 
+async def lista_ricorrenze(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """🔁 Mostra le pubblicazioni ricorrenti e la loro prossima scadenza."""
+    if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
+        await update.message.reply_text("❌ Non hai i permessi per usare questo comando.")
+        return
+    
+    if not len(ricorrenze):
+        await update.message.reply_text(
+            "🔁 **Nessuna pubblicazione ricorrente**\n\n"
+            "Usa `/ricorrenza` per aggiungerne una!",
+            parse_mode='Markdown'
+        )
+        return
+    
+    testo = "🔁 **Pubblicazioni Ricorrenti:**\n\n"
+    for ricorrenza in ricorrenze.ricorrenze():
+        prossima = ricorrenze.prossima(ricorrenza.id)
+        contenuto = ricorrenza.testo[:100] if ricorrenza.testo else "(messaggio quotidiano del catalogo)"
+        testo += (
+            f"**ID:** `{ricorrenza.id}`\n"
+            f"⏰ `{ricorrenza.cron.testo}`\n"
+            f"📅 Prossima: {prossima.strftime('%d/%m/%Y %H:%M') if prossima else '-'}\n"
+            f"📡 {ricorrenza.gruppo or PREDEFINITO}\n"
+            f"📝 {contenuto}\n\n"
+        )
+    testo += "\nUsa `/cancella_ricorrenza <id>` per cancellare"
+    
+    await update.message.reply_text(testo, parse_mode='Markdown')
+
+
+async def imposta_ricorrenza(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """🔁 Aggiunge o modifica una pubblicazione ricorrente senza toccare le altre."""
+    if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
+        await update.message.reply_text("❌ Non hai i permessi per usare questo comando.")
+        return
+    
+    if not context.args or len(context.args) < 6:
+        await update.message.reply_text(
+            "🔁 **Pubblicazione Ricorrente**\n\n"
+            "**Sintassi:**\n"
+            "`/ricorrenza <id> <min> <ore> <giorno> <mese> <giorno_sett> [@gruppo] [messaggio]`\n\n"
+            "Campi come in cron: `*`, `1-5`, `*/15`, `sab,dom`.\n"
+            "Senza messaggio viene pubblicato il messaggio quotidiano del catalogo; "
+            "senza gruppo si pubblica nelle destinazioni predefinite.\n\n"
+            "**Esempi:**\n"
+            "`/ricorrenza mattina 0 9 * * lun-ven Buongiorno dalla Basilicata! ☀️`\n"
+            "`/ricorrenza weekend 30 19 * * sab,dom @tutti Idee per il weekend 🏞️`",
+            parse_mode='Markdown'
+        )
+        return
+    
+    id = context.args[0]
+    espressione = " ".join(context.args[1:6])
+    
+    try:
+        gruppo, parole = estrai_gruppo(context.args[6:])
+        testo = " ".join(parole) or None
+        async with lock_impostazioni:
+            esisteva = id in ricorrenze
+            ricorrenze.imposta(id, espressione, testo, gruppo)
+            archivio.salva_ricorrenza(id, espressione, testo, gruppo)
+            prossima = ricorrenze.prossima(id)
+        
+        await update.message.reply_text(
+            f"✅ **Ricorrenza {'aggiornata' if esisteva else 'aggiunta'}!**\n\n"
+            f"🆔 `{id}`\n"
+            f"⏰ `{espressione}`\n"
+            f"📡 `{gruppo or PREDEFINITO}`\n"
+            f"📅 Prossima: **{prossima.strftime('%d/%m/%Y alle %H:%M') if prossima else '-'}**",
+            parse_mode='Markdown'
+        )
+        logger.info(f"🔁 Ricorrenza '{id}' impostata: {espressione}")
+        
+    except ValueError as e:
+        await update.message.reply_text(
+            f"❌ **Ricorrenza non valida:** {e}\n\n"
+            "Esempio: `/ricorrenza mattina 0 9 * * lun-ven`",
+            parse_mode='Markdown'
+        )
+    except Exception as e:
+        await update.message.reply_text(f"❌ Errore: {e}")
+        logger.error(f"Errore imposta_ricorrenza: {e}")
+
+
+async def cancella_ricorrenza(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """🗑️ Rimuove una pubblicazione ricorrente."""
+    if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
+        await update.message.reply_text("❌ Non hai i permessi per usare questo comando.")
+        return
+    
+    if not context.args:
+        await update.message.reply_text(
+            "🗑️ **Cancella Ricorrenza**\n\n"
+            "Sintassi: `/cancella_ricorrenza <id>`\n\n"
+            "Usa `/ricorrenze` per vedere gli ID",
+            parse_mode='Markdown'
+        )
+        return
+    
+    id = context.args[0]
+    async with lock_impostazioni:
+        rimossa = ricorrenze.rimuovi(id)
+        if rimossa:
+            archivio.rimuovi_ricorrenza(id)
+    
+    if rimossa is None:
+        await update.message.reply_text(f"❌ Ricorrenza `{id}` non trovata", parse_mode='Markdown')
+        return
+    
+    await update.message.reply_text(f"✅ Ricorrenza `{id}` cancellata!", parse_mode='Markdown')
+    logger.info(f"🗑️ Ricorrenza '{id}' cancellata")
+
+
+def descrivi_salute(salute):
+    """Riga di stato di una destinazione, dalla cache di SaluteCanale."""
+    if salute.aggiornato is None:
+        testo = "⏳ Non ancora verificato"
+    elif salute.puo_pubblicare:
+        username = salute.chat and salute.chat.username
+        testo = f"✅ Connesso: @{username}" if username else "✅ Connesso"
+    else:
+        testo = f"❌ {salute.motivo}"
+    if salute.aggiornato is not None:
+        testo += f" (verificato {orologio.adesso() - salute.aggiornato:.0f}s fa)"
+    if salute.ultimo_errore:
+        testo += f"\n⚠️ Ultima verifica non riuscita: {salute.ultimo_errore[:50]}"
+    return testo
+
+
+async def lista_destinazioni(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """📡 Mostra le destinazioni e i gruppi di pubblicazione."""
+    if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
+        await update.message.reply_text("❌ Non hai i permessi per usare questo comando.")
+        return
+    
+    # Senza Markdown: nomi e modelli possono contenere caratteri speciali
+    testo = "📡 DESTINAZIONI\n\n"
+    for destinazione in destinazioni.destinazioni.values():
+        salute = salute_canali[destinazione.chat_id]
+        testo += f"• {destinazione.nome} ({destinazione.chat_id}): {descrivi_salute(salute)}\n"
+        if destinazione.modello:
+            testo += f"  📝 {destinazione.modello[:80]}\n"
+    testo += "\n👥 GRUPPI\n\n"
+    for nome, membri in destinazioni.gruppi.items():
+        testo += f"• @{nome}: {', '.join(d.nome for d in membri)}\n"
+    
+    await update.message.reply_text(testo)
+
+
 async def stato_bot(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """📊 Mostra lo stato completo del bot e delle pubblicazioni."""
     if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
@@ -523,38 +1124,67 @@ async def stato_bot(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         return
     
     try:
-        timezone = pytz.timezone('Europe/Rome')
-        ora_attuale = datetime.now(timezone)
+        ora_attuale = orologio.ora(FUSO_ORARIO)
         
-        # Verifica connessione al canale
-        try:
-            chat_info = await context.bot.get_chat(CHAT_ID_CANALE)
-            canale_ok = f"✅ Connesso: @{chat_info.username or 'basilicataGo'}"
-        except Exception as e:
-            canale_ok = f"❌ Errore connessione: {str(e)[:50]}"
+        # Stato delle destinazioni dalla cache (nessuna chiamata a Telegram)
+        if len(salute_canali) == 1:
+            salute, = salute_canali.values()
+            canali = f"📢 **Canale:** {descrivi_salute(salute)}\n🆔 ID: `{salute.chat_id}`"
+        else:
+            canali = f"📡 **Destinazioni:** {len(salute_canali)}\n" + "\n".join(
+                f"• {salute.nome}: {descrivi_salute(salute)}" for salute in salute_canali.values()
+            )
         
-        # Calcola prossima pubblicazione
-        ore = orario_pubblicazione['ore']
-        minuti = orario_pubblicazione['minuti']
-        prossimo = ora_attuale.replace(hour=ore, minute=minuti, second=0, microsecond=0)
-        if prossimo <= ora_attuale:
-            prossimo += timedelta(days=1)
+        # Prossima pubblicazione ricorrente
+        pianificate = pianificatore.lavori(tipo=MotoreRicorrenze.TIPO)
+        prossimo = pianificate[0].dati['quando'].strftime('%d/%m/%Y %H:%M') if pianificate else '-'
         
-        task_status = "✅ Attivo" if pubblicazione_task and not pubblicazione_task.done() else "❌ Non attivo"
+        attivo = pianificatore_task and not pianificatore_task.done() and pianificate
+        task_status = "✅ Attivo" if attivo else "❌ Non attivo"
         
         # Conta messaggi programmati
-        programmati_attivi = sum(1 for info in messaggi_programmati.values() if not info['task'].done())
+        programmati_attivi = len(pianificatore.lavori(tipo='programmato'))
+        
+        # Coda invii
+        invii = limitatore.metriche()
+        
+        iscritti = await asyncio.to_thread(archivio.conta_iscritti)
+        pulizia = cestino.metriche()
+        modifiche = cache_modifiche.metriche()
+        posta = await asyncio.to_thread(archivio.conta_uscita)
+        processi = ""
+        if elezione is not None:
+            replica = "questa replica" if elezione.leader else (elezione.titolare or "nessuna")
+            processi += f"👑 **Leader:** {replica} (epoca {elezione.epoca})\n\n"
+        if smistatore is not None:
+            lavoratori = smistatore.metriche()
+            processi += (
+                f"🧩 **Lavoratori:** {lavoratori['collegati']}/{lavoratori['lavoratori']} collegati, "
+                f"{lavoratori['in_coda']} update in coda, {lavoratori['riavvii']} riavvii "
+                "(coda invii, pulizia e modifiche qui sotto sono del solo front)\n\n"
+            )
         
         stato = (
             "📊 **STATO BOT BASILICATAGO**\n\n"
             f"🕐 **Ora attuale:** {ora_attuale.strftime('%d/%m/%Y %H:%M:%S')}\n"
             f"🌐 **Timezone:** Europe/Rome\n\n"
-            f"📢 **Canale:** {canale_ok}\n"
-            f"🆔 ID: `{CHAT_ID_CANALE}`\n\n"
+            f"{canali}\n\n"
             f"⏰ **Pubblicazione automatica:** {task_status}\n"
-            f"🕐 Orario: {ore:02d}:{minuti:02d}\n"
-            f"📅 Prossimo: {prossimo.strftime('%d/%m/%Y %H:%M')}\n\n"
-            f"📨 **Messaggi programmati:** {programmati_attivi} attivi\n\n"
+            f"🔁 Ricorrenze: {len(ricorrenze)}\n"
+            f"📅 Prossima: {prossimo}\n\n"
+            f"📨 **Messaggi programmati:** {programmati_attivi} attivi\n"
+            f"👥 **Iscritti:** {iscritti}\n\n"
+            f"{processi}"
+            f"📤 **Coda invii:** {invii['in_coda']} in attesa\n"
+            f"⏱️ Attesa media: {invii['attesa_media_ms']:.0f} ms (max {invii['attesa_massima_ms']:.0f} ms)\n"
+            f"🚦 Flood wait: {invii['flood_wait']}\n\n"
+            f"📮 **Posta in uscita:** {posta.get('in_attesa', 0)} da ritentare, "
+            f"{posta.get('bloccato', 0)} bloccati, "
+            f"{posta.get('incerto', 0)} incerti, {posta.get('fallito', 0)} falliti\n\n"
+            f"🧹 **Messaggi cancellati:** {pulizia['messaggi']} "
+            f"con {pulizia['chiamate']} chiamate ({pulizia['risparmiate']} risparmiate)\n"
+            f"🪞 **Modifiche del menu:** {modifiche['evitate']} evitate, {modifiche['eseguite']} eseguite, "
+            f"{modifiche['espulse']} espulse dalla cache\n\n"
             f"👤 **Admin ID:** `{ADMIN_ID}`"
         )
         
@@ -565,6 +1195,122 @@ async def stato_bot(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         logger.error(f"Errore stato_bot: {e}")
 
 
+def barra(valore, massimo, larghezza=12):
+    return '▇' * round(larghezza * valore / massimo) if massimo else ''
+
+
+def percentuale(parte, totale):
+    return f"{100 * parte / totale:.0f}%" if totale else "-"
+
+
+def file_statistiche(lavoratore=None):
+    """File dei contatori di questo processo: ogni replica e ogni lavoratore ha il suo."""
+    if not STATISTICHE_PATH:
+        return None
+    percorso = STATISTICHE_PATH
+    if LEADER_ID:
+        percorso += f"-{LEADER_ID}"
+    if lavoratore is not None:
+        percorso += f"-lavoratore{lavoratore}"
+    return percorso
+
+
+async def vista_statistiche():
+    """Contatori di questo processo più quelli salvati da lavoratori e repliche: (Statistiche, file letti)."""
+    statistiche.aggrega()
+    vista = Statistiche(capienza=1, adesso=orologio.adesso)
+    vista.unisci(statistiche)
+    letti = 0
+    if STATISTICHE_PATH:
+        import glob  # Solo per /statistiche
+        for percorso in sorted(glob.glob(glob.escape(STATISTICHE_PATH) + '*')):
+            if percorso == statistiche_file or percorso.endswith('.tmp'):
+                continue
+            try:
+                vista.unisci(await asyncio.to_thread(Statistiche.leggi, percorso))
+                letti += 1
+            except ERRORI_FILE as e:
+                logger.warning(f"⚠️ Statistiche non lette da {percorso}: {e}")
+    return vista, letti
+
+
+def descrivi_imbuto(vista, passi):
+    """Una riga per passo, con la percentuale rispetto al passo precedente e al primo."""
+    righe = []
+    primo = precedente = 0
+    for k, (nome, volte) in enumerate(vista.imbuto(passi)):
+        if k == 0:
+            primo = volte
+            righe.append(f"{nome}: {volte}")
+        else:
+            righe.append(f"→ {nome}: {volte} ({percentuale(volte, precedente)} dal passo prima, "
+                         f"{percentuale(volte, primo)} dal primo)")
+        precedente = volte
+    return "\n".join(righe)
+
+
+async def mostra_statistiche(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """📊 Percorsi nel menu: più visitati, tap per ora, uscite e imbuti (dai soli contatori)."""
+    if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
+        await update.message.reply_text("❌ Non hai i permessi per usare questo comando.")
+        return
+    
+    try:
+        vista, letti = await vista_statistiche()
+        argomenti = context.args or []
+        
+        # Senza Markdown: i nomi dei pulsanti contengono trattini bassi
+        if len(argomenti) > 1:
+            testo = f"🔻 IMBUTO\n\n{descrivi_imbuto(vista, argomenti)}"
+        elif argomenti:
+            nome = argomenti[0]
+            nodo = vista.indice(nome)
+            if nodo is None:
+                await update.message.reply_text(f"❌ Nessun tap registrato per {nome}")
+                return
+            # Percentuali sulle visite: le sessioni ancora aperte non hanno ancora un passo successivo
+            visite = vista.totali[nodo]
+            testo = f"📊 {nome}\n\n👆 Visite: {visite}\n\n➡️ DOPO\n"
+            testo += "".join(f"• {altro}: {volte} ({percentuale(volte, visite)})\n"
+                             for altro, volte in vista.successivi(nome)[:10])
+            testo += "\n⬅️ PRIMA\n"
+            testo += "".join(f"• {altro}: {volte} ({percentuale(volte, visite)})\n"
+                             for altro, volte in vista.precedenti(nome)[:10])
+        else:
+            adesso = orologio.adesso()
+            ore = vista.per_ora(24, adesso)
+            massimo = max(tap for _, tap in ore)
+            testo = (
+                "📊 STATISTICHE DEL MENU\n\n"
+                f"👆 Ultime 24 ore: {sum(tap for _, tap in ore)} tap e comandi\n"
+                f"🧭 Sessioni: {vista.sessioni} in totale\n"
+            )
+            if vista.persi:
+                testo += f"⚠️ Tap non registrati (troppi tra due aggregazioni): {vista.persi}\n"
+            testo += "\n🏆 PIÙ VISITATI (24 ORE)\n"
+            testo += "".join(f"• {nome}: {visite}\n" for nome, visite in vista.piu_visitati(10, 24, adesso))
+            testo += "\n🕐 TAP PER ORA\n"
+            testo += "".join(
+                f"{datetime.fromtimestamp(ora * 3600, FUSO_ORARIO):%H}:00 {barra(tap, massimo)} {tap}\n"
+                for ora, tap in ore
+            )
+            testo += "\n🚪 USCITE DAL MENU\n"
+            testo += "".join(
+                f"• {nome}: {uscite} ({frazione:.0%} delle volte)\n"
+                for nome, uscite, frazione in vista.uscite(5)
+            )
+            testo += f"\n🔻 PERCORSO PIÙ FREQUENTE DA /start\n{descrivi_imbuto(vista, vista.percorso_frequente('/start'))}\n"
+            if letti:
+                testo += f"\n🧩 Compresi {letti} file di lavoratori e repliche (salvati ogni {STATISTICHE_SALVATAGGIO:.0f}s)\n"
+            testo += "\n/statistiche <pulsante> per i dettagli, /statistiche <pulsante> <pulsante>... per un imbuto"
+        
+        await update.message.reply_text(testo)
+        
+    except Exception as e:
+        await update.message.reply_text(f"❌ Errore nel calcolo delle statistiche: {e}")
+        logger.error(f"Errore statistiche: {e}")
+
+
 async def verifica_permessi(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """🔐 Verifica i permessi del bot nel canale."""
     if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
@@ -574,19 +1320,29 @@ async def verifica_permessi(update: Update, context: ContextTypes.DEFAULT_TYPE)
     try:
         await update.message.reply_text("🔍 Verifica permessi in corso...")
         
-        chat = await context.bot.get_chat(CHAT_ID_CANALE)
-        bot_member = await context.bot.get_chat_member(CHAT_ID_CANALE, context.bot.id)
+        # Verifica esplicita di tutte le destinazioni insieme: aggiorna anche
+        # la cache usata da invii e /stato_bot
+        await asyncio.gather(*(salute.aggiorna(context.bot) for salute in salute_canali.values()))
+        if len(salute_canali) == 1 and next(iter(salute_canali.values())).ultimo_errore:
+            raise RuntimeError(next(iter(salute_canali.values())).ultimo_errore)
         
-        permessi = []
-        if hasattr(bot_member, 'can_post_messages'):
-            permessi.append(f"📝 Pubblicare messaggi: {'✅' if bot_member.can_post_messages else '❌'}")
+        sezioni = []
+        for salute in salute_canali.values():
+            if salute.ultimo_errore:
+                sezioni.append(f"📢 **{salute.nome}:** ⚠️ verifica non riuscita ({salute.ultimo_errore[:50]})")
+                continue
+            chat = salute.chat
+            permessi = [f"📝 Pubblicare messaggi: {'✅' if salute.puo_pubblicare else '❌'}"]
+            if salute.motivo:
+                permessi.append(f"⚠️ {salute.motivo}")
+            sezioni.append(
+                f"📢 **{'Gruppo' if chat and chat.type in ('group', 'supergroup') else 'Canale'}:** "
+                f"@{(chat.username if chat else None) or salute.nome}\n"
+                f"👤 **Status:** {salute.stato_membro or '-'}\n\n"
+                f"**Permessi:**\n" + "\n".join(permessi)
+            )
         
-        stato_permessi = (
-            f"🔐 **PERMESSI BOT NEL CANALE**\n\n"
-            f"📢 **Canale:** @{chat.username or 'basilicataGo'}\n"
-            f"👤 **Status:** {bot_member.status}\n\n"
-            f"**Permessi:**\n" + "\n".join(permessi)
-        )
+        stato_permessi = "🔐 **PERMESSI BOT NEL CANALE**\n\n" + "\n\n".join(sezioni)
         
         await update.message.reply_text(stato_permessi, parse_mode='Markdown')
         
@@ -602,6 +1358,86 @@ async def verifica_permessi(update: Update, context: ContextTypes.DEFAULT_TYPE)
         logger.error(f"Errore verifica_permessi: {e}")
 
 
+def avvia_diffusione(bot, riga):
+    """Avvia (o riprende) un broadcast in background."""
+    global diffusione_task
+    from diffusione import Diffusione  # Serve solo durante un broadcast
+    diffusione = Diffusione(bot, archivio, riga, lavoratori=BROADCAST_LAVORATORI)
+    diffusione_task = asyncio.create_task(diffusione.esegui())
+    servizi_task.append(diffusione_task)
+    diffusione_task.add_done_callback(
+        lambda task: task in servizi_task and servizi_task.remove(task)
+    )
+    return diffusione
+
+
+async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """📣 Invia un messaggio a tutti gli iscritti del bot."""
+    if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
+        await update.message.reply_text("❌ Non hai i permessi per usare questo comando.")
+        return
+    if not await replica_leader(update):
+        return
+    
+    if not context.args:
+        await update.message.reply_text(
+            "📣 **Broadcast agli iscritti**\n\n"
+            "Sintassi: `/broadcast <messaggio>`\n\n"
+            "Gli utenti che hanno bloccato il bot vengono rimossi automaticamente.",
+            parse_mode='Markdown'
+        )
+        return
+    
+    if diffusione_task and not diffusione_task.done():
+        await update.message.reply_text("⏳ C'è già un broadcast in corso, attendi che finisca.")
+        return
+    
+    try:
+        testo = " ".join(context.args)
+        totale = await asyncio.to_thread(archivio.conta_iscritti)
+        stato = await update.message.reply_text(f"📣 Broadcast a {totale} iscritti in preparazione...")
+        
+        riga = {
+            'testo': testo,
+            'admin_chat': update.effective_chat.id,
+            'messaggio_id': stato.message_id,
+            'totale': totale,
+            'cursore': 0,
+            'inviati': 0,
+            'falliti': 0
+        }
+        riga['id'] = await asyncio.to_thread(
+            archivio.crea_broadcast, testo, riga['admin_chat'], riga['messaggio_id'], totale
+        )
+        avvia_diffusione(context.bot, riga)
+        logger.info(f"📣 Broadcast {riga['id']} avviato verso {totale} iscritti")
+        
+    except Exception as e:
+        await update.message.reply_text(f"❌ Errore: {e}")
+        logger.error(f"Errore broadcast: {e}")
+
+
+async def ricarica(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """🔄 Ricarica il catalogo dei contenuti senza riavviare il bot."""
+    if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
+        await update.message.reply_text("❌ Non hai i permessi per usare questo comando.")
+        return
+    
+    try:
+        # Due ricariche concorrenti non devono sovrascriversi in ordine sbagliato
+        async with lock_impostazioni:
+            nuovo = await catalogo.ricarica()
+        await update.message.reply_text(
+            f"✅ **Catalogo ricaricato!**\n\n"
+            f"📚 Schermate: {len(nuovo.schermate)}\n"
+            f"📝 Testi: {len(nuovo.testi)}",
+            parse_mode='Markdown'
+        )
+    except Exception as e:
+        await update.message.reply_text(f"❌ Catalogo non valido, resta attivo il precedente.\n\nErrore: {e}")
+        logger.error(f"Errore ricarica catalogo: {e}")
+
+
 async def help_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """📚 Mostra i comandi disponibili per l'admin."""
     if ADMIN_ID is None or update.effective_user.id != ADMIN_ID:
@@ -611,23 +1447,34 @@ async def help_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         "📚 **COMANDI ADMIN BASILICATAGO**\n\n"
         
         "**📢 Pubblicazione Manuale:**\n"
-        "`/pubblica <testo>` - Pubblica messaggio\n"
-        "`/pubblica_bot` - Pubblica con link bot\n"
-        "`/test_canale` - Test invio immediato\n\n"
+        "`/pubblica [@gruppo] <testo>` - Pubblica messaggio\n"
+        "`/pubblica_bot [@gruppo]` - Pubblica con link bot\n"
+        "`/test_canale [@gruppo]` - Test invio immediato\n"
+        "`/destinazioni` - Canali e gruppi configurati\n\n"
         
         "**📅 Messaggi Programmati:**\n"
-        "`/programma GG/MM/AAAA HH:MM <msg>` - Programma messaggio\n"
+        "`/programma GG/MM/AAAA HH:MM [@gruppo] <msg>` - Programma messaggio\n"
         "`/lista_programmati` - Mostra messaggi programmati\n"
         "`/cancella_programmato <id>` - Cancella messaggio\n\n"
         
         "**⏰ Gestione Automatica:**\n"
-        "`/imposta_orario HH:MM` - Cambia orario quotidiano\n"
+        "`/imposta_orario HH:MM [@gruppo]` - Cambia orario quotidiano\n"
+        "`/ricorrenza <id> <cron> [@gruppo] [msg]` - Aggiungi/modifica ricorrenza\n"
+        "`/ricorrenze` - Mostra pubblicazioni ricorrenti\n"
+        "`/cancella_ricorrenza <id>` - Cancella ricorrenza\n"
         "`/stato_bot` - Stato completo\n"
-        "`/verifica_permessi` - Controlla permessi\n\n"
+        "`/statistiche [pulsante...]` - Percorsi nel menu e imbuti\n"
+        "`/verifica_permessi` - Controlla permessi\n"
+        "`/ricarica` - Ricarica catalogo contenuti\n\n"
+        
+        "**📣 Iscritti:**\n"
+        "`/broadcast <testo>` - Invia a tutti gli iscritti\n\n"
         
         "**Esempi:**\n"
         "`/programma 01/11/2025 18:00 Evento speciale!`\n"
-        "`/imposta_orario 09:00`"
+        "`/imposta_orario 09:00`\n"
+        "`/ricorrenza weekend 30 19 * * sab,dom Idee per il weekend!`\n"
+        "`/pubblica @tutti Festa di San Rocco a Tolve!`"
     )
     
     await update.message.reply_text(help_text, parse_mode='Markdown')
@@ -635,21 +1482,20 @@ async def help_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
 
 async def handle_menu_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Gestisce il click sul pulsante 'Scopri la Basilicata'."""
-    menu_text = "🏛️ **Esplora la Basilicata**\n\nCosa ti interessa scoprire?"
+    schermata = catalogo.corrente().schermate['TORNA_MENU_PRINCIPALE']
     
-    await update.message.reply_text(
-        text=menu_text,
-        reply_markup=get_main_menu_keyboard(),
-        parse_mode='Markdown'
+    menu = await update.message.reply_text(
+        text=schermata.testo,
+        reply_markup=schermata.tastiera,
+        parse_mode=schermata.parse_mode
     )
+    # Un tap su "Menu principale" da questo messaggio non richiede una modifica
+    cache_modifiche.ricorda(menu.chat_id, menu.message_id, schermata.impronta)
 
 
 async def handle_other_messages(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Cancella automaticamente qualsiasi altro messaggio dell'utente."""
-    try:
-        await update.message.delete()
-    except Exception:
-        pass
+    """Cancella automaticamente qualsiasi altro messaggio dell'utente (a blocchi per chat)."""
+    cestino.aggiungi(context.bot, update.effective_chat.id, update.message.message_id)
 
 
 # --------------------------------------------------------------------------
@@ -657,385 +1503,277 @@ async def handle_other_messages(update: Update, context: ContextTypes.DEFAULT_TY
 # --------------------------------------------------------------------------
 
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Gestisce tutte le interazioni con i pulsanti inline."""
+    """Gestisce tutte le interazioni con i pulsanti inline tramite l'indice delle schermate."""
     query = update.callback_query
-    await query.answer()
-    
-    data = query.data
+    schermata = catalogo.corrente().schermate.get(query.data, catalogo.SCHERMATA_VUOTA)
+    azione = schermata.azione
 
-    if data == 'TORNA_MENU_PRINCIPALE':
-        await query.edit_message_text(
-            text="🏛️ **Esplora la Basilicata**\n\nCosa ti interessa scoprire?",
-            reply_markup=get_main_menu_keyboard(),
-            parse_mode='Markdown'
-        )
-        return
-
-    elif data == 'MENU_DOVE_DORMIRE':
-        pulsanti_dormire = [
-            [InlineKeyboardButton("🏡 Bio del Fico - Locazione Turistica", callback_data='LINK_BIODELFICO')],
-            [InlineKeyboardButton("🏨 Tutte le Strutture Ricettive", callback_data='LINK_STRUTTURE_BASILICATAGO')],
-            [InlineKeyboardButton("⬅️ Menu Principale", callback_data='TORNA_MENU_PRINCIPALE')]
-        ]
-        
-        await query.edit_message_text(
-            text=(
-                "**🏖️ DOVE DORMIRE IN BASILICATA**\n\n"
-                "Scopri le migliori strutture ricettive della regione:\n"
-                "🏡 Agriturismi e case vacanza\n"
-                "🏨 Hotel e B&B\n"
-                "🏛️ Dimore storiche e masserie"
-            ),
-            reply_markup=InlineKeyboardMarkup(pulsanti_dormire),
-            parse_mode='Markdown'
-        )
-
-    elif data == 'LINK_BIODELFICO':
-        await query.answer("Apertura in corso...", show_alert=False)
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
-            text=(
-                "🏡 **Bio del Fico - Locazione Turistica**\n\n"
-                "Vivi un'esperienza autentica nella natura lucana!\n\n"
-                "🌿 Immerso nel verde della Basilicata\n"
-                "🏖️ A pochi km dalle spiagge più belle\n"
-                "🍇 Prodotti biologici a km zero\n\n"
-                "🔗 **Prenota ora:** https://biodelfico.com"
-            ),
-            parse_mode='Markdown'
+    if azione == 'edit':
+        await query.answer()
+        await cache_modifiche.modifica(
+            query, schermata.testo, schermata.tastiera, schermata.parse_mode, schermata.impronta
         )
-
-    elif data == 'LINK_STRUTTURE_BASILICATAGO':
-        await query.answer("Apertura in corso...", show_alert=False)
+    elif azione == 'send':
+        await query.answer(schermata.avviso, show_alert=False)
         await context.bot.send_message(
             chat_id=query.message.chat_id,
-            text=(
-                "🏨 **Strutture Ricettive Basilicata**\n\n"
-                "Trova l'alloggio perfetto su BasilicataGo:\n\n"
-                "✅ Hotel, B&B, Agriturismi\n"
-                "✅ Case vacanza e appartamenti\n"
-                "✅ Recensioni verificate\n"
-                "✅ Prenotazione diretta\n\n"
-                "🔗 **Scopri tutte le strutture:** https://basilicatago.com"
-            ),
-            parse_mode='Markdown'
-        )
-
-    elif data == 'MENU_COSA_VEDERE':
-        pulsanti_vedere = [
-            [InlineKeyboardButton("🏛️ Matera e i Sassi", callback_data='DESTINAZIONE_MATERA')],
-            [InlineKeyboardButton("🏖️ Maratea e le Spiagge", callback_data='DESTINAZIONE_MARATEA')],
-            [InlineKeyboardButton("🏰 Borghi e Castelli", callback_data='DESTINAZIONE_BORGHI')],
-            [InlineKeyboardButton("🌄 Parchi Naturali", callback_data='DESTINAZIONE_PARCHI')],
-            [InlineKeyboardButton("⬅️ Menu Principale", callback_data='TORNA_MENU_PRINCIPALE')]
-        ]
-        
-        await query.edit_message_text(
-            text="**🗺️ COSA VEDERE IN BASILICATA**\n\nScegli una destinazione:",
-            reply_markup=InlineKeyboardMarkup(pulsanti_vedere),
-            parse_mode='Markdown'
-        )
-
-    elif data == 'DESTINAZIONE_MATERA':
-        pulsanti_matera = [
-            [InlineKeyboardButton("📋 Maggiori Info", callback_data='INFO_MATERA')],
-            [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_COSA_VEDERE')]
-        ]
-        await query.edit_message_text(
-            text=(
-                "**🏛️ MATERA - CITTÀ DEI SASSI**\n\n"
-                "Patrimonio UNESCO dal 1993\n\n"
-                "✨ I Sassi Barisano e Caveoso\n"
-                "⛪ Chiese rupestri\n"
-                "🏺 Casa Grotta e Cisterna del Palombaro\n"
-                "🎬 Location di film internazionali\n\n"
-                "📍 Capitale Europea della Cultura 2019"
-            ),
-            reply_markup=InlineKeyboardMarkup(pulsanti_matera),
-            parse_mode='Markdown'
-        )
-
-    elif data == 'INFO_MATERA':
-        await query.answer("Apertura in corso...", show_alert=False)
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
-            text=(
-                "📋 **Informazioni su Matera**\n\n"
-                "🔗 Scopri tutti i dettagli, servizi e strutture su:\n"
-                "https://basilicatago.com"
-            ),
-            parse_mode='Markdown'
-        )
-
-    elif data == 'DESTINAZIONE_MARATEA':
-        pulsanti_maratea = [
-            [InlineKeyboardButton("🏖️ Spiagge", callback_data='INFO_SPIAGGE')],
-            [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_COSA_VEDERE')]
-        ]
-        await query.edit_message_text(
-            text=(
-                "**🏖️ MARATEA - PERLA DEL TIRRENO**\n\n"
-                "32 km di costa mozzafiato\n\n"
-                "🏝️ Spiagge e calette nascoste\n"
-                "⛰️ Cristo Redentore (21 metri)\n"
-                "🏛️ Centro storico medievale\n"
-                "🌊 Mare cristallino\n\n"
-                "📍 Unica località lucana sul Mar Tirreno"
-            ),
-            reply_markup=InlineKeyboardMarkup(pulsanti_maratea),
-            parse_mode='Markdown'
-        )
-
-    elif data == 'INFO_SPIAGGE':
-        await query.answer("Apertura in corso...", show_alert=False)
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
-            text=(
-                "🏖️ **Le Spiagge della Basilicata**\n\n"
-                "Scopri tutte le spiagge, lidi e servizi su:\n"
-                "https://basilicatago.com"
-            ),
-            parse_mode='Markdown'
+            text=schermata.testo,
+            reply_markup=schermata.tastiera,
+            parse_mode=schermata.parse_mode
         )
+    else:
+        await query.answer(schermata.testo or None)
 
-    elif data == 'DESTINAZIONE_BORGHI':
-        await query.edit_message_text(
-            text=(
-                "**🏰 BORGHI E CASTELLI**\n\n"
-                "📍 **Castelmezzano** e **Pietrapertosa** - Volo dell'Angelo\n"
-                "📍 **Craco** - Città fantasma\n"
-                "📍 **Venosa** - Città di Orazio\n"
-                "📍 **Tricarico** - Borgo arabo-normanno\n"
-                "📍 **Muro Lucano** - Borgo Presepe\n\n"
-                "🔗 Scopri tutti i borghi su https://basilicatago.com"
-            ),
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_COSA_VEDERE')]
-            ]),
-            parse_mode='Markdown'
-        )
 
-    elif data == 'DESTINAZIONE_PARCHI':
-        await query.edit_message_text(
-            text=(
-                "**🌄 PARCHI NATURALI**\n\n"
-                "🌲 **Parco del Pollino** - Il più grande d'Italia\n"
-                "🏔️ **Parco della Val d'Agri**\n"
-                "🌊 **Riserva dei Calanchi di Montalbano Jonico**\n"
-                "🦅 **Parco di Gallipoli Cognato**\n"
-                "🌋 **Laghi di Monticchio** (laghi vulcanici)\n\n"
-                "🔗 Itinerari e info: https://basilicatago.com"
-            ),
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_COSA_VEDERE')]
-            ]),
-            parse_mode='Markdown'
-        )
+async def cerca_inline(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """🔎 Modalità inline (@basilicatagobot vino): risultati già pronti dall'indice del catalogo."""
+    query = update.inline_query
+    await query.answer(catalogo.ricerca().cerca(query.query), cache_time=RICERCA_CACHE)
 
-    elif data == 'MENU_PRODOTTI_LUCANI':
-        pulsanti_prodotti = [
-            [InlineKeyboardButton("🧀 Formaggi DOP", callback_data='PRODOTTI_FORMAGGI')],
-            [InlineKeyboardButton("🥓 Salumi e Lucanica", callback_data='PRODOTTI_SALUMI')],
-            [InlineKeyboardButton("🍷 Vini e Aglianico", callback_data='PRODOTTI_VINI')],
-            [InlineKeyboardButton("🌶️ Peperoni Cruschi IGP", callback_data='PRODOTTI_CRUSCHI')],
-            [InlineKeyboardButton("🛒 Acquista su BasilicataGo", callback_data='LINK_PRODOTTI_BASILICATAGO')],
-            [InlineKeyboardButton("⬅️ Menu Principale", callback_data='TORNA_MENU_PRINCIPALE')]
-        ]
-        
-        await query.edit_message_text(
-            text=(
-                "**🍷 PRODOTTI TIPICI LUCANI**\n\n"
-                "Scopri le eccellenze enogastronomiche della Basilicata:\n"
-                "Prodotti DOP, IGP e tradizioni centenarie"
-            ),
-            reply_markup=InlineKeyboardMarkup(pulsanti_prodotti),
-            parse_mode='Markdown'
-        )
 
-    elif data == 'PRODOTTI_FORMAGGI':
-        await query.edit_message_text(
-            text=(
-                "**🧀 FORMAGGI LUCANI DOP**\n\n"
-                "🧀 **Caciocavallo Silano DOP**\n"
-                "🧀 **Canestrato di Moliterno IGP**\n"
-                "🧀 **Pecorino di Filiano DOP**\n"
-                "🧀 **Ricotta forte lucana**\n\n"
-                "Formaggi prodotti con latte di pascoli montani e tecniche tradizionali.\n\n"
-                "🛒 Acquista su https://basilicatago.com"
-            ),
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_PRODOTTI_LUCANI')]
-            ]),
-            parse_mode='Markdown'
-        )
+# --------------------------------------------------------------------------
+# MAIN
+# --------------------------------------------------------------------------
 
-    elif data == 'PRODOTTI_SALUMI':
-        await query.edit_message_text(
-            text=(
-                "**🥓 SALUMI E LUCANICA**\n\n"
-                "🥓 **Lucanica di Picerno IGP**\n"
-                "🥓 **Soppressata lucana**\n"
-                "🥓 **Salsiccia al Peperone Crusco**\n"
-                "🥓 **Pezzenta** (salame povero)\n\n"
-                "Salumi artigianali con carne di maiali allevati allo stato brado.\n\n"
-                "🛒 Ordina su https://basilicatago.com"
-            ),
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_PRODOTTI_LUCANI')]
-            ]),
-            parse_mode='Markdown'
-        )
+async def all_avvio(application) -> None:
+    """Avvia i servizi in background: pianificatore, catalogo, archivio e recupero programmati.
+    
+    Qui si fa solo il lavoro locale; le chiamate a Telegram (verifica delle
+    destinazioni, post in sospeso, avvisi all'admin) continuano in
+    riprendi_lavori senza ritardare il primo update.
+    """
+    global pianificatore_task, server_metriche
+    
+    # ✅ AVVIA PUBBLICAZIONE AUTOMATICA (SENZA JOB_QUEUE); con più repliche solo sul leader
+    if elezione is None:
+        pianificatore_task = asyncio.create_task(pianificatore.esegui())
+        servizi_task.append(pianificatore_task)
+    servizi_task.extend([
+        asyncio.create_task(catalogo.sorveglia_catalogo(CATALOGO_INTERVALLO)),
+        asyncio.create_task(archivio.scrittore()),
+        asyncio.create_task(ritardo_loop.sorveglia()),
+        asyncio.create_task(statistiche.sorveglia(statistiche_file, salvataggio=STATISTICHE_SALVATAGGIO))
+    ])
+    if METRICHE_PORTA:
+        server_metriche = metriche.crea_server(METRICHE_HOST, METRICHE_PORTA)
+        await server_metriche.avvia()
+    if smistatore is not None:
+        await smistatore.avvia()
+    posta_uscita.avviso = avvisa_post
+    posta_uscita.bot = application.bot
+    for salute in salute_canali.values():
+        salute.avviso = avvisa_salute
+    ricorrenze.avvia(TempContext(application))
+    servizi_task.append(asyncio.create_task(riprendi_lavori(application)))
+    
+    logger.info("✅ Sistema di pubblicazione automatica avviato")
+    for ricorrenza in ricorrenze.ricorrenze():
+        prossima = ricorrenze.prossima(ricorrenza.id)
+        logger.info(f"📅 Ricorrenza '{ricorrenza.id}' ({ricorrenza.cron.testo}): prossima {prossima:%d/%m/%Y %H:%M}")
+    logger.info("🆕 Sistema messaggi programmati attivo")
 
-    elif data == 'PRODOTTI_VINI':
-        await query.edit_message_text(
-            text=(
-                "**🍷 VINI LUCANI**\n\n"
-                "🍷 **Aglianico del Vulture DOC**\n"
-                "🍷 **Matera DOC**\n"
-                "🍷 **Grottino di Roccanova DOC**\n"
-                "🥂 **Malvasia e Moscato**\n\n"
-                "Vini pregiati da terreni vulcanici e colline soleggiate.\n\n"
-                "🛒 Enoteca su https://basilicatago.com"
-            ),
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_PRODOTTI_LUCANI')]
-            ]),
-            parse_mode='Markdown'
-        )
 
-    elif data == 'PRODOTTI_CRUSCHI':
-        await query.edit_message_text(
-            text=(
-                "**🌶️ PEPERONI CRUSCHI IGP**\n\n"
-                "Il simbolo della cucina lucana!\n\n"
-                "✨ Peperoni di Senise essiccati al sole\n"
-                "🔥 Fritti fino a diventare croccanti\n"
-                "🍝 Perfetti con pasta e piatti tipici\n"
-                "🏅 Presidio Slow Food\n\n"
-                "🛒 Acquista su https://basilicatago.com"
-            ),
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("⬅️ Indietro", callback_data='MENU_PRODOTTI_LUCANI')]
-            ]),
-            parse_mode='Markdown'
+async def riprendi_lavori(application) -> None:
+    """Verifica le destinazioni, poi riprende le pubblicazioni (con più repliche, se diventa leader)."""
+    try:
+        # Primo controllo delle destinazioni prima di riprendere i post in sospeso
+        await asyncio.gather(*(salute.aggiorna(application.bot) for salute in salute_canali.values()))
+        servizi_task.extend(
+            asyncio.create_task(salute.sorveglia(application.bot)) for salute in salute_canali.values()
         )
+        if elezione is None:
+            await riprendi_pubblicazioni(application)
+            return
+        elezione.promosso = functools.partial(diventa_leader, application)
+        elezione.destituito = lascia_leader
+        servizi_task.extend([
+            asyncio.create_task(elezione.esegui()),
+            asyncio.create_task(allinea_pianificazione(TempContext(application)))
+        ])
+    except Exception as e:
+        logger.error(f"❌ Errore nella ripresa dei lavori all'avvio: {e}", exc_info=True)
 
-    elif data == 'LINK_PRODOTTI_BASILICATAGO':
-        await query.answer("Apertura in corso...", show_alert=False)
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
-            text=(
-                "🛒 **Shop Prodotti Lucani**\n\n"
-                "Acquista online le eccellenze della Basilicata:\n\n"
-                "✅ Spedizione in tutta Italia\n"
-                "✅ Produttori selezionati\n"
-                "✅ Qualità certificata DOP/IGP\n\n"
-                "🔗 **Acquista ora:** https://basilicatago.com"
-            ),
-            parse_mode='Markdown'
-        )
 
-    elif data == 'MENU_SERVIZI_BASILICATAGO':
-        pulsanti_servizi = [
-            [InlineKeyboardButton("🏠 Strutture Ricettive", callback_data='SERVIZIO_STRUTTURE')],
-            [InlineKeyboardButton("📢 Annunci", callback_data='SERVIZIO_ANNUNCI')],
-            [InlineKeyboardButton("🛒 Shop Prodotti", callback_data='SERVIZIO_SHOP')],
-            [InlineKeyboardButton("🌐 Vai al Portale", callback_data='LINK_PORTALE_BASILICATAGO')],
-            [InlineKeyboardButton("⬅️ Menu Principale", callback_data='TORNA_MENU_PRINCIPALE')]
-        ]
+async def riprendi_pubblicazioni(application, tolleranza=0) -> None:
+    """Riprende post in sospeso, programmati e broadcast interrotti."""
+    try:
+        await posta_uscita.avvia(application.bot)
+        await recupera_programmati(application, tolleranza)
         
-        await query.edit_message_text(
-            text=(
-                "**📋 SERVIZI BASILICATAGO.COM**\n\n"
-                "Il portale completo per turismo e servizi in Basilicata:\n\n"
-                "🏨 Prenota strutture ricettive\n"
-                "📢 Consulta annunci locali\n"
-                "🛒 Acquista prodotti tipici\n"
-                "🗺️ Scopri itinerari turistici"
-            ),
-            reply_markup=InlineKeyboardMarkup(pulsanti_servizi),
-            parse_mode='Markdown'
-        )
-
-    elif data == 'SERVIZIO_STRUTTURE':
-        await query.answer("Apertura in corso...", show_alert=False)
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
-            text=(
-                "🏨 **Strutture Ricettive**\n\n"
-                "Database completo con:\n"
-                "✅ Hotel, B&B, Agriturismi\n"
-                "✅ Case vacanza\n"
-                "✅ Masserie e dimore storiche\n"
-                "✅ Recensioni e contatti diretti\n\n"
-                "🔗 https://basilicatago.com"
-            ),
-            parse_mode='Markdown'
-        )
-
-    elif data == 'SERVIZIO_ANNUNCI':
-        await query.answer("Apertura in corso...", show_alert=False)
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
-            text=(
-                "📢 **Annunci Basilicata**\n\n"
-                "Trova e pubblica:\n"
-                "🏠 Immobili\n"
-                "🚗 Veicoli\n"
-                "💼 Servizi locali\n"
-                "🎯 Eventi e iniziative\n\n"
-                "🔗 https://basilicatago.com"
-            ),
-            parse_mode='Markdown'
-        )
-
-    elif data == 'SERVIZIO_SHOP':
-        await query.answer("Apertura in corso...", show_alert=False)
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
-            text=(
-                "🛒 **Shop Prodotti Lucani**\n\n"
-                "Acquista online:\n"
-                "🧀 Formaggi DOP/IGP\n"
-                "🥓 Salumi artigianali\n"
-                "🍷 Vini pregiati\n"
-                "🌶️ Peperoni Cruschi\n\n"
-                "Spedizione in tutta Italia!\n\n"
-                "🔗 https://basilicatago.com"
-            ),
-            parse_mode='Markdown'
-        )
-
-    elif data == 'LINK_PORTALE_BASILICATAGO':
-        await query.answer("Apertura in corso...", show_alert=False)
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
-            text=(
-                "🌐 **BasilicataGo - Portale Turistico**\n\n"
-                "Il riferimento per scoprire e vivere la Basilicata:\n\n"
-                "🏛️ Destinazioni e attrazioni\n"
-                "🏨 Prenotazioni strutture\n"
-                "🛒 Shop prodotti locali\n"
-                "📢 Annunci e servizi\n"
-                "📰 News e eventi\n\n"
-                "🔗 **Visita ora:** https://basilicatago.com"
-            ),
-            parse_mode='Markdown'
-        )
+        # 📣 Riprendi un broadcast interrotto
+        in_corso = archivio.broadcast_in_corso()
+        if in_corso:
+            logger.info(f"📣 Ripresa broadcast {in_corso['id']} dal cursore {in_corso['cursore']}")
+            avvia_diffusione(application.bot, in_corso)
+    except Exception as e:
+        logger.error(f"❌ Errore nella ripresa delle pubblicazioni: {e}", exc_info=True)
+
+
+def riallinea_ricorrenze():
+    """Porta le ricorrenze in memoria allo stato dell'archivio."""
+    salvate = {id: (espressione, testo, gruppo) for id, espressione, testo, gruppo in archivio.carica_ricorrenze()}
+    for ricorrenza in ricorrenze.ricorrenze():
+        if ricorrenza.id not in salvate:
+            ricorrenze.rimuovi(ricorrenza.id)
+    for id, (espressione, testo, gruppo) in salvate.items():
+        attuale = ricorrenze.get(id)
+        if attuale and (attuale.cron.testo, attuale.testo, attuale.gruppo) == (espressione, testo, gruppo):
+            continue
+        try:
+            ricorrenze.imposta(id, espressione, testo, gruppo)
+        except ValueError as e:
+            logger.error(f"❌ Ricorrenza '{id}' non valida ({espressione}): {e}")
+
+
+def riallinea_programmati(contesto):
+    """Pianifica i programmati futuri aggiunti nell'archivio e toglie quelli cancellati."""
+    adesso = orologio.adesso()
+    salvati = {riga[0]: riga[1:] for riga in archivio.carica_programmati()}
+    for lavoro in pianificatore.lavori(tipo='programmato'):
+        if lavoro.id not in salvati:
+            pianificatore.cancella(lavoro.id)
+    for task_id, (quando, messaggio, gruppo) in salvati.items():
+        # Quelli già scaduti sono in invio o in attesa di una decisione dell'admin
+        if task_id not in pianificatore and quando > adesso:
+            data = datetime.fromtimestamp(quando, FUSO_ORARIO)
+            pianifica_programmato(contesto, task_id, data, messaggio, gruppo=gruppo)
+
+
+async def diventa_leader(application) -> None:
+    """👑 Lease preso: riallinea la pianificazione all'archivio e avvia le pubblicazioni.
+    
+    Le scadenze degli ultimi LEADER_LEASE secondi vengono ripianificate:
+    quelle già pubblicate dal leader precedente hanno la stessa chiave nella
+    posta in uscita e non partono una seconda volta.
+    """
+    global pianificatore_task
+    contesto = TempContext(application)
+    async with lock_impostazioni:
+        # Anche le modifiche fatte da questa replica quando era follower devono essere nell'archivio
+        await archivio.scrivi_coda()
+        riallinea_ricorrenze()
+        ricorrenze.avvia(contesto, orologio.adesso() - LEADER_LEASE)
+        for lavoro in pianificatore.lavori(tipo='programmato'):
+            pianificatore.cancella(lavoro.id)
+        programmati_persi.clear()
+    pianificatore_task = asyncio.create_task(pianificatore.esegui())
+    lavori_leader.extend([
+        pianificatore_task,
+        asyncio.create_task(riprendi_pubblicazioni(application, tolleranza=LEADER_LEASE))
+    ])
+    servizi_task.extend(lavori_leader)
+
+
+async def lascia_leader() -> None:
+    """👑 Lease perso: ferma subito pianificatore e broadcast, che riprende la nuova replica leader."""
+    lavori = lavori_leader + ([diffusione_task] if diffusione_task else [])
+    lavori_leader.clear()
+    for task in lavori:
+        task.cancel()
+    await asyncio.gather(*lavori, return_exceptions=True)
+    for task in lavori:
+        if task in servizi_task:
+            servizi_task.remove(task)
 
 
-# --------------------------------------------------------------------------
-# MAIN
-# --------------------------------------------------------------------------
-
-def main() -> None:
-    """Avvia il bot con pubblicazioni automatiche."""
-    global pubblicazione_task
+async def allinea_pianificazione(contesto) -> None:
+    """👑 Con più repliche: rilegge programmati e ricorrenze, che l'admin può cambiare da qualsiasi replica.
+    
+    Sui follower, dove il pianificatore è fermo, tiene aggiornate anche le
+    prossime scadenze mostrate da /stato_bot, /ricorrenze e /lista_programmati.
+    Sul leader riprende anche i post in attesa senza un tentativo pianificato.
+    """
+    while True:
+        async with lock_impostazioni:
+            # Prima su disco le modifiche fatte qui, poi si rilegge
+            await archivio.scrivi_coda()
+            riallinea_ricorrenze()
+            riallinea_programmati(contesto)
+            if not elezione.leader:
+                ricorrenze.avvia(contesto)
+        if elezione.leader:
+            # Post rimessi in attesa altrove (es. sbloccati da questa replica quando era follower)
+            try:
+                await posta_uscita.riallinea()
+            except Exception as e:
+                logger.error(f"❌ Errore riallineamento posta in uscita: {e}")
+        await asyncio.sleep(elezione.intervallo)
+
+
+def etichetta_pulsante(update):
+    """callback_data del pulsante (solo valori del catalogo, per limitare le serie)."""
+    data = update.callback_query.data
+    return data if data in catalogo.corrente().schermate else 'sconosciuto'
+
+
+def strumenta_handler(application):
+    """Avvolge i callback di tutti gli handler registrati con le metriche."""
+    for gruppo in application.handlers.values():
+        for handler in gruppo:
+            # 📊 Comandi e pulsanti del menu finiscono anche nelle statistiche dei percorsi
+            traccia = statistiche.registra
+            if isinstance(handler, CommandHandler):
+                etichetta = '/' + min(handler.commands)
+            elif handler.callback is button_handler:
+                etichetta = etichetta_pulsante
+            else:
+                etichetta = handler.callback.__name__
+                traccia = None
+            handler.callback = metriche.strumenta(handler.callback, etichetta, traccia)
+
+
+async def al_fermo(application) -> None:
+    """Cancella i messaggi in attesa e conclude i post in invio finché il bot può chiamare Telegram."""
+    await cestino.svuota()
+    await posta_uscita.attendi_invii(USCITA_ATTESA_CHIUSURA)
+    if smistatore is not None:
+        await smistatore.svuota(USCITA_ATTESA_CHIUSURA)
+
+
+async def alla_chiusura(application) -> None:
+    """Ferma il pianificatore e gli altri servizi in background."""
+    for task in servizi_task:
+        task.cancel()
+    await asyncio.gather(*servizi_task, return_exceptions=True)
+    servizi_task.clear()
+    if server_metriche is not None:
+        await server_metriche.ferma()
+    if smistatore is not None:
+        await smistatore.ferma()
+    if elezione is not None:
+        await elezione.rilascia()
+
+
+def crea_applicazione(base_url=None, richiesta=None):
+    """Costruisce l'Application e registra tutti gli handler.
     
-    application = Application.builder().token(TOKEN).build()
+    `base_url` e `richiesta` (un BaseRequest di PTB) servono a benchmark e
+    prove per sostituire la Bot API di Telegram.
+    """
+    global richiesta_polling
+    # Un solo contesto TLS per le due connessioni: caricare i certificati costa decine di ms
+    opzioni_http = {'verify': httpx.create_ssl_context()}
+    # Come quella predefinita di PTB per getUpdates (una connessione), ma da aprire in anticipo
+    richiesta_polling = HTTPXRequest(connection_pool_size=1, httpx_kwargs=opzioni_http)
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .get_updates_request(richiesta_polling)
+        .rate_limiter(limitatore)
+        # Sopra WEBHOOK_MAX_CODA update in volo il webhook risponde 503 prima che PTB li metta in attesa
+        .concurrent_updates(ProcessoreUpdate(lavoratori=MAX_LAVORATORI, max_in_volo=WEBHOOK_MAX_CODA))
+        .post_init(all_avvio)
+        .post_stop(al_fermo)
+        .post_shutdown(alla_chiusura)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    builder = builder.request(richiesta or HTTPXRequest(httpx_kwargs=opzioni_http))
+    application = builder.build()
     
     # Registra i comandi
     application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("stop", stop))
     application.add_handler(CommandHandler("pubblica", pubblica))
     application.add_handler(CommandHandler("pubblica_bot", pubblica_bot))
     application.add_handler(CommandHandler("test_canale", test_canale))
@@ -1043,13 +1781,25 @@ def main() -> None:
     application.add_handler(CommandHandler("lista_programmati", lista_programmati))  # 🆕
     application.add_handler(CommandHandler("cancella_programmato", cancella_programmato))  # 🆕
     application.add_handler(CommandHandler("imposta_orario", imposta_orario))
+    application.add_handler(CommandHandler("ricorrenza", imposta_ricorrenza))
+    application.add_handler(CommandHandler("ricorrenze", lista_ricorrenze))
+    application.add_handler(CommandHandler("cancella_ricorrenza", cancella_ricorrenza))
+    application.add_handler(CommandHandler("destinazioni", lista_destinazioni))
     application.add_handler(CommandHandler("stato_bot", stato_bot))
+    application.add_handler(CommandHandler("statistiche", mostra_statistiche))
     application.add_handler(CommandHandler("verifica_permessi", verifica_permessi))
+    application.add_handler(CommandHandler("ricarica", ricarica))
+    application.add_handler(CommandHandler("broadcast", broadcast))
     application.add_handler(CommandHandler("help", help_admin))
     
     # Handler per i pulsanti inline
+    application.add_handler(CallbackQueryHandler(gestisci_recupero, pattern='^RECUPERO_'))
+    application.add_handler(CallbackQueryHandler(gestisci_uscita, pattern='^USCITA_'))
     application.add_handler(CallbackQueryHandler(button_handler))
     
+    # Ricerca inline (da attivare con /setinline su BotFather)
+    application.add_handler(InlineQueryHandler(cerca_inline))
+    
     # Handler per il pulsante "Scopri la Basilicata"
     application.add_handler(MessageHandler(
         filters.Regex("^🏛️ Scopri la Basilicata$"), 
@@ -1062,25 +1812,211 @@ def main() -> None:
         handle_other_messages
     ))
     
-    # ✅ AVVIA PUBBLICAZIONE AUTOMATICA (SENZA JOB_QUEUE)
-    loop = asyncio.get_event_loop()
-    pubblicazione_task = loop.create_task(loop_pubblicazione_quotidiana(application))
+    strumenta_handler(application)
     
-    logger.info("✅ Sistema di pubblicazione automatica avviato")
-    logger.info(f"📅 Orario predefinito: {orario_pubblicazione['ore']:02d}:{orario_pubblicazione['minuti']:02d}")
-    logger.info("🆕 Sistema messaggi programmati attivo")
-    logger.info("🚀 Bot @basilicatagobot avviato e in ascolto...")
+    return application
+
+
+def evento_stop(segnali=(signal.SIGINT, signal.SIGTERM)):
+    """asyncio.Event impostato da uno dei `segnali`."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for segnale in segnali:
+        loop.add_signal_handler(segnale, stop.set)
+    return stop
+
+
+async def riscalda_polling(application) -> None:
+    """Apre la connessione di getUpdates (TCP e TLS) mentre get_me usa l'altra."""
+    try:
+        await richiesta_polling.post(f"{application.bot.base_url}/getMe")
+    except Exception as e:
+        logger.warning("⚠️ Connessione di getUpdates non aperta in anticipo: %s", e)
+
+
+async def primo_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """⏱️ Con --profile-startup stampa il profilo di avvio al primo update ricevuto."""
+    if not any(nome == 'primo update' for nome, _ in profilo.fasi):
+        profilo.fase('primo update')
+        print(profilo.rapporto(), flush=True)
+
+
+async def esegui_polling(application) -> None:
+    """📥 Modalità polling, con l'avvio ridotto alle sole chiamate indispensabili.
     
+    Rispetto a run_polling: la connessione di getUpdates si apre insieme a
+    get_me, i servizi locali partono mentre l'Updater cancella il webhook e
+    fa la prima getUpdates, e il resto (vedi riprendi_lavori) continua in
+    background.
+    """
+    stop = evento_stop()
+    riscaldamento = asyncio.create_task(riscalda_polling(application))
+    async with application:
+        await riscaldamento
+        profilo.fase('get_me')
+        await asyncio.gather(
+            all_avvio(application),
+            application.updater.start_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+        )
+        await application.start()
+        profilo.fase('servizi e polling')
+        logger.info("🚀 In ascolto dopo %.0f ms dall'avvio", profilo.totale() * 1000)
+        
+        await stop.wait()
+        
+        await application.updater.stop()
+        await application.stop()
+        await al_fermo(application)
+        await alla_chiusura(application)
+
+
+def crea_smistatore(percorso):
+    """🧩 Front della modalità multi-processo: lavoratori avviati con questo stesso file."""
+    import smistamento  # Solo con LAVORATORI
+    def comando(indice):
+        return [sys.executable, os.path.abspath(__file__), '--lavoratore', str(indice), '--socket', percorso]
+    
+    smistatore = smistamento.Smistatore(percorso, LAVORATORI, comando)
+    metriche.registro.registra(metriche.Indicatore(
+        'basilicatago_lavoratori_in_coda', 'Update inoltrati ai lavoratori e non ancora elaborati.',
+        lambda: smistatore.in_coda
+    ))
+    metriche.registro.registra(metriche.Indicatore(
+        'basilicatago_lavoratori_riavvii', 'Riavvii dei processi lavoratori.',
+        lambda: smistatore.metriche()['riavvii']
+    ))
+    return smistatore
+
+
+async def instrada(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """🧩 Inoltra al lavoratore della chat gli update degli utenti; quelli dell'admin restano qui."""
+    utente = update.effective_user
+    chiave = chiave_chat(update)
+    if chiave is None or (utente is not None and utente.id == ADMIN_ID):
+        return
+    await smistatore.inoltra(chiave, update.to_dict())
+    raise ApplicationHandlerStop
+
+
+async def esegui_lavoratore(application, indice, percorso) -> None:
+    """🧩 Processo lavoratore: elabora gli update inoltrati dal front.
+    
+    Niente polling, pianificatore, canale o broadcast: solo menu, comandi
+    degli utenti e pulizia dei messaggi delle chat assegnate.
+    """
+    # Ctrl+C arriva a tutto il gruppo di processi: il lavoratore si ferma solo con il SIGTERM del front,
+    # dopo che il front ha smesso di ricevere update e ha atteso quelli in coda
+    stop = evento_stop((signal.SIGTERM,))
+    asyncio.get_running_loop().add_signal_handler(signal.SIGINT, lambda: None)
+    
+    import smistamento
+    
+    async def elabora(dati):
+        update = Update.de_json(dati, application.bot)
+        await application.update_processor.process_update(update, application.process_update(update))
+    
+    async with application:
+        servizi_task.extend([
+            asyncio.create_task(catalogo.sorveglia_catalogo(CATALOGO_INTERVALLO)),
+            asyncio.create_task(archivio.scrittore()),
+            asyncio.create_task(statistiche.sorveglia(statistiche_file, salvataggio=STATISTICHE_SALVATAGGIO))
+        ])
+        await application.start()
+        ricezione = asyncio.create_task(smistamento.servi(percorso, indice, elabora))
+        fermo = asyncio.create_task(stop.wait())
+        await asyncio.wait({ricezione, fermo}, return_when=asyncio.FIRST_COMPLETED)
+        
+        # Gli update già ricevuti vengono conclusi e confermati prima di uscire
+        ricezione.cancel()
+        fermo.cancel()
+        await asyncio.gather(ricezione, fermo, return_exceptions=True)
+        await application.stop()
+        await al_fermo(application)
+        await alla_chiusura(application)
+
+
+async def esegui_webhook(application) -> None:
+    """🪝 Modalità webhook: server HTTP integrato al posto di run_polling."""
+    import secrets
+    from webhook import ServerWebhook  # Non serve in polling
+    global WEBHOOK_SEGRETO
+    WEBHOOK_SEGRETO = WEBHOOK_SEGRETO or secrets.token_urlsafe(32)
+    server = ServerWebhook(
+        application,
+        percorso=WEBHOOK_PERCORSO,
+        segreto=WEBHOOK_SEGRETO,
+        host=WEBHOOK_HOST,
+        porta=WEBHOOK_PORTA,
+        max_coda=WEBHOOK_MAX_CODA
+    )
+    
+    stop = evento_stop()
+    
+    # /healthz risponde già durante l'avvio, /readyz solo a webhook registrato
+    await server.avvia()
     try:
-        application.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+        async with application:
+            await all_avvio(application)
+            await application.start()
+            await application.bot.set_webhook(
+                url=WEBHOOK_URL,
+                secret_token=WEBHOOK_SEGRETO,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=True
+            )
+            server.pronto = True
+            logger.info(f"🪝 Webhook attivo: {WEBHOOK_URL}")
+            
+            await stop.wait()
+            
+            await server.ferma()
+            await application.stop()
+            await al_fermo(application)
+            await alla_chiusura(application)
+    finally:
+        await server.ferma()
+
+
+def main() -> None:
+    """Avvia il bot con pubblicazioni automatiche."""
+    global smistatore, statistiche_file
+    parser = argparse.ArgumentParser(description="Bot Telegram BasilicataGo")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="stampa i tempi di import e delle fasi di avvio al primo update")
+    # Usati dal front per avviare i processi lavoratori (LAVORATORI > 0)
+    parser.add_argument('--lavoratore', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--socket', help=argparse.SUPPRESS)
+    argomenti = parser.parse_args()
+    
+    profilo.fase('configurazione')
+    statistiche_file = file_statistiche(argomenti.lavoratore)
+    application = crea_applicazione(base_url=TELEGRAM_BASE_URL)
+    if profilo.attivo:
+        application.add_handler(TypeHandler(Update, primo_update), group=-2)
+    if LAVORATORI and argomenti.lavoratore is None:
+        percorso = SMISTAMENTO_SOCKET or os.path.join(tempfile.gettempdir(), f"basilicatago-{os.getpid()}.sock")
+        smistatore = crea_smistatore(percorso)
+        application.add_handler(TypeHandler(Update, instrada), group=-1)
+    profilo.fase('applicazione')
+    if TELEGRAM_BASE_URL:
+        logger.warning(f"🧪 Bot API alternativa: {TELEGRAM_BASE_URL}")
+    
+    try:
+        if argomenti.lavoratore is not None:
+            logger.info(f"🧩 Lavoratore {argomenti.lavoratore} avviato")
+            asyncio.run(esegui_lavoratore(application, argomenti.lavoratore, argomenti.socket))
+            return
+        logger.info("🚀 Bot @basilicatagobot avviato e in ascolto...")
+        if WEBHOOK_URL:
+            asyncio.run(esegui_webhook(application))
+        else:
+            asyncio.run(esegui_polling(application))
     except KeyboardInterrupt:
-        if pubblicazione_task:
-            pubblicazione_task.cancel()
-        # Cancella tutti i messaggi programmati
-        for info in messaggi_programmati.values():
-            if not info['task'].done():
-                info['task'].cancel()
         logger.info("Bot fermato dall'utente")
+    finally:
+        archivio.chiudi()
+        if elezione is not None:
+            elezione.chiudi()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,271 @@
+"""📤 Livello di invio verso Telegram con limiti di frequenza e priorità.
+
+LimitatoreInvii si aggancia all'Application come rate limiter di
+python-telegram-bot, quindi tutte le chiamate del bot passano di qui:
+
+- un secchio di gettoni globale (~30 messaggi/s);
+- un secchio per chat (chat private ~1/s, gruppi e canali ~20/min); le
+  modifiche dei messaggi nelle chat private (i tap sul menu) ne sono
+  escluse e passano solo dal secchio globale;
+- una coda a priorità: admin e canale prima delle risposte ai menu,
+  i broadcast agli iscritti per ultimi;
+- RetryAfter: tutti gli invii si fermano per il tempo indicato da Telegram
+  e la richiesta viene ripetuta.
+
+Se `osservatore` è impostato viene chiamato con (metodo, durata, esito) al
+termine di ogni chiamata alla Bot API.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+PRIORITA_ADMIN = 0
+PRIORITA_CANALE = 1
+PRIORITA_MENU = 2
+PRIORITA_BROADCAST = 3
+NOMI_PRIORITA = {
+    PRIORITA_ADMIN: 'admin',
+    PRIORITA_CANALE: 'canale',
+    PRIORITA_MENU: 'menu',
+    PRIORITA_BROADCAST: 'broadcast'
+}
+
+# Metodi che Telegram conta nei limiti di frequenza per chat
+PREFISSI_LIMITATI = ('send', 'edit', 'copy', 'forward')
+# ...tranne questi nelle chat private: un tap sul menu non deve attendere il gettone della chat
+PREFISSI_LIBERI_PRIVATI = ('edit',)
+
+MAX_SECCHI_CHAT = 10_000
+
+
+def privata(chat_id):
+    """True per le chat private (id positivi); gruppi e canali hanno id negativi, o @username."""
+    return isinstance(chat_id, int) and chat_id > 0
+
+
+def secondi(valore):
+    """retry_after può essere int o timedelta a seconda della versione di PTB."""
+    return valore.total_seconds() if hasattr(valore, 'total_seconds') else float(valore)
+
+
+class Secchio:
+    """Secchio di gettoni: `frequenza` gettoni al secondo, al massimo `capacita`."""
+
+    __slots__ = ('frequenza', 'capacita', 'gettoni', 'aggiornato')
+
+    def __init__(self, frequenza, capacita, adesso):
+        self.frequenza = frequenza
+        self.capacita = capacita
+        self.gettoni = capacita
+        self.aggiornato = adesso
+
+    def _ricarica(self, adesso):
+        self.gettoni = min(self.capacita, self.gettoni + (adesso - self.aggiornato) * self.frequenza)
+        self.aggiornato = adesso
+
+    def attesa(self, adesso):
+        """Secondi mancanti al prossimo gettone (0 se disponibile)."""
+        self._ricarica(adesso)
+        if self.gettoni >= 1:
+            return 0.0
+        return (1 - self.gettoni) / self.frequenza
+
+    def consuma(self, adesso):
+        self._ricarica(adesso)
+        self.gettoni -= 1
+
+    def pieno(self, adesso):
+        self._ricarica(adesso)
+        return self.gettoni >= self.capacita
+
+
+class LimitatoreInvii(BaseRateLimiter[int]):
+    """Rate limiter con coda a priorità (rate_limit_args = priorità, 0 la più alta)."""
+
+    __slots__ = (
+        'admin_id', 'canali', 'limite_globale', 'limite_privato', 'limite_gruppo',
+        'max_tentativi', '_globale', '_chat', '_coda', '_sequenza', '_nuovo',
+        '_pausa_fino', '_distributore', '_attesa_totale', '_attesa_massima',
+        '_concessi', '_flood_wait', 'osservatore'
+    )
+
+    def __init__(self, admin_id=None, canali=(), limite_globale=30, limite_privato=1.0,
+                 limite_gruppo=20 / 60, max_tentativi=3):
+        self.admin_id = admin_id
+        self.canali = set(canali)
+        self.limite_globale = limite_globale
+        self.limite_privato = limite_privato
+        self.limite_gruppo = limite_gruppo
+        self.max_tentativi = max_tentativi
+        self._globale = Secchio(limite_globale, limite_globale, time.monotonic())
+        self._chat = {}
+        self._coda = []
+        self._sequenza = itertools.count()
+        self._nuovo = asyncio.Event()
+        self._pausa_fino = 0.0
+        self._distributore = None
+        self._attesa_totale = 0.0
+        self._attesa_massima = 0.0
+        self._concessi = 0
+        self._flood_wait = 0
+        self.osservatore = None
+
+    async def initialize(self) -> None:
+        if self._distributore is None:
+            self._distributore = asyncio.create_task(self._distribuisci())
+
+    async def shutdown(self) -> None:
+        if self._distributore is not None:
+            self._distributore.cancel()
+            try:
+                await self._distributore
+            except asyncio.CancelledError:
+                pass
+            self._distributore = None
+
+    # ------------------------------------------------------------------
+    # Metriche
+    # ------------------------------------------------------------------
+
+    def metriche(self):
+        """Profondità della coda per priorità e tempi di attesa."""
+        profondita = {nome: 0 for nome in NOMI_PRIORITA.values()}
+        for priorita, _, _, _, futuro in self._coda:
+            if not futuro.done():
+                nome = NOMI_PRIORITA.get(priorita, str(priorita))
+                profondita[nome] = profondita.get(nome, 0) + 1
+        return {
+            'in_coda': sum(profondita.values()),
+            'profondita': profondita,
+            'concessi': self._concessi,
+            'attesa_media_ms': 1000 * self._attesa_totale / self._concessi if self._concessi else 0.0,
+            'attesa_massima_ms': 1000 * self._attesa_massima,
+            'flood_wait': self._flood_wait,
+            'in_pausa_s': max(0.0, self._pausa_fino - time.monotonic())
+        }
+
+    # ------------------------------------------------------------------
+    # Coda a priorità
+    # ------------------------------------------------------------------
+
+    def priorita_predefinita(self, chat_id):
+        if chat_id is not None and chat_id == self.admin_id:
+            return PRIORITA_ADMIN
+        if chat_id in self.canali:
+            return PRIORITA_CANALE
+        return PRIORITA_MENU
+
+    def _secchio_chat(self, chat_id, adesso):
+        secchio = self._chat.get(chat_id)
+        if secchio is None:
+            if len(self._chat) >= MAX_SECCHI_CHAT:
+                # Dimentica le chat inattive (secchio pieno)
+                self._chat = {c: s for c, s in self._chat.items() if not s.pieno(adesso)}
+            frequenza = self.limite_privato if privata(chat_id) else self.limite_gruppo
+            secchio = Secchio(frequenza, 1 if privata(chat_id) else 3, adesso)
+            self._chat[chat_id] = secchio
+        return secchio
+
+    async def _attendi_turno(self, chat_id, priorita):
+        futuro = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._coda, (priorita, next(self._sequenza), time.monotonic(), chat_id, futuro))
+        self._nuovo.set()
+        await futuro
+
+    async def _dormi(self, secondi):
+        """Dorme al massimo `secondi`, svegliandosi se arriva una nuova richiesta."""
+        self._nuovo.clear()
+        try:
+            await asyncio.wait_for(self._nuovo.wait(), timeout=secondi)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _distribuisci(self):
+        """Concede i turni di invio in ordine di priorità rispettando i limiti."""
+        while True:
+            if not self._coda:
+                self._nuovo.clear()
+                await self._nuovo.wait()
+                continue
+
+            adesso = time.monotonic()
+            attesa = max(self._pausa_fino - adesso, self._globale.attesa(adesso))
+            if attesa > 0:
+                await asyncio.sleep(attesa)
+                continue
+
+            # Prima richiesta (in ordine di priorità) la cui chat ha un gettone
+            saltate = []
+            scelta = None
+            attesa_chat = None
+            while self._coda:
+                voce = heapq.heappop(self._coda)
+                if voce[4].done():
+                    continue
+                # chat None: nessun secchio per chat, solo quello globale
+                attesa = 0 if voce[3] is None else self._secchio_chat(voce[3], adesso).attesa(adesso)
+                if attesa == 0:
+                    scelta = voce
+                    break
+                saltate.append(voce)
+                attesa_chat = attesa if attesa_chat is None else min(attesa_chat, attesa)
+            for voce in saltate:
+                heapq.heappush(self._coda, voce)
+
+            if scelta is None:
+                if attesa_chat is not None:
+                    await self._dormi(attesa_chat)
+                continue
+
+            _, _, accodato, chat_id, futuro = scelta
+            self._globale.consuma(adesso)
+            if chat_id is not None:
+                self._secchio_chat(chat_id, adesso).consuma(adesso)
+            atteso = adesso - accodato
+            self._concessi += 1
+            self._attesa_totale += atteso
+            self._attesa_massima = max(self._attesa_massima, atteso)
+            futuro.set_result(None)
+
+    # ------------------------------------------------------------------
+    # Interfaccia BaseRateLimiter
+    # ------------------------------------------------------------------
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        limitato = endpoint.startswith(PREFISSI_LIMITATI)
+        chat_id = data.get('chat_id')
+        priorita = rate_limit_args if rate_limit_args is not None else self.priorita_predefinita(chat_id)
+        # Secchio della chat da rispettare (None = solo il limite globale)
+        secchio = None if privata(chat_id) and endpoint.startswith(PREFISSI_LIBERI_PRIVATI) else chat_id
+
+        for tentativo in range(1, self.max_tentativi + 1):
+            if limitato:
+                await self._attendi_turno(secchio, priorita)
+            else:
+                pausa = self._pausa_fino - time.monotonic()
+                if pausa > 0:
+                    await asyncio.sleep(pausa)
+            inizio = time.perf_counter()
+            esito = 'errore'
+            try:
+                risultato = await callback(*args, **kwargs)
+                esito = 'ok'
+                return risultato
+            except RetryAfter as e:
+                esito = 'flood_wait'
+                attesa = secondi(e.retry_after)
+                self._flood_wait += 1
+                self._pausa_fino = max(self._pausa_fino, time.monotonic() + attesa)
+                logger.warning("⏳ Flood wait %.0fs su %s (tentativo %d)", attesa, endpoint, tentativo)
+                if tentativo == self.max_tentativi:
+                    raise
+            finally:
+                if self.osservatore is not None:
+                    self.osservatore(endpoint, time.perf_counter() - inizio, esito)
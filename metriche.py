@@ -0,0 +1,224 @@
+"""📈 Metriche in formato Prometheus (testo, versione 0.0.4), solo libreria standard.
+
+- contatori e istogrammi di durata per ogni handler (comandi, singoli
+  pulsanti del menu) e per ogni metodo della Bot API chiamato;
+- indicatori letti al momento dello scrape (lavori pianificati, coda
+  invii, ritardo dell'event loop);
+- endpoint GET /metrics su un ServerHTTP locale.
+
+strumenta() imposta anche il contesto dei log (update_id, chat_id, handler)
+e scrive nel logger 'update' una riga con la durata per una frazione degli
+update (diario.campione) e per tutti quelli finiti con un errore.
+
+Registrare un valore costa un lookup in un dizionario e una ricerca binaria
+sui limiti dell'istogramma; il testo viene prodotto solo durante lo scrape.
+"""
+import asyncio
+import functools
+import logging
+import time
+from bisect import bisect_left
+
+import diario
+
+logger = logging.getLogger(__name__)
+log_update = logging.getLogger('update')
+
+TIPO_CONTENUTO = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Limiti (in secondi) degli istogrammi di durata
+LIMITI_DURATA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(valore):
+    return str(valore).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etichette(nomi, valori, extra=''):
+    coppie = [f'{nome}="{_escape(valore)}"' for nome, valore in zip(nomi, valori)]
+    if extra:
+        coppie.append(extra)
+    return '{' + ','.join(coppie) + '}' if coppie else ''
+
+
+def _numero(valore):
+    if valore == float('inf'):
+        return '+Inf'
+    return repr(float(valore)) if isinstance(valore, float) else str(valore)
+
+
+class Contatore:
+    """Contatore monotono, una serie per combinazione di etichette."""
+
+    tipo = 'counter'
+
+    def __init__(self, nome, aiuto, etichette=()):
+        self.nome = nome
+        self.aiuto = aiuto
+        self.etichette = tuple(etichette)
+        self._serie = {}
+
+    def inc(self, *valori, quanto=1):
+        self._serie[valori] = self._serie.get(valori, 0) + quanto
+
+    def valore(self, *valori):
+        return self._serie.get(valori, 0)
+
+    def righe(self):
+        for valori, totale in self._serie.items():
+            yield f"{self.nome}{_etichette(self.etichette, valori)} {_numero(totale)}"
+
+
+class Istogramma:
+    """Istogramma a limiti fissi, una serie per combinazione di etichette."""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, aiuto, etichette=(), limiti=LIMITI_DURATA):
+        self.nome = nome
+        self.aiuto = aiuto
+        self.etichette = tuple(etichette)
+        self.limiti = tuple(limiti)
+        # valori -> [conteggio per intervallo..., oltre l'ultimo limite, somma]
+        self._serie = {}
+
+    def osserva(self, valore, *valori):
+        serie = self._serie.get(valori)
+        if serie is None:
+            serie = self._serie[valori] = [0] * (len(self.limiti) + 1) + [0.0]
+        serie[bisect_left(self.limiti, valore)] += 1
+        serie[-1] += valore
+
+    def righe(self):
+        for valori, serie in self._serie.items():
+            cumulato = 0
+            for limite, conteggio in zip(self.limiti + (float('inf'),), serie):
+                cumulato += conteggio
+                le = f'le="{_numero(limite)}"'
+                yield f"{self.nome}_bucket{_etichette(self.etichette, valori, le)} {cumulato}"
+            yield f"{self.nome}_sum{_etichette(self.etichette, valori)} {_numero(serie[-1])}"
+            yield f"{self.nome}_count{_etichette(self.etichette, valori)} {cumulato}"
+
+
+class Indicatore:
+    """Valore istantaneo letto da `funzione` al momento dello scrape."""
+
+    tipo = 'gauge'
+
+    def __init__(self, nome, aiuto, funzione):
+        self.nome = nome
+        self.aiuto = aiuto
+        self.funzione = funzione
+
+    def righe(self):
+        try:
+            valore = self.funzione()
+        except Exception as e:
+            logger.warning(f"⚠️ Metrica {self.nome} non disponibile: {e}")
+            return
+        yield f"{self.nome} {_numero(valore)}"
+
+
+class Registro:
+    """Insieme delle metriche esportate."""
+
+    def __init__(self):
+        self._metriche = {}
+
+    def registra(self, metrica):
+        self._metriche[metrica.nome] = metrica
+        return metrica
+
+    def esporta(self):
+        righe = []
+        for metrica in self._metriche.values():
+            righe.append(f"# HELP {metrica.nome} {metrica.aiuto}")
+            righe.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            righe.extend(metrica.righe())
+        return '\n'.join(righe) + '\n'
+
+
+registro = Registro()
+
+HANDLER_CHIAMATE = registro.registra(Contatore(
+    'basilicatago_handler_total', 'Update elaborati per handler ed esito.', ('handler', 'esito')
+))
+HANDLER_DURATA = registro.registra(Istogramma(
+    'basilicatago_handler_seconds', 'Durata degli handler in secondi.', ('handler',)
+))
+API_CHIAMATE = registro.registra(Contatore(
+    'basilicatago_api_total', 'Chiamate alla Bot API per metodo ed esito.', ('metodo', 'esito')
+))
+API_DURATA = registro.registra(Istogramma(
+    'basilicatago_api_seconds', 'Durata delle chiamate alla Bot API in secondi.', ('metodo',)
+))
+
+
+# ----------------------------------------------------------------------
+# Strumentazione
+# ----------------------------------------------------------------------
+
+def strumenta(callback, etichetta, traccia=None):
+    """Avvolge il callback di un handler; `etichetta` è una stringa o una funzione dell'update.
+
+    Se c'è, `traccia(chat_id, etichetta)` viene chiamata per ogni update con una chat.
+    """
+    @functools.wraps(callback)
+    async def avvolto(update, context):
+        nome = etichetta(update) if callable(etichetta) else etichetta
+        chat = update.effective_chat
+        if traccia is not None and chat is not None:
+            traccia(chat.id, nome)
+        token = diario.contesto.set({
+            'update_id': update.update_id, 'chat_id': chat.id if chat else None, 'handler': nome
+        })
+        esito = 'errore'
+        inizio = time.perf_counter()
+        try:
+            risultato = await callback(update, context)
+            esito = 'ok'
+            return risultato
+        finally:
+            durata = time.perf_counter() - inizio
+            HANDLER_DURATA.osserva(durata, nome)
+            HANDLER_CHIAMATE.inc(nome, esito)
+            if esito != 'ok':
+                log_update.warning("update %s", esito, extra={'latency_ms': round(durata * 1000, 2)})
+            elif diario.campiona():
+                log_update.info("update %s", esito, extra={'latency_ms': round(durata * 1000, 2)})
+            diario.contesto.reset(token)
+    return avvolto
+
+
+def osserva_api(metodo, durata, esito):
+    """Osservatore per LimitatoreInvii: una chiamata alla Bot API conclusa."""
+    API_DURATA.osserva(durata, metodo)
+    API_CHIAMATE.inc(metodo, esito)
+
+
+class RitardoLoop:
+    """Misura di quanto l'event loop è in ritardo rispetto a un sonno programmato."""
+
+    def __init__(self, intervallo=0.5):
+        self.intervallo = intervallo
+        self.ultimo = 0.0
+        self.massimo = 0.0
+
+    async def sorveglia(self):
+        while True:
+            inizio = time.perf_counter()
+            await asyncio.sleep(self.intervallo)
+            self.ultimo = max(0.0, time.perf_counter() - inizio - self.intervallo)
+            self.massimo = max(self.massimo, self.ultimo)
+
+
+def crea_server(host, porta, reg=registro):
+    """ServerHTTP con la sola rotta GET /metrics."""
+    from server_http import Risposta, ServerHTTP  # Solo se /metrics è attivo
+
+    async def esporta(richiesta):
+        return Risposta(200, reg.esporta().encode('utf-8'), TIPO_CONTENUTO)
+
+    server = ServerHTTP(host, porta)
+    server.rotta('GET', '/metrics', esporta)
+    return server
@@ -0,0 +1,95 @@
+"""🪞 Ultimo contenuto mostrato da ogni messaggio del menu.
+
+Premere due volte lo stesso pulsante (o "Indietro" verso la schermata già
+visibile) porta a un edit_message_text identico, che Telegram rifiuta con
+"message is not modified": una chiamata e un'eccezione per nulla.
+
+CacheModifiche ricorda, per (chat_id, message_id), un'impronta di testo,
+tastiera e parse_mode dell'ultima versione mostrata; modifica() salta la
+chiamata se l'impronta non cambia. La cache è un LRU con al massimo
+`capienza` messaggi (circa 260 byte l'uno: 13 MB con la capienza
+predefinita); i meno recenti vengono espulsi e il loro primo edit identico
+dopo l'espulsione torna semplicemente a chiamare Telegram.
+"""
+import logging
+from collections import OrderedDict
+
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+NON_MODIFICATO = 'message is not modified'
+
+
+def impronta(testo, tastiera=None, parse_mode=None):
+    """Hash del contenuto di un messaggio (le tastiere di PTB hanno un hash per contenuto)."""
+    return hash((testo, tastiera, parse_mode))
+
+
+class CacheModifiche:
+    """LRU (chat_id, message_id) -> impronta dell'ultimo contenuto mostrato."""
+
+    def __init__(self, capienza=50_000):
+        self.capienza = capienza
+        self._voci = OrderedDict()
+        self.evitate = 0         # edit identici saltati senza chiamare Telegram
+        self.eseguite = 0        # edit inviati a Telegram
+        self.non_modificati = 0  # edit identici scoperti solo dalla risposta di Telegram
+        self.espulse = 0
+
+    def __len__(self):
+        return len(self._voci)
+
+    def metriche(self):
+        return {
+            'messaggi': len(self._voci),
+            'evitate': self.evitate,
+            'eseguite': self.eseguite,
+            'non_modificati': self.non_modificati,
+            'espulse': self.espulse
+        }
+
+    def ricorda(self, chat_id, message_id, valore):
+        """Registra il contenuto mostrato ora dal messaggio."""
+        chiave = (chat_id, message_id)
+        self._voci[chiave] = valore
+        self._voci.move_to_end(chiave)
+        while len(self._voci) > self.capienza:
+            self._voci.popitem(last=False)
+            self.espulse += 1
+
+    def dimentica(self, chat_id, message_id):
+        self._voci.pop((chat_id, message_id), None)
+
+    def uguale(self, chat_id, message_id, valore):
+        """True se il messaggio mostra già questo contenuto."""
+        chiave = (chat_id, message_id)
+        if self._voci.get(chiave) != valore:
+            return False
+        self._voci.move_to_end(chiave)
+        return True
+
+    async def modifica(self, query, testo, reply_markup=None, parse_mode=None, valore=None):
+        """edit_message_text sul messaggio della callback, saltato se il contenuto è lo stesso.
+
+        `valore` è l'impronta del contenuto, se già calcolata. Restituisce
+        True se è stata fatta la chiamata a Telegram.
+        """
+        messaggio = query.message
+        if valore is None:
+            valore = impronta(testo, reply_markup, parse_mode)
+        if self.uguale(messaggio.chat_id, messaggio.message_id, valore):
+            self.evitate += 1
+            return False
+
+        self.eseguite += 1
+        try:
+            await query.edit_message_text(text=testo, reply_markup=reply_markup, parse_mode=parse_mode)
+        except BadRequest as e:
+            if NON_MODIFICATO not in str(e).lower():
+                self.dimentica(messaggio.chat_id, messaggio.message_id)
+                raise
+            # Stesso contenuto ma non in cache (riavvio o espulsione)
+            self.non_modificati += 1
+        self.ricorda(messaggio.chat_id, messaggio.message_id, valore)
+        return True
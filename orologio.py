@@ -0,0 +1,108 @@
+"""🕐 Orologio del bot: reale in produzione, virtuale nelle simulazioni.
+
+Il pianificatore e le funzioni di pubblicazione leggono l'ora e dormono
+solo tramite un Orologio, così una simulazione può sostituirlo con un
+OrologioVirtuale e far scorrere mesi di tempo in pochi secondi:
+
+    orologio = OrologioVirtuale(datetime(2026, 1, 1, tzinfo=pytz.utc))
+    ...
+    await orologio.avanza(30 * 86400)
+
+Anche il lavoro bloccante passa dall'orologio (in_thread): in produzione
+gira in un thread, nel tempo virtuale subito, così avanza() non fa
+scorrere il tempo mentre un thread non ha ancora finito.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime
+
+# Giri massimi dell'event loop per lasciare terminare i task risvegliati
+MAX_GIRI_ASSESTAMENTO = 100
+
+
+class Orologio:
+    """Orologio di sistema."""
+
+    def adesso(self):
+        """Timestamp Unix attuale."""
+        return time.time()
+
+    def ora(self, tz):
+        """datetime attuale nel fuso `tz`."""
+        return datetime.now(tz)
+
+    async def dormi(self, secondi):
+        await asyncio.sleep(secondi)
+
+    async def in_thread(self, funzione, *argomenti, **opzioni):
+        """Esegue una funzione bloccante (es. SQLite) senza fermare l'event loop."""
+        return await asyncio.to_thread(funzione, *argomenti, **opzioni)
+
+    async def attendi(self, evento, secondi):
+        """Attende `evento` per al massimo `secondi`."""
+        try:
+            await asyncio.wait_for(evento.wait(), timeout=secondi)
+        except asyncio.TimeoutError:
+            pass
+
+
+class OrologioVirtuale(Orologio):
+    """Tempo simulato: scorre solo con avanza(), risvegliando i timer in ordine."""
+
+    def __init__(self, inizio):
+        self._adesso = inizio.timestamp() if isinstance(inizio, datetime) else float(inizio)
+        self._timer = []  # (scadenza, sequenza, futuro)
+        self._sequenza = itertools.count()
+
+    def adesso(self):
+        return self._adesso
+
+    def ora(self, tz):
+        return datetime.fromtimestamp(self._adesso, tz)
+
+    @property
+    def timer_attivi(self):
+        return sum(1 for _, _, futuro in self._timer if not futuro.done())
+
+    async def in_thread(self, funzione, *argomenti, **opzioni):
+        return funzione(*argomenti, **opzioni)
+
+    async def dormi(self, secondi):
+        futuro = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._timer, (self._adesso + max(0.0, secondi), next(self._sequenza), futuro))
+        await futuro
+
+    async def attendi(self, evento, secondi):
+        if evento.is_set():
+            return
+        attesa = asyncio.ensure_future(evento.wait())
+        sonno = asyncio.ensure_future(self.dormi(secondi))
+        try:
+            await asyncio.wait((attesa, sonno), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            attesa.cancel()
+            sonno.cancel()
+
+    async def _assesta(self):
+        """Lascia girare l'event loop finché non ci sono più callback pronte."""
+        pronti = getattr(asyncio.get_running_loop(), '_ready', None)
+        for _ in range(MAX_GIRI_ASSESTAMENTO):
+            await asyncio.sleep(0)
+            if pronti is not None and not pronti:
+                return
+
+    async def avanza(self, secondi):
+        """Fa scorrere il tempo di `secondi`, risvegliando in ordine i timer scaduti."""
+        fine = self._adesso + secondi
+        await self._assesta()
+        while self._timer and self._timer[0][0] <= fine:
+            scadenza, _, futuro = heapq.heappop(self._timer)
+            if futuro.done():
+                continue
+            self._adesso = max(self._adesso, scadenza)
+            futuro.set_result(None)
+            await self._assesta()
+        self._adesso = fine
+        await self._assesta()
@@ -0,0 +1,161 @@
+"""⏰ Pianificatore a timer singolo per le pubblicazioni del bot BasilicataGo.
+
+Un'unica coroutine (esegui) gestisce tutti i lavori pianificati tramite un
+min-heap ordinato per orario di scadenza: dorme solo fino alla prossima
+scadenza (al massimo SONNO_MASSIMO secondi) e al risveglio ricontrolla
+l'orologio di sistema, così sospensioni o cambi d'ora non fanno slittare
+gli invii.
+
+Ora e attese passano dall'Orologio ricevuto (di sistema se non indicato):
+le simulazioni usano un OrologioVirtuale.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime
+
+from orologio import Orologio
+
+logger = logging.getLogger(__name__)
+
+# Intervallo massimo tra due controlli dell'orologio di sistema
+SONNO_MASSIMO = 60
+
+
+class Lavoro:
+    """Un invio pianificato. `quando` è un timestamp Unix (secondi)."""
+
+    __slots__ = ('id', 'quando', 'funzione', 'args', 'tipo', 'dati', 'cancellato')
+
+    def __init__(self, id, quando, funzione, args, tipo, dati):
+        self.id = id
+        self.quando = quando
+        self.funzione = funzione
+        self.args = args
+        self.tipo = tipo
+        self.dati = dati
+        self.cancellato = False
+
+    def __repr__(self):
+        return f"Lavoro({self.id!r}, {self.tipo!r}, quando={self.quando})"
+
+
+class Pianificatore:
+    """Min-heap di lavori con cancellazione pigra.
+
+    aggiungi/cancella costano O(log n) e O(1); i lavori cancellati restano
+    nell'heap finché non arrivano in cima o finché non superano la metà
+    degli elementi, nel qual caso l'heap viene ricostruito.
+    """
+
+    def __init__(self, orologio=None):
+        self.orologio = orologio or Orologio()
+        self.sonno_massimo = SONNO_MASSIMO
+        self._heap = []
+        self._lavori = {}
+        self._sequenza = itertools.count()
+        self._cancellati = 0
+        self._in_corso = set()
+        self._risveglio = asyncio.Event()
+
+    def __contains__(self, id):
+        return id in self._lavori
+
+    def __len__(self):
+        return len(self._lavori)
+
+    def get(self, id):
+        return self._lavori.get(id)
+
+    def aggiungi(self, quando, funzione, *args, id, tipo='', dati=None):
+        """Pianifica `await funzione(*args)` per l'istante `quando`.
+
+        `quando` può essere un datetime con timezone o un timestamp. Se esiste
+        già un lavoro con lo stesso id viene sostituito.
+        """
+        if isinstance(quando, datetime):
+            quando = quando.timestamp()
+
+        if id in self._lavori:
+            self.cancella(id)
+
+        lavoro = Lavoro(id, quando, funzione, args, tipo, dati or {})
+        self._lavori[id] = lavoro
+        heapq.heappush(self._heap, (quando, next(self._sequenza), lavoro))
+        if self._heap[0][2] is lavoro:
+            # Nuova prima scadenza: sveglia il timer
+            self._risveglio.set()
+        return lavoro
+
+    def cancella(self, id):
+        """Rimuove un lavoro pianificato. Restituisce il lavoro o None."""
+        lavoro = self._lavori.pop(id, None)
+        if lavoro is None:
+            return None
+
+        lavoro.cancellato = True
+        self._cancellati += 1
+        if self._cancellati > len(self._heap) // 2:
+            self._heap = [voce for voce in self._heap if not voce[2].cancellato]
+            heapq.heapify(self._heap)
+            self._cancellati = 0
+        return lavoro
+
+    def lavori(self, tipo=None):
+        """Lavori ancora da eseguire, in ordine di scadenza."""
+        lavori = (l for l in self._lavori.values() if tipo is None or l.tipo == tipo)
+        return sorted(lavori, key=lambda l: l.quando)
+
+    def prossimo(self):
+        """Il primo lavoro in scadenza (None se non ce ne sono)."""
+        self._scarta_cancellati()
+        return self._heap[0][2] if self._heap else None
+
+    def _scarta_cancellati(self):
+        while self._heap and self._heap[0][2].cancellato:
+            heapq.heappop(self._heap)
+            self._cancellati -= 1
+
+    def _avvia(self, lavoro):
+        task = asyncio.create_task(self._esegui_lavoro(lavoro))
+        self._in_corso.add(task)
+        task.add_done_callback(self._in_corso.discard)
+
+    async def _esegui_lavoro(self, lavoro):
+        try:
+            await lavoro.funzione(*lavoro.args)
+        except asyncio.CancelledError:
+            logger.info(f"⏸️ Lavoro {lavoro.id} interrotto")
+        except Exception as e:
+            logger.error(f"❌ Errore lavoro {lavoro.id}: {e}")
+
+    async def _attendi(self, secondi):
+        """Dorme fino a `secondi` o finché non arriva una scadenza più vicina."""
+        await self.orologio.attendi(self._risveglio, secondi)
+
+    async def esegui(self):
+        """Coroutine del timer: da avviare una sola volta."""
+        logger.info("⏰ Pianificatore avviato")
+        try:
+            while True:
+                self._risveglio.clear()
+                self._scarta_cancellati()
+
+                if not self._heap:
+                    await self._attendi(self.sonno_massimo)
+                    continue
+
+                attesa = self._heap[0][0] - self.orologio.adesso()
+                if attesa > 0:
+                    await self._attendi(min(attesa, self.sonno_massimo))
+                    continue
+
+                _, _, lavoro = heapq.heappop(self._heap)
+                del self._lavori[lavoro.id]
+                self._avvia(lavoro)
+        except asyncio.CancelledError:
+            for task in list(self._in_corso):
+                task.cancel()
+            logger.info("⏸️ Pianificatore fermato")
+            raise
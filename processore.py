@@ -0,0 +1,84 @@
+"""🔀 Elaborazione concorrente degli update con ordine garantito per chat.
+
+Update di chat diverse vengono elaborati in parallelo (al massimo
+`lavoratori` alla volta); quelli della stessa chat uno dopo l'altro,
+nell'ordine di arrivo.
+
+Il lock della chat viene preso prima del semaforo dei lavoratori: una chat
+che invia molti messaggi non occupa posti in attesa del proprio turno.
+
+Con più di un update concorrente PTB avvia un task per ogni update appena
+lo toglie dalla update_queue, che quindi resta quasi sempre vuota: il
+numero di update accettati e non ancora finiti è `in_volo`, ed è questo
+che il webhook confronta col suo limite per rispondere 503.
+"""
+import asyncio
+import logging
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+def chiave_chat(update):
+    """Chat (o utente) a cui appartiene l'update; None se non serve ordinarlo."""
+    chat = getattr(update, 'effective_chat', None)
+    if chat is not None:
+        return chat.id
+    utente = getattr(update, 'effective_user', None)
+    if utente is not None:
+        return utente.id
+    return None
+
+
+class ProcessoreUpdate(BaseUpdateProcessor):
+    """BaseUpdateProcessor con ordinamento per chat e limite di lavoratori."""
+
+    __slots__ = ('_lavoratori', '_chat', 'max_lavoratori', 'max_in_volo', 'in_volo')
+
+    def __init__(self, lavoratori=32, max_in_volo=1024):
+        # Il semaforo di PTB limita gli update accettati, il nostro quelli in esecuzione
+        max_in_volo = max(max_in_volo, lavoratori)
+        super().__init__(max_concurrent_updates=max_in_volo)
+        self.max_lavoratori = lavoratori
+        self.max_in_volo = max_in_volo
+        self.in_volo = 0  # update entrati in do_process_update e non ancora finiti
+        self._lavoratori = asyncio.Semaphore(lavoratori)
+        self._chat = {}  # chiave -> [lock, update in attesa o in corso]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @property
+    def chat_attive(self):
+        return len(self._chat)
+
+    async def do_process_update(self, update, coroutine) -> None:
+        self.in_volo += 1
+        try:
+            await self._elabora(update, coroutine)
+        finally:
+            self.in_volo -= 1
+
+    async def _elabora(self, update, coroutine):
+        chiave = chiave_chat(update)
+        if chiave is None:
+            async with self._lavoratori:
+                await coroutine
+            return
+
+        voce = self._chat.get(chiave)
+        if voce is None:
+            voce = self._chat[chiave] = [asyncio.Lock(), 0]
+        voce[1] += 1
+        try:
+            async with voce[0]:
+                async with self._lavoratori:
+                    await coroutine
+        finally:
+            voce[1] -= 1
+            if voce[1] == 0:
+                del self._chat[chiave]
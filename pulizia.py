@@ -0,0 +1,114 @@
+"""🧹 Cancellazione a blocchi dei messaggi indesiderati degli utenti.
+
+Invece di una chiamata deleteMessage per ogni messaggio, gli id vengono
+raccolti per chat e cancellati con deleteMessages (fino a 100 per
+chiamata):
+
+- dopo `ritardo` secondi dal primo messaggio in attesa della chat;
+- subito, se la chat raggiunge `soglia` messaggi in attesa;
+- all'arresto del bot, con svuota().
+
+Se Telegram rifiuta un blocco (BadRequest, per esempio per un messaggio
+troppo vecchio) i messaggi di quel blocco vengono cancellati uno per uno
+con deleteMessage, così un id sbagliato non lascia in chat tutti gli altri.
+"""
+import asyncio
+import logging
+
+from telegram.error import BadRequest, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Limite di Telegram per una singola chiamata deleteMessages
+MAX_PER_CHIAMATA = 100
+
+
+class CestinoMessaggi:
+    """Raccoglie i messaggi da cancellare e li elimina a blocchi per chat."""
+
+    def __init__(self, ritardo=1.0, soglia=MAX_PER_CHIAMATA):
+        self.ritardo = ritardo
+        self.soglia = min(soglia, MAX_PER_CHIAMATA)
+        self._attesa = {}  # chat_id -> (bot, [message_id])
+        self._timer = {}   # chat_id -> asyncio.TimerHandle
+        self._in_corso = set()
+        self.messaggi = 0
+        self.chiamate = 0
+        self.errori = 0
+
+    @property
+    def risparmiate(self):
+        """Chiamate evitate rispetto a un deleteMessage per messaggio."""
+        return self.messaggi - self.chiamate
+
+    @property
+    def in_attesa(self):
+        return sum(len(ids) for _, ids in self._attesa.values())
+
+    def metriche(self):
+        return {
+            'messaggi': self.messaggi,
+            'chiamate': self.chiamate,
+            'risparmiate': self.risparmiate,
+            'errori': self.errori,
+            'in_attesa': self.in_attesa
+        }
+
+    def aggiungi(self, bot, chat_id, message_id):
+        """Mette in coda un messaggio da cancellare."""
+        voce = self._attesa.get(chat_id)
+        if voce is None:
+            voce = self._attesa[chat_id] = (bot, [])
+            self._timer[chat_id] = asyncio.get_running_loop().call_later(
+                self.ritardo, self._avvia_svuotamento, chat_id
+            )
+        voce[1].append(message_id)
+        if len(voce[1]) >= self.soglia:
+            self._avvia_svuotamento(chat_id)
+
+    def _avvia_svuotamento(self, chat_id):
+        # Gli id vengono staccati subito: i messaggi successivi aprono un nuovo blocco
+        task = asyncio.create_task(self._cancella(chat_id, self._stacca(chat_id)))
+        self._in_corso.add(task)
+        task.add_done_callback(self._in_corso.discard)
+
+    def _stacca(self, chat_id):
+        timer = self._timer.pop(chat_id, None)
+        if timer is not None:
+            timer.cancel()
+        return self._attesa.pop(chat_id, None)
+
+    async def _cancella(self, chat_id, voce):
+        if voce is None:
+            return
+        bot, ids = voce
+        for inizio in range(0, len(ids), MAX_PER_CHIAMATA):
+            blocco = ids[inizio:inizio + MAX_PER_CHIAMATA]
+            self.chiamate += 1
+            self.messaggi += len(blocco)
+            try:
+                await bot.delete_messages(chat_id=chat_id, message_ids=blocco)
+            except BadRequest as e:
+                logger.info("🧹 deleteMessages rifiutato in %s (%s): cancello %d messaggi uno per uno",
+                            chat_id, e, len(blocco))
+                await self._cancella_singoli(bot, chat_id, blocco)
+            except Exception as e:
+                self.errori += 1
+                logger.warning("⚠️ Cancellazione di %d messaggi in %s fallita: %s", len(blocco), chat_id, e)
+
+    async def _cancella_singoli(self, bot, chat_id, ids):
+        for message_id in ids:
+            self.chiamate += 1
+            try:
+                await bot.delete_message(chat_id=chat_id, message_id=message_id)
+            except TelegramError as e:
+                self.errori += 1
+                logger.debug("Messaggio %s in %s non cancellato: %s", message_id, chat_id, e)
+
+    async def svuota(self):
+        """Cancella tutti i messaggi in attesa (da chiamare all'arresto)."""
+        await asyncio.gather(*(
+            self._cancella(chat_id, self._stacca(chat_id)) for chat_id in list(self._attesa)
+        ))
+        if self._in_corso:
+            await asyncio.gather(*self._in_corso, return_exceptions=True)
@@ -0,0 +1,178 @@
+"""🔎 Ricerca inline nel catalogo (@basilicatagobot vino).
+
+L'indice si costruisce una volta per snapshot del catalogo (vedi
+catalogo.ricerca: alla prima ricerca dopo l'avvio, poi nel thread che
+ricarica il file):
+
+- ogni schermata del menu è un documento con titolo (il testo del pulsante
+  che la apre) e testo; per ognuno c'è già pronto l'InlineQueryResultArticle
+  da restituire, con il testo della schermata e il pulsante verso il sito;
+- le parole, normalizzate senza accenti e maiuscole ("Città" -> "citta"),
+  formano un vocabolario; un indice invertito di trigrammi porta da ogni
+  trigramma alle parole che lo contengono e da ogni parola ai documenti.
+
+Una parola della ricerca trova le parole del vocabolario che hanno almeno
+SOGLIA dei suoi trigrammi: "vino" trova "vini", l'ultima parola vale anche
+come prefisso ("mate" trova "matera"). Con più parole un documento deve
+contenerle tutte; il punteggio somma somiglianza × peso del campo. Le
+risposte alle ricerche più frequenti restano in un LRU.
+"""
+import re
+import unicodedata
+from collections import OrderedDict
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+
+# Frazione dei trigrammi di una parola cercata che una parola del catalogo deve avere
+SOGLIA = 0.6
+# Peso di una parola nel titolo rispetto al testo
+PESO_TITOLO = 3.0
+PESO_TESTO = 1.0
+# Risultati per risposta (Telegram ne accetta al massimo 50)
+MAX_RISULTATI = 20
+MAX_DESCRIZIONE = 100
+ETICHETTA_LINK = "🔗 Apri il sito"
+
+PAROLA = re.compile(r'[^\W_]+')
+MARKDOWN = re.compile(r'[*_`\[\]]')
+# Accenti e altri segni diacritici separati dalla lettera con NFKD
+DIACRITICI = re.compile('[\u0300-\u036f]')
+PAROLE_VUOTE = frozenset(
+    'a ad al alla alle ai agli che con da dal dalla dei del della delle di e ed gli i il in la le lo '
+    'nel nella nei o per su sul sulla tra fra un una uno'.split()
+)
+
+
+def normalizza(testo):
+    """Minuscole e senza accenti: 'Città' -> 'citta'."""
+    testo = testo.casefold()
+    if testo.isascii():
+        return testo
+    return DIACRITICI.sub('', unicodedata.normalize('NFKD', testo))
+
+
+def parole(testo):
+    """Parole normalizzate di `testo`, senza parole vuote."""
+    return [parola for parola in PAROLA.findall(normalizza(testo)) if parola not in PAROLE_VUOTE]
+
+
+def trigrammi(parola, prefisso=False):
+    """Trigrammi di `parola` con due spazi davanti e uno dietro (senza quello finale se `prefisso`)."""
+    esteso = f"  {parola}" if prefisso else f"  {parola} "
+    return {esteso[i:i + 3] for i in range(len(esteso) - 2)}
+
+
+def pulisci(riga):
+    return ' '.join(MARKDOWN.sub('', riga).split())
+
+
+class IndiceRicerca:
+    """Indice di trigrammi sulle schermate del catalogo, con i risultati inline già costruiti."""
+
+    def __init__(self, schermate, escludi=(), tastiera=None, cache_risposte=1000):
+        """`schermate`: callback_data -> Schermata; `tastiera`: righe di pulsanti url aggiunte a ogni risultato."""
+        titoli = {}
+        for schermata in schermate.values():
+            for riga in (schermata.tastiera.inline_keyboard if schermata.tastiera else ()):
+                for pulsante in riga:
+                    if pulsante.callback_data:
+                        titoli.setdefault(pulsante.callback_data, pulsante.text)
+
+        self.chiavi = []
+        self.risultati = []
+        vocabolario = {}  # parola -> indice
+        documenti = []    # indice parola -> {documento: peso}
+        for chiave, schermata in schermate.items():
+            righe = [pulisci(riga) for riga in schermata.testo.splitlines()]
+            righe = [riga for riga in righe if riga]
+            if chiave in escludi or not righe:
+                continue
+            documento = len(self.chiavi)
+            titolo = titoli.get(chiave, righe[0])
+            campi = ((titolo, PESO_TITOLO), (schermata.testo, PESO_TESTO))
+            for testo, peso in campi:
+                for parola in parole(testo):
+                    indice = vocabolario.setdefault(parola, len(vocabolario))
+                    if indice == len(documenti):
+                        documenti.append({})
+                    documenti[indice][documento] = max(peso, documenti[indice].get(documento, 0))
+            self.chiavi.append(chiave)
+            self.risultati.append(self._risultato(chiave, schermata, titolo, righe, tastiera))
+
+        self.parole = list(vocabolario)
+        self._documenti = [tuple(pesi.items()) for pesi in documenti]
+        indice_trigrammi = {}
+        for indice, parola in enumerate(self.parole):
+            for trigramma in trigrammi(parola):
+                indice_trigrammi.setdefault(trigramma, []).append(indice)
+        self._trigrammi = {trigramma: tuple(indici) for trigramma, indici in indice_trigrammi.items()}
+        self.risultati = tuple(self.risultati)
+        self.cache_risposte = cache_risposte
+        self._risposte = OrderedDict()
+
+    @staticmethod
+    def _risultato(chiave, schermata, titolo, righe, tastiera):
+        # Solo pulsanti url: i callback di un messaggio inline non hanno una chat in cui rispondere
+        pulsanti = [[InlineKeyboardButton(ETICHETTA_LINK, url=schermata.url)]] if schermata.url else []
+        pulsanti.extend(tastiera or ())
+        descrizione = ' '.join(righe[1:] if titolo == righe[0] else righe)
+        return InlineQueryResultArticle(
+            id=chiave,
+            title=pulisci(titolo),
+            description=descrizione[:MAX_DESCRIZIONE],
+            input_message_content=InputTextMessageContent(schermata.testo, parse_mode=schermata.parse_mode),
+            reply_markup=InlineKeyboardMarkup(pulsanti) if pulsanti else None
+        )
+
+    def __len__(self):
+        return len(self.risultati)
+
+    def cerca(self, testo, limite=MAX_RISULTATI):
+        """Risultati (InlineQueryResultArticle) per la ricerca `testo`, dal più pertinente.
+
+        Gli oggetti sono quelli costruiti con l'indice: PTB li copia prima di
+        applicare i suoi valori predefiniti, quindi si possono riusare.
+        """
+        chiave = (' '.join(parole(testo)), limite)
+        risposta = self._risposte.get(chiave)
+        if risposta is not None:
+            self._risposte.move_to_end(chiave)
+            return risposta
+        risposta = tuple(self.risultati[documento] for documento in self._cerca(chiave[0].split(), limite))
+        if self.cache_risposte:
+            self._risposte[chiave] = risposta
+            if len(self._risposte) > self.cache_risposte:
+                self._risposte.popitem(last=False)
+        return risposta
+
+    def _cerca(self, cercate, limite):
+        """Indici dei documenti trovati, dal più pertinente."""
+        if not cercate:
+            # Ricerca vuota: tutte le schermate, nell'ordine del catalogo
+            return tuple(range(min(limite, len(self.risultati))))
+        punteggi = None
+        for k, cercata in enumerate(cercate):
+            gruppo = trigrammi(cercata, prefisso=k == len(cercate) - 1)
+            conteggi = {}
+            for trigramma in gruppo:
+                for indice in self._trigrammi.get(trigramma, ()):
+                    conteggi[indice] = conteggi.get(indice, 0) + 1
+            minimo = SOGLIA * len(gruppo)
+            trovati = {}
+            for indice, comuni in conteggi.items():
+                if comuni < minimo:
+                    continue
+                somiglianza = comuni / len(gruppo)
+                for documento, peso in self._documenti[indice]:
+                    valore = somiglianza * peso
+                    if valore > trovati.get(documento, 0):
+                        trovati[documento] = valore
+            if punteggi is None:
+                punteggi = trovati
+            else:
+                punteggi = {documento: punteggi[documento] + valore
+                            for documento, valore in trovati.items() if documento in punteggi}
+            if not punteggi:
+                return ()
+        ordinati = sorted(punteggi, key=lambda documento: (-punteggi[documento], documento))
+        return tuple(ordinati[:limite])
@@ -0,0 +1,224 @@
+"""🔁 Pubblicazioni ricorrenti con espressioni in stile cron.
+
+Ogni ricorrenza ha un id, un'espressione cron a 5 campi nel fuso del bot
+e un testo (None = testo quotidiano del catalogo):
+
+    minuti  ore  giorno-del-mese  mese  giorno-della-settimana
+    0       9    *                *     1-5        lun-ven alle 9:00
+    30      19   *                *     sab,dom    weekend alle 19:30
+    */15    8-10 1                *     *          il 1° del mese, ogni 15 min dalle 8 alle 10
+
+Campi: `*`, valori, intervalli `a-b`, passi `/n` e liste separate da
+virgole. Giorni della settimana 0-7 (0 e 7 = domenica) o lun..dom; come in
+cron, se giorno del mese e della settimana sono entrambi limitati basta
+che ne valga uno.
+
+La prossima scadenza si calcola in avanti dall'ultima, giorno per giorno,
+localizzando ogni orario nel fuso (pytz) per gestire l'ora legale: un
+orario che cade nell'ora saltata slitta di un'ora, uno nell'ora ripetuta
+scatta una volta sola. Ogni ricorrenza è un lavoro a sé nel pianificatore:
+aggiungerne, modificarne o rimuoverne una non tocca le altre.
+"""
+import logging
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+# Oltre questo orizzonte un'espressione è considerata impossibile (es. 31 febbraio)
+GIORNI_MASSIMI = 366 * 5
+
+NOMI_GIORNI = {'dom': 0, 'lun': 1, 'mar': 2, 'mer': 3, 'gio': 4, 'ven': 5, 'sab': 6}
+CAMPI = (
+    ('minuti', 0, 59),
+    ('ore', 0, 23),
+    ('giorni', 1, 31),
+    ('mesi', 1, 12),
+    ('giorni_settimana', 0, 7)
+)
+
+
+def _valore(testo, nome):
+    if nome == 'giorni_settimana' and testo.lower() in NOMI_GIORNI:
+        return NOMI_GIORNI[testo.lower()]
+    return int(testo)
+
+
+def _campo(testo, nome, minimo, massimo):
+    """Insieme dei valori ammessi da un campo cron."""
+    valori = set()
+    for parte in testo.split(','):
+        intervallo, _, passo = parte.partition('/')
+        passo = int(passo) if passo else 1
+        if passo < 1:
+            raise ValueError(f"Passo non valido in {nome}: {parte}")
+        if intervallo == '*':
+            inizio, fine = minimo, massimo
+        elif '-' in intervallo:
+            a, b = intervallo.split('-', 1)
+            inizio, fine = _valore(a, nome), _valore(b, nome)
+        else:
+            inizio = _valore(intervallo, nome)
+            fine = massimo if passo > 1 else inizio
+        if not (minimo <= inizio <= fine <= massimo):
+            raise ValueError(f"Valore fuori intervallo in {nome}: {parte}")
+        valori.update(range(inizio, fine + 1, passo))
+    return valori
+
+
+class EspressioneCron:
+    """Espressione cron a 5 campi compilata in liste ordinate di valori."""
+
+    __slots__ = ('testo', 'minuti', 'ore', 'giorni', 'mesi', 'giorni_settimana',
+                 '_giorno_libero', '_settimana_libera')
+
+    def __init__(self, testo):
+        campi = testo.split()
+        if len(campi) != 5:
+            raise ValueError("Servono 5 campi: minuti ore giorno mese giorno_settimana")
+        self.testo = ' '.join(campi)
+        for valore, (nome, minimo, massimo) in zip(campi, CAMPI):
+            setattr(self, nome, sorted(_campo(valore, nome, minimo, massimo)))
+        # 7 è un alias della domenica
+        self.giorni_settimana = sorted({g % 7 for g in self.giorni_settimana})
+        self._giorno_libero = campi[2] == '*'
+        self._settimana_libera = campi[4] == '*'
+
+    def __repr__(self):
+        return f"EspressioneCron({self.testo!r})"
+
+    def corrisponde(self, giorno):
+        """True se la data `giorno` rientra nell'espressione."""
+        if giorno.month not in self.mesi:
+            return False
+        nel_mese = giorno.day in self.giorni
+        in_settimana = (giorno.weekday() + 1) % 7 in self.giorni_settimana
+        if self._giorno_libero or self._settimana_libera:
+            return nel_mese and in_settimana
+        return nel_mese or in_settimana
+
+    def prossima(self, dopo, fuso):
+        """Prima scadenza strettamente successiva a `dopo` (datetime con timezone)."""
+        soglia = dopo.timestamp()
+        locale = dopo.astimezone(fuso)
+        # Si riparte dal giorno prima: con l'ora legale un orario locale del giorno
+        # precedente può cadere dopo `dopo` in UTC
+        giorno = locale.date() - timedelta(days=1)
+        for _ in range(GIORNI_MASSIMI):
+            if self.corrisponde(giorno):
+                candidato = self._primo_del_giorno(giorno, fuso, soglia, locale)
+                if candidato is not None:
+                    return candidato
+            giorno += timedelta(days=1)
+        raise ValueError(f"Nessuna scadenza per '{self.testo}' nei prossimi {GIORNI_MASSIMI} giorni")
+
+    def _primo_del_giorno(self, giorno, fuso, soglia, locale):
+        ore = self.ore
+        if giorno == locale.date():
+            # Salta le ore già passate (con un'ora di margine per il cambio d'ora)
+            ore = ore[bisect_left(ore, max(0, locale.hour - 1)):]
+        for ora in ore:
+            for minuto in self.minuti:
+                quando = localizza(fuso, datetime(giorno.year, giorno.month, giorno.day, ora, minuto))
+                if quando.timestamp() > soglia:
+                    return quando
+        return None
+
+
+def localizza(fuso, ingenuo):
+    """Orario locale -> datetime con timezone; ora saltata +1h, ora ripetuta una volta."""
+    return fuso.normalize(fuso.localize(ingenuo, is_dst=False))
+
+
+class Ricorrenza(NamedTuple):
+    id: str
+    cron: EspressioneCron
+    testo: Optional[str] = None
+    gruppo: Optional[str] = None  # gruppo di destinazioni (None = predefinito)
+
+
+class MotoreRicorrenze:
+    """Tiene le ricorrenze e ne pianifica una scadenza alla volta nel pianificatore.
+
+    `invia(contesto, ricorrenza, quando)` è la coroutine che pubblica; il motore
+    pianifica solo dopo avvia(contesto).
+    """
+
+    TIPO = 'ricorrenza'
+
+    def __init__(self, pianificatore, fuso, invia):
+        self.pianificatore = pianificatore
+        self.fuso = fuso
+        self.invia = invia
+        self.contesto = None
+        self._ricorrenze = {}
+
+    def __contains__(self, id):
+        return id in self._ricorrenze
+
+    def __len__(self):
+        return len(self._ricorrenze)
+
+    def get(self, id):
+        return self._ricorrenze.get(id)
+
+    def ricorrenze(self):
+        return sorted(self._ricorrenze.values(), key=lambda r: r.id)
+
+    @staticmethod
+    def id_lavoro(id):
+        return f"ricorrenza:{id}"
+
+    def prossima(self, id):
+        """Prossima scadenza pianificata della ricorrenza (datetime) o None."""
+        lavoro = self.pianificatore.get(self.id_lavoro(id))
+        return lavoro.dati['quando'] if lavoro else None
+
+    def imposta(self, id, espressione, testo=None, gruppo=None):
+        """Aggiunge o sostituisce una ricorrenza, ripianificando solo quella."""
+        ricorrenza = Ricorrenza(id, EspressioneCron(espressione), testo or None, gruppo or None)
+        self._ricorrenze[id] = ricorrenza
+        if self.contesto is not None:
+            self._pianifica(ricorrenza, datetime.fromtimestamp(self.pianificatore.orologio.adesso(), pytz.utc))
+        return ricorrenza
+
+    def rimuovi(self, id):
+        ricorrenza = self._ricorrenze.pop(id, None)
+        self.pianificatore.cancella(self.id_lavoro(id))
+        return ricorrenza
+
+    def avvia(self, contesto, dopo=None):
+        """Pianifica tutte le ricorrenze dalla prima scadenza dopo `dopo` (timestamp, default adesso).
+
+        Da chiamare all'avvio; di nuovo, con `dopo` nel passato, per recuperare
+        le scadenze di un intervallo in cui non pubblicava nessuno.
+        """
+        self.contesto = contesto
+        if dopo is None:
+            dopo = self.pianificatore.orologio.adesso()
+        dopo = datetime.fromtimestamp(dopo, pytz.utc)
+        for ricorrenza in self._ricorrenze.values():
+            self._pianifica(ricorrenza, dopo)
+
+    def _pianifica(self, ricorrenza, dopo):
+        quando = ricorrenza.cron.prossima(dopo, self.fuso)
+        self.pianificatore.aggiungi(
+            quando, self._scatta, ricorrenza, quando,
+            id=self.id_lavoro(ricorrenza.id),
+            tipo=self.TIPO,
+            dati={'quando': quando, 'ricorrenza': ricorrenza.id}
+        )
+        return quando
+
+    async def _scatta(self, ricorrenza, quando):
+        try:
+            await self.invia(self.contesto, ricorrenza, quando)
+        finally:
+            # La ricorrenza potrebbe essere stata modificata o rimossa nel frattempo
+            if self._ricorrenze.get(ricorrenza.id) is ricorrenza:
+                adesso = datetime.fromtimestamp(self.pianificatore.orologio.adesso(), pytz.utc)
+                # In avanti dall'ultima scadenza; se il bot era in ritardo, da adesso
+                self._pianifica(ricorrenza, max(quando, adesso))
@@ -0,0 +1,142 @@
+"""🌐 Server HTTP/1.1 minimale su asyncio (solo libreria standard).
+
+Pensato per endpoint interni dietro un reverse proxy (webhook Telegram,
+controlli di salute): supporta keep-alive e corpi con Content-Length, non
+supporta chunked encoding né TLS.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_CORPO = 1 << 20  # 1 MiB
+TIMEOUT_LETTURA = 30
+
+MOTIVI = {
+    200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden',
+    404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+    429: 'Too Many Requests', 500: 'Internal Server Error', 502: 'Bad Gateway',
+    503: 'Service Unavailable'
+}
+
+
+class Richiesta(NamedTuple):
+    metodo: str
+    percorso: str
+    query: str
+    intestazioni: Dict[str, str]  # nomi in minuscolo
+    corpo: bytes
+
+
+class Risposta(NamedTuple):
+    stato: int = 200
+    corpo: bytes = b''
+    tipo: str = 'text/plain; charset=utf-8'
+
+
+Gestore = Callable[[Richiesta], Awaitable[Risposta]]
+
+
+class ServerHTTP:
+    """Instrada (metodo, percorso) verso coroutine che restituiscono una Risposta."""
+
+    def __init__(self, host='127.0.0.1', porta=8080):
+        self.host = host
+        self.porta = porta
+        self._rotte: Dict[Tuple[str, str], Gestore] = {}
+        self._predefinito: Optional[Gestore] = None
+        self._server = None
+        self._connessioni = set()
+
+    def rotta(self, metodo, percorso, gestore: Gestore):
+        self._rotte[(metodo.upper(), percorso)] = gestore
+
+    def rotta_predefinita(self, gestore: Gestore):
+        """Gestore per tutte le richieste che non corrispondono a nessuna rotta."""
+        self._predefinito = gestore
+
+    async def avvia(self):
+        self._server = await asyncio.start_server(self._connessione, self.host, self.porta)
+        if self.porta == 0:
+            self.porta = self._server.sockets[0].getsockname()[1]
+        logger.info(f"🌐 Server HTTP in ascolto su {self.host}:{self.porta}")
+
+    async def ferma(self):
+        if self._server is not None:
+            self._server.close()
+            for task in list(self._connessioni):
+                task.cancel()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _leggi_richiesta(self, reader):
+        riga = await reader.readline()
+        if not riga:
+            return None
+        try:
+            metodo, destinazione, _ = riga.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise ValueError("Riga di richiesta non valida") from None
+
+        intestazioni = {}
+        while True:
+            riga = await reader.readline()
+            if riga in (b'\r\n', b'\n', b''):
+                break
+            nome, _, valore = riga.decode('latin-1').partition(':')
+            intestazioni[nome.strip().lower()] = valore.strip()
+
+        lunghezza = int(intestazioni.get('content-length', '0'))
+        if lunghezza > MAX_CORPO:
+            raise OverflowError(lunghezza)
+        corpo = await reader.readexactly(lunghezza) if lunghezza else b''
+
+        percorso, _, query = destinazione.partition('?')
+        return Richiesta(metodo.upper(), percorso, query, intestazioni, corpo)
+
+    async def _gestisci(self, richiesta):
+        gestore = self._rotte.get((richiesta.metodo, richiesta.percorso), self._predefinito)
+        if gestore is None:
+            if any(p == richiesta.percorso for _, p in self._rotte):
+                return Risposta(405, b'method not allowed')
+            return Risposta(404, b'not found')
+        try:
+            return await gestore(richiesta)
+        except Exception as e:
+            logger.error(f"❌ Errore gestore {richiesta.percorso}: {e}")
+            return Risposta(500, b'internal error')
+
+    async def _connessione(self, reader, writer):
+        task = asyncio.current_task()
+        self._connessioni.add(task)
+        try:
+            while True:
+                try:
+                    richiesta = await asyncio.wait_for(self._leggi_richiesta(reader), TIMEOUT_LETTURA)
+                except OverflowError:
+                    risposta, richiesta = Risposta(413, b'payload too large'), None
+                except (ValueError, asyncio.IncompleteReadError):
+                    risposta, richiesta = Risposta(400, b'bad request'), None
+                else:
+                    if richiesta is None:
+                        break
+                    risposta = await self._gestisci(richiesta)
+
+                chiudi = richiesta is None or richiesta.intestazioni.get('connection', '').lower() == 'close'
+                writer.write(
+                    f"HTTP/1.1 {risposta.stato} {MOTIVI.get(risposta.stato, '')}\r\n"
+                    f"Content-Type: {risposta.tipo}\r\n"
+                    f"Content-Length: {len(risposta.corpo)}\r\n"
+                    f"Connection: {'close' if chiudi else 'keep-alive'}\r\n\r\n".encode('latin-1')
+                    + risposta.corpo
+                )
+                await writer.drain()
+                if chiudi:
+                    break
+        except (asyncio.TimeoutError, ConnectionError, asyncio.CancelledError):
+            # Connessione chiusa dal client, inattiva o server in arresto
+            pass
+        finally:
+            self._connessioni.discard(task)
+            writer.close()
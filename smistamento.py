@@ -0,0 +1,322 @@
+"""🧩 Modalità multi-processo: un front e N lavoratori divisi per chat.
+
+Il front riceve gli update (polling o webhook) e li inoltra al lavoratore
+della chat, scelto con un hash consistente di chat_id: ogni chat va sempre
+allo stesso processo, che ne conserva l'ordine (ProcessoreUpdate), e
+cambiando il numero di lavoratori si sposta solo una parte delle chat.
+Il front resta l'unico proprietario di pianificatore, pubblicazioni nel
+canale e comandi dell'admin.
+
+Front e lavoratori si parlano su un socket Unix con frame JSON preceduti
+dalla lunghezza (4 byte big-endian):
+
+    lavoratore -> front   {"lavoratore": 2, "pid": 1234}     saluto
+    front -> lavoratore   {"update_id": ..., ...}             un update
+    lavoratore -> front   {"ok": [update_id, ...]}            update elaborati
+
+Il front tiene ogni update finché il lavoratore non ne conferma
+l'elaborazione (al massimo `finestra` in volo per lavoratore). Se un
+lavoratore muore viene riavviato con un'attesa crescente e riceve di
+nuovo, nello stesso ordine, gli update non confermati: nessun update in
+coda va perso, ma uno elaborato e non ancora confermato può essere
+rielaborato.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+import signal
+import struct
+import time
+from bisect import bisect
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+INTESTAZIONE = struct.Struct('>I')
+# Punti di ogni lavoratore sull'anello (più punti, chat distribuite in modo più uniforme)
+REPLICHE = 64
+# Attesa prima di riavviare un lavoratore morto: raddoppia a ogni riavvio ravvicinato
+RIAVVIO_MINIMO = 1.0
+RIAVVIO_MASSIMO = 30.0
+# Un lavoratore rimasto vivo così a lungo riparte dall'attesa minima
+VITA_STABILE = 60.0
+# Secondi concessi a un lavoratore per chiudersi dopo SIGTERM
+ATTESA_TERMINE = 10.0
+
+
+def codifica(dati):
+    corpo = json.dumps(dati, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return INTESTAZIONE.pack(len(corpo)) + corpo
+
+
+async def leggi_frame(reader):
+    """Prossimo frame decodificato, o None se la connessione è chiusa."""
+    try:
+        intestazione = await reader.readexactly(INTESTAZIONE.size)
+        corpo = await reader.readexactly(INTESTAZIONE.unpack(intestazione)[0])
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    return json.loads(corpo)
+
+
+def _hash(testo):
+    return int.from_bytes(hashlib.blake2b(testo.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class AnelloHash:
+    """Hash consistente: chiave -> nodo."""
+
+    def __init__(self, nodi, repliche=REPLICHE):
+        punti = sorted((_hash(f"{nodo}#{r}"), nodo) for nodo in nodi for r in range(repliche))
+        if not punti:
+            raise ValueError("Serve almeno un nodo")
+        self._punti = [punto for punto, _ in punti]
+        self._nodi = [nodo for _, nodo in punti]
+
+    def nodo(self, chiave):
+        return self._nodi[bisect(self._punti, _hash(str(chiave))) % len(self._punti)]
+
+
+class Lavoratore:
+    """Stato di un processo lavoratore visto dal front."""
+
+    def __init__(self, indice):
+        self.indice = indice
+        self.da_inviare = deque()
+        self.in_volo = OrderedDict()  # update_id -> update inviato e non ancora confermato
+        self.scrittore = None
+        self.processo = None
+        self.pid = None
+        self.riavvii = 0
+        self.elaborati = 0
+        self.risveglio = asyncio.Event()  # nuovi update da inviare o conferme ricevute
+
+    @property
+    def in_coda(self):
+        return len(self.da_inviare) + len(self.in_volo)
+
+    @property
+    def collegato(self):
+        return self.scrittore is not None
+
+    def scollega(self, scrittore):
+        """Connessione persa: gli update non confermati tornano in testa alla coda, in ordine."""
+        if self.scrittore is not scrittore:
+            return
+        self.scrittore = None
+        self.da_inviare.extendleft(reversed(self.in_volo.values()))
+        self.in_volo.clear()
+        self.risveglio.set()
+
+
+class Smistatore:
+    """Front: avvia e sorveglia i lavoratori e inoltra loro gli update.
+
+    `comando(indice)` restituisce la riga di comando (lista) che avvia il
+    lavoratore `indice`, collegato al socket `percorso`.
+    """
+
+    def __init__(self, percorso, quanti, comando, finestra=1000, max_coda=10_000):
+        self.percorso = percorso
+        self.comando = comando
+        self.finestra = finestra
+        self.max_coda = max_coda
+        self.lavoratori = [Lavoratore(i) for i in range(quanti)]
+        self.anello = AnelloHash(range(quanti))
+        self.inoltrati = 0
+        self._server = None
+        self._task = []
+        self._fermo = False
+        self._spazio = asyncio.Event()  # qualche coda è scesa sotto max_coda
+
+    def lavoratore_di(self, chiave):
+        return self.lavoratori[self.anello.nodo(chiave)]
+
+    @property
+    def in_coda(self):
+        return sum(lavoratore.in_coda for lavoratore in self.lavoratori)
+
+    def metriche(self):
+        return {
+            'lavoratori': len(self.lavoratori),
+            'collegati': sum(lavoratore.collegato for lavoratore in self.lavoratori),
+            'in_coda': self.in_coda,
+            'inoltrati': self.inoltrati,
+            'riavvii': sum(lavoratore.riavvii for lavoratore in self.lavoratori)
+        }
+
+    async def inoltra(self, chiave, dati):
+        """Mette in coda l'update (dict JSON) per il lavoratore della chat; attende se la coda è piena."""
+        lavoratore = self.lavoratore_di(chiave)
+        while lavoratore.in_coda >= self.max_coda:
+            self._spazio.clear()
+            await self._spazio.wait()
+        lavoratore.da_inviare.append(dati)
+        lavoratore.risveglio.set()
+        self.inoltrati += 1
+
+    async def avvia(self):
+        """Apre il socket e avvia i lavoratori."""
+        if os.path.exists(self.percorso):
+            os.unlink(self.percorso)
+        self._server = await asyncio.start_unix_server(self._connessione, path=self.percorso)
+        self._task = [asyncio.create_task(self._sorveglia(lavoratore)) for lavoratore in self.lavoratori]
+        logger.info(f"🧩 {len(self.lavoratori)} lavoratori su {self.percorso}")
+
+    async def svuota(self, secondi):
+        """Attende (al massimo `secondi`) che i lavoratori abbiano elaborato tutti gli update inoltrati."""
+        limite = time.monotonic() + secondi
+        while self.in_coda and time.monotonic() < limite:
+            await asyncio.sleep(0.05)
+        if self.in_coda:
+            logger.warning(f"⚠️ {self.in_coda} update non elaborati dai lavoratori alla chiusura")
+
+    async def ferma(self):
+        """Ferma i lavoratori (SIGTERM, poi SIGKILL) e chiude il socket."""
+        self._fermo = True
+        for task in self._task:
+            task.cancel()
+        await asyncio.gather(*self._task, return_exceptions=True)
+        await asyncio.gather(*(self._termina(lavoratore) for lavoratore in self.lavoratori))
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.percorso):
+            os.unlink(self.percorso)
+
+    async def _termina(self, lavoratore):
+        processo = lavoratore.processo
+        if processo is None or processo.returncode is not None:
+            return
+        processo.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(processo.wait(), timeout=ATTESA_TERMINE)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Lavoratore {lavoratore.indice} non si è fermato: SIGKILL")
+            processo.kill()
+            await processo.wait()
+
+    async def _sorveglia(self, lavoratore):
+        """Avvia il lavoratore e lo riavvia (con attesa crescente) ogni volta che termina."""
+        attesa = RIAVVIO_MINIMO
+        while not self._fermo:
+            inizio = time.monotonic()
+            lavoratore.processo = await asyncio.create_subprocess_exec(*self.comando(lavoratore.indice))
+            codice = await lavoratore.processo.wait()
+            if self._fermo:
+                return
+            if time.monotonic() - inizio >= VITA_STABILE:
+                attesa = RIAVVIO_MINIMO
+            lavoratore.riavvii += 1
+            logger.error(
+                "❌ Lavoratore %d terminato (codice %s), %d update in coda: riavvio tra %.0fs",
+                lavoratore.indice, codice, lavoratore.in_coda, attesa
+            )
+            await asyncio.sleep(attesa)
+            attesa = min(RIAVVIO_MASSIMO, attesa * 2)
+
+    async def _connessione(self, reader, writer):
+        saluto = await leggi_frame(reader)
+        if not saluto or not 0 <= saluto.get('lavoratore', -1) < len(self.lavoratori):
+            writer.close()
+            return
+        lavoratore = self.lavoratori[saluto['lavoratore']]
+        if lavoratore.scrittore is not None:
+            # Un processo precedente ancora collegato: i suoi update passano al nuovo
+            vecchio = lavoratore.scrittore
+            lavoratore.scollega(vecchio)
+            vecchio.close()
+        lavoratore.scrittore = writer
+        lavoratore.pid = saluto.get('pid')
+        logger.info(f"🧩 Lavoratore {lavoratore.indice} collegato (pid {lavoratore.pid}, {lavoratore.in_coda} update in coda)")
+
+        invio = asyncio.create_task(self._invia(lavoratore, writer))
+        try:
+            while True:
+                frame = await leggi_frame(reader)
+                if frame is None:
+                    break
+                for update_id in frame.get('ok', ()):
+                    if lavoratore.in_volo.pop(update_id, None) is not None:
+                        lavoratore.elaborati += 1
+                lavoratore.risveglio.set()
+                if lavoratore.in_coda < self.max_coda:
+                    self._spazio.set()
+        finally:
+            invio.cancel()
+            lavoratore.scollega(writer)
+            writer.close()
+            if not self._fermo:
+                logger.warning(f"⚠️ Lavoratore {lavoratore.indice} scollegato ({lavoratore.in_coda} update in coda)")
+
+    async def _invia(self, lavoratore, writer):
+        """Invia gli update in coda, con al massimo `finestra` non confermati."""
+        try:
+            while True:
+                while lavoratore.da_inviare and len(lavoratore.in_volo) < self.finestra:
+                    dati = lavoratore.da_inviare.popleft()
+                    lavoratore.in_volo[dati['update_id']] = dati
+                    writer.write(codifica(dati))
+                await writer.drain()
+                if lavoratore.da_inviare and len(lavoratore.in_volo) < self.finestra:
+                    continue
+                lavoratore.risveglio.clear()
+                await lavoratore.risveglio.wait()
+        except ConnectionError:
+            lavoratore.scollega(writer)
+
+
+async def servi(percorso, indice, elabora):
+    """Lato lavoratore: riceve gli update dal front e conferma quelli elaborati.
+
+    `elabora(dati)` è la coroutine che elabora un update (dict JSON). Termina
+    quando il front chiude la connessione; se viene cancellata attende gli
+    update in corso e ne invia le conferme prima di uscire.
+    """
+    reader, writer = await asyncio.open_unix_connection(percorso)
+    writer.write(codifica({'lavoratore': indice, 'pid': os.getpid()}))
+    conferme = []
+    pronte = asyncio.Event()
+    in_corso = set()
+
+    def finito(update_id, task):
+        in_corso.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("❌ Update %s non elaborato: %s", update_id, task.exception())
+        conferme.append(update_id)
+        pronte.set()
+
+    async def invia_conferme():
+        while True:
+            await pronte.wait()
+            pronte.clear()
+            if conferme:
+                writer.write(codifica({'ok': conferme[:]}))
+                conferme.clear()
+                await writer.drain()
+
+    invio = asyncio.create_task(invia_conferme())
+    try:
+        while True:
+            dati = await leggi_frame(reader)
+            if dati is None:
+                logger.warning(f"⚠️ Lavoratore {indice}: connessione con il front chiusa")
+                return
+            task = asyncio.create_task(elabora(dati))
+            in_corso.add(task)
+            task.add_done_callback(functools.partial(finito, dati['update_id']))
+    finally:
+        if in_corso:
+            await asyncio.wait(in_corso)
+        invio.cancel()
+        if conferme and not writer.is_closing():
+            writer.write(codifica({'ok': conferme}))
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+        writer.close()
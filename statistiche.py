@@ -0,0 +1,373 @@
+"""📊 Percorsi degli utenti nel menu: tap sui pulsanti e comandi, aggregati in memoria.
+
+Sul percorso caldo registra() scrive (chat_id, nodo) in due array a
+dimensione fissa usati come anello: un lookup nel dizionario dei nodi,
+nessuna lettura dell'orologio, nessuna allocazione, nessun I/O. Ogni secondo
+aggrega() sposta gli eventi nuovi, con l'istante dell'aggregazione, in
+contatori su array:
+
+- visite per nodo e per ora, su una finestra di `ore` ore (ore × max_nodi);
+- transizioni tra nodi (max_nodi × max_nodi), comprese quelle da INIZIO
+  (primo tap di una sessione) e verso FINE (nessun tap per `sessione`
+  secondi: l'utente si è fermato lì);
+- visite totali per nodo.
+
+Se tra due aggregazioni arrivano più di `capienza` eventi i più vecchi si
+perdono (contati in `persi`); oltre `max_nodi` nodi diversi i nuovi finiscono
+in ALTRO. salva() scrive i contatori in un file binario compatto (intestazione
+JSON e array compressi con zlib), carica() li rilegge all'avvio: /statistiche
+legge solo i contatori, mai gli eventi grezzi.
+"""
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from array import array
+
+logger = logging.getLogger(__name__)
+
+FIRMA = b'BGST'
+VERSIONE = 1
+INTESTAZIONE = struct.Struct('>4sHI')  # firma, versione, lunghezza del JSON
+
+# Nodi riservati, sempre ai primi indici
+INIZIO = '(inizio)'
+FINE = '(fine)'
+ALTRO = '(altro)'
+RISERVATI = (INIZIO, FINE, ALTRO)
+NODO_INIZIO, NODO_FINE, NODO_ALTRO = range(len(RISERVATI))
+
+SECONDI_ORA = 3600
+# Errori possibili leggendo un file di statistiche
+ERRORI_FILE = (OSError, ValueError, KeyError, struct.error, zlib.error)
+
+
+def _zeri(tipo, quanti):
+    return array(tipo, bytes(array(tipo).itemsize * quanti))
+
+
+class Statistiche:
+    """Anello di eventi e contatori aggregati dei percorsi nel menu."""
+
+    def __init__(self, capienza=65_536, max_nodi=128, ore=168, sessione=1800, max_chat=50_000,
+                 adesso=time.time):
+        if max_nodi <= len(RISERVATI):
+            raise ValueError(f"Servono più di {len(RISERVATI)} nodi")
+        self.capienza = capienza
+        self.max_nodi = max_nodi
+        self.ore = ore
+        self.sessione = sessione
+        self.max_chat = max_chat
+        self.adesso = adesso
+        # Anello degli eventi grezzi
+        self._chat = _zeri('q', capienza)
+        self._eventi = _zeri('H', capienza)
+        self._scritti = 0
+        self._letti = 0
+        self.persi = 0
+        # Nodi: nome <-> indice
+        self.nodi = list(RISERVATI)
+        self._indici = {nome: i for i, nome in enumerate(self.nodi)}
+        # Contatori aggregati
+        self.visite = _zeri('I', ore * max_nodi)        # [slot * max_nodi + nodo]
+        self.ora_slot = _zeri('q', ore)                 # ora (timestamp // 3600) di ogni slot
+        self.transizioni = _zeri('I', max_nodi * max_nodi)  # [da * max_nodi + a]
+        self.totali = _zeri('Q', max_nodi)
+        self.sessioni = 0
+        # Ultimo nodo di ogni chat con una sessione aperta, dalla meno recente
+        self._ultimi = {}
+
+    def __len__(self):
+        """Eventi registrati e non ancora aggregati."""
+        return min(self._scritti - self._letti, self.capienza)
+
+    def registra(self, chat_id, nome):
+        """Un tap o un comando di `chat_id` (percorso caldo)."""
+        nodo = self._indici.get(nome)
+        if nodo is None:
+            nodo = self._nuovo_nodo(nome)
+        i = self._scritti % self.capienza
+        self._chat[i] = chat_id
+        self._eventi[i] = nodo
+        self._scritti += 1
+
+    def _nuovo_nodo(self, nome):
+        if len(self.nodi) >= self.max_nodi:
+            return NODO_ALTRO
+        nodo = len(self.nodi)
+        self.nodi.append(nome)
+        self._indici[nome] = nodo
+        return nodo
+
+    def indice(self, nome):
+        return self._indici.get(nome)
+
+    # ------------------------------------------------------------------
+    # Aggregazione
+    # ------------------------------------------------------------------
+
+    def aggrega(self):
+        """Sposta nei contatori gli eventi nuovi e chiude le sessioni scadute; restituisce gli eventi letti.
+
+        Gli eventi prendono l'istante dell'aggregazione: chiamata ogni secondo,
+        basta per le ore e per le sessioni.
+        """
+        adesso = int(self.adesso())
+        scritti = self._scritti
+        if scritti - self._letti > self.capienza:
+            self.persi += scritti - self._letti - self.capienza
+            self._letti = scritti - self.capienza
+        letti = scritti - self._letti
+        for n in range(self._letti, scritti):
+            i = n % self.capienza
+            self._conta(adesso, self._chat[i], self._eventi[i])
+        self._letti = scritti
+        self._chiudi_sessioni(adesso - self.sessione)
+        return letti
+
+    def _slot(self, ora):
+        """Slot dell'ora `ora`, azzerato se apparteneva a un'ora precedente; None se l'ora è già uscita."""
+        slot = ora % self.ore
+        if self.ora_slot[slot] > ora:
+            return None
+        if self.ora_slot[slot] != ora:
+            # Slot di un'ora uscita dalla finestra: si riparte da zero
+            inizio = slot * self.max_nodi
+            self.visite[inizio:inizio + self.max_nodi] = _zeri('I', self.max_nodi)
+            self.ora_slot[slot] = ora
+        return slot
+
+    def _transizione(self, da, a):
+        self.transizioni[da * self.max_nodi + a] += 1
+
+    def _conta(self, istante, chat_id, nodo):
+        slot = self._slot(istante // SECONDI_ORA)
+        if slot is not None:
+            self.visite[slot * self.max_nodi + nodo] += 1
+        self.totali[nodo] += 1
+        ultimo = self._ultimi.pop(chat_id, None)
+        if ultimo is not None and istante - ultimo[1] <= self.sessione:
+            self._transizione(ultimo[0], nodo)
+        else:
+            if ultimo is not None:
+                self._transizione(ultimo[0], NODO_FINE)
+            self._transizione(NODO_INIZIO, nodo)
+            self.sessioni += 1
+        self._ultimi[chat_id] = (nodo, istante)
+        if len(self._ultimi) > self.max_chat:
+            vecchia = next(iter(self._ultimi))
+            self._transizione(self._ultimi.pop(vecchia)[0], NODO_FINE)
+
+    def _chiudi_sessioni(self, limite):
+        """Le chat ferme da più di `sessione` secondi lasciano il menu dall'ultimo nodo visto."""
+        while self._ultimi:
+            chat_id = next(iter(self._ultimi))
+            nodo, istante = self._ultimi[chat_id]
+            if istante > limite:
+                break
+            del self._ultimi[chat_id]
+            self._transizione(nodo, NODO_FINE)
+
+    # ------------------------------------------------------------------
+    # Letture (solo contatori)
+    # ------------------------------------------------------------------
+
+    def _riga_ora(self, ora):
+        slot = ora % self.ore
+        if self.ora_slot[slot] != ora:
+            return None
+        inizio = slot * self.max_nodi
+        return self.visite[inizio:inizio + self.max_nodi]
+
+    def per_ora(self, ore=24, adesso=None):
+        """[(ora, tap)] delle ultime `ore` ore, dalla più vecchia; `ora` è timestamp // 3600."""
+        attuale = int(self.adesso() if adesso is None else adesso) // SECONDI_ORA
+        risultato = []
+        for ora in range(attuale - min(ore, self.ore) + 1, attuale + 1):
+            riga = self._riga_ora(ora)
+            risultato.append((ora, sum(riga) if riga is not None else 0))
+        return risultato
+
+    def visite_nodi(self, ore=None, adesso=None):
+        """Visite per indice di nodo: tutte (ore=None) o delle ultime `ore` ore."""
+        if ore is None:
+            return list(self.totali)
+        somma = [0] * self.max_nodi
+        attuale = int(self.adesso() if adesso is None else adesso) // SECONDI_ORA
+        for ora in range(attuale - min(ore, self.ore) + 1, attuale + 1):
+            riga = self._riga_ora(ora)
+            if riga is not None:
+                for nodo, visite in enumerate(riga):
+                    somma[nodo] += visite
+        return somma
+
+    def piu_visitati(self, quanti=10, ore=None, adesso=None):
+        """[(nome, visite)] dei nodi più visitati (ALTRO compreso)."""
+        visite = self.visite_nodi(ore, adesso)
+        nodi = sorted(range(NODO_ALTRO, len(self.nodi)), key=lambda nodo: visite[nodo], reverse=True)
+        return [(self.nodi[nodo], visite[nodo]) for nodo in nodi[:quanti] if visite[nodo]]
+
+    def successivi(self, nome):
+        """[(nome, volte)] dei nodi visitati subito dopo `nome` (FINE = uscite), dal più frequente."""
+        da = self._indici.get(nome)
+        if da is None:
+            return []
+        riga = self.transizioni[da * self.max_nodi:(da + 1) * self.max_nodi]
+        return sorted(((self.nodi[a], volte) for a, volte in enumerate(riga) if volte),
+                      key=lambda voce: voce[1], reverse=True)
+
+    def precedenti(self, nome):
+        """[(nome, volte)] dei nodi da cui si arriva a `nome` (INIZIO = primo tap), dal più frequente."""
+        a = self._indici.get(nome)
+        if a is None:
+            return []
+        colonna = self.transizioni[a::self.max_nodi]
+        return sorted(((self.nodi[da], volte) for da, volte in enumerate(colonna) if volte),
+                      key=lambda voce: voce[1], reverse=True)
+
+    def uscite(self, quanti=10):
+        """[(nome, uscite, frazione)] dei nodi da cui più spesso si lascia il menu."""
+        colonna = self.transizioni[NODO_FINE::self.max_nodi]
+        voci = []
+        for nodo in range(NODO_ALTRO, len(self.nodi)):
+            if colonna[nodo]:
+                partenze = sum(self.transizioni[nodo * self.max_nodi:(nodo + 1) * self.max_nodi])
+                voci.append((self.nodi[nodo], colonna[nodo], colonna[nodo] / partenze))
+        voci.sort(key=lambda voce: voce[1], reverse=True)
+        return voci[:quanti]
+
+    def imbuto(self, passi):
+        """[(nome, volte)] lungo il percorso `passi`: visite del primo, poi transizioni da un passo al successivo."""
+        nodi = [self._indici.get(nome) for nome in passi]
+        risultato = []
+        for k, (nome, nodo) in enumerate(zip(passi, nodi)):
+            if nodo is None or (k and nodi[k - 1] is None):
+                volte = 0
+            elif k == 0:
+                volte = self.totali[nodo]
+            else:
+                volte = self.transizioni[nodi[k - 1] * self.max_nodi + nodo]
+            risultato.append((nome, volte))
+        return risultato
+
+    def percorso_frequente(self, inizio, lunghezza=5):
+        """Percorso seguendo ogni volta il passo successivo più frequente (senza tornare indietro)."""
+        passi = [inizio]
+        while len(passi) < lunghezza:
+            prossimi = [nome for nome, _ in self.successivi(passi[-1])
+                        if nome not in RISERVATI and nome not in passi]
+            if not prossimi:
+                break
+            passi.append(prossimi[0])
+        return passi
+
+    # ------------------------------------------------------------------
+    # Unione e file
+    # ------------------------------------------------------------------
+
+    def unisci(self, altre):
+        """Somma ai contatori quelli di `altre` (per esempio letti dai file dei lavoratori)."""
+        mappa = [self._indici[nome] if nome in self._indici else self._nuovo_nodo(nome) for nome in altre.nodi]
+        for nodo, totale in enumerate(altre.totali[:len(altre.nodi)]):
+            if totale:
+                self.totali[mappa[nodo]] += totale
+        for da in range(len(altre.nodi)):
+            base = da * altre.max_nodi
+            for a in range(len(altre.nodi)):
+                volte = altre.transizioni[base + a]
+                if volte:
+                    self.transizioni[mappa[da] * self.max_nodi + mappa[a]] += volte
+        for slot, ora in enumerate(altre.ora_slot):
+            proprio = self._slot(ora) if ora else None
+            if proprio is None:
+                continue
+            inizio = slot * altre.max_nodi
+            for nodo, visite in enumerate(altre.visite[inizio:inizio + len(altre.nodi)]):
+                if visite:
+                    self.visite[proprio * self.max_nodi + mappa[nodo]] += visite
+        self.sessioni += altre.sessioni
+        self.persi += altre.persi
+
+    def _serializza(self):
+        intestazione = json.dumps({
+            'max_nodi': self.max_nodi, 'ore': self.ore, 'nodi': self.nodi,
+            'sessioni': self.sessioni, 'persi': self.persi
+        }, ensure_ascii=False).encode('utf-8')
+        corpo = b''.join(a.tobytes() for a in (self.visite, self.ora_slot, self.transizioni, self.totali))
+        return INTESTAZIONE.pack(FIRMA, VERSIONE, len(intestazione)) + intestazione + corpo
+
+    @staticmethod
+    def _scrivi(percorso, dati):
+        temporaneo = f"{percorso}.tmp"
+        with open(temporaneo, 'wb') as f:
+            f.write(zlib.compress(dati, 6))
+        os.replace(temporaneo, percorso)
+
+    def salva(self, percorso):
+        """Scrive i contatori in `percorso` (atomicamente); restituisce i byte scritti."""
+        self._scrivi(percorso, self._serializza())
+        return os.path.getsize(percorso)
+
+    async def salva_async(self, percorso):
+        """Come salva(), con compressione e scrittura in un thread (la copia degli array resta qui)."""
+        dati = self._serializza()
+        await asyncio.to_thread(self._scrivi, percorso, dati)
+
+    @classmethod
+    def leggi(cls, percorso):
+        """Statistiche salvate in `percorso` (solo contatori)."""
+        with open(percorso, 'rb') as f:
+            dati = zlib.decompress(f.read())
+        firma, versione, lunghezza = INTESTAZIONE.unpack_from(dati)
+        if firma != FIRMA or versione != VERSIONE:
+            raise ValueError(f"{percorso}: formato sconosciuto")
+        intestazione = json.loads(dati[INTESTAZIONE.size:INTESTAZIONE.size + lunghezza])
+        statistiche = cls(capienza=1, max_nodi=intestazione['max_nodi'], ore=intestazione['ore'])
+        statistiche.nodi = intestazione['nodi']
+        statistiche._indici = {nome: i for i, nome in enumerate(statistiche.nodi)}
+        statistiche.sessioni = intestazione['sessioni']
+        statistiche.persi = intestazione['persi']
+        posizione = INTESTAZIONE.size + lunghezza
+        for contatori in (statistiche.visite, statistiche.ora_slot, statistiche.transizioni, statistiche.totali):
+            fine = posizione + len(contatori) * contatori.itemsize
+            contatori[:] = array(contatori.typecode, dati[posizione:fine])
+            posizione = fine
+        return statistiche
+
+    async def carica(self, percorso):
+        """Riprende i contatori salvati in `percorso` (letti in un thread); False se manca o non è leggibile."""
+        if not os.path.exists(percorso):
+            return False
+        try:
+            self.unisci(await asyncio.to_thread(self.leggi, percorso))
+        except ERRORI_FILE as e:
+            logger.warning(f"⚠️ Statistiche non lette da {percorso}: {e}")
+            return False
+        return True
+
+    async def sorveglia(self, percorso=None, intervallo=1.0, salvataggio=60.0):
+        """Riprende `percorso`, poi aggrega ogni `intervallo` secondi e salva ogni `salvataggio` secondi (e alla fine)."""
+        if percorso:
+            await self.carica(percorso)
+        prossimo = time.monotonic() + salvataggio
+        try:
+            while True:
+                await asyncio.sleep(intervallo)
+                self.aggrega()
+                if percorso and time.monotonic() >= prossimo:
+                    prossimo = time.monotonic() + salvataggio
+                    try:
+                        await self.salva_async(percorso)
+                    except OSError as e:
+                        logger.error(f"❌ Statistiche non salvate in {percorso}: {e}")
+        except asyncio.CancelledError:
+            self.aggrega()
+            if percorso:
+                try:
+                    self.salva(percorso)
+                except OSError as e:
+                    logger.error(f"❌ Statistiche non salvate in {percorso}: {e}")
+            raise
@@ -0,0 +1,89 @@
+"""🩺 Permesso di pubblicare per canali e gruppi (canale.valuta e SaluteCanale)."""
+import unittest
+from types import SimpleNamespace
+
+from telegram.constants import ChatMemberStatus, ChatType
+
+from canale import SaluteCanale, valuta
+
+ID_GRUPPO = -1001234567890
+
+
+def membro(status, **permessi):
+    """ChatMember finto: solo lo stato e i permessi indicati."""
+    return SimpleNamespace(status=status, **permessi)
+
+
+class FintoBot:
+    id = 1
+
+    def __init__(self, tipo, membro):
+        self.tipo = tipo
+        self.membro = membro
+
+    async def get_chat(self, chat_id):
+        return SimpleNamespace(id=chat_id, type=self.tipo, username=None)
+
+    async def get_chat_member(self, chat_id, user_id):
+        return self.membro
+
+
+class TestValuta(unittest.TestCase):
+
+    def test_canale(self):
+        self.assertEqual(valuta(membro(ChatMemberStatus.OWNER)), (True, None))
+        self.assertEqual(valuta(membro(ChatMemberStatus.ADMINISTRATOR, can_post_messages=True)), (True, None))
+        puo, motivo = valuta(membro(ChatMemberStatus.ADMINISTRATOR, can_post_messages=None))
+        self.assertFalse(puo)
+        self.assertIn("permesso", motivo)
+        puo, motivo = valuta(membro(ChatMemberStatus.MEMBER), ChatType.CHANNEL)
+        self.assertFalse(puo)
+        self.assertIn("amministratore", motivo)
+
+    def test_gruppo(self):
+        for tipo in (ChatType.GROUP, ChatType.SUPERGROUP):
+            with self.subTest(tipo=tipo):
+                # Nei gruppi can_post_messages è sempre None
+                self.assertEqual(valuta(membro(ChatMemberStatus.ADMINISTRATOR, can_post_messages=None), tipo),
+                                 (True, None))
+                self.assertEqual(valuta(membro(ChatMemberStatus.MEMBER), tipo), (True, None))
+                self.assertEqual(valuta(membro(ChatMemberStatus.OWNER), tipo), (True, None))
+                self.assertEqual(valuta(membro(ChatMemberStatus.RESTRICTED, is_member=True, can_send_messages=True),
+                                        tipo), (True, None))
+
+    def test_gruppo_senza_permesso(self):
+        tipo = ChatType.SUPERGROUP
+        puo, motivo = valuta(membro(ChatMemberStatus.RESTRICTED, is_member=True, can_send_messages=False), tipo)
+        self.assertFalse(puo)
+        self.assertIn("inviare messaggi", motivo)
+        self.assertFalse(valuta(membro(ChatMemberStatus.RESTRICTED, is_member=False, can_send_messages=True),
+                                tipo)[0])
+        for status in (ChatMemberStatus.LEFT, ChatMemberStatus.BANNED):
+            puo, motivo = valuta(membro(status), tipo)
+            self.assertFalse(puo)
+            self.assertIn("non fa parte del gruppo", motivo)
+
+
+class TestSaluteGruppo(unittest.IsolatedAsyncioTestCase):
+
+    async def test_destinazione_gruppo_non_bloccata(self):
+        salute = SaluteCanale(ID_GRUPPO, nome='gruppo')
+        bot = FintoBot(ChatType.SUPERGROUP, membro(ChatMemberStatus.ADMINISTRATOR, can_post_messages=None))
+        await salute.aggiorna(bot)
+        self.assertTrue(salute.puo_pubblicare)
+        self.assertIsNone(salute.blocco(ID_GRUPPO))
+
+        bot.membro = membro(ChatMemberStatus.MEMBER)
+        await salute.aggiorna(bot)
+        self.assertTrue(salute.puo_pubblicare)
+        self.assertEqual(salute.stato_membro, ChatMemberStatus.MEMBER)
+
+    async def test_gruppo_lasciato_blocca_gli_invii(self):
+        salute = SaluteCanale(ID_GRUPPO, nome='gruppo')
+        await salute.aggiorna(FintoBot(ChatType.GROUP, membro(ChatMemberStatus.LEFT)))
+        self.assertFalse(salute.puo_pubblicare)
+        self.assertIn("non fa parte del gruppo", salute.blocco(ID_GRUPPO))
+
+
+if __name__ == '__main__':
+    unittest.main()
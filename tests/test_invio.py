@@ -0,0 +1,48 @@
+"""📤 LimitatoreInvii: secchi per chat e modifiche del menu nelle chat private."""
+import time
+import unittest
+
+from invio import LimitatoreInvii
+
+CHAT_PRIVATA = 12345
+GRUPPO = -1001234567890
+
+
+class TestLimitatoreInvii(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        # Un gettone ogni 0,2 s per chat: abbastanza per vedere l'attesa, poco per rallentare i test
+        self.limitatore = LimitatoreInvii(limite_globale=1000, limite_privato=5, limite_gruppo=5)
+        await self.limitatore.initialize()
+
+    async def asyncTearDown(self):
+        await self.limitatore.shutdown()
+
+    async def durata(self, endpoint, chat_id, quante):
+        async def chiamata():
+            return True
+
+        inizio = time.monotonic()
+        for _ in range(quante):
+            await self.limitatore.process_request(chiamata, (), {}, endpoint, {'chat_id': chat_id}, None)
+        return time.monotonic() - inizio
+
+    async def test_modifiche_private_senza_attesa(self):
+        # Tap rapidi sul menu: editMessageText non aspetta il gettone della chat
+        self.assertLess(await self.durata('editMessageText', CHAT_PRIVATA, 5), 0.1)
+
+    async def test_invii_privati_limitati(self):
+        # Capacità 1: ogni invio dopo il primo attende un gettone (0,2 s)
+        self.assertGreaterEqual(await self.durata('sendMessage', CHAT_PRIVATA, 3), 0.35)
+
+    async def test_gruppi_limitati_anche_nelle_modifiche(self):
+        # Capacità 3 nei gruppi, poi un gettone ogni 0,2 s anche per le modifiche
+        self.assertLess(await self.durata('editMessageText', GRUPPO, 3), 0.1)
+        self.assertGreaterEqual(await self.durata('editMessageText', GRUPPO, 2), 0.35)
+
+    async def test_metodi_non_limitati(self):
+        self.assertLess(await self.durata('answerCallbackQuery', CHAT_PRIVATA, 10), 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
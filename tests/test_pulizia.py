@@ -0,0 +1,108 @@
+"""🧹 CestinoMessaggi contro un Bot finto: blocchi da 100, raggruppamento per chat e ripiego su deleteMessage."""
+import asyncio
+import unittest
+
+from telegram.error import BadRequest, Forbidden
+
+from pulizia import MAX_PER_CHIAMATA, CestinoMessaggi
+
+
+class FintoBot:
+    """Registra le chiamate; `rifiuta` sono gli id che fanno fallire deleteMessages e deleteMessage."""
+
+    def __init__(self, rifiuta=()):
+        self.rifiuta = set(rifiuta)
+        self.blocchi = []   # (chat_id, [message_id]) per ogni deleteMessages
+        self.singoli = []   # (chat_id, message_id) per ogni deleteMessage
+        self.cancellati = set()
+
+    async def delete_messages(self, chat_id, message_ids):
+        self.blocchi.append((chat_id, list(message_ids)))
+        if self.rifiuta.intersection(message_ids):
+            raise BadRequest("Message can't be deleted")
+        self.cancellati.update((chat_id, message_id) for message_id in message_ids)
+        return True
+
+    async def delete_message(self, chat_id, message_id):
+        self.singoli.append((chat_id, message_id))
+        if message_id in self.rifiuta:
+            raise BadRequest("Message can't be deleted")
+        self.cancellati.add((chat_id, message_id))
+        return True
+
+
+class TestCestinoMessaggi(unittest.IsolatedAsyncioTestCase):
+
+    async def test_blocchi_da_cento(self):
+        bot = FintoBot()
+        cestino = CestinoMessaggi(ritardo=3600)
+        for message_id in range(1, 251):
+            cestino.aggiungi(bot, 1, message_id)
+        await asyncio.sleep(0)
+        # La soglia fa partire subito i primi due blocchi, il resto aspetta
+        self.assertEqual([len(ids) for _, ids in bot.blocchi], [MAX_PER_CHIAMATA, MAX_PER_CHIAMATA])
+        self.assertEqual(cestino.in_attesa, 50)
+
+        await cestino.svuota()
+        self.assertEqual([len(ids) for _, ids in bot.blocchi], [100, 100, 50])
+        self.assertEqual([message_id for _, ids in bot.blocchi for message_id in ids], list(range(1, 251)))
+        self.assertEqual(bot.singoli, [])
+        self.assertEqual(cestino.metriche(), {
+            'messaggi': 250, 'chiamate': 3, 'risparmiate': 247, 'errori': 0, 'in_attesa': 0
+        })
+
+    async def test_svuota_spezza_oltre_il_limite(self):
+        bot = FintoBot()
+        cestino = CestinoMessaggi(ritardo=3600, soglia=1000)
+        self.assertEqual(cestino.soglia, MAX_PER_CHIAMATA)
+        # Messaggi accodati senza passare dalla soglia: svuota() deve comunque spezzarli
+        cestino._attesa[7] = (bot, list(range(1, 231)))
+        await cestino.svuota()
+        self.assertEqual([len(ids) for _, ids in bot.blocchi], [100, 100, 30])
+
+    async def test_chat_diverse_in_blocchi_separati(self):
+        bot = FintoBot()
+        cestino = CestinoMessaggi(ritardo=0.01)
+        for message_id in range(1, 6):
+            for chat_id in (10, 20, 30):
+                cestino.aggiungi(bot, chat_id, message_id * chat_id)
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(len(bot.blocchi), 3)
+        self.assertEqual(sorted(bot.blocchi), [
+            (chat_id, [message_id * chat_id for message_id in range(1, 6)]) for chat_id in (10, 20, 30)
+        ])
+        self.assertEqual(cestino.in_attesa, 0)
+
+    async def test_ripiego_su_singoli_se_il_blocco_fallisce(self):
+        bot = FintoBot(rifiuta={3})
+        cestino = CestinoMessaggi(ritardo=3600)
+        for message_id in range(1, 6):
+            cestino.aggiungi(bot, 1, message_id)
+        await cestino.svuota()
+
+        self.assertEqual(bot.blocchi, [(1, [1, 2, 3, 4, 5])])
+        self.assertEqual(bot.singoli, [(1, message_id) for message_id in range(1, 6)])
+        self.assertEqual(bot.cancellati, {(1, 1), (1, 2), (1, 4), (1, 5)})
+        self.assertEqual(cestino.errori, 1)
+        self.assertEqual(cestino.chiamate, 6)
+
+    async def test_nessun_ripiego_per_altri_errori(self):
+        class BotBloccato(FintoBot):
+            async def delete_messages(self, chat_id, message_ids):
+                self.blocchi.append((chat_id, list(message_ids)))
+                raise Forbidden("bot was kicked")
+
+        bot = BotBloccato()
+        cestino = CestinoMessaggi(ritardo=3600)
+        for message_id in range(1, 6):
+            cestino.aggiungi(bot, 1, message_id)
+        await cestino.svuota()
+
+        self.assertEqual(len(bot.blocchi), 1)
+        self.assertEqual(bot.singoli, [])
+        self.assertEqual(cestino.errori, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""🔎 Indice della ricerca inline sul catalogo.json del repository."""
+import os
+import unittest
+
+import catalogo
+from ricerca import MAX_RISULTATI, normalizza, parole, trigrammi
+
+CATALOGO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'catalogo.json')
+
+
+class TestNormalizzazione(unittest.TestCase):
+
+    def test_normalizza(self):
+        self.assertEqual(normalizza('Città'), 'citta')
+        self.assertEqual(normalizza('PERCHÉ'), 'perche')
+        self.assertEqual(normalizza('matera'), 'matera')
+
+    def test_parole_senza_parole_vuote(self):
+        self.assertEqual(parole('Il vino della Basilicata!'), ['vino', 'basilicata'])
+
+    def test_trigrammi(self):
+        self.assertEqual(trigrammi('vino'), {'  v', ' vi', 'vin', 'ino', 'no '})
+        self.assertEqual(trigrammi('vino', prefisso=True), {'  v', ' vi', 'vin', 'ino'})
+
+
+class TestIndiceRicerca(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.indice = catalogo.carica_catalogo(CATALOGO, con_ricerca=True).ricerca
+
+    def primi(self, testo, quanti=3):
+        return [risultato.id for risultato in self.indice.cerca(testo)[:quanti]]
+
+    def test_accenti_refusi_e_prefissi(self):
+        self.assertIn('DESTINAZIONE_MATERA', self.primi('Città'))
+        self.assertEqual(self.primi('materra')[0], 'DESTINAZIONE_MATERA')
+        self.assertIn('DESTINAZIONE_MATERA', self.primi('mate'))
+        self.assertEqual(self.primi('vino')[0], 'PRODOTTI_VINI')
+
+    def test_piu_parole_tutte_presenti(self):
+        self.assertEqual(self.primi('peperoni senise'), ['PRODOTTI_CRUSCHI'])
+        self.assertEqual(self.indice.cerca('peperoni xyzzy'), ())
+
+    def test_ricerca_vuota(self):
+        risultati = self.indice.cerca('')
+        self.assertEqual(len(risultati), min(MAX_RISULTATI, len(self.indice)))
+        self.assertNotIn(catalogo.SCHERMATA_PRINCIPALE, [risultato.id for risultato in risultati])
+
+    def test_risposte_riusate(self):
+        # Stessa ricerca normalizzata: stessa tupla dall'LRU, con gli oggetti costruiti una volta sola
+        self.assertIs(self.indice.cerca('Vino'), self.indice.cerca('vino '))
+        self.assertIs(self.indice.cerca('vino')[0], self.indice.cerca('vini')[0])
+
+    def test_solo_pulsanti_url(self):
+        for risultato in self.indice.risultati:
+            for riga in (risultato.reply_markup.inline_keyboard if risultato.reply_markup else ()):
+                for pulsante in riga:
+                    self.assertIsNone(pulsante.callback_data, risultato.id)
+                    self.assertTrue(pulsante.url, risultato.id)
+
+
+if __name__ == '__main__':
+    unittest.main()
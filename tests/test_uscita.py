@@ -0,0 +1,126 @@
+"""📮 Posta in uscita: gruppi tolti dalla configurazione e post ripresi dal leader."""
+import asyncio
+import os
+import unittest
+from types import SimpleNamespace
+
+os.environ.setdefault('TELEGRAM_TOKEN', '0:test')
+os.environ.setdefault('ARCHIVIO_PATH', ':memory:')
+
+import gobasilicata_bot as bot  # noqa: E402
+from archivio import Archivio  # noqa: E402
+from orologio import OrologioVirtuale  # noqa: E402
+from pianificatore import Pianificatore  # noqa: E402
+from uscita import BLOCCATO, CONSEGNATO, FALLITO, IN_ATTESA, PostaInUscita  # noqa: E402
+
+ADMIN_ID = 42
+
+
+class FintoBot:
+    """Registra i messaggi inviati: (chat_id, testo)."""
+
+    def __init__(self):
+        self.inviati = []
+
+    async def send_message(self, chat_id, text, **opzioni):
+        await asyncio.sleep(0)
+        self.inviati.append((chat_id, text))
+        return SimpleNamespace(message_id=len(self.inviati))
+
+
+class TestGruppoSconosciuto(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.finto = FintoBot()
+        self.precedenti = bot.ADMIN_ID, bot.posta_uscita.bot, bot.posta_uscita.avviso
+        bot.ADMIN_ID = ADMIN_ID
+        bot.posta_uscita.bot = self.finto
+        bot.posta_uscita.avviso = bot.avvisa_post
+
+    async def asyncTearDown(self):
+        bot.ADMIN_ID, bot.posta_uscita.bot, bot.posta_uscita.avviso = self.precedenti
+
+    async def test_non_pubblica_nel_canale_predefinito(self):
+        esiti = await bot.invia_al_canale(None, 'programmato:prova', 'Sagra a Matera', gruppo='rimosso')
+
+        self.assertEqual([(esito.destinazione, esito.stato) for esito in esiti], [('rimosso', FALLITO)])
+        self.assertIn("rimosso", esiti[0].errore)
+        # Nessun invio alle destinazioni, solo l'avviso all'admin
+        self.assertEqual([chat_id for chat_id, _ in self.finto.inviati], [ADMIN_ID])
+        self.assertIn("Sagra a Matera", self.finto.inviati[0][1])
+
+        # Stessa chiave di nuovo (es. dopo un riavvio): nessun secondo avviso
+        esiti = await bot.invia_al_canale(None, 'programmato:prova', 'Sagra a Matera', gruppo='rimosso')
+        self.assertEqual(esiti[0].stato, FALLITO)
+        self.assertEqual(len(self.finto.inviati), 1)
+
+
+class TestRipresaLeader(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.archivio = Archivio(':memory:')
+        self.orologio = OrologioVirtuale(1_000_000)
+        self.pianificatore = Pianificatore(self.orologio)
+        self.posta = PostaInUscita(self.archivio, self.pianificatore)
+        self.posta.bot = self.finto = FintoBot()
+
+    async def asyncTearDown(self):
+        self.archivio.chiudi()
+
+    def registra(self, chiave, stato=IN_ATTESA):
+        riga, _ = self.archivio.registra_uscita(chiave, -100, chiave, '{}', self.orologio.adesso())
+        self.archivio.aggiorna_uscita(riga['id'], stato=stato)
+        return riga['id']
+
+    async def test_riallinea_riprende_i_post_senza_tentativo(self):
+        # Sbloccato da un'altra replica: in attesa nell'archivio ma senza lavoro qui
+        orfano = self.registra('orfano')
+        bloccato = self.registra('bloccato', BLOCCATO)
+        pianificato = self.registra('pianificato')
+        self.posta._pianifica(pianificato, self.orologio.adesso() + 3600, 'pianificato')
+
+        self.assertEqual(await self.posta.riallinea(), 1)
+        self.assertIn(PostaInUscita.id_lavoro(orfano), self.pianificatore)
+        self.assertNotIn(PostaInUscita.id_lavoro(bloccato), self.pianificatore)
+        # Una seconda passata non lo ripianifica
+        self.assertEqual(await self.posta.riallinea(), 0)
+
+        esecuzione = asyncio.create_task(self.pianificatore.esegui())
+        await self.orologio.avanza(1)
+        esecuzione.cancel()
+        await asyncio.gather(esecuzione, return_exceptions=True)
+        self.assertEqual(self.archivio.leggi_uscita(orfano)['stato'], CONSEGNATO)
+        self.assertEqual(self.finto.inviati, [(-100, 'orfano')])
+
+    async def test_tentativi_contemporanei_un_solo_invio(self):
+        id = self.registra('doppio')
+        esiti = await asyncio.gather(self.posta._tenta(id), self.posta._tenta(id))
+        self.assertEqual(esiti, [CONSEGNATO, CONSEGNATO])
+        self.assertEqual(len(self.finto.inviati), 1)
+
+
+class TestSaluteSuiFollower(unittest.IsolatedAsyncioTestCase):
+
+    async def test_follower_non_sblocca_e_non_avvisa(self):
+        finto = FintoBot()
+        precedenti = bot.elezione, bot.ADMIN_ID, bot.posta_uscita.bot
+        bot.elezione, bot.ADMIN_ID, bot.posta_uscita.bot = SimpleNamespace(leader=False), ADMIN_ID, finto
+        riga, _ = bot.archivio.registra_uscita('follower@canale', -100, 'testo', '{}', bot.orologio.adesso())
+        bot.archivio.aggiorna_uscita(riga['id'], stato=BLOCCATO)
+        try:
+            await bot.avvisa_salute(SimpleNamespace(puo_pubblicare=True, chat_id=-100, nome='canale'))
+            self.assertEqual(bot.archivio.leggi_uscita(riga['id'])['stato'], BLOCCATO)
+            self.assertEqual(finto.inviati, [])
+
+            # Il leader invece lo rimette in coda e avvisa l'admin
+            bot.elezione = SimpleNamespace(leader=True)
+            await bot.avvisa_salute(SimpleNamespace(puo_pubblicare=True, chat_id=-100, nome='canale'))
+            self.assertEqual(bot.archivio.leggi_uscita(riga['id'])['stato'], IN_ATTESA)
+            self.assertEqual([chat_id for chat_id, _ in finto.inviati], [ADMIN_ID])
+        finally:
+            bot.pianificatore.cancella(bot.posta_uscita.id_lavoro(riga['id']))
+            bot.elezione, bot.ADMIN_ID, bot.posta_uscita.bot = precedenti
+
+
+if __name__ == '__main__':
+    unittest.main()
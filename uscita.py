@@ -0,0 +1,320 @@
+"""📮 Posta in uscita persistente per i post nel canale.
+
+Ogni post viene scritto nell'archivio con una chiave di idempotenza prima
+di essere inviato, e ogni cambio di stato è salvato subito (non in coda):
+
+    in_attesa -> in_invio -> consegnato    (Telegram ha restituito il message_id)
+                          -> in_attesa     (errore sicuramente non consegnato: si riprova)
+                          -> incerto       (il post potrebbe essere arrivato)
+                          -> fallito       (errore permanente o tentativi esauriti)
+    in_attesa -> bloccato                  (il bot non può pubblicare: nessuna chiamata)
+    bloccato  -> in_attesa                 (sblocca(), quando il permesso torna)
+
+Una chiave già registrata non viene mai inviata di nuovo: chi ripete la
+stessa pubblicazione (un update ricevuto due volte, una ricorrenza che
+riscatta dopo un riavvio) ottiene lo stato esistente.
+
+Si riprova solo quando il post non può essere arrivato: flood wait,
+risposte di errore 5xx e connessioni mai aperte, con attesa esponenziale
+e jitter. Un timeout dopo l'invio della richiesta, o un post trovato
+`in_invio` all'avvio (il bot si è fermato durante la chiamata), diventa
+`incerto`: la Bot API non permette di verificare se è stato pubblicato,
+quindi decide l'admin (conferma() per reinviarlo, scarta() per chiuderlo)
+invece di rischiare un doppione nel canale.
+
+Le letture e i cambi di stato girano in un thread (Orologio.in_thread): la
+connessione è condivisa con lo scrittore dell'archivio e, con lavoratori e
+repliche sullo stesso file, può attendere il lock di SQLite per secondi
+senza fermare l'event loop.
+"""
+import asyncio
+import json
+import logging
+import random
+
+import httpx
+from telegram import InlineKeyboardMarkup
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+
+from invio import secondi
+
+logger = logging.getLogger(__name__)
+
+IN_ATTESA = 'in_attesa'
+IN_INVIO = 'in_invio'
+CONSEGNATO = 'consegnato'
+INCERTO = 'incerto'
+FALLITO = 'fallito'
+SCARTATO = 'scartato'
+BLOCCATO = 'bloccato'
+
+RIPROVA = 'riprova'
+
+# Errori di rete per cui la richiesta non è mai partita
+CONNESSIONE_MANCATA = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Per quanto si ricordano le chiavi dei post conclusi
+CONSERVAZIONE = 30 * 86400
+
+
+def classifica(errore):
+    """Esito di un invio fallito: RIPROVA, INCERTO o FALLITO."""
+    if isinstance(errore, RetryAfter):
+        return RIPROVA
+    if isinstance(errore, BadRequest):
+        # In PTB BadRequest è una sottoclasse di NetworkError
+        return FALLITO
+    if isinstance(errore, NetworkError):
+        causa = errore.__cause__
+        if isinstance(causa, CONNESSIONE_MANCATA):
+            return RIPROVA
+        if isinstance(errore, TimedOut) or causa is not None:
+            # Timeout o connessione caduta a richiesta inviata
+            return INCERTO
+        # Telegram ha risposto con un errore (502 e altri 5xx)
+        return RIPROVA
+    return FALLITO
+
+
+class PostaInUscita:
+    """Invii al canale con chiave di idempotenza e nuovi tentativi pianificati.
+
+    I nuovi tentativi sono lavori del pianificatore (tipo TIPO). Il bot
+    viene impostato da avvia(); `avviso(riga)`, se impostato, è una
+    coroutine chiamata quando un post diventa incerto o fallito.
+    `controllo(chat_id)`, se impostato, restituisce il motivo per cui non
+    si può pubblicare in quella chat (o None): il post resta bloccato
+    senza chiamare Telegram.
+    """
+
+    TIPO = 'uscita'
+
+    def __init__(self, archivio, pianificatore, max_tentativi=8, attesa_base=2.0,
+                 attesa_massima=900.0, seme=None):
+        self.archivio = archivio
+        self.pianificatore = pianificatore
+        self.max_tentativi = max_tentativi
+        self.attesa_base = attesa_base
+        self.attesa_massima = attesa_massima
+        self.bot = None
+        self.avviso = None
+        self.controllo = None
+        self._rng = random.Random(seme)
+        self._in_volo = 0
+        self._in_corso = {}  # id -> Event dei tentativi in corso: uno solo per post
+        self._libero = asyncio.Event()
+        self._libero.set()
+
+    @staticmethod
+    def id_lavoro(id):
+        return f"uscita:{id}"
+
+    def attesa(self, tentativi, minimo=0.0):
+        """Secondi prima del prossimo tentativo: esponenziale con jitter (metà fissa, metà casuale)."""
+        tetto = min(self.attesa_massima, self.attesa_base * 2 ** (tentativi - 1))
+        return max(minimo, self._rng.uniform(tetto / 2, tetto))
+
+    async def invia(self, chiave, chat_id, testo, reply_markup=None, parse_mode=None):
+        """Registra il post e lo invia subito.
+
+        Restituisce la riga del post (dict con stato, message_id, errore...).
+        Se la chiave esiste già non invia nulla e restituisce la riga
+        registrata (es. stato CONSEGNATO).
+        """
+        opzioni = {'parse_mode': parse_mode}
+        if reply_markup is not None:
+            opzioni['reply_markup'] = reply_markup.to_dict()
+        riga, nuova = await self.pianificatore.orologio.in_thread(
+            self.archivio.registra_uscita,
+            chiave, chat_id, testo, json.dumps(opzioni), self.pianificatore.orologio.adesso()
+        )
+        if not nuova:
+            logger.info("📮 Post '%s' già registrato (%s): non reinviato", chiave, riga['stato'])
+            return riga
+        await self._tenta(riga['id'])
+        return await self._leggi(riga['id'])
+
+    async def rifiuta(self, chiave, chat_id, testo, errore):
+        """Registra come fallito, senza inviarlo, un post che non si può pubblicare (es. gruppo sconosciuto).
+
+        L'admin viene avvisato una volta sola: la chiave resta registrata.
+        """
+        riga, nuova = await self.pianificatore.orologio.in_thread(
+            self.archivio.registra_uscita, chiave, chat_id, testo, '{}', self.pianificatore.orologio.adesso()
+        )
+        if not nuova:
+            return riga
+        await self._aggiorna(riga['id'], stato=FALLITO, errore=errore)
+        logger.error("❌ Post '%s' non pubblicato: %s", chiave, errore)
+        await self._avvisa(riga['id'])
+        return await self._leggi(riga['id'])
+
+    async def _leggi(self, id):
+        return await self.pianificatore.orologio.in_thread(self.archivio.leggi_uscita, id)
+
+    async def _aggiorna(self, id, **campi):
+        await self.pianificatore.orologio.in_thread(self.archivio.aggiorna_uscita, id, **campi)
+
+    async def _tenta(self, id):
+        in_corso = self._in_corso.get(id)
+        if in_corso is not None:
+            # Un altro tentativo dello stesso post (es. pianificato da riallinea): si attende il suo esito
+            await in_corso.wait()
+            riga = await self._leggi(id)
+            return riga and riga['stato']
+        evento = self._in_corso[id] = asyncio.Event()
+        try:
+            return await self._prova(id)
+        finally:
+            del self._in_corso[id]
+            evento.set()
+
+    async def _prova(self, id):
+        riga = await self._leggi(id)
+        if riga is None or riga['stato'] != IN_ATTESA:
+            return riga and riga['stato']
+
+        motivo = self.controllo and self.controllo(riga['chat_id'])
+        if motivo:
+            await self._aggiorna(id, stato=BLOCCATO, errore=motivo)
+            logger.warning("🚫 Post '%s' bloccato: %s", riga['chiave'], motivo)
+            return BLOCCATO
+
+        tentativi = riga['tentativi'] + 1
+        # Su disco prima della chiamata: se il bot si ferma adesso, all'avvio il post è incerto
+        await self._aggiorna(id, stato=IN_INVIO, tentativi=tentativi)
+        opzioni = json.loads(riga['opzioni'])
+        if 'reply_markup' in opzioni:
+            opzioni['reply_markup'] = InlineKeyboardMarkup.de_json(opzioni['reply_markup'], self.bot)
+
+        self._in_volo += 1
+        self._libero.clear()
+        try:
+            messaggio = await self.bot.send_message(chat_id=riga['chat_id'], text=riga['testo'], **opzioni)
+        except Exception as e:
+            errore = e
+        else:
+            errore = None
+        finally:
+            self._in_volo -= 1
+            if not self._in_volo:
+                self._libero.set()
+        if errore is not None:
+            return await self._errore(riga, tentativi, errore)
+
+        await self._aggiorna(id, stato=CONSEGNATO, message_id=messaggio.message_id, errore=None)
+        logger.info("✅ Post '%s' consegnato (message_id %s)", riga['chiave'], messaggio.message_id)
+        return CONSEGNATO
+
+    async def _errore(self, riga, tentativi, errore):
+        esito = classifica(errore)
+        if esito == RIPROVA and tentativi >= self.max_tentativi:
+            esito = FALLITO
+
+        if esito == RIPROVA:
+            minimo = secondi(errore.retry_after) if isinstance(errore, RetryAfter) else 0.0
+            prossimo = self.pianificatore.orologio.adesso() + self.attesa(tentativi, minimo)
+            await self._aggiorna(riga['id'], stato=IN_ATTESA, prossimo=prossimo, errore=str(errore))
+            self._pianifica(riga['id'], prossimo, riga['chiave'])
+            logger.warning(
+                "⏳ Post '%s' non inviato (tentativo %d): %s; nuovo tentativo tra %.0fs",
+                riga['chiave'], tentativi, errore, prossimo - self.pianificatore.orologio.adesso()
+            )
+            return IN_ATTESA
+
+        await self._aggiorna(riga['id'], stato=esito, errore=str(errore))
+        logger.error("❌ Post '%s' %s dopo %d tentativi: %s", riga['chiave'], esito, tentativi, errore)
+        await self._avvisa(riga['id'])
+        return esito
+
+    def _pianifica(self, id, quando, chiave):
+        self.pianificatore.aggiungi(
+            quando, self._tenta, id,
+            id=self.id_lavoro(id),
+            tipo=self.TIPO,
+            dati={'chiave': chiave}
+        )
+
+    async def _avvisa(self, id):
+        if self.avviso is None:
+            return
+        try:
+            await self.avviso(await self._leggi(id))
+        except Exception as e:
+            logger.error(f"❌ Errore avviso post {id}: {e}")
+
+    async def avvia(self, bot):
+        """Imposta il bot e riprende i post rimasti in sospeso; da chiamare all'avvio."""
+        self.bot = bot
+        adesso = self.pianificatore.orologio.adesso()
+        await self.pianificatore.orologio.in_thread(self.archivio.pulisci_uscita, adesso - CONSERVAZIONE)
+        incerti = []
+        for riga in await self.pianificatore.orologio.in_thread(self.archivio.uscita_in_sospeso):
+            if riga['stato'] == IN_ATTESA:
+                self._pianifica(riga['id'], max(riga['prossimo'], adesso), riga['chiave'])
+            elif riga['stato'] == BLOCCATO:
+                # Il controllo viene ripetuto al tentativo
+                await self._aggiorna(riga['id'], stato=IN_ATTESA)
+                self._pianifica(riga['id'], adesso, riga['chiave'])
+            else:
+                # in_invio: il bot si è fermato durante la chiamata a Telegram
+                await self._aggiorna(riga['id'], stato=INCERTO, errore='interrotto da un riavvio')
+                incerti.append(riga['id'])
+        if incerti:
+            logger.warning(f"⚠️ {len(incerti)} post interrotti durante l'invio: serve una conferma dell'admin")
+        for id in incerti:
+            await self._avvisa(id)
+
+    async def sblocca(self, chat_id=None):
+        """Rimette in coda i post bloccati (di `chat_id` o tutti) quando si può di nuovo pubblicare."""
+        adesso = self.pianificatore.orologio.adesso()
+        sbloccati = 0
+        for riga in await self.pianificatore.orologio.in_thread(self.archivio.uscita_in_sospeso):
+            if riga['stato'] == BLOCCATO and chat_id in (None, riga['chat_id']):
+                await self._aggiorna(riga['id'], stato=IN_ATTESA)
+                self._pianifica(riga['id'], adesso, riga['chiave'])
+                sbloccati += 1
+        if sbloccati:
+            logger.info(f"📮 {sbloccati} post bloccati rimessi in coda")
+        return sbloccati
+
+    async def riallinea(self):
+        """Pianifica i post in attesa che non hanno un tentativo pianificato qui.
+
+        Con più repliche un post può essere rimesso in attesa da un'altra
+        replica (es. sbloccato prima di un cambio di leader): il leader lo
+        riprende senza aspettare un riavvio. Restituisce i post ripresi.
+        """
+        adesso = self.pianificatore.orologio.adesso()
+        ripresi = 0
+        for riga in await self.pianificatore.orologio.in_thread(self.archivio.uscita_in_sospeso):
+            if (riga['stato'] == IN_ATTESA and riga['id'] not in self._in_corso
+                    and self.id_lavoro(riga['id']) not in self.pianificatore):
+                self._pianifica(riga['id'], max(riga['prossimo'], adesso), riga['chiave'])
+                ripresi += 1
+        if ripresi:
+            logger.info(f"📮 {ripresi} post in attesa senza tentativo pianificato ripresi")
+        return ripresi
+
+    async def conferma(self, id):
+        """L'admin ha verificato che un post incerto non è nel canale: lo reinvia."""
+        riga = await self._leggi(id)
+        if riga is None or riga['stato'] != INCERTO:
+            return riga and riga['stato']
+        await self._aggiorna(id, stato=IN_ATTESA)
+        return await self._tenta(id)
+
+    async def scarta(self, id):
+        """Chiude un post incerto, in attesa o bloccato senza inviarlo."""
+        riga = await self._leggi(id)
+        if riga is None or riga['stato'] not in (INCERTO, IN_ATTESA, BLOCCATO):
+            return riga and riga['stato']
+        self.pianificatore.cancella(self.id_lavoro(id))
+        await self._aggiorna(id, stato=SCARTATO)
+        return SCARTATO
+
+    async def attendi_invii(self, secondi):
+        """Attende (al massimo `secondi`) che finiscano le chiamate in corso."""
+        try:
+            await asyncio.wait_for(self._libero.wait(), timeout=secondi)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ {self._in_volo} post ancora in invio alla chiusura")
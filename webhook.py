@@ -0,0 +1,80 @@
+"""🪝 Modalità webhook: riceve gli update da Telegram tramite HTTP.
+
+Il server risponde subito 200 e mette l'update nella coda dell'Application,
+che lo elabora in background. Il lavoro è limitato: con MAX_CODA update in
+coda o in elaborazione (ProcessoreUpdate.in_volo) risponde 503 e Telegram
+riproverà più tardi.
+
+Endpoint:
+    POST <percorso>  update Telegram (header X-Telegram-Bot-Api-Secret-Token)
+    GET  /healthz    processo vivo
+    GET  /readyz     bot avviato e webhook registrato
+"""
+import hmac
+import json
+import logging
+
+from telegram import Update
+
+from server_http import Risposta, ServerHTTP
+
+logger = logging.getLogger(__name__)
+
+INTESTAZIONE_SEGRETO = 'x-telegram-bot-api-secret-token'
+
+
+class ServerWebhook:
+    """Endpoint webhook collegato alla update_queue di un'Application."""
+
+    def __init__(self, application, percorso='/webhook', segreto=None,
+                 host='127.0.0.1', porta=8443, max_coda=1000):
+        self.application = application
+        self.percorso = percorso
+        self.segreto = segreto
+        self.max_coda = max_coda
+        self.pronto = False
+        self.ricevuti = 0
+        self.rifiutati = 0
+        self.server = ServerHTTP(host, porta)
+        self.server.rotta('POST', percorso, self._ricevi)
+        self.server.rotta('GET', '/healthz', self._salute)
+        self.server.rotta('GET', '/readyz', self._prontezza)
+
+    async def _ricevi(self, richiesta):
+        if self.segreto:
+            ricevuto = richiesta.intestazioni.get(INTESTAZIONE_SEGRETO, '')
+            if not hmac.compare_digest(ricevuto, self.segreto):
+                return Risposta(403, b'forbidden')
+
+        coda = self.application.update_queue
+        # La coda da sola non basta: PTB la svuota subito avviando un task per update
+        in_volo = getattr(self.application.update_processor, 'in_volo', 0)
+        if coda.qsize() + in_volo >= self.max_coda:
+            self.rifiutati += 1
+            return Risposta(503, b'busy')
+
+        try:
+            dati = json.loads(richiesta.corpo)
+            update = Update.de_json(dati, self.application.bot)
+        except Exception as e:
+            logger.warning("⚠️ Update webhook non valido: %s", e)
+            return Risposta(400, b'bad update')
+
+        coda.put_nowait(update)
+        self.ricevuti += 1
+        return Risposta(200, b'ok')
+
+    async def _salute(self, richiesta):
+        return Risposta(200, b'ok')
+
+    async def _prontezza(self, richiesta):
+        if self.pronto and self.application.running:
+            return Risposta(200, b'ready')
+        return Risposta(503, b'starting')
+
+    async def avvia(self):
+        await self.server.avvia()
+
+    async def ferma(self):
+        self.pronto = False
+        await self.server.ferma()